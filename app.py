@@ -1,19 +1,39 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 import logging
 from typing import Optional
 import os
 import uvicorn
 import json
+import hmac
+import uuid
 import asyncio
 from datetime import datetime
 
+from src.core.admission import AdmissionRejected, admission, tenant_key
 from src.core.config import Config
-from src.model.pipeline_graph import stream_pipeline  # <-- use the graph runner
+from src.core.database import AsyncDatabaseService
+from src.core.encounters import EncounterStore, encounter_store
+from src.core.event_log import event_logs, format_sse, parse_last_event_id
+from src.core.job_queue import job_queue
+from src.core.log_config import configure_logging, log_context, stop_logging
+from src.core.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, metrics
+from src.core.profiling import profiler
+from src.core.result_writer import result_writer
+from src.core.stage_pools import stage_pools
+from src.model.audio_probe import AudioProbe, PreflightError
+from src.model.checkpoints import pipeline_checkpoints
+from src.model.dictation import DictationSession
+from src.model.file_service import FileService
+from src.model.job_worker import astream_analyze_events, astream_job_events, job_workers
+from src.model.pipeline_graph import (  # <-- use the graph runner
+    stream_pipeline, parse_schemas, reextract_result, stream_encounter_clip, finalize_encounter,
+)
+from src.model.prewarm import prewarmer
 
 # Initialize logger
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Initialize FastAPI app
@@ -29,15 +49,64 @@ app.add_middleware(
 )
 
 # Create uploads directory if it doesn't exist
-UPLOAD_FOLDER = "uploads"
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+UPLOAD_FOLDER = Config.UPLOAD_FOLDER
+Config.ensure_folders()
+
+@app.middleware("http")
+async def request_id_middleware(request: Request, call_next):
+    """Tag every log line of a request with its id (the caller's X-Request-ID if given)"""
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex[:12]
+    with log_context(request_id=request_id):
+        response = await call_next(request)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+@app.middleware("http")
+async def upload_size_limit(request: Request, call_next):
+    """Refuse bodies over MAX_CONTENT_LENGTH from the header, before the upload is read"""
+    content_length = request.headers.get("content-length")
+    # Multipart framing adds a little on top of the file itself
+    if content_length and content_length.isdigit() and int(content_length) > Config.MAX_CONTENT_LENGTH + 64 * 1024:
+        return JSONResponse(status_code=413, content={"detail": f"Upload exceeds {Config.MAX_CONTENT_LENGTH} bytes",
+                                                      "reason": "too_large"})
+    return await call_next(request)
+
+@app.exception_handler(PreflightError)
+async def preflight_error_handler(request: Request, exc: PreflightError):
+    """Uploads that are not usable audio are refused before any decoding or scheduling"""
+    return JSONResponse(status_code=exc.status_code, content={"detail": str(exc), "reason": exc.reason})
+
+async def _preflight_upload(file_path: str, filename: str, ticket=None):
+    """Header-only checks on a saved upload; a rejected file is removed (and its admission ticket released)."""
+    try:
+        return await asyncio.to_thread(AudioProbe.preflight, file_path, filename, Config.MAX_CONTENT_LENGTH, Config.PREFLIGHT_MAX_DURATION)
+    except PreflightError:
+        if ticket is not None:
+            admission.release(ticket)
+        await asyncio.to_thread(FileService.cleanup_file, file_path)
+        raise
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    """Shed load early instead of letting every request time out together"""
+    return JSONResponse(status_code=503, content={"detail": str(exc)},
+                        headers={"Retry-After": exc.retry_after_header})
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize application on startup"""
     logger.info("Initializing test application")
+    await asyncio.to_thread(job_workers.start)
+    prewarmer.start()
     logger.info("Application started successfully")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush pending results before the process exits"""
+    await asyncio.to_thread(job_workers.stop)
+    await asyncio.to_thread(result_writer.stop)
+    await asyncio.to_thread(stop_logging)
+
 @app.get("/")
 async def root():
     """Root endpoint for health check"""
@@ -46,53 +115,443 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    return {"status": "healthy", "timestamp": datetime.now().isoformat(), "prewarm": prewarmer.stats()["state"]}
+
+@app.get("/admission/stats")
+async def admission_stats():
+    """Pipeline concurrency, queue depth and wait times"""
+    return admission.stats()
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus metrics: stage durations, upstream latency, payload sizes, tokens, queue waits"""
+    return PlainTextResponse(metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/pipeline/stages")
+async def pipeline_stages():
+    """Per-stage worker utilization, queue depth and timings; names the busiest stage"""
+    return stage_pools.stats()
+
+def _is_admin(request: Request) -> bool:
+    # Fail closed: without a configured ADMIN_TOKEN nobody is an admin
+    token = request.headers.get("X-Admin-Token")
+    return bool(Config.ADMIN_TOKEN and token) and hmac.compare_digest(token.encode(), Config.ADMIN_TOKEN.encode())
+
+def _require_admin(request: Request):
+    if not _is_admin(request):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@app.get("/admin/profiles")
+async def list_profiles(request: Request):
+    """Stored run profiles, newest first"""
+    _require_admin(request)
+    return {"profiles": await asyncio.to_thread(profiler.list)}
+
+@app.get("/admin/profiles/{run_id}")
+async def get_profile(run_id: str, request: Request):
+    """Wall/CPU time per function and tracemalloc peaks of a profiled run"""
+    _require_admin(request)
+    report = await asyncio.to_thread(profiler.load, run_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="No profile for this run")
+    return report
+
+@app.get("/admin/profiles/{run_id}/flamegraph")
+async def get_flamegraph(run_id: str, request: Request, kind: str = "wall"):
+    """Collapsed stacks of a profiled run (kind=wall or cpu), for flamegraph.pl or speedscope"""
+    _require_admin(request)
+    folded = await asyncio.to_thread(profiler.load_folded, run_id, kind)
+    if folded is None:
+        raise HTTPException(status_code=404, detail="No profile for this run")
+    return PlainTextResponse(folded)
 
 @app.post("/analyze")
 async def Analyze(
-    audio: UploadFile = File(...),
+    request: Request,
+    audio: Optional[UploadFile] = File(None),
     language: str = Form("ar"),
-    features: Optional[str] = Form(None)  # optional override of DEFAULT_FEATURES
+    features: Optional[str] = Form(None),  # optional override of DEFAULT_FEATURES
+    user_id: Optional[int] = Form(None),
+    doctor_name: Optional[str] = Form(None),
+    run_id: Optional[str] = Form(None),  # X-Run-Id of an earlier run to resume from its checkpoint
 ):
     """Handle file uploads and stream processing results."""
     logger.info(f"Received upload request")
-    logger.info(f"File: {audio.filename}, Content Type: {audio.content_type}")
-    logger.info(f"Parameters: language={language}")
+    logger.info(f"Parameters: language={language}, run_id={run_id}")
+
+    broker_mode = Config.ANALYZE_MODE == "broker"
+    if run_id:
+        existing = event_logs.get(run_id)
+        if existing is not None and not existing.closed:
+            raise HTTPException(status_code=409, detail="Run is still in progress")
+        job = await asyncio.to_thread(job_queue.get_job, run_id) if broker_mode else None
+        if job is not None and job["status"] not in job_queue.TERMINAL_STATUSES:
+            raise HTTPException(status_code=409, detail="Run is still in progress")
+        if audio is None and not await asyncio.to_thread(pipeline_checkpoints.has_run, run_id):
+            raise HTTPException(status_code=404, detail="No checkpoint for this run; upload the audio again")
+    elif audio is None:
+        raise HTTPException(status_code=400, detail="No audio file provided")
 
-    logger.info(f"Upload parameters: language={language}")
+    # Reject early (503 + Retry-After) if the pipeline is saturated; in broker
+    # mode the workers schedule the run instead
+    ticket = None if broker_mode else admission.reserve(tenant_key(user_id, doctor_name))
 
     # Save the uploaded file
+    file_path = None
+    if audio is not None:
+        logger.info(f"File: {audio.filename}, Content Type: {audio.content_type}")
+        try:
+            contents = await audio.read()
+            file_path = os.path.join(UPLOAD_FOLDER, audio.filename)
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path, "wb") as f:
+                f.write(contents)
+            logger.info(f"File saved to {file_path}")
+        except Exception as e:
+            if ticket is not None:
+                admission.release(ticket)
+            logger.error(f"Error saving file: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error saving file: {str(e)}")
+        await _preflight_upload(file_path, audio.filename, ticket)
+
+    if broker_mode:
+        return await _analyze_via_broker(file_path, language, features, user_id, doctor_name, run_id)
+
+    # The run is decoupled from this connection: events are buffered in the run's
+    # event log so a client that drops can resume via /analyze/{run_id}/events.
+    # The same id keys the run's checkpoints, so a retry resumes from the last good stage.
+    run_id = run_id or uuid.uuid4().hex
+    # X-Profile: 1 (or PROFILE_SAMPLE_RATE) stores a profile under the run id, see /admin/profiles
+    profile = profiler.should_profile(request.headers.get("X-Profile") if _is_admin(request) else None)
+    run = event_logs.start_run(lambda: admission.run(ticket, lambda: profiler.profile_run(run_id, lambda: stream_pipeline(
+        file_path=file_path,
+        language=language,
+        api_key=Config.FIREWORKS_API_KEY,
+        features=features,
+        user_id=user_id,
+        doctor_name=doctor_name,
+        run_id=run_id,
+    ), profile)), run_id=run_id)
+
+    async def sse_generator():
+        """
+        Stream graph results as SSE events: id: <n>, data: {"step": <name>, "data": <payload>}
+        """
+        async for event_id, step_name, payload in run.afollow(0):
+            yield format_sse(event_id, step_name, payload)
+
+    return StreamingResponse(sse_generator(), media_type="text/event-stream",
+                             headers={"X-Run-Id": run.run_id, "Cache-Control": "no-cache"})
+
+async def _analyze_via_broker(file_path, language, features, user_id, doctor_name, run_id):
+    """ANALYZE_MODE=broker: queue the run for the pipeline workers and stream the events they publish."""
+    # A first run's job id is its run id; a retry gets a new job that resumes the run's checkpoints
+    job_id = uuid.uuid4().hex
+    run_id = run_id or job_id
+    await asyncio.to_thread(job_queue.enqueue, {
+        "file_path": file_path,
+        "language": language,
+        "features": features,
+        "user_id": user_id,
+        "doctor_name": doctor_name,
+        "run_id": run_id,
+        "priority": admission.INTERACTIVE,
+    }, "analyze", job_id)
+
+    async def sse_generator():
+        async for seq, step_name, payload in astream_analyze_events(job_id):
+            yield format_sse(seq, step_name, payload)
+
+    return StreamingResponse(sse_generator(), media_type="text/event-stream",
+                             headers={"X-Run-Id": run_id, "X-Job-Id": job_id, "Cache-Control": "no-cache"})
+
+@app.get("/analyze/{run_id}/events")
+async def resume_analyze(run_id: str, request: Request, after: int = 0):
+    """Resume an /analyze stream after the event in Last-Event-ID without recomputing anything."""
+    last_event_id = parse_last_event_id(request.headers.get("last-event-id"), after)
+    run = event_logs.get(run_id)
+    if run is None:
+        # Runs handed to the pipeline workers (ANALYZE_MODE=broker) live in the job broker
+        if await asyncio.to_thread(job_queue.get_job, run_id) is None:
+            raise HTTPException(status_code=404, detail="Run not found or expired")
+
+        async def job_sse_generator():
+            async for seq, step_name, payload in astream_analyze_events(run_id, last_event_id):
+                yield format_sse(seq, step_name, payload)
+
+        return StreamingResponse(job_sse_generator(), media_type="text/event-stream",
+                                 headers={"X-Run-Id": run_id, "Cache-Control": "no-cache"})
+
+    async def sse_generator():
+        async for event_id, step_name, payload in run.afollow(last_event_id):
+            yield format_sse(event_id, step_name, payload)
+
+    return StreamingResponse(sse_generator(), media_type="text/event-stream",
+                             headers={"X-Run-Id": run.run_id, "Cache-Control": "no-cache"})
+
+@app.websocket("/dictation")
+async def dictation(
+    websocket: WebSocket,
+    language: str = "ar",
+    encoding: str = DictationSession.PCM,  # "pcm" (16-bit little-endian mono) or "opus"
+    sample_rate: int = Config.DICTATION_SAMPLE_RATE,
+    user_id: Optional[int] = None,
+    doctor_name: Optional[str] = None,
+):
+    """
+    Real-time dictation. Send binary audio frames while speaking and a text
+    message {"type": "end"} when done (a text message may also carry
+    "features"). Receives {"step": ..., "data": ...} messages: rolling
+    partial_transcript / partial_validation / partial_refinement while
+    speaking, then the same final steps as /analyze.
+    """
+    await websocket.accept()
+    try:
+        session = DictationSession(
+            language=language, encoding=encoding, sample_rate=sample_rate,
+            api_key=Config.FIREWORKS_API_KEY, user_id=user_id, doctor_name=doctor_name,
+        )
+    except ValueError as e:
+        await websocket.send_json({"step": "error", "data": str(e)})
+        await websocket.close(code=1003)
+        return
+
+    async def send_events():
+        while True:
+            event = await session.events.get()
+            if event is None:
+                return
+            await websocket.send_json({"step": event[0], "data": event[1]})
+
+    sender = asyncio.create_task(send_events())
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("bytes") is not None:
+                await session.feed(message["bytes"])
+                continue
+            try:
+                control = json.loads(message.get("text") or "{}")
+            except ValueError:
+                control = {}
+            if control.get("features"):
+                session.features = control["features"]
+            if control.get("type") == "end":
+                break
+
+        await session.finish()
+        await session.events.put(None)  # flush the remaining events, then close
+        await sender
+        await websocket.close()
+    except WebSocketDisconnect:
+        logger.info("Dictation client disconnected")
+    except Exception as e:
+        logger.exception("Unexpected error in dictation")
+        await websocket.send_json({"step": "error", "data": f"Unexpected error: {str(e)}"})
+        await websocket.close(code=1011)
+    finally:
+        sender.cancel()
+        session.cancel()
+
+@app.post("/encounters", status_code=201)
+async def create_encounter(
+    language: str = Form("ar"),
+    features: Optional[str] = Form(None),
+    user_id: Optional[int] = Form(None),
+    doctor_name: Optional[str] = Form(None),
+):
+    """Open a multi-clip encounter; clips are appended with POST /encounters/{id}/clips."""
+    encounter_id = await asyncio.to_thread(encounter_store.create, language, features, user_id, doctor_name)
+    return {"encounter_id": encounter_id, "status": EncounterStore.OPEN}
+
+@app.get("/encounters/{encounter_id}")
+async def get_encounter(encounter_id: str):
+    """Return an encounter with its merged features and clips"""
+    encounter = await asyncio.to_thread(encounter_store.get, encounter_id)
+    if encounter is None:
+        raise HTTPException(status_code=404, detail="Encounter not found")
+    return encounter
+
+@app.post("/encounters/{encounter_id}/clips")
+async def add_encounter_clip(encounter_id: str, audio: UploadFile = File(...)):
+    """Process one more clip and stream its events; extraction updates the encounter's features."""
+    encounter = await asyncio.to_thread(encounter_store.get, encounter_id, False)
+    if encounter is None:
+        raise HTTPException(status_code=404, detail="Encounter not found")
+    if encounter["status"] != EncounterStore.OPEN:
+        raise HTTPException(status_code=409, detail="Encounter is already finalized")
+
+    ticket = admission.reserve(tenant_key(encounter["user_id"], encounter["doctor_name"]))
     try:
         contents = await audio.read()
-        file_path = os.path.join(UPLOAD_FOLDER, audio.filename)
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        clip_folder = os.path.join(UPLOAD_FOLDER, "encounters", encounter_id)
+        os.makedirs(clip_folder, exist_ok=True)
+        file_path = os.path.join(clip_folder, FileService._generate_unique_filename(audio.filename))
         with open(file_path, "wb") as f:
             f.write(contents)
-        logger.info(f"File saved to {file_path}")
     except Exception as e:
+        admission.release(ticket)
         logger.error(f"Error saving file: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error saving file: {str(e)}")
+    await _preflight_upload(file_path, audio.filename, ticket)
+
+    run = event_logs.start_run(lambda: admission.run(
+        ticket, lambda: stream_encounter_clip(encounter_id, file_path, api_key=Config.FIREWORKS_API_KEY)
+    ))
 
     async def sse_generator():
-        """
-        Stream graph results as SSE lines: {"step": <name>, "data": <payload>}
-        """
-        try:
-            # Iterate the LangGraph stream
-            for step_name, payload in stream_pipeline(
-                file_path=file_path,
-                language=language,
-                api_key=Config.FIREWORKS_API_KEY,
-                features=features
-            ):
-                yield json.dumps({"step": step_name, "data": payload}) + "\n"
-                await asyncio.sleep(0.01)  # tiny pause to flush to client
+        async for event_id, step_name, payload in run.afollow(0):
+            yield format_sse(event_id, step_name, payload)
 
-        except Exception as e:
-            logger.exception("Unexpected error in pipeline stream")
-            yield json.dumps({"step": "error", "data": f"Unexpected error: {str(e)}"}) + "\n"
+    return StreamingResponse(sse_generator(), media_type="text/event-stream",
+                             headers={"X-Run-Id": run.run_id, "Cache-Control": "no-cache"})
+
+@app.post("/encounters/{encounter_id}/finalize")
+async def finalize_encounter_endpoint(encounter_id: str):
+    """Close the encounter and store it as a single result"""
+    try:
+        result_id = await asyncio.to_thread(finalize_encounter, encounter_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404 if "not found" in str(e) else 409, detail=str(e))
+    return {"encounter_id": encounter_id, "result_id": result_id, "status": EncounterStore.FINALIZED}
+
+@app.post("/jobs", status_code=202)
+async def submit_job(
+    audio: UploadFile = File(...),
+    language: str = Form("ar"),
+    features: Optional[str] = Form(None),
+    user_id: Optional[int] = Form(None),
+    doctor_name: Optional[str] = Form(None),
+):
+    """Store the upload and queue it for background processing; returns a job id."""
+    try:
+        contents = await audio.read()
+        job_folder = os.path.join(UPLOAD_FOLDER, "jobs")
+        os.makedirs(job_folder, exist_ok=True)
+        file_path = os.path.join(job_folder, FileService._generate_unique_filename(audio.filename))
+        with open(file_path, "wb") as f:
+            f.write(contents)
+    except Exception as e:
+        logger.error(f"Error saving file: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error saving file: {str(e)}")
+    await _preflight_upload(file_path, audio.filename)
+
+    job_id = await asyncio.to_thread(job_queue.enqueue, {
+        "file_path": file_path,
+        "filename": audio.filename,
+        "language": language,
+        "features": features,
+        "user_id": user_id,
+        "doctor_name": doctor_name,
+    })
+    return {"job_id": job_id, "status": job_queue.QUEUED}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Job status plus every event recorded so far"""
+    job = await asyncio.to_thread(job_queue.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    events = await asyncio.to_thread(job_queue.get_events, job_id)
+    return {
+        "job_id": job_id,
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+        "events": events,
+    }
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request, after: int = 0):
+    """Replay a job's stored events, then live-tail new ones as SSE (resume with Last-Event-ID)."""
+    if await asyncio.to_thread(job_queue.get_job, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    after_seq = parse_last_event_id(request.headers.get("last-event-id"), after)
+
+    async def sse_generator():
+        async for seq, step_name, payload in astream_job_events(job_id, after_seq):
+            yield format_sse(seq, step_name, payload)
+
+    return StreamingResponse(sse_generator(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+@app.get("/results")
+async def list_results(
+    user_id: Optional[int] = None,
+    doctor_name: Optional[str] = None,
+    language: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+):
+    """Page through stored results (summary columns only), newest first"""
+    try:
+        rows, next_cursor = await AsyncDatabaseService.list_audio_results(
+            user_id=user_id, doctor_name=doctor_name, language=language,
+            start_date=start_date, end_date=end_date, cursor=cursor, limit=min(limit, 500),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"results": rows, "next_cursor": next_cursor}
+
+@app.get("/results/search")
+async def search_results(
+    q: str,
+    user_id: Optional[int] = None,
+    doctor_name: Optional[str] = None,
+    language: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+):
+    """Ranked full-text search over stored transcripts and extractions"""
+    try:
+        results = await AsyncDatabaseService.search_audio_results(
+            q, user_id=user_id, doctor_name=doctor_name, language=language,
+            limit=min(limit, 100), offset=offset,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"results": results}
+
+@app.get("/results/{result_id}")
+async def get_result(result_id: int):
+    """Return a single stored result with all of its texts"""
+    result = await AsyncDatabaseService.get_audio_result(result_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Result not found")
+    return result
 
-    return StreamingResponse(sse_generator(), media_type="text/event-stream")
+@app.post("/results/{result_id}/extract")
+async def reextract(result_id: int, schemas: Optional[str] = Form(None)):
+    """
+    Extract new feature schemas from a stored result without re-running the pipeline.
+
+    ``schemas`` is a JSON object (name -> schema text) or list of schema texts;
+    each schema costs one LLM call and they run concurrently.
+    """
+    try:
+        parsed = parse_schemas(schemas)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    result = await AsyncDatabaseService.get_audio_result(result_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Result not found")
+    ticket = admission.reserve(tenant_key(result.get("user_id"), result.get("doctor_name")))
+
+    def run_extraction():
+        with admission.slot(ticket):
+            return reextract_result(result, parsed)
+
+    try:
+        extractions = await asyncio.to_thread(run_extraction)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"result_id": result_id, "extractions": extractions}
 
 @app.post("/test-form")
 async def test_form_data(
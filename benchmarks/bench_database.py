@@ -0,0 +1,120 @@
+"""
+Micro-benchmark: pooled WAL connections vs. a fresh connection per call.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_database --rows 2000 --threads 4
+
+The "legacy" mode reproduces the previous DatabaseService behaviour (open a
+new rollback-journal connection, run one statement, commit, close); the
+"pooled" mode goes through the current DatabaseService.
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from src.core.database import DatabaseService
+
+ROW = dict(
+    user_id=1, filename="sample.ogg", language="ar", model="whisper-v3",
+    is_conversation=False, raw_text="x" * 800, arabic_text="y" * 800,
+    translation_text="z" * 800, json_data='{"plan": ""}', reasoning="r" * 200,
+    preprocessing_time=0.5, voice_processing_time=1.5, llm_processing_time=3.0,
+)
+
+
+def _legacy_insert(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute(
+            "INSERT INTO audio_results (user_id, filename, language, model, is_conversation, raw_text, "
+            "arabic_text, translation_text, json_data, reasoning, preprocessing_time, "
+            "voice_processing_time, llm_processing_time) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            tuple(ROW.values()),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _legacy_read(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("SELECT id, username, hashed_password FROM users WHERE username = ?", ("bench",)).fetchone()
+    finally:
+        conn.close()
+
+
+def _pooled_insert(db_path):
+    DatabaseService.save_audio_result(**ROW)
+
+
+def _pooled_read(db_path):
+    DatabaseService.verify_user("bench")
+
+
+def _run(fn, db_path, ops, threads):
+    errors = []
+    per_thread = ops // threads
+
+    def worker():
+        for _ in range(per_thread):
+            try:
+                fn(db_path)
+            except Exception as e:  # "database is locked" shows up here in legacy mode
+                errors.append(e)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return (per_thread * threads) / elapsed, len(errors)
+
+
+def _fresh_db(tmpdir, name, wal):
+    db_path = os.path.join(tmpdir, name)
+    DatabaseService.DB_PATH = db_path
+    DatabaseService.initialize_db()
+    DatabaseService.register_user("bench", "hash")
+    DatabaseService.close()
+    if not wal:
+        conn = sqlite3.connect(db_path)
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.close()
+    return db_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000, help="operations per measurement")
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        results = {}
+        for mode, insert_fn, read_fn, wal in (
+            ("legacy", _legacy_insert, _legacy_read, False),
+            ("pooled", _pooled_insert, _pooled_read, True),
+        ):
+            db_path = _fresh_db(tmpdir, f"{mode}.db", wal)
+            DatabaseService.DB_PATH = db_path
+            inserts, insert_errors = _run(insert_fn, db_path, args.rows, args.threads)
+            reads, read_errors = _run(read_fn, db_path, args.rows, args.threads)
+            DatabaseService.close()
+            results[mode] = (inserts, reads, insert_errors + read_errors)
+
+    print(f"{'mode':<8} {'inserts/s':>12} {'reads/s':>12} {'errors':>8}")
+    for mode, (inserts, reads, errors) in results.items():
+        print(f"{mode:<8} {inserts:>12.0f} {reads:>12.0f} {errors:>8}")
+    legacy, pooled = results["legacy"], results["pooled"]
+    print(f"speedup  {pooled[0] / legacy[0]:>11.1f}x {pooled[1] / legacy[1]:>11.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,383 @@
+"""
+End-to-end load benchmark of ``POST /analyze``.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_e2e --app fastapi --rate 2 --duration 60 \\
+        --audio-seconds 30 --codec ogg --output results.json
+
+Starts the Fireworks stand-in (benchmarks/fireworks_stub.py) and the chosen
+app (``fastapi`` or ``flask``) as a subprocess pointed at it, so nothing
+leaves the machine. Pass ``--url`` to drive an app that is already running
+instead (it must be configured against a stub or real keys itself).
+
+Requests arrive open-loop at a fixed ``--rate`` (``--arrivals poisson`` for
+exponential gaps), each uploading synthetic speech-like audio of
+``--audio-seconds`` in ``--codec``. For every request the time to the first
+SSE event (TTFR) and to the last one (TTFS) are recorded, along with the
+per-stage timings the pipeline attaches to its final event. The report has
+p50/p95/p99 for each, throughput, errors and 503 rejections, and the app's
+peak RSS and mean CPU.
+
+``--output`` writes the results as JSON. ``--baseline`` compares them with an
+earlier results file and exits with status 1 if a latency percentile grew or
+throughput fell by more than ``--tolerance`` (default 10%).
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+import requests
+import soundfile as sf
+
+from benchmarks.fireworks_stub import FireworksStub, start_in_background
+
+try:
+    import psutil  # optional, for non-Linux hosts
+except ImportError:
+    psutil = None
+
+SAMPLE_RATE = 44100  # phone and browser recordings; preprocessing assumes more than 16 kHz
+CODECS = {
+    "wav": ("WAV", "PCM_16", "audio/wav"),
+    "ogg": ("OGG", "VORBIS", "audio/ogg"),
+    "mp3": ("MP3", "MPEG_LAYER_III", "audio/mpeg"),
+}
+PERCENTILES = (50, 95, 99)
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# ---- Synthetic audio ------------------------------------------------------
+
+def synthesize_speech(seconds: float, seed: int = 0, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Speech-like test signal: voiced "syllables" (a gliding pitch with a few
+    harmonics shaped by two formant bands) at about 4 per second, separated
+    by short pauses and longer breaths, over a low noise floor.
+    """
+    rng = np.random.default_rng(seed)
+    samples = int(seconds * sample_rate)
+    audio = rng.normal(0.0, 0.003, samples)
+    position = int(0.3 * sample_rate)
+    while position < samples:
+        length = int(rng.uniform(0.12, 0.3) * sample_rate)
+        t = np.arange(min(length, samples - position)) / sample_rate
+        pitch = rng.uniform(100, 220) * (1 + 0.1 * np.sin(2 * np.pi * rng.uniform(2, 5) * t))
+        phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+        formants = rng.uniform(500, 900), rng.uniform(1200, 2400)
+        syllable = sum(
+            np.sin(k * phase) / k * sum(np.exp(-((k * pitch - f) / 300.0) ** 2) for f in formants)
+            for k in range(1, 12)
+        )
+        envelope = np.sin(np.pi * np.arange(len(t)) / max(1, len(t))) ** 2
+        audio[position:position + len(t)] += 0.3 * envelope * syllable
+        gap = rng.uniform(0.6, 1.2) if rng.random() < 0.1 else rng.uniform(0.03, 0.12)
+        position += len(t) + int(gap * sample_rate)
+    return (audio / max(1e-9, np.max(np.abs(audio))) * 0.8).astype(np.float32)
+
+
+def write_audio(path: str, audio: np.ndarray, codec: str, sample_rate: int = SAMPLE_RATE):
+    file_format, subtype, _ = CODECS[codec]
+    sf.write(path, audio, sample_rate, format=file_format, subtype=subtype)
+
+
+# ---- App under test -------------------------------------------------------
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_app(app: str, port: int, env: Dict[str, str], workdir: str) -> subprocess.Popen:
+    """Start the FastAPI or Flask app on ``port`` with ``env``; returns once /health answers."""
+    if app == "fastapi":
+        command = [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port),
+                   "--log-level", "warning"]
+    else:
+        command = [sys.executable, "-m", "flask", "--app", "flask_app", "run", "--host", "127.0.0.1",
+                   "--port", str(port), "--with-threads"]
+    env = {**os.environ, **env, "PYTHONPATH": REPO_ROOT}
+    process = subprocess.Popen(command, cwd=REPO_ROOT, env=env,
+                               stdout=open(os.path.join(workdir, f"{app}.log"), "w"), stderr=subprocess.STDOUT)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise Exception(f"{app} exited with {process.returncode}; see {workdir}/{app}.log")
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/health", timeout=1).ok:
+                return process
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    process.kill()
+    raise Exception(f"{app} did not become healthy within 60s")
+
+
+class ResourceSampler:
+    """Samples the RSS and CPU time of the app process on a background thread."""
+
+    def __init__(self, pid: int, interval: float = 0.5):
+        self.pid = pid
+        self.interval = interval
+        self.peak_rss = 0
+        self.cpu_seconds = 0.0
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._start_cpu = self._cpu()
+        self._started = time.monotonic()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.cpu_seconds = self._cpu() - self._start_cpu
+        self.elapsed = time.monotonic() - self._started
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, self._rss())
+
+    def _rss(self) -> int:
+        if psutil is not None:
+            try:
+                return psutil.Process(self.pid).memory_info().rss
+            except psutil.Error:
+                return 0
+        try:
+            with open(f"/proc/{self.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        return 0
+
+    def _cpu(self) -> float:
+        if psutil is not None:
+            try:
+                times = psutil.Process(self.pid).cpu_times()
+                return times.user + times.system
+            except psutil.Error:
+                return 0.0
+        try:
+            with open(f"/proc/{self.pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        except OSError:
+            return 0.0
+
+
+# ---- Load generation ------------------------------------------------------
+
+def analyze_once(url: str, audio_path: str, codec: str, index: int, language: str) -> dict:
+    """POST one recording to /analyze and time its SSE stream."""
+    result = {"status": None, "ttfr": None, "ttfs": None, "timings": {}, "error": None}
+    started = time.perf_counter()
+    try:
+        with open(audio_path, "rb") as f:
+            files = {"audio": (f"bench-{index}.{codec}", f, CODECS[codec][2])}
+            with requests.post(f"{url}/analyze", files=files, data={"language": language},
+                               stream=True, timeout=600) as response:
+                result["status"] = response.status_code
+                if response.status_code != 200:
+                    return result
+                last = None
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    if result["ttfr"] is None:
+                        result["ttfr"] = time.perf_counter() - started
+                    last = json.loads(line[len("data:"):])
+                result["ttfs"] = time.perf_counter() - started
+                data = (last or {}).get("data")
+                if isinstance(data, dict):
+                    result["timings"] = data.get("timings") or {}
+                if (last or {}).get("step") == "error":
+                    result["error"] = str(data)
+    except requests.RequestException as e:
+        result["error"] = str(e)
+    return result
+
+
+def run_load(url: str, audio_path: str, codec: str, rate: float, duration: float,
+             arrivals: str, language: str, seed: int) -> List[dict]:
+    """Open-loop load: start requests on schedule regardless of how fast earlier ones finish."""
+    rng = random.Random(seed)
+    offsets, offset = [], 0.0
+    while offset < duration:
+        offsets.append(offset)
+        offset += rng.expovariate(rate) if arrivals == "poisson" else 1.0 / rate
+    results = [None] * len(offsets)
+
+    def fire(index: int):
+        results[index] = analyze_once(url, audio_path, codec, index, language)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(8, len(offsets))) as pool:
+        for index, offset in enumerate(offsets):
+            delay = started + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(fire, index)
+    return results
+
+
+# ---- Reporting ------------------------------------------------------------
+
+def percentiles(samples: List[float]) -> Optional[Dict[str, float]]:
+    if not samples:
+        return None
+    values = np.percentile(np.array(samples), PERCENTILES)
+    return {f"p{p}": round(float(v), 4) for p, v in zip(PERCENTILES, values)}
+
+
+def summarize(results: List[dict], wall_time: float, sampler: Optional[ResourceSampler]) -> dict:
+    ok = [r for r in results if r["status"] == 200 and not r["error"]]
+    stages = sorted({stage for r in ok for stage in r["timings"]})
+    summary = {
+        "requests": len(results),
+        "ok": len(ok),
+        "rejected": sum(1 for r in results if r["status"] == 503),
+        "errors": sum(1 for r in results if r not in ok and r["status"] != 503),
+        "throughput_rps": round(len(ok) / wall_time, 3) if wall_time else 0.0,
+        "ttfr": percentiles([r["ttfr"] for r in ok if r["ttfr"] is not None]),
+        "ttfs": percentiles([r["ttfs"] for r in ok if r["ttfs"] is not None]),
+        "stages": {stage: percentiles([r["timings"][stage] for r in ok if stage in r["timings"]]) for stage in stages},
+    }
+    if sampler is not None:
+        summary["rss_peak_mb"] = round(sampler.peak_rss / 1024 / 1024, 1)
+        summary["cpu_percent"] = round(100 * sampler.cpu_seconds / sampler.elapsed, 1) if sampler.elapsed else 0.0
+    return summary
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Regressions of ``current`` against ``baseline``, as human-readable lines."""
+    regressions = []
+
+    def check(name: str, now: Optional[dict], before: Optional[dict]):
+        for key in (f"p{p}" for p in PERCENTILES):
+            if now and before and before.get(key) and now[key] > before[key] * (1 + tolerance):
+                regressions.append(f"{name} {key}: {before[key]:.3f}s -> {now[key]:.3f}s")
+
+    check("ttfr", current.get("ttfr"), baseline.get("ttfr"))
+    check("ttfs", current.get("ttfs"), baseline.get("ttfs"))
+    for stage, now in current.get("stages", {}).items():
+        check(f"stage {stage}", now, baseline.get("stages", {}).get(stage))
+    before = baseline.get("throughput_rps") or 0.0
+    if before and current["throughput_rps"] < before * (1 - tolerance):
+        regressions.append(f"throughput: {before:.3f} -> {current['throughput_rps']:.3f} req/s")
+    return regressions
+
+
+def print_report(summary: dict):
+    print(f"requests {summary['requests']}: ok {summary['ok']}, rejected {summary['rejected']}, "
+          f"errors {summary['errors']}, throughput {summary['throughput_rps']} req/s")
+    if "rss_peak_mb" in summary:
+        print(f"app peak RSS {summary['rss_peak_mb']} MB, CPU {summary['cpu_percent']}%")
+    print(f"{'metric':<24} {'p50 (s)':>10} {'p95 (s)':>10} {'p99 (s)':>10}")
+    rows = [("TTFR", summary["ttfr"]), ("TTFS", summary["ttfs"])]
+    rows += [(f"stage {stage}", values) for stage, values in summary["stages"].items()]
+    for name, values in rows:
+        if values:
+            print(f"{name:<24} {values['p50']:>10.3f} {values['p95']:>10.3f} {values['p99']:>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", choices=("fastapi", "flask"), default="fastapi")
+    parser.add_argument("--url", help="drive an already running app instead of starting one")
+    parser.add_argument("--rate", type=float, default=1.0, help="requests per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of arrivals")
+    parser.add_argument("--arrivals", choices=("fixed", "poisson"), default="fixed")
+    parser.add_argument("--audio-seconds", type=float, default=30.0)
+    parser.add_argument("--codec", choices=sorted(CODECS), default="ogg")
+    parser.add_argument("--sample-rate", type=int, default=SAMPLE_RATE)
+    parser.add_argument("--language", default="ar")
+    parser.add_argument("--transcription-latency", default="lognormal:1.5,0.4")
+    parser.add_argument("--completion-latency", default="lognormal:0.8,0.5")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        audio_path = os.path.join(workdir, f"speech.{args.codec}")
+        audio = synthesize_speech(args.audio_seconds, args.seed, args.sample_rate)
+        write_audio(audio_path, audio, args.codec, args.sample_rate)
+
+        process, sampler, stub_server = None, None, None
+        url = args.url
+        if url is None:
+            stub = FireworksStub(
+                transcription_latency=args.transcription_latency, completion_latency=args.completion_latency,
+                error_rate=args.error_rate, throttle_rate=args.throttle_rate, seed=args.seed,
+            )
+            stub_server = start_in_background(stub)
+            port = _free_port()
+            process = start_app(args.app, port, {
+                "FIREWORKS_BASE_URL": f"http://127.0.0.1:{stub_server.server_address[1]}",
+                "FIREWORKS_API_KEY": "stub", "refine": "stub", "translation": "stub", "extraction": "stub",
+                "UPLOAD_FOLDER": os.path.join(workdir, "uploads"),
+                "CHECKPOINT_DB_PATH": os.path.join(workdir, "checkpoints.db"),
+                "JOB_QUEUE_PATH": os.path.join(workdir, "jobs.db"),
+                "PERSIST_RESULTS": "0",
+            }, workdir)
+            url = f"http://127.0.0.1:{port}"
+            sampler = ResourceSampler(process.pid)
+            sampler.start()
+
+        try:
+            started = time.perf_counter()
+            results = run_load(url, audio_path, args.codec, args.rate, args.duration,
+                               args.arrivals, args.language, args.seed)
+            wall_time = time.perf_counter() - started
+        finally:
+            if sampler is not None:
+                sampler.stop()
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=30)
+            if stub_server is not None:
+                stub_server.shutdown()
+
+    summary = summarize(results, wall_time, sampler)
+    summary["config"] = {
+        **{key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count(),
+    }
+    print_report(summary)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(summary, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\nREGRESSIONS (>{args.tolerance:.0%} vs {args.baseline}):")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nno regressions vs {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Micro-benchmarks of the audio preprocessing steps.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_preprocessing --durations 10,60,600 \\
+        --sample-rates 8000,16000,44100,48000 --channels 1,2 --codecs wav,ogg,mp3 \\
+        --output preprocessing.json
+
+For every combination of duration, sample rate, channel count and input
+codec, a synthetic speech-like recording is written and the steps of
+``AudioPreprocessingService.preprocess_audio`` are timed one by one (decode,
+trim, high-pass, low-pass, spectral subtraction, normalize, save), followed
+by the whole function. Times are the median of ``--repeat`` runs; peak
+memory per step is measured in a separate pass under tracemalloc (numpy
+reports its buffers to it), so tracing never inflates the times.
+
+Pass ``--durations 3600`` for the hour-long case (needs several GB of RAM at
+48 kHz; that is part of what this finds). ogg and mp3 inputs are decoded
+through pydub and need ffmpeg; cases that cannot run are reported and
+skipped.
+
+``--output`` writes the results as JSON; ``--baseline`` compares with an
+earlier file and exits with status 1 if any step got slower by more than
+``--tolerance`` (default 20%; steps under 5 ms are ignored as noise).
+"""
+import argparse
+import itertools
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from benchmarks.bench_e2e import synthesize_speech, write_audio
+from src.model.audio_preprocessing import AudioPreprocessingService as APS
+
+SEED_SECONDS = 60  # synthesized once per rate, then tiled to the requested duration
+MIN_COMPARED_SECONDS = 0.005
+
+
+def make_recording(path: str, seconds: float, sample_rate: int, channels: int, codec: str):
+    seed = synthesize_speech(min(seconds, SEED_SECONDS), seed=1, sample_rate=sample_rate)
+    audio = np.resize(seed, int(seconds * sample_rate))
+    if channels > 1:
+        # A slightly delayed, quieter copy per extra channel, like a second microphone
+        audio = np.stack([np.roll(audio, 40 * channel) * (1 - 0.1 * channel) for channel in range(channels)], axis=1)
+    write_audio(path, audio, codec, sample_rate)
+
+
+def steps(path: str, output_path: str) -> List[tuple]:
+    """The pipeline as (name, function of the previous result) pairs, in order."""
+    return [
+        ("decode", lambda _: APS.decode(path)),
+        ("trim", lambda ysr: (APS.trim(ysr[0]), ysr[1])),
+        ("highpass", lambda ysr: (APS.highpass(*ysr), ysr[1])),
+        ("lowpass", lambda ysr: (APS.lowpass(*ysr), ysr[1])),
+        ("spectral_subtract", lambda ysr: (APS.spectral_subtract(*ysr), ysr[1])),
+        ("normalize", lambda ysr: (APS.normalize(ysr[0]), ysr[1])),
+        ("save", lambda ysr: APS.save(ysr[0], ysr[1], output_path)),
+    ]
+
+
+def time_steps(path: str, output_path: str, repeat: int) -> Dict[str, float]:
+    samples: Dict[str, List[float]] = {}
+    for _ in range(repeat):
+        value = None
+        for name, step in steps(path, output_path):
+            started = time.perf_counter()
+            value = step(value)
+            samples.setdefault(name, []).append(time.perf_counter() - started)
+        started = time.perf_counter()
+        APS.preprocess_audio(path, output_path)
+        samples.setdefault("total", []).append(time.perf_counter() - started)
+    return {name: statistics.median(values) for name, values in samples.items()}
+
+
+def peak_memory(path: str, output_path: str) -> Dict[str, int]:
+    """Peak bytes allocated while each step runs (inputs from earlier steps not counted)."""
+    peaks = {}
+
+    def traced(fn: Callable):
+        tracemalloc.start()
+        try:
+            result = fn()
+            _, peak = tracemalloc.get_traced_memory()
+            return result, peak
+        finally:
+            tracemalloc.stop()
+
+    value = None
+    for name, step in steps(path, output_path):
+        value, peaks[name] = traced(lambda: step(value))
+    _, peaks["total"] = traced(lambda: APS.preprocess_audio(path, output_path))
+    return peaks
+
+
+def run_case(workdir: str, seconds: float, sample_rate: int, channels: int, codec: str,
+             repeat: int, memory: bool) -> dict:
+    path = os.path.join(workdir, f"input-{seconds:g}s-{sample_rate}-{channels}ch.{codec}")
+    output_path = os.path.join(workdir, "output.wav")
+    case = {"seconds": seconds, "sample_rate": sample_rate, "channels": channels, "codec": codec}
+    try:
+        make_recording(path, seconds, sample_rate, channels, codec)
+        case["input_bytes"] = os.path.getsize(path)
+        APS.preprocess_audio(path, output_path)  # warm up (librosa/numba JIT, FFT plans)
+        case["seconds_per_step"] = time_steps(path, output_path, repeat)
+        if memory:
+            case["peak_bytes_per_step"] = peak_memory(path, output_path)
+    except Exception as e:
+        case["error"] = str(e)
+    finally:
+        for leftover in (path, output_path):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+    return case
+
+
+def case_key(case: dict) -> str:
+    return f"{case['seconds']:g}s {case['sample_rate']}Hz {case['channels']}ch {case['codec']}"
+
+
+def compare(current: List[dict], baseline: List[dict], tolerance: float) -> List[str]:
+    before = {case_key(case): case for case in baseline}
+    regressions = []
+    for case in current:
+        old = before.get(case_key(case), {}).get("seconds_per_step", {})
+        for name, seconds in case.get("seconds_per_step", {}).items():
+            if old.get(name, 0) >= MIN_COMPARED_SECONDS and seconds > old[name] * (1 + tolerance):
+                regressions.append(f"{case_key(case)} {name}: {old[name] * 1000:.1f} -> {seconds * 1000:.1f} ms")
+    return regressions
+
+
+def print_case(case: dict):
+    if "error" in case:
+        print(f"{case_key(case):<28} skipped: {case['error']}")
+        return
+    times = case["seconds_per_step"]
+    peaks = case.get("peak_bytes_per_step", {})
+    columns = "  ".join(
+        f"{name}={times[name] * 1000:.0f}ms" + (f"/{peaks[name] / 1048576:.0f}MB" if name in peaks else "")
+        for name in times
+    )
+    print(f"{case_key(case):<28} {columns}")
+
+
+def _numbers(value: str, kind=float) -> list:
+    return [kind(item) for item in value.split(",") if item]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--durations", default="10,60,600", help="seconds, comma separated")
+    parser.add_argument("--sample-rates", default="8000,16000,44100,48000")
+    parser.add_argument("--channels", default="1,2")
+    parser.add_argument("--codecs", default="wav,ogg,mp3")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.20)
+    args = parser.parse_args()
+
+    matrix = itertools.product(
+        _numbers(args.durations), _numbers(args.sample_rates, int), _numbers(args.channels, int),
+        [codec for codec in args.codecs.split(",") if codec],
+    )
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for seconds, sample_rate, channels, codec in matrix:
+            case = run_case(workdir, seconds, sample_rate, channels, codec, args.repeat, not args.no_memory)
+            print_case(case)
+            results.append(case)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"cases": results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)["cases"], args.tolerance)
+        if regressions:
+            print(f"\nREGRESSIONS (>{args.tolerance:.0%} vs {args.baseline}):")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nno regressions vs {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Full-text search benchmark over synthetic encounters.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_search --rows 1000000
+
+Fills a fresh database through DatabaseService (so the FTS5 index is built by
+the same triggers production uses), then reports median and p95 latency of
+ranked searches. Each encounter mentions a couple of drugs out of a large
+formulary, so drug-name queries are selective the way real ones are; the
+"common" queries match nearly every row and show the worst case.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from benchmarks.bench_storage import _encounter
+from src.core.database import DatabaseService
+
+FORMULARY = [f"drug{n:04d}" for n in range(2000)]
+SELECTIVE_QUERIES = ("drug0042", "drug1999 drug0007", "drug12")
+COMMON_QUERIES = ("metformin", "chest pain", "الأنسولين", "ألم في الصدر")
+
+
+def _with_drugs(encounter: dict, rng: random.Random) -> dict:
+    drugs = " ".join(rng.sample(FORMULARY, 2))
+    encounter["translation_text"] += f" prescribed {drugs}"
+    return encounter
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        DatabaseService.DB_PATH = os.path.join(tmpdir, "search.db")
+        DatabaseService.initialize_db()
+        start = time.perf_counter()
+        for batch_start in range(0, args.rows, 5000):
+            batch = [_with_drugs(_encounter(rng), rng) for _ in range(min(5000, args.rows - batch_start))]
+            DatabaseService.save_audio_results(batch)
+        print(f"indexed {args.rows} rows in {time.perf_counter() - start:.1f}s")
+
+        print(f"{'query':<16} {'p50 (ms)':>10} {'p95 (ms)':>10}")
+        for query in SELECTIVE_QUERIES + COMMON_QUERIES:
+            samples = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                DatabaseService.search_audio_results(query, limit=20)
+                samples.append((time.perf_counter() - started) * 1000)
+            samples.sort()
+            p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+            print(f"{query:<16} {statistics.median(samples):>10.2f} {p95:>10.2f}")
+        DatabaseService.close()
+
+
+if __name__ == "__main__":
+    main()
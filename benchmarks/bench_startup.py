@@ -0,0 +1,180 @@
+"""
+Cold-start report: import cost of the app modules and time until it serves.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_startup --app fastapi --runs 3 --output startup.json
+
+Two measurements, each in fresh processes so nothing is cached in memory
+(the OS page cache still is; run once before measuring for stable numbers):
+
+* Import time: ``python -X importtime -c "import app"`` (or ``flask_app``) is
+  parsed into self/cumulative microseconds per module. The report has the
+  total and the ``--top`` modules by cumulative time, which is where to look
+  when a new top-level import slows startup down.
+* Readiness: the app is started as a server (like benchmarks/bench_e2e.py)
+  and the seconds until ``/health`` first answers are recorded, then the
+  seconds until its ``prewarm`` field reports ``done`` (the background
+  warm-up of langgraph, librosa/numba and the clients, see
+  src/model/prewarm.py).
+
+Times are medians over ``--runs``. ``--output`` writes the results as JSON;
+``--baseline`` compares with an earlier file and exits with status 1 if the
+import total, time to health or prewarm time grew by more than
+``--tolerance`` (default 20%).
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import requests
+
+from benchmarks.bench_e2e import REPO_ROOT, _free_port, start_app
+
+MODULES = {"fastapi": "app", "flask": "flask_app"}
+COMPARED = ("import_seconds", "health_seconds", "prewarm_seconds")
+
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def import_times(module: str, env: Dict[str, str]) -> Dict[str, Dict[str, float]]:
+    """Run ``-X importtime`` in a fresh interpreter; module -> {self, cumulative, depth} (seconds)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, env={**os.environ, **env, "PYTHONPATH": REPO_ROOT},
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise Exception(f"import {module} failed: {result.stderr.strip().splitlines()[-1:]}")
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            modules[name] = {
+                "self": int(own) / 1e6, "cumulative": int(cumulative) / 1e6, "depth": len(indent) // 2,
+            }
+    return modules
+
+
+def readiness(app: str, env: Dict[str, str], workdir: str, prewarm_timeout: float) -> Dict[str, Optional[float]]:
+    """Seconds from process start to the first healthy /health, and to a finished prewarm."""
+    port = _free_port()
+    started = time.monotonic()
+    process = start_app(app, port, env, workdir)
+    health_seconds = time.monotonic() - started
+    prewarm_seconds = None
+    try:
+        deadline = time.monotonic() + prewarm_timeout
+        while time.monotonic() < deadline:
+            state = requests.get(f"http://127.0.0.1:{port}/health", timeout=5).json().get("prewarm")
+            if state in ("done", "disabled", None):
+                if state == "done":
+                    prewarm_seconds = time.monotonic() - started
+                break
+            time.sleep(0.1)
+    finally:
+        process.terminate()
+        process.wait(10)
+    return {"health_seconds": health_seconds, "prewarm_seconds": prewarm_seconds}
+
+
+def _median(values: List[Optional[float]]) -> Optional[float]:
+    values = [value for value in values if value is not None]
+    return statistics.median(values) if values else None
+
+
+def measure(app: str, runs: int, top: int, prewarm: bool, prewarm_timeout: float) -> dict:
+    module = MODULES[app]
+    with tempfile.TemporaryDirectory() as workdir:
+        env = {
+            "UPLOAD_FOLDER": os.path.join(workdir, "uploads"),
+            "CHECKPOINT_DB_PATH": os.path.join(workdir, "checkpoints.db"),
+            "JOB_QUEUE_PATH": os.path.join(workdir, "jobs.db"),
+            "PERSIST_RESULTS": "0",
+            "PREWARM": "1" if prewarm else "0",
+        }
+        imports = [import_times(module, env) for _ in range(runs)]
+        ready = [readiness(app, env, workdir, prewarm_timeout) for _ in range(runs)]
+
+    # Per-module medians across runs, ranked by cumulative time
+    modules = {}
+    for name in imports[0]:
+        samples = [run[name] for run in imports if name in run]
+        modules[name] = {
+            "self": statistics.median(sample["self"] for sample in samples),
+            "cumulative": statistics.median(sample["cumulative"] for sample in samples),
+            "depth": samples[0]["depth"],
+        }
+    slowest = sorted(modules.items(), key=lambda item: item[1]["cumulative"], reverse=True)
+    return {
+        "app": app,
+        "runs": runs,
+        "prewarm": prewarm,
+        "import_seconds": statistics.median(run[module]["cumulative"] for run in imports),
+        "health_seconds": _median([run["health_seconds"] for run in ready]),
+        "prewarm_seconds": _median([run["prewarm_seconds"] for run in ready]),
+        "slowest_imports": [{"module": name, **times} for name, times in slowest[:top]],
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> List[str]:
+    regressions = []
+    for key in COMPARED:
+        old, new = baseline.get(key), current.get(key)
+        if old and new and new > old * (1 + tolerance):
+            regressions.append(f"{key}: {old:.3f} -> {new:.3f} s")
+    return regressions
+
+
+def print_report(report: dict):
+    print(f"{report['app']} cold start (median of {report['runs']} runs)")
+    print(f"  import {MODULES[report['app']]:<12} {report['import_seconds'] * 1000:8.0f} ms")
+    if report["health_seconds"] is not None:
+        print(f"  first /health        {report['health_seconds'] * 1000:8.0f} ms")
+    if report["prewarm_seconds"] is not None:
+        print(f"  prewarm done         {report['prewarm_seconds'] * 1000:8.0f} ms")
+    print("  slowest imports (cumulative / self ms):")
+    for entry in report["slowest_imports"]:
+        print(f"    {entry['cumulative'] * 1000:8.1f} {entry['self'] * 1000:8.1f}  {'  ' * entry['depth']}{entry['module']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", choices=sorted(MODULES), default="fastapi")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=25, help="slowest imports to list")
+    parser.add_argument("--no-prewarm", action="store_true", help="start the app with PREWARM=0")
+    parser.add_argument("--prewarm-timeout", type=float, default=120.0)
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.20)
+    args = parser.parse_args()
+
+    report = measure(args.app, args.runs, args.top, not args.no_prewarm, args.prewarm_timeout)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\nREGRESSIONS (>{args.tolerance:.0%} vs {args.baseline}):")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nno regressions vs {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
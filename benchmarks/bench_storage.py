@@ -0,0 +1,151 @@
+"""
+Storage benchmark: inline text columns vs. the compressed payload side table.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_storage --rows 20000
+
+Builds two databases from the same synthetic encounters:
+
+* "inline": the original schema with raw/refined/translated text, json_data
+  and reasoning stored inline, listed with ``SELECT *`` (previous behaviour).
+* "compressed": the current DatabaseService schema (payloads compressed in
+  ``audio_result_payloads``, zstd dictionary trained on the first rows),
+  listed with ``list_audio_results``.
+
+Reports the database file size and the latency of a 50-row history page.
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from src.core.compression import PayloadCodec
+from src.core.database import DatabaseService
+
+ARABIC_WORDS = (
+    "المريض يشكو من ألم في الصدر منذ ثلاثة أيام مع ضيق في التنفس وسعال جاف "
+    "ارتفاع في درجة الحرارة ضغط الدم السكر الأنسولين الميتفورمين باراسيتامول "
+    "الفحص السريري الأشعة السينية التحليل المتابعة بعد أسبوع الجرعة مرتين يوميا"
+).split()
+ENGLISH_WORDS = (
+    "patient complains of chest pain for three days with shortness of breath and dry cough "
+    "fever blood pressure diabetes insulin metformin paracetamol clinical examination x-ray "
+    "labs follow up after one week dose twice daily history of hypertension"
+).split()
+
+
+def _encounter(rng: random.Random) -> dict:
+    length = rng.randint(80, 400)
+    arabic = " ".join(rng.choice(ARABIC_WORDS) for _ in range(length))
+    english = " ".join(rng.choice(ENGLISH_WORDS) for _ in range(length))
+    json_data = {
+        "chief_complaint": " ".join(rng.choice(ENGLISH_WORDS) for _ in range(6)),
+        "icd10_codes": ["R07.9 - Chest pain, unspecified", "R05 - Cough"],
+        "history_of_illness": " ".join(rng.choice(ENGLISH_WORDS) for _ in range(30)),
+        "current_medication": "Metformin 500mg twice daily",
+        "imaging_results": "",
+        "plan": " ".join(rng.choice(ENGLISH_WORDS) for _ in range(20)),
+        "assessment": " ".join(rng.choice(ENGLISH_WORDS) for _ in range(10)),
+        "follow_up": "Return in 7 days",
+    }
+    return dict(
+        user_id=rng.randint(1, 50), filename=f"{rng.getrandbits(64):x}.ogg", language="ar",
+        model="whisper-v3", is_conversation=False, raw_text=arabic, arabic_text=arabic,
+        translation_text=english, json_data=json.dumps(json_data), reasoning=english[:600],
+        preprocessing_time=1.0, voice_processing_time=2.0, llm_processing_time=6.0,
+        doctor_name=f"dr_{rng.randint(1, 20)}",
+    )
+
+
+def _build_inline(path: str, rows: list):
+    conn = sqlite3.connect(path)
+    conn.execute('''
+    CREATE TABLE audio_results (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, filename TEXT NOT NULL,
+        language TEXT NOT NULL, model TEXT NOT NULL, is_conversation BOOLEAN NOT NULL,
+        raw_text TEXT, arabic_text TEXT, translation_text TEXT, json_data TEXT, reasoning TEXT,
+        preprocessing_time REAL, voice_processing_time REAL, llm_processing_time REAL,
+        doctor_name TEXT, feedback TEXT, insertion_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''')
+    columns = list(rows[0])
+    conn.executemany(
+        f"INSERT INTO audio_results ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+        [tuple(row[c] for c in columns) for row in rows],
+    )
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+
+
+def _build_compressed(path: str, rows: list, train_rows: int):
+    DatabaseService.DB_PATH = path
+    DatabaseService.initialize_db()
+    DatabaseService.save_audio_results(rows[:train_rows])
+    if PayloadCodec.default_codec() == PayloadCodec.ZSTD:
+        DatabaseService.train_compression_dictionary(sample_limit=train_rows)
+        DatabaseService.recompress_payloads()
+    for start in range(train_rows, len(rows), 1000):
+        DatabaseService.save_audio_results(rows[start:start + 1000])
+    DatabaseService.pool().connection().execute("VACUUM")
+
+
+def _time(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--train-rows", type=int, default=1000, help="rows used to train the dictionary")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    rows = [_encounter(rng) for _ in range(args.rows)]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        inline_path = os.path.join(tmpdir, "inline.db")
+        compressed_path = os.path.join(tmpdir, "compressed.db")
+        _build_inline(inline_path, rows)
+        _build_compressed(compressed_path, rows, min(args.train_rows, args.rows))
+
+        inline_conn = sqlite3.connect(inline_path)
+        inline_conn.row_factory = sqlite3.Row
+
+        def inline_page():
+            [dict(r) for r in inline_conn.execute(
+                "SELECT * FROM audio_results ORDER BY insertion_date DESC LIMIT 50").fetchall()]
+
+        def compressed_page():
+            DatabaseService.list_audio_results(limit=50)
+
+        def compressed_open():
+            DatabaseService.get_audio_result(args.rows // 2)
+
+        inline_ms = _time(inline_page, args.repeat)
+        compressed_ms = _time(compressed_page, args.repeat)
+        open_ms = _time(compressed_open, args.repeat)
+        inline_size = os.path.getsize(inline_path)
+        compressed_size = os.path.getsize(compressed_path)
+        inline_conn.close()
+        DatabaseService.close()
+
+    print(f"codec: {PayloadCodec.default_codec()}, rows: {args.rows}")
+    print(f"{'layout':<12} {'db size (MiB)':>14} {'list page (ms)':>15}")
+    print(f"{'inline':<12} {inline_size / 2**20:>14.2f} {inline_ms:>15.2f}")
+    print(f"{'compressed':<12} {compressed_size / 2**20:>14.2f} {compressed_ms:>15.2f}")
+    print(f"size ratio: {inline_size / compressed_size:.2f}x, open one result: {open_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
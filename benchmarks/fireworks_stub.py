@@ -0,0 +1,292 @@
+"""
+Local stand-in for the Fireworks API, for offline load and latency testing.
+
+Run from the repository root:
+
+    python -m benchmarks.fireworks_stub --port 8787 \\
+        --transcription-latency lognormal:1.5,0.4 --completion-latency lognormal:0.8,0.5 \\
+        --error-rate 0.01 --throttle-rate 0.02
+
+and point the app at it (no real key is needed, and no audio or text leaves
+the machine):
+
+    FIREWORKS_BASE_URL=http://127.0.0.1:8787 FIREWORKS_API_KEY=stub python app.py
+
+Implements ``POST /inference/v1/audio/transcriptions`` (multipart, like
+Whisper) and ``POST /inference/v1/completions`` (plain and ``stream: true``
+SSE, like the fireworks client expects). Outputs are deterministic: each
+response is derived from the SHA-256 of the uploaded audio or the prompt, or
+taken verbatim from ``--canned`` (a JSON object of hash -> output). Latencies
+are drawn from the configured distributions and failures (500) and rate
+limits (429 + Retry-After) are injected at the given rates; ``--seed`` makes
+the whole sequence reproducible.
+
+Latency distributions are given as ``kind:params`` in seconds:
+``fixed:0.5``, ``uniform:0.2,1.0``, ``exponential:0.8`` (mean) or
+``lognormal:1.5,0.4`` (median, sigma).
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+
+from benchmarks.bench_storage import ARABIC_WORDS, ENGLISH_WORDS
+
+TRANSCRIPTION_PATH = "/inference/v1/audio/transcriptions"
+COMPLETIONS_PATH = "/inference/v1/completions"
+
+# Keys of a JSON template in an extraction prompt, e.g. "chief_complaint": ""
+_TEMPLATE_KEY = re.compile(r'"(\w+)"\s*:\s*("[^"]*"|\[\])')
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """Parse ``kind:params`` into a sampler of seconds (see the module docstring)."""
+    kind, _, params = spec.partition(":")
+    values = [float(value) for value in params.split(",") if value]
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "exponential" and len(values) == 1:
+        return lambda rng: rng.expovariate(1.0 / values[0]) if values[0] > 0 else 0.0
+    if kind == "lognormal" and len(values) == 2:
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"Invalid latency distribution: {spec}")
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _words(seed: str, count: int, arabic: bool = False) -> str:
+    rng = random.Random(seed)
+    vocabulary = ARABIC_WORDS if arabic else ENGLISH_WORDS
+    return " ".join(rng.choice(vocabulary) for _ in range(max(1, count)))
+
+
+def _tokens(text: str) -> int:
+    # Rough BPE estimate, good enough for token histograms
+    return max(1, round(len(text.split()) * 4 / 3))
+
+
+class FireworksStub:
+    """The stub's behaviour: canned outputs, latency sampling and fault injection."""
+
+    def __init__(self,
+                 transcription_latency: str = "lognormal:1.5,0.4",
+                 completion_latency: str = "lognormal:0.8,0.5",
+                 token_interval: float = 0.01,
+                 error_rate: float = 0.0,
+                 throttle_rate: float = 0.0,
+                 retry_after: float = 1.0,
+                 canned: Optional[Dict[str, str]] = None,
+                 seed: Optional[int] = None):
+        self.transcription_latency = parse_latency(transcription_latency)
+        self.completion_latency = parse_latency(completion_latency)
+        self.token_interval = token_interval
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.canned = canned or {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+
+    # --- Faults and latency --- #
+    def fault(self) -> Optional[int]:
+        """Status code to fail this request with (429 or 500), or None."""
+        with self._lock:
+            self.requests += 1
+            draw = self._rng.random()
+            if draw < self.throttle_rate:
+                self.throttled += 1
+                return 429
+            if draw < self.throttle_rate + self.error_rate:
+                self.errors += 1
+                return 500
+        return None
+
+    def delay(self, sampler: Callable[[random.Random], float]) -> float:
+        with self._lock:
+            seconds = max(0.0, sampler(self._rng))
+        time.sleep(seconds)
+        return seconds
+
+    # --- Canned outputs --- #
+    def transcription(self, audio: bytes, language: str) -> str:
+        key = _digest(audio)
+        if key in self.canned:
+            return self.canned[key]
+        # About one word per 8 KB of audio, like compressed speech
+        return _words(key, min(400, 5 + len(audio) // 8192), arabic=language == "ar")
+
+    def completion(self, prompt: str, structured: bool, max_tokens: int) -> str:
+        key = _digest(prompt.encode("utf-8"))
+        if key in self.canned:
+            return self.canned[key]
+        if "MEDICAL|95" in prompt:
+            # Medical content validator
+            return f"MEDICAL|{80 + int(key[:2], 16) % 20}"
+        if structured:
+            fields = {
+                name: [_words(key + name, 2)] if default == "[]" else _words(key + name, 6)
+                for name, default in _TEMPLATE_KEY.findall(prompt)
+                if name not in ("json_data", "reasoning")
+            }
+            return json.dumps({"json_data": fields, "reasoning": _words(key, 20)})
+        # Refinement / translation: roughly as long as the text in the prompt
+        return _words(key, min(max_tokens, len(prompt.split()) // 2))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    stub: FireworksStub = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # keep load runs quiet
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        path = self.path.split("?", 1)[0]
+        if path not in (TRANSCRIPTION_PATH, COMPLETIONS_PATH):
+            return self._json(404, {"error": f"Unknown path {path}"})
+        status = self.stub.fault()
+        if status is not None:
+            headers = {"Retry-After": str(math.ceil(self.stub.retry_after))} if status == 429 else {}
+            return self._json(status, {"error": "injected failure"}, headers)
+        if path == TRANSCRIPTION_PATH:
+            self._transcribe(body)
+        else:
+            self._complete(json.loads(body or b"{}"))
+
+    def _transcribe(self, body: bytes):
+        fields = _multipart_fields(self.headers.get("Content-Type", ""), body)
+        audio = fields.get("file", b"")
+        self.stub.delay(self.stub.transcription_latency)
+        self._json(200, {"text": self.stub.transcription(audio, fields.get("language", b"").decode())})
+
+    def _complete(self, request: dict):
+        prompt = request.get("prompt") or ""
+        text = self.stub.completion(prompt, bool(request.get("response_format")), int(request.get("max_tokens") or 2000))
+        usage = {"prompt_tokens": _tokens(prompt), "completion_tokens": _tokens(text)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        response = {
+            "id": uuid.uuid4().hex, "object": "text_completion", "created": int(time.time()),
+            "model": request.get("model", ""),
+        }
+        self.stub.delay(self.stub.completion_latency)  # time to first token
+        if not request.get("stream"):
+            return self._json(200, {
+                **response, "usage": usage,
+                "choices": [{"index": 0, "text": text, "finish_reason": "stop"}],
+            })
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        chunks = re.findall(r"\S+\s*", text) or [text]
+        for index, chunk in enumerate(chunks):
+            last = index == len(chunks) - 1
+            event = {
+                **response,
+                "choices": [{"index": 0, "text": chunk, "finish_reason": "stop" if last else None}],
+                "usage": usage if last else None,
+            }
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            if not last and self.stub.token_interval:
+                time.sleep(self.stub.token_interval)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+    def _json(self, status: int, payload: dict, headers: Optional[dict] = None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def _multipart_fields(content_type: str, body: bytes) -> Dict[str, bytes]:
+    """Minimal multipart/form-data parser: field name -> raw value."""
+    match = re.search(r'boundary="?([^";]+)"?', content_type)
+    if not match:
+        return {}
+    fields = {}
+    for part in body.split(b"--" + match.group(1).encode()):
+        head, separator, value = part.partition(b"\r\n\r\n")
+        name = re.search(rb'name="([^"]*)"', head)
+        if separator and name:
+            fields[name.group(1).decode()] = value[:-2] if value.endswith(b"\r\n") else value
+    return fields
+
+
+def make_server(stub: FireworksStub, host: str = "127.0.0.1", port: int = 8787) -> ThreadingHTTPServer:
+    """Build the HTTP server (port 0 picks a free port); call ``serve_forever`` to run it."""
+    handler = type("FireworksStubHandler", (_Handler,), {"stub": stub})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_background(stub: FireworksStub, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Serve ``stub`` on a daemon thread; returns the server (``server.server_address`` has the port)."""
+    server = make_server(stub, host, port)
+    threading.Thread(target=server.serve_forever, name="fireworks-stub", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--transcription-latency", default="lognormal:1.5,0.4")
+    parser.add_argument("--completion-latency", default="lognormal:0.8,0.5")
+    parser.add_argument("--token-interval", type=float, default=0.01, help="seconds between streamed chunks")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests failed with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of requests rejected with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--canned", help="JSON file mapping input SHA-256 -> output text")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    canned = None
+    if args.canned:
+        with open(args.canned, encoding="utf-8") as f:
+            canned = json.load(f)
+    stub = FireworksStub(
+        transcription_latency=args.transcription_latency,
+        completion_latency=args.completion_latency,
+        token_interval=args.token_interval,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+        canned=canned,
+        seed=args.seed,
+    )
+    server = make_server(stub, args.host, args.port)
+    print(f"Fireworks stub listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"served {stub.requests} requests ({stub.errors} errors, {stub.throttled} throttled)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,91 @@
-from flask import Flask, request, jsonify, Response, stream_template
+from flask import Flask, g, request, jsonify, Response, stream_template
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 import logging
 import os
+import hmac
 import json
+import uuid
 import asyncio
 from datetime import datetime
+from src.core.admission import AdmissionRejected, admission, tenant_key
 from src.core.config import Config
-from src.model.pipeline_graph import stream_pipeline
+from src.core.database import DatabaseService
+from src.core.encounters import EncounterStore, encounter_store
+from src.core.event_log import event_logs, format_sse, parse_last_event_id
+from src.core.job_queue import job_queue
+from src.core.log_config import configure_logging, request_id_var
+from src.core.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, metrics
+from src.core.profiling import profiler
+from src.core.stage_pools import stage_pools
+from src.model.audio_probe import AudioProbe, PreflightError
+from src.model.checkpoints import pipeline_checkpoints
+from src.model.file_service import FileService
+from src.model.job_worker import job_workers, stream_analyze_events, stream_job_events
+from src.model.pipeline_graph import (
+    stream_pipeline, parse_schemas, reextract_result, stream_encounter_clip, finalize_encounter,
+)
+from src.model.prewarm import prewarmer
 
 # Initialize logger
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Initialize Flask app
 app = Flask(__name__)
-app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB max file size
+# Multipart framing adds a little on top of the file itself
+app.config['MAX_CONTENT_LENGTH'] = Config.MAX_CONTENT_LENGTH + 64 * 1024
 
 # Add CORS support
 CORS(app, origins=["*"], supports_credentials=True)
 
 # Create uploads directory if it doesn't exist
-UPLOAD_FOLDER = "uploads"
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+UPLOAD_FOLDER = Config.UPLOAD_FOLDER
+Config.ensure_folders()
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
 # Application startup initialization
+@app.before_request
+def bind_request_id():
+    """Tag every log line of a request with its id (the caller's X-Request-ID if given)"""
+    g.request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex[:12]
+    request_id_var.set(g.request_id)  # each request runs in its own thread context
+
+@app.after_request
+def add_request_id_header(response):
+    response.headers["X-Request-ID"] = g.get("request_id", "")
+    return response
+
 @app.before_request
 def startup_event():
     """Initialize application on startup"""
     logger.info("Initializing test application")
+    job_workers.start()
+    prewarmer.start()
     logger.info("Application started successfully")
 
+@app.errorhandler(AdmissionRejected)
+def admission_rejected(error):
+    """Shed load early instead of letting every request time out together"""
+    response = jsonify({"error": str(error)})
+    response.headers["Retry-After"] = error.retry_after_header
+    return response, 503
+
+@app.errorhandler(PreflightError)
+def preflight_rejected(error):
+    """Uploads that are not usable audio are refused before any decoding or scheduling"""
+    return jsonify({"error": str(error), "reason": error.reason}), error.status_code
+
+def _preflight_upload(file_path, filename, ticket=None):
+    """Header-only checks on a saved upload; a rejected file is removed (and its admission ticket released)."""
+    try:
+        return AudioProbe.preflight(file_path, filename, Config.MAX_CONTENT_LENGTH, Config.PREFLIGHT_MAX_DURATION)
+    except PreflightError:
+        if ticket is not None:
+            admission.release(ticket)
+        FileService.cleanup_file(file_path)
+        raise
+
 @app.route("/", methods=["GET"])
 def root():
     """Root endpoint for health check"""
@@ -46,61 +100,307 @@ def health_check():
     """Health check endpoint"""
     return jsonify({
         "status": "healthy", 
-        "timestamp": datetime.now().isoformat()
+        "timestamp": datetime.now().isoformat(),
+        "prewarm": prewarmer.stats()["state"],
     })
 
+@app.route("/admission/stats", methods=["GET"])
+def admission_stats():
+    """Pipeline concurrency, queue depth and wait times"""
+    return jsonify(admission.stats())
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Prometheus metrics: stage durations, upstream latency, payload sizes, tokens, queue waits"""
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+@app.route("/pipeline/stages", methods=["GET"])
+def pipeline_stages():
+    """Per-stage worker utilization, queue depth and timings; names the busiest stage"""
+    return jsonify(stage_pools.stats())
+
+def _is_admin():
+    # Fail closed: without a configured ADMIN_TOKEN nobody is an admin
+    token = request.headers.get("X-Admin-Token")
+    return bool(Config.ADMIN_TOKEN and token) and hmac.compare_digest(token.encode(), Config.ADMIN_TOKEN.encode())
+
+@app.route("/admin/profiles", methods=["GET"])
+def list_profiles():
+    """Stored run profiles, newest first"""
+    if not _is_admin():
+        return jsonify({"error": "Admin token required"}), 403
+    return jsonify({"profiles": profiler.list()})
+
+@app.route("/admin/profiles/<run_id>", methods=["GET"])
+def get_profile(run_id):
+    """Wall/CPU time per function and tracemalloc peaks of a profiled run"""
+    if not _is_admin():
+        return jsonify({"error": "Admin token required"}), 403
+    report = profiler.load(run_id)
+    if report is None:
+        return jsonify({"error": "No profile for this run"}), 404
+    return jsonify(report)
+
+@app.route("/admin/profiles/<run_id>/flamegraph", methods=["GET"])
+def get_flamegraph(run_id):
+    """Collapsed stacks of a profiled run (kind=wall or cpu), for flamegraph.pl or speedscope"""
+    if not _is_admin():
+        return jsonify({"error": "Admin token required"}), 403
+    folded = profiler.load_folded(run_id, request.args.get("kind", "wall"))
+    if folded is None:
+        return jsonify({"error": "No profile for this run"}), 404
+    return Response(folded, content_type="text/plain; charset=utf-8")
+
 @app.route("/analyze", methods=["POST"])
 def analyze():
     """Handle file uploads and stream processing results."""
     logger.info("Received upload request")
     
-    # Check if file is present
-    if 'audio' not in request.files:
-        logger.error("No audio file provided")
-        return jsonify({"error": "No audio file provided"}), 400
-    
-    audio_file = request.files['audio']
-    logger.info(f"audio_file: {audio_file}" )
-    if audio_file.filename == '':
-        logger.error("No file selected")
-        return jsonify({"error": "No file selected"}), 400
-    
     # Get form parameters
     language = request.form.get('language', 'ar')
     features = request.form.get('features', None)
+    user_id = request.form.get('user_id', None, type=int)
+    doctor_name = request.form.get('doctor_name', None)
+    run_id = request.form.get('run_id', None)  # X-Run-Id of an earlier run to resume from its checkpoint
+    
+    # A retry of an earlier run may omit the audio when its transcription is checkpointed
+    audio_file = request.files.get('audio')
+    if audio_file is not None and audio_file.filename == '':
+        audio_file = None
+    broker_mode = Config.ANALYZE_MODE == "broker"
+    if run_id:
+        existing = event_logs.get(run_id)
+        if existing is not None and not existing.closed:
+            return jsonify({"error": "Run is still in progress"}), 409
+        job = job_queue.get_job(run_id) if broker_mode else None
+        if job is not None and job["status"] not in job_queue.TERMINAL_STATUSES:
+            return jsonify({"error": "Run is still in progress"}), 409
+        if audio_file is None and not pipeline_checkpoints.has_run(run_id):
+            return jsonify({"error": "No checkpoint for this run; upload the audio again"}), 404
+    elif audio_file is None:
+        logger.error("No audio file provided")
+        return jsonify({"error": "No audio file provided"}), 400
+    
+    logger.info(f"Parameters: language={language}, run_id={run_id}")
     
-    logger.info(f"File_org:, {request.files['audio']} File: {audio_file.filename}, Content Type: {audio_file.content_type}")
-    logger.info(f"Parameters: language={language}")
+    # Reject early (503 + Retry-After) if the pipeline is saturated; in broker
+    # mode the workers schedule the run instead
+    ticket = None if broker_mode else admission.reserve(tenant_key(user_id, doctor_name))
     
     # Save the uploaded file
+    file_path = None
+    if audio_file is not None:
+        logger.info(f"File: {audio_file.filename}, Content Type: {audio_file.content_type}")
+        try:
+            filename = secure_filename(audio_file.filename)
+            file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            audio_file.save(file_path)
+            logger.info(f"File saved to {file_path}")
+        except Exception as e:
+            if ticket is not None:
+                admission.release(ticket)
+            logger.error(f"Error saving file: {str(e)}")
+            return jsonify({"error": f"Error saving file: {str(e)}"}), 500
+        _preflight_upload(file_path, audio_file.filename, ticket)
+    
+    if broker_mode:
+        return _analyze_via_broker(file_path, language, features, user_id, doctor_name, run_id)
+    
+    # The run is decoupled from this connection: events are buffered in the run's
+    # event log so a client that drops can resume via /analyze/<run_id>/events.
+    # The same id keys the run's checkpoints, so a retry resumes from the last good stage.
+    run_id = run_id or uuid.uuid4().hex
+    # X-Profile: 1 (or PROFILE_SAMPLE_RATE) stores a profile under the run id, see /admin/profiles
+    profile = profiler.should_profile(request.headers.get("X-Profile") if _is_admin() else None)
+    run = event_logs.start_run(lambda: admission.run(ticket, lambda: profiler.profile_run(run_id, lambda: stream_pipeline(
+        file_path=file_path,
+        language=language,
+        features=features,
+        user_id=user_id,
+        doctor_name=doctor_name,
+        run_id=run_id,
+    ), profile)), run_id=run_id)
+    return _stream_run(run, 0)
+
+def _analyze_via_broker(file_path, language, features, user_id, doctor_name, run_id):
+    """ANALYZE_MODE=broker: queue the run for the pipeline workers and stream the events they publish."""
+    # A first run's job id is its run id; a retry gets a new job that resumes the run's checkpoints
+    job_id = uuid.uuid4().hex
+    run_id = run_id or job_id
+    job_queue.enqueue({
+        "file_path": file_path,
+        "language": language,
+        "features": features,
+        "user_id": user_id,
+        "doctor_name": doctor_name,
+        "run_id": run_id,
+        "priority": admission.INTERACTIVE,
+    }, "analyze", job_id)
+    return _stream_job_run(job_id, run_id, 0)
+
+@app.route("/analyze/<run_id>/events", methods=["GET"])
+def resume_analyze(run_id):
+    """Resume an /analyze stream after the event in Last-Event-ID without recomputing anything."""
+    last_event_id = parse_last_event_id(request.headers.get('Last-Event-ID'), request.args.get('after', 0, type=int))
+    run = event_logs.get(run_id)
+    if run is None:
+        # Runs handed to the pipeline workers (ANALYZE_MODE=broker) live in the job broker
+        if job_queue.get_job(run_id) is None:
+            return jsonify({"error": "Run not found or expired"}), 404
+        return _stream_job_run(run_id, run_id, last_event_id)
+    return _stream_run(run, last_event_id)
+
+def _stream_job_run(job_id, run_id, last_event_id):
+    """Stream the events a pipeline worker publishes for an /analyze job, in the same SSE format"""
+    def sse_generator():
+        for seq, step_name, payload in stream_analyze_events(job_id, last_event_id):
+            yield format_sse(seq, step_name, payload)
+
+    return Response(
+        sse_generator(),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'Connection': 'keep-alive',
+            'Access-Control-Allow-Origin': '*',
+            'X-Run-Id': run_id,
+            'X-Job-Id': job_id,
+        }
+    )
+
+def _stream_run(run, last_event_id):
+    """
+    Stream a run's events as SSE: id: <n>, data: {"step": <name>, "data": <payload>}
+    """
+    def sse_generator():
+        for event_id, step_name, payload in run.follow(last_event_id):
+            yield format_sse(event_id, step_name, payload)
+
+    return Response(
+        sse_generator(),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'Connection': 'keep-alive',
+            'Access-Control-Allow-Origin': '*',
+            'X-Run-Id': run.run_id,
+        }
+    )
+
+@app.route("/encounters", methods=["POST"])
+def create_encounter():
+    """Open a multi-clip encounter; clips are appended with POST /encounters/<id>/clips."""
+    encounter_id = encounter_store.create(
+        language=request.form.get('language', 'ar'),
+        features=request.form.get('features', None),
+        user_id=request.form.get('user_id', None, type=int),
+        doctor_name=request.form.get('doctor_name', None),
+    )
+    return jsonify({"encounter_id": encounter_id, "status": EncounterStore.OPEN}), 201
+
+@app.route("/encounters/<encounter_id>", methods=["GET"])
+def get_encounter(encounter_id):
+    """Return an encounter with its merged features and clips"""
+    encounter = encounter_store.get(encounter_id)
+    if encounter is None:
+        return jsonify({"error": "Encounter not found"}), 404
+    return jsonify(encounter)
+
+@app.route("/encounters/<encounter_id>/clips", methods=["POST"])
+def add_encounter_clip(encounter_id):
+    """Process one more clip and stream its events; extraction updates the encounter's features."""
+    encounter = encounter_store.get(encounter_id, with_clips=False)
+    if encounter is None:
+        return jsonify({"error": "Encounter not found"}), 404
+    if encounter["status"] != EncounterStore.OPEN:
+        return jsonify({"error": "Encounter is already finalized"}), 409
+    if 'audio' not in request.files or request.files['audio'].filename == '':
+        logger.error("No audio file provided")
+        return jsonify({"error": "No audio file provided"}), 400
+    audio_file = request.files['audio']
+
+    ticket = admission.reserve(tenant_key(encounter["user_id"], encounter["doctor_name"]))
     try:
-        filename = secure_filename(audio_file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        clip_folder = os.path.join(app.config['UPLOAD_FOLDER'], "encounters", secure_filename(encounter_id))
+        os.makedirs(clip_folder, exist_ok=True)
+        file_path = os.path.join(clip_folder, FileService._generate_unique_filename(secure_filename(audio_file.filename)))
         audio_file.save(file_path)
-        logger.info(f"File saved to {file_path}")
     except Exception as e:
+        admission.release(ticket)
         logger.error(f"Error saving file: {str(e)}")
         return jsonify({"error": f"Error saving file: {str(e)}"}), 500
-    
+    _preflight_upload(file_path, audio_file.filename, ticket)
+
+    run = event_logs.start_run(lambda: admission.run(ticket, lambda: stream_encounter_clip(encounter_id, file_path)))
+    return _stream_run(run, 0)
+
+@app.route("/encounters/<encounter_id>/finalize", methods=["POST"])
+def finalize_encounter_endpoint(encounter_id):
+    """Close the encounter and store it as a single result"""
+    try:
+        result_id = finalize_encounter(encounter_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 404 if "not found" in str(e) else 409
+    return jsonify({"encounter_id": encounter_id, "result_id": result_id, "status": EncounterStore.FINALIZED})
+
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    """Store the upload and queue it for background processing; returns a job id."""
+    if 'audio' not in request.files or request.files['audio'].filename == '':
+        logger.error("No audio file provided")
+        return jsonify({"error": "No audio file provided"}), 400
+    audio_file = request.files['audio']
+
+    try:
+        job_folder = os.path.join(app.config['UPLOAD_FOLDER'], "jobs")
+        os.makedirs(job_folder, exist_ok=True)
+        file_path = os.path.join(job_folder, FileService._generate_unique_filename(secure_filename(audio_file.filename)))
+        audio_file.save(file_path)
+    except Exception as e:
+        logger.error(f"Error saving file: {str(e)}")
+        return jsonify({"error": f"Error saving file: {str(e)}"}), 500
+    _preflight_upload(file_path, audio_file.filename)
+
+    job_id = job_queue.enqueue({
+        "file_path": file_path,
+        "filename": audio_file.filename,
+        "language": request.form.get('language', 'ar'),
+        "features": request.form.get('features', None),
+        "user_id": request.form.get('user_id', None, type=int),
+        "doctor_name": request.form.get('doctor_name', None),
+    })
+    return jsonify({"job_id": job_id, "status": job_queue.QUEUED}), 202
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    """Job status plus every event recorded so far"""
+    job = job_queue.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify({
+        "job_id": job_id,
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+        "events": job_queue.get_events(job_id),
+    })
+
+@app.route("/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    """Replay a job's stored events, then live-tail new ones as SSE (resume with Last-Event-ID)."""
+    if job_queue.get_job(job_id) is None:
+        return jsonify({"error": "Job not found"}), 404
+    after_seq = parse_last_event_id(request.headers.get('Last-Event-ID'), request.args.get('after', 0, type=int))
+
     def sse_generator():
-        """
-        Stream graph results as SSE lines: {"step": <name>, "data": <payload>}
-        """
-        try:
-            # Iterate the LangGraph stream
-            for step_name, payload in stream_pipeline(
-                file_path=file_path,
-                language=language,
-                features=features
-            ):
-                yield f"data: {json.dumps({'step': step_name, 'data': payload})}\n\n"
-        except Exception as e:
-            logger.exception("Unexpected error in pipeline stream")
-            yield f"data: {json.dumps({'step': 'error', 'data': f'Unexpected error: {str(e)}'})}\n\n"
-    
+        for seq, step_name, payload in stream_job_events(job_id, after_seq):
+            yield format_sse(seq, step_name, payload)
+
     return Response(
-        sse_generator(), 
+        sse_generator(),
         mimetype='text/event-stream',
         headers={
             'Cache-Control': 'no-cache',
@@ -109,10 +409,73 @@ def analyze():
         }
     )
 
+@app.route("/results", methods=["GET"])
+def list_results():
+    """Page through stored results (summary columns only), newest first"""
+    try:
+        rows, next_cursor = DatabaseService.list_audio_results(
+            user_id=request.args.get('user_id', None, type=int),
+            doctor_name=request.args.get('doctor_name'),
+            language=request.args.get('language'),
+            start_date=request.args.get('start_date'),
+            end_date=request.args.get('end_date'),
+            cursor=request.args.get('cursor'),
+            limit=min(request.args.get('limit', 50, type=int), 500),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"results": rows, "next_cursor": next_cursor})
+
+@app.route("/results/search", methods=["GET"])
+def search_results():
+    """Ranked full-text search over stored transcripts and extractions"""
+    try:
+        results = DatabaseService.search_audio_results(
+            request.args.get('q', ''),
+            user_id=request.args.get('user_id', None, type=int),
+            doctor_name=request.args.get('doctor_name'),
+            language=request.args.get('language'),
+            limit=min(request.args.get('limit', 20, type=int), 100),
+            offset=request.args.get('offset', 0, type=int),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"results": results})
+
+@app.route("/results/<int:result_id>", methods=["GET"])
+def get_result(result_id):
+    """Return a single stored result with all of its texts"""
+    result = DatabaseService.get_audio_result(result_id)
+    if result is None:
+        return jsonify({"error": "Result not found"}), 404
+    return jsonify(result)
+
+@app.route("/results/<int:result_id>/extract", methods=["POST"])
+def reextract(result_id):
+    """
+    Extract new feature schemas from a stored result without re-running the pipeline.
+
+    ``schemas`` is a JSON object (name -> schema text) or list of schema texts;
+    each schema costs one LLM call and they run concurrently.
+    """
+    try:
+        parsed = parse_schemas(request.form.get('schemas'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    result = DatabaseService.get_audio_result(result_id)
+    if result is None:
+        return jsonify({"error": "Result not found"}), 404
+    try:
+        with admission.slot(admission.reserve(tenant_key(result.get("user_id"), result.get("doctor_name")))):
+            extractions = reextract_result(result, parsed)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 422
+    return jsonify({"result_id": result_id, "extractions": extractions})
+
 @app.errorhandler(413)
 def too_large(e):
     """Handle file too large error"""
-    return jsonify({"error": "File too large"}), 413
+    return jsonify({"error": "File too large", "reason": "too_large"}), 413
 
 @app.errorhandler(404)
 def not_found(e):
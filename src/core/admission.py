@@ -0,0 +1,332 @@
+import math
+import time
+import logging
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Iterable, Optional
+
+from ..core.config import Config
+from ..core.metrics import QUEUE_WAIT, metrics
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; ``retry_after`` is in seconds."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class Ticket:
+    """A request waiting for, or holding, a pipeline slot."""
+
+    def __init__(self, tenant: str, priority: str, deadline: float, tag: float):
+        self.tenant = tenant
+        self.priority = priority
+        self.deadline = deadline
+        self.tag = tag  # virtual finish time for weighted fair queuing
+        self.created_at = time.monotonic()
+        self.started_at: Optional[float] = None
+
+
+ANONYMOUS = "anonymous"
+
+
+def tenant_key(user_id: Optional[int] = None, doctor_name: Optional[str] = None) -> str:
+    """Scheduling key of a request: the user, else the doctor, else a shared bucket."""
+    if user_id is not None:
+        return f"user:{user_id}"
+    if doctor_name:
+        return f"doctor:{doctor_name}"
+    return ANONYMOUS
+
+
+def parse_tenant_weights(value: str) -> dict:
+    """Parse ``"user:1=3,doctor:Amr=2"`` into ``{"user:1": 3.0, "doctor:Amr": 2.0}``."""
+    weights = {}
+    for item in filter(None, (part.strip() for part in (value or "").split(","))):
+        tenant, _, weight = item.rpartition("=")
+        try:
+            weights[tenant] = float(weight)
+        except ValueError:
+            logger.warning(f"Ignoring invalid tenant weight: {item}")
+    return weights
+
+
+class AdmissionController:
+    """
+    Admission control and weighted fair scheduling in front of the pipeline.
+
+    At most ``max_in_flight`` pipelines run at once. Requests wait in a
+    bounded queue and are started by priority class first (interactive
+    ``/analyze`` before batch jobs), then in weighted-fair order across
+    tenants: each tenant's tickets get virtual finish tags spaced
+    ``1 / weight`` apart, so a clinic uploading 200 recordings interleaves
+    with everyone else instead of running ahead of them. Each tenant may hold
+    at most ``tenant_max_in_flight`` slots and batch work at most
+    ``batch_max_in_flight``, which keeps headroom for interactive requests.
+    The shared anonymous bucket (requests without a user or doctor) is many
+    clients, so it is only bound by ``max_in_flight``. A batch ticket that has
+    waited longer than ``batch_aging`` seconds is ranked with interactive
+    ones, so sustained interactive load delays batch work but cannot starve it.
+
+    Interactive admission is decided up front: a request is rejected
+    immediately (503 + Retry-After) when the queue is full or its expected
+    wait, estimated from the interactive queue (overall and of its tenant,
+    against the tenant cap) and the moving average of pipeline durations,
+    would exceed its deadline. Batch tickets are never
+    rejected; they wait until capacity is available.
+    """
+
+    INTERACTIVE = "interactive"
+    BATCH = "batch"
+    _PRIORITY_RANK = {INTERACTIVE: 0, BATCH: 1}
+
+    def __init__(self,
+                 max_in_flight: int = Config.ADMISSION_MAX_IN_FLIGHT,
+                 max_queue: int = Config.ADMISSION_MAX_QUEUE,
+                 queue_timeout: float = Config.ADMISSION_QUEUE_TIMEOUT,
+                 initial_service_time: float = Config.ADMISSION_INITIAL_SERVICE_TIME,
+                 tenant_max_in_flight: int = Config.SCHEDULER_TENANT_MAX_IN_FLIGHT,
+                 batch_max_in_flight: int = Config.SCHEDULER_BATCH_MAX_IN_FLIGHT,
+                 tenant_weights: Optional[dict] = None,
+                 batch_aging: float = Config.SCHEDULER_BATCH_AGING):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.tenant_max_in_flight = tenant_max_in_flight
+        self.batch_max_in_flight = batch_max_in_flight
+        self.batch_aging = batch_aging
+        self.tenant_weights = parse_tenant_weights(Config.SCHEDULER_TENANT_WEIGHTS) \
+            if tenant_weights is None else tenant_weights
+        self._service_time = initial_service_time  # moving average, seconds
+        self._wait_time = {self.INTERACTIVE: 0.0, self.BATCH: 0.0}  # moving averages, seconds
+        self._cond = threading.Condition()
+        self._queue = []
+        self._in_flight = 0
+        self._class_in_flight = defaultdict(int)
+        self._tenant_in_flight = defaultdict(int)
+        self._tenant_tags = {}  # last virtual finish tag of tenants with queued or running tickets
+        self._virtual_time = 0.0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.completed = 0
+
+    # --- Admission --- #
+    def reserve(self, tenant: str = ANONYMOUS, priority: str = INTERACTIVE,
+                timeout: Optional[float] = None) -> Ticket:
+        """
+        Decide admission without blocking and queue the request.
+
+        Raises AdmissionRejected when an interactive request finds the queue
+        full or its estimated wait exceeds ``timeout`` (defaults to
+        ``queue_timeout``). Batch tickets have no deadline.
+        """
+        with self._cond:
+            if priority == self.BATCH:
+                deadline = math.inf
+            else:
+                timeout = self.queue_timeout if timeout is None else min(timeout, self.queue_timeout)
+                waiting = self._queued(self.INTERACTIVE)
+                if waiting >= self.max_queue:
+                    self.rejected += 1
+                    # A queue spot frees up roughly every service_time / max_in_flight seconds
+                    raise AdmissionRejected("Server is at capacity, queue is full",
+                                            self._service_time / self.max_in_flight)
+                estimated_wait = self._estimate_wait(waiting + 1, tenant, self._queued(self.INTERACTIVE, tenant) + 1)
+                if estimated_wait > timeout:
+                    self.rejected += 1
+                    raise AdmissionRejected(
+                        f"Server is at capacity, expected wait {estimated_wait:.0f}s exceeds {timeout:.0f}s",
+                        estimated_wait - timeout,
+                    )
+                deadline = time.monotonic() + timeout
+
+            weight = self.tenant_weights.get(tenant, 1.0)
+            tag = max(self._virtual_time, self._tenant_tags.get(tenant, 0.0)) + 1.0 / weight
+            self._tenant_tags[tenant] = tag
+            ticket = Ticket(tenant, priority, deadline, tag)
+            self._queue.append(ticket)
+            self.admitted += 1
+            self._cond.notify_all()
+            return ticket
+
+    def acquire(self, ticket: Ticket):
+        """Block until the scheduler picks this ticket."""
+        with self._cond:
+            while self._next() is not ticket:
+                remaining = ticket.deadline - time.monotonic()
+                if remaining <= 0:
+                    self._queue.remove(ticket)
+                    self._forget_idle_tenant(ticket.tenant)
+                    self.timed_out += 1
+                    self._cond.notify_all()
+                    raise AdmissionRejected("Timed out waiting for a pipeline slot", self._estimate_wait(
+                        self._queued(self.INTERACTIVE), ticket.tenant, self._queued(self.INTERACTIVE, ticket.tenant)
+                    ))
+                self._cond.wait(None if math.isinf(remaining) else remaining)
+            self._queue.remove(ticket)
+            self._in_flight += 1
+            self._class_in_flight[ticket.priority] += 1
+            self._tenant_in_flight[ticket.tenant] += 1
+            self._virtual_time = max(self._virtual_time, ticket.tag)
+            ticket.started_at = time.monotonic()
+            self._wait_time[ticket.priority] = self._ewma(
+                self._wait_time[ticket.priority], ticket.started_at - ticket.created_at
+            )
+            QUEUE_WAIT.observe(ticket.started_at - ticket.created_at, queue=f"admission_{ticket.priority}")
+            self._cond.notify_all()
+
+    def release(self, ticket: Ticket):
+        with self._cond:
+            if ticket.started_at is not None:
+                self._in_flight -= 1
+                self._class_in_flight[ticket.priority] -= 1
+                self._tenant_in_flight[ticket.tenant] -= 1
+                if not self._tenant_in_flight[ticket.tenant]:
+                    del self._tenant_in_flight[ticket.tenant]
+                self.completed += 1
+                self._service_time = self._ewma(self._service_time, time.monotonic() - ticket.started_at)
+                ticket.started_at = None
+            elif ticket in self._queue:
+                self._queue.remove(ticket)
+            self._forget_idle_tenant(ticket.tenant)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, ticket: Ticket):
+        """Hold a pipeline slot for the duration of the block."""
+        try:
+            self.acquire(ticket)
+            yield
+        finally:
+            self.release(ticket)
+
+    def run(self, ticket: Ticket, events: Callable[[], Iterable[tuple]]):
+        """
+        Generator wrapper for streaming endpoints: yields a ``queued`` event
+        if the request has to wait, then the events of ``events()`` while
+        holding a slot.
+        """
+        try:
+            with self._cond:
+                waiting = self._next() is not ticket
+                position = self._queued(ticket.priority)
+                tenant_position = self._queued(ticket.priority, ticket.tenant)
+                estimated_wait = self._estimate_wait(position, ticket.tenant, tenant_position)
+            if waiting:
+                yield "queued", {"position": position, "estimated_wait": round(estimated_wait, 1)}
+            self.acquire(ticket)
+            yield from events()
+        finally:
+            self.release(ticket)
+
+    # --- Stats --- #
+    def stats(self) -> dict:
+        with self._cond:
+            now = time.monotonic()
+            tenants = defaultdict(lambda: {"in_flight": 0, "queued": 0})
+            for tenant, count in self._tenant_in_flight.items():
+                tenants[tenant]["in_flight"] = count
+            for ticket in self._queue:
+                tenants[ticket.tenant]["queued"] += 1
+            return {
+                "in_flight": self._in_flight,
+                "max_in_flight": self.max_in_flight,
+                "queue_depth": len(self._queue),
+                "max_queue": self.max_queue,
+                "oldest_wait": round(now - min(t.created_at for t in self._queue), 3) if self._queue else 0.0,
+                "avg_service_time": round(self._service_time, 3),
+                "estimated_wait": round(self._estimate_wait(self._queued(self.INTERACTIVE) + 1), 3),
+                "classes": {
+                    priority: {
+                        "in_flight": self._class_in_flight[priority],
+                        "queued": self._queued(priority),
+                        "avg_wait": round(self._wait_time[priority], 3),
+                    }
+                    for priority in (self.INTERACTIVE, self.BATCH)
+                },
+                "tenants": dict(tenants),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "completed": self.completed,
+            }
+
+    # --- Scheduling --- #
+    def _next(self) -> Optional[Ticket]:
+        """The ticket to start now, or None if no slot is free for any eligible ticket."""
+        if self._in_flight >= self.max_in_flight:
+            return None
+        eligible = [
+            ticket for ticket in self._queue
+            if self._tenant_in_flight.get(ticket.tenant, 0) < self._tenant_cap(ticket.tenant)
+            and (ticket.priority != self.BATCH or self._class_in_flight[self.BATCH] < self.batch_max_in_flight)
+        ]
+        if not eligible:
+            return None
+        aged = time.monotonic() - self.batch_aging
+        return min(eligible, key=lambda t: (
+            0 if t.created_at <= aged else self._PRIORITY_RANK[t.priority], t.tag, t.created_at
+        ))
+
+    def _forget_idle_tenant(self, tenant: str):
+        """Drop the finish tag of a tenant with nothing running or queued.
+
+        All of its tickets have started, so the virtual time has passed its
+        tag and a new ticket would be tagged from the virtual time anyway.
+        """
+        if tenant not in self._tenant_in_flight and not any(t.tenant == tenant for t in self._queue):
+            self._tenant_tags.pop(tenant, None)
+
+    def _queued(self, priority: str, tenant: Optional[str] = None) -> int:
+        return sum(1 for ticket in self._queue
+                   if ticket.priority == priority and (tenant is None or ticket.tenant == tenant))
+
+    def _tenant_cap(self, tenant: str) -> int:
+        return self.max_in_flight if tenant == ANONYMOUS else self.tenant_max_in_flight
+
+    def _estimate_wait(self, position: int, tenant: Optional[str] = None, tenant_position: int = 0) -> float:
+        """
+        Expected wait of the interactive request at 1-based ``position`` in its
+        queue and ``tenant_position`` among its tenant's interactive requests.
+        """
+        wait = self._slot_wait(position, self.max_in_flight - self._in_flight, self.max_in_flight)
+        if tenant is not None:
+            cap = self._tenant_cap(tenant)
+            wait = max(wait, self._slot_wait(tenant_position, cap - self._tenant_in_flight.get(tenant, 0), cap))
+        return wait
+
+    def _slot_wait(self, position: int, free: int, capacity: int) -> float:
+        if position <= free:
+            return 0.0
+        # Slots free up at roughly ``capacity`` per average pipeline duration
+        return math.ceil((position - free) / capacity) * self._service_time
+
+    @staticmethod
+    def _ewma(current: float, sample: float, alpha: float = 0.2) -> float:
+        return current + alpha * (sample - current)
+
+
+# Shared scheduler for both apps and the in-process job workers
+admission = AdmissionController()
+
+_ADMISSION_IN_FLIGHT = metrics.gauge("admission_in_flight", "Pipelines holding a slot.", ("priority",))
+_ADMISSION_QUEUED = metrics.gauge("admission_queued", "Requests waiting for a slot.", ("priority",))
+
+
+def _collect_admission():
+    for priority, stats in admission.stats()["classes"].items():
+        _ADMISSION_IN_FLIGHT.set(stats["in_flight"], priority=priority)
+        _ADMISSION_QUEUED.set(stats["queued"], priority=priority)
+
+
+metrics.on_collect(_collect_admission)
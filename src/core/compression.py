@@ -0,0 +1,114 @@
+import logging
+import threading
+import zlib
+from typing import Callable, Optional
+
+try:
+    import zstandard
+except ImportError:  # optional: fall back to zlib so payloads stay readable/writable
+    zstandard = None
+
+from ..core.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class MissingDictionaryError(LookupError):
+    """A payload names a compression dictionary that is not stored."""
+
+
+class PayloadCodec:
+    """Compression for the large text payloads of ``audio_results``.
+
+    Transcripts are short and repetitive (same clinical vocabulary, same JSON
+    keys), so zstd with a dictionary trained on our own transcripts compresses
+    them far better than compressing each field on its own. Rows record the
+    codec and dictionary id they were written with, so dictionaries can be
+    retrained at any time without rewriting old rows. Dictionaries not
+    registered yet (e.g. trained by another process) are fetched through the
+    loader the storage layer installs with ``set_dictionary_loader``.
+    """
+
+    ZSTD = "zstd"
+    ZLIB = "zlib"
+
+    _dictionaries = {}  # dict_id -> zstandard.ZstdCompressionDict
+    _lock = threading.Lock()
+    _loader: Optional[Callable[[int], Optional[bytes]]] = None
+
+    @staticmethod
+    def default_codec() -> str:
+        return PayloadCodec.ZSTD if zstandard is not None else PayloadCodec.ZLIB
+
+    @classmethod
+    def register_dictionary(cls, dict_id: int, data: bytes):
+        """Make a stored dictionary available for (de)compression."""
+        if zstandard is None:
+            return
+        with cls._lock:
+            if dict_id not in cls._dictionaries:
+                dictionary = zstandard.ZstdCompressionDict(data)
+                dictionary.precompute_compress(level=Config.PAYLOAD_COMPRESSION_LEVEL)
+                cls._dictionaries[dict_id] = dictionary
+
+    @classmethod
+    def has_dictionary(cls, dict_id: int) -> bool:
+        return dict_id in cls._dictionaries
+
+    @classmethod
+    def set_dictionary_loader(cls, loader: Callable[[int], Optional[bytes]]):
+        """Install ``loader(dict_id) -> bytes or None``, used for dictionaries not registered yet."""
+        cls._loader = loader
+
+    @classmethod
+    def _dictionary(cls, dict_id: Optional[int]):
+        if dict_id is None:
+            return None
+        dictionary = cls._dictionaries.get(dict_id)
+        if dictionary is None and cls._loader is not None:
+            data = cls._loader(dict_id)
+            if data is not None:
+                cls.register_dictionary(dict_id, data)
+                dictionary = cls._dictionaries.get(dict_id)
+        if dictionary is None:
+            raise MissingDictionaryError(f"Compression dictionary {dict_id} is not stored")
+        return dictionary
+
+    @classmethod
+    def compress(cls, text: Optional[str], codec: str, dict_id: Optional[int] = None) -> Optional[bytes]:
+        if text is None:
+            return None
+        data = text.encode("utf-8")
+        if codec == cls.ZSTD:
+            dictionary = cls._dictionary(dict_id)
+            compressor = zstandard.ZstdCompressor(level=Config.PAYLOAD_COMPRESSION_LEVEL, dict_data=dictionary)
+            return compressor.compress(data)
+        if codec == cls.ZLIB:
+            return zlib.compress(data, 6)
+        raise ValueError(f"Unsupported payload codec: {codec}")
+
+    @classmethod
+    def decompress(cls, blob: Optional[bytes], codec: str, dict_id: Optional[int] = None) -> Optional[str]:
+        if blob is None:
+            return None
+        if codec == cls.ZSTD:
+            if zstandard is None:
+                raise RuntimeError("zstandard is required to read zstd-compressed payloads")
+            dictionary = cls._dictionary(dict_id)
+            decompressor = zstandard.ZstdDecompressor(dict_data=dictionary)
+            return decompressor.decompress(blob).decode("utf-8")
+        if codec == cls.ZLIB:
+            return zlib.decompress(blob).decode("utf-8")
+        raise ValueError(f"Unsupported payload codec: {codec}")
+
+    @staticmethod
+    def train_dictionary(samples: list, dict_size: int = Config.PAYLOAD_DICTIONARY_SIZE) -> bytes:
+        """Train a zstd dictionary from sample payload strings."""
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to train a compression dictionary")
+        encoded = [sample.encode("utf-8") for sample in samples if sample]
+        if not encoded:
+            raise ValueError("No samples to train a compression dictionary on")
+        dictionary = zstandard.train_dictionary(dict_size, encoded)
+        logger.info(f"Trained {len(dictionary.as_bytes())}-byte dictionary on {len(encoded)} samples")
+        return dictionary.as_bytes()
@@ -5,8 +5,8 @@ load_dotenv()
 class Config:
     """Base configuration."""
 
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16 MB max upload
-    ALLOWED_EXTENSIONS = {'mp3', 'wav', 'ogg'}
+    MAX_CONTENT_LENGTH = int(os.getenv("MAX_CONTENT_LENGTH", str(16 * 1024 * 1024)))  # 16 MB max upload
+    ALLOWED_EXTENSIONS = {ext.strip().lower() for ext in os.getenv("ALLOWED_EXTENSIONS", "mp3,wav,ogg").split(",") if ext.strip()}
     DEBUG = True
     TESTING = False
     PORT = 8586
@@ -20,7 +20,109 @@ class Config:
     EXTRACTION_API_KEY = os.getenv("extraction")
 
     DATABASE_PATH = "app_data.db"
-    
-    # Create upload folder if it doesn't exist
-    if not os.path.exists(UPLOAD_FOLDER):
-        os.makedirs(UPLOAD_FOLDER)
+    DATABASE_BUSY_TIMEOUT = int(os.getenv("DATABASE_BUSY_TIMEOUT", "5000"))  # ms
+    DATABASE_CACHE_SIZE = int(os.getenv("DATABASE_CACHE_SIZE", "16384"))  # KiB per connection
+    DATABASE_SYNCHRONOUS = os.getenv("DATABASE_SYNCHRONOUS", "NORMAL")
+    DATABASE_CACHED_STATEMENTS = int(os.getenv("DATABASE_CACHED_STATEMENTS", "256"))
+
+    # Compressed storage of large audio_results payloads
+    PAYLOAD_COMPRESSION_LEVEL = int(os.getenv("PAYLOAD_COMPRESSION_LEVEL", "9"))
+    PAYLOAD_DICTIONARY_SIZE = int(os.getenv("PAYLOAD_DICTIONARY_SIZE", str(64 * 1024)))  # bytes
+    # How often to look for a dictionary trained by another process (seconds)
+    PAYLOAD_DICTIONARY_REFRESH = float(os.getenv("PAYLOAD_DICTIONARY_REFRESH", "60"))
+
+    # Incremental Parquet export for analytics
+    EXPORT_FOLDER = os.getenv("EXPORT_FOLDER", "exports")
+    EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))
+    EXPORT_ROW_GROUP_SIZE = int(os.getenv("EXPORT_ROW_GROUP_SIZE", "50000"))
+
+    # Resumable SSE: per-run event logs kept in memory
+    EVENT_LOG_MAX_EVENTS = int(os.getenv("EVENT_LOG_MAX_EVENTS", "1000"))
+    EVENT_LOG_TTL = float(os.getenv("EVENT_LOG_TTL", "600"))  # seconds after the run ends
+    EVENT_LOG_MAX_AGE = float(os.getenv("EVENT_LOG_MAX_AGE", "3600"))  # seconds since the run started
+
+    # LangGraph checkpoints of pipeline runs (resume a failed or re-extracted run)
+    CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", "checkpoints.db")
+    CHECKPOINT_RETENTION = float(os.getenv("CHECKPOINT_RETENTION", str(7 * 24 * 3600)))  # seconds since last use
+    CHECKPOINT_PRUNE_INTERVAL = float(os.getenv("CHECKPOINT_PRUNE_INTERVAL", "3600"))  # seconds
+
+    # Re-extraction of stored results with new feature schemas
+    EXTRACT_MAX_CONCURRENCY = int(os.getenv("EXTRACT_MAX_CONCURRENCY", "4"))  # LLM calls in flight per request
+    REEXTRACT_MAX_SCHEMAS = int(os.getenv("REEXTRACT_MAX_SCHEMAS", "8"))
+
+    # Real-time dictation over WebSocket
+    DICTATION_SAMPLE_RATE = int(os.getenv("DICTATION_SAMPLE_RATE", "16000"))
+    DICTATION_PAUSE_MS = int(os.getenv("DICTATION_PAUSE_MS", "600"))  # silence that closes a segment
+    DICTATION_MAX_SEGMENT_SECONDS = float(os.getenv("DICTATION_MAX_SEGMENT_SECONDS", "20"))
+    DICTATION_MIN_SPEECH_MS = int(os.getenv("DICTATION_MIN_SPEECH_MS", "300"))
+    DICTATION_MIN_VALIDATION_WORDS = int(os.getenv("DICTATION_MIN_VALIDATION_WORDS", "15"))
+
+    # Admission control in front of the pipeline
+    ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "4"))
+    ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+    ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30"))  # seconds a request may wait
+    ADMISSION_INITIAL_SERVICE_TIME = float(os.getenv("ADMISSION_INITIAL_SERVICE_TIME", "20"))  # seconds
+    # Weighted fair scheduling across tenants (user, else doctor); interactive before batch jobs
+    SCHEDULER_TENANT_MAX_IN_FLIGHT = int(os.getenv("SCHEDULER_TENANT_MAX_IN_FLIGHT", "2"))
+    SCHEDULER_BATCH_MAX_IN_FLIGHT = int(os.getenv("SCHEDULER_BATCH_MAX_IN_FLIGHT", str(max(1, ADMISSION_MAX_IN_FLIGHT - 1))))
+    SCHEDULER_TENANT_WEIGHTS = os.getenv("SCHEDULER_TENANT_WEIGHTS", "")  # e.g. "user:1=3,doctor:Amr=2"
+    # Batch work queued longer than this competes with interactive requests, so it is never starved
+    SCHEDULER_BATCH_AGING = float(os.getenv("SCHEDULER_BATCH_AGING", "300"))  # seconds
+
+    # Per-stage worker pools (audio preprocessing is CPU-bound, Whisper and LLM calls are I/O-bound)
+    STAGE_PREPROCESS_WORKERS = int(os.getenv("STAGE_PREPROCESS_WORKERS", str(os.cpu_count() or 2)))
+    STAGE_TRANSCRIPTION_WORKERS = int(os.getenv("STAGE_TRANSCRIPTION_WORKERS", "8"))
+    STAGE_LLM_WORKERS = int(os.getenv("STAGE_LLM_WORKERS", "16"))
+    STAGE_MAX_QUEUE = int(os.getenv("STAGE_MAX_QUEUE", "64"))  # pending tasks per stage before callers block
+    STAGE_SUBMIT_TIMEOUT = float(os.getenv("STAGE_SUBMIT_TIMEOUT", "0"))  # seconds to block on a full queue; 0 = no limit
+
+    # Durable job queue (POST /jobs)
+    JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "jobs.db")
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))  # in-process pipeline workers, 0 to disable
+    JOB_VISIBILITY_TIMEOUT = float(os.getenv("JOB_VISIBILITY_TIMEOUT", "120"))  # seconds
+    JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    JOB_RETRY_BACKOFF = float(os.getenv("JOB_RETRY_BACKOFF", "5"))  # seconds, doubled per attempt
+    JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "0.5"))  # seconds
+    JOB_RETENTION = float(os.getenv("JOB_RETENTION", str(7 * 24 * 3600)))  # seconds after a job finished
+    JOB_PRUNE_INTERVAL = float(os.getenv("JOB_PRUNE_INTERVAL", "3600"))  # seconds
+    # Where jobs and their events live; a shared URL lets API nodes and the workers
+    # (python -m src.model.job_worker) run on different machines
+    JOB_BROKER_URL = os.getenv("JOB_BROKER_URL", f"sqlite:///{JOB_QUEUE_PATH}")
+    JOB_BROKER_PLUGINS = os.getenv("JOB_BROKER_PLUGINS", "")  # modules registering other broker schemes
+    # "inline" runs /analyze in the web process, "broker" hands it to the job workers and streams their events
+    ANALYZE_MODE = os.getenv("ANALYZE_MODE", "inline")
+
+    # Write-behind persistence of pipeline results
+    PERSIST_RESULTS = os.getenv("PERSIST_RESULTS", "1") == "1"
+    RESULT_WRITER_BATCH_SIZE = int(os.getenv("RESULT_WRITER_BATCH_SIZE", "50"))
+    RESULT_WRITER_FLUSH_INTERVAL = float(os.getenv("RESULT_WRITER_FLUSH_INTERVAL", "2.0"))  # seconds
+    RESULT_WRITER_MAX_QUEUE = int(os.getenv("RESULT_WRITER_MAX_QUEUE", "10000"))
+
+    # Logging: records go through a queue and are formatted on a background thread
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FILE = os.getenv("LOG_FILE")  # also write to this file when set
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))  # records beyond this are dropped, not waited for
+    LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")  # e.g. "src.core.database=0.01" (below WARNING only)
+    LOG_MAX_PAYLOAD_CHARS = int(os.getenv("LOG_MAX_PAYLOAD_CHARS", "200"))  # per string argument
+    LOG_MAX_MESSAGE_CHARS = int(os.getenv("LOG_MAX_MESSAGE_CHARS", "2000"))
+    LOG_REDACT_PAYLOADS = os.getenv("LOG_REDACT_PAYLOADS", "1") == "1"  # hide long arguments (transcripts) entirely
+
+    # Opt-in sampling profiler for /analyze runs (X-Profile: 1, or a share of all runs)
+    PROFILE_FOLDER = os.getenv("PROFILE_FOLDER", "profiles")
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # e.g. 0.01 profiles 1% of runs
+    PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))  # seconds between stack samples
+    PROFILE_MAX_ARTIFACTS = int(os.getenv("PROFILE_MAX_ARTIFACTS", "200"))  # newest runs kept on disk
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")  # /admin endpoints and X-Profile need X-Admin-Token; disabled when unset
+
+    # Upload pre-flight: header-only checks before anything is decoded or scheduled
+    PREFLIGHT_MIN_DURATION = float(os.getenv("PREFLIGHT_MIN_DURATION", "0.5"))  # seconds
+    PREFLIGHT_MAX_DURATION = float(os.getenv("PREFLIGHT_MAX_DURATION", "1800"))  # seconds
+    PREFLIGHT_SILENCE_DB = float(os.getenv("PREFLIGHT_SILENCE_DB", "-50"))  # dBFS of the loudest 50 ms (PCM WAV)
+
+    # Background warm-up of the lazily imported pipeline dependencies after startup
+    PREWARM = os.getenv("PREWARM", "1") == "1"
+
+    @staticmethod
+    def ensure_folders():
+        """Create the upload folder if it doesn't exist (called at app startup, not on import)."""
+        os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
@@ -1,80 +1,626 @@
 import sqlite3
 import logging
 import os
+import time
+import json
+import base64
+import asyncio
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from ..core.config import Config
+from ..core.compression import MissingDictionaryError, PayloadCodec
+from ..core.text_search import normalize_arabic, flatten_json_values, build_match_query
 
 logger = logging.getLogger(__name__)
 
+
+class ConnectionPool:
+    """Per-thread pool of SQLite connections tuned for concurrent access.
+
+    Each thread reuses a single long-lived connection instead of opening a new
+    one per query. Connections run in WAL mode so readers never block the
+    writer, and wait up to ``busy_timeout`` ms for a lock instead of failing
+    straight away with "database is locked".
+    """
+
+    def __init__(self, db_path: str,
+                 busy_timeout: int = Config.DATABASE_BUSY_TIMEOUT,
+                 cache_size: int = Config.DATABASE_CACHE_SIZE,
+                 synchronous: str = Config.DATABASE_SYNCHRONOUS,
+                 cached_statements: int = Config.DATABASE_CACHED_STATEMENTS,
+                 on_connect=None):
+        self.db_path = db_path
+        self.busy_timeout = busy_timeout
+        self.cache_size = cache_size
+        self.synchronous = synchronous
+        self.cached_statements = cached_statements
+        self.on_connect = on_connect  # called with each new connection, e.g. to register SQL functions
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = {}  # thread -> connection
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout / 1000,
+            isolation_level=None,  # transactions are managed explicitly
+            check_same_thread=False,  # only close_all() crosses threads
+            cached_statements=self.cached_statements,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA cache_size=-{self.cache_size}")
+        conn.execute(f"PRAGMA busy_timeout={self.busy_timeout}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        if self.on_connect is not None:
+            self.on_connect(conn)
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """Return the calling thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._lock:
+                self._prune_dead_threads()
+                self._connections[threading.current_thread()] = conn
+            logger.debug("Opened pooled connection to %s", self.db_path)
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Run the enclosed statements in one write transaction.
+
+        ``BEGIN IMMEDIATE`` takes the write lock up front so concurrent writers
+        queue on the busy timeout rather than deadlocking on lock upgrade.
+        """
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+
+    def close_connection(self):
+        """Close the calling thread's connection, leaving other threads' open."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            return
+        self._local.conn = None
+        with self._lock:
+            self._connections.pop(threading.current_thread(), None)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def close_all(self):
+        """Close every pooled connection (call at shutdown)."""
+        with self._lock:
+            for conn in self._connections.values():
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._connections.clear()
+        self._local = threading.local()
+
+    def _prune_dead_threads(self):
+        for thread in [t for t in self._connections if not t.is_alive()]:
+            try:
+                self._connections.pop(thread).close()
+            except sqlite3.Error:
+                pass
+
+
 class DatabaseService:
     """Service for database operations"""
-    
+
     DB_PATH = Config.DATABASE_PATH
-    
+    _pool = None
+
+    # Large text columns, stored compressed in audio_result_payloads rather than inline
+    _PAYLOAD_COLUMNS = ("raw_text", "arabic_text", "translation_text", "json_data", "reasoning")
+    _ROW_COLUMNS = (
+        "user_id", "filename", "language", "model", "is_conversation", "preprocessing_time",
+        "voice_processing_time", "llm_processing_time", "doctor_name", "feedback",
+    )
+
+    # Columns returned by list queries; the large text columns are only read by get_audio_result
+    _SUMMARY_COLUMNS = ("id", "user_id", "doctor_name", "filename", "language", "insertion_date")
+
+    # Schema migrations, applied in order on top of the base tables. The index of
+    # each entry + 1 is the schema version stored in PRAGMA user_version.
+    _MIGRATIONS = (
+        # 1: covering indexes for history pages (by user, by doctor, and unfiltered)
+        (
+            "CREATE INDEX IF NOT EXISTS idx_audio_results_user_date "
+            "ON audio_results (user_id, insertion_date, id, language, doctor_name, filename)",
+            "CREATE INDEX IF NOT EXISTS idx_audio_results_doctor_date "
+            "ON audio_results (doctor_name, insertion_date, id, language, user_id, filename)",
+            "CREATE INDEX IF NOT EXISTS idx_audio_results_date "
+            "ON audio_results (insertion_date, id, language, user_id, doctor_name, filename)",
+        ),
+        # 2: move the large text columns to a compressed side table
+        "_migrate_compressed_payloads",
+        # 3: FTS5 index over refined text, translation and json_data values
+        "_migrate_fulltext_index",
+        # 4: the FTS5 index no longer keeps its own uncompressed copy of the texts
+        "_migrate_fulltext_external_content",
+        # 5: multi-clip encounters, clip texts compressed like result payloads
+        "_migrate_encounters",
+    )
+
+    _active_dict_id = None
+    _active_dict_checked_at = None  # monotonic time of the last lookup; None forces one
+
+    @classmethod
+    def pool(cls) -> ConnectionPool:
+        """Return the connection pool for the current ``DB_PATH``."""
+        if cls._pool is None or cls._pool.db_path != cls.DB_PATH:
+            if cls._pool is not None:
+                cls._pool.close_all()
+            cls._pool = ConnectionPool(cls.DB_PATH, on_connect=cls._register_functions)
+            cls._active_dict_checked_at = None
+        return cls._pool
+
+    @classmethod
+    def close(cls):
+        """Close all pooled connections."""
+        if cls._pool is not None:
+            cls._pool.close_all()
+            cls._pool = None
+
+    @classmethod
+    def close_connection(cls):
+        """Close the calling thread's pooled connection (when a long-lived thread exits)."""
+        if cls._pool is not None:
+            cls._pool.close_connection()
+
     @classmethod
     def initialize_db(cls):
         """Create database tables if they don't exist"""
         try:
-            conn = sqlite3.connect(cls.DB_PATH)
-            cursor = conn.cursor()
-            
-            # Create users table
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT NOT NULL UNIQUE,
-                hashed_password TEXT NOT NULL,
-                insertion_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            ''')
-            
-            # Create audio_results table (add user_id)
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS audio_results (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                filename TEXT NOT NULL,
-                language TEXT NOT NULL,
-                model TEXT NOT NULL,
-                is_conversation BOOLEAN NOT NULL,
-                raw_text TEXT,
-                arabic_text TEXT,
-                translation_text TEXT,
-                json_data TEXT,
-                reasoning TEXT,
-                preprocessing_time REAL,
-                voice_processing_time REAL,
-                llm_processing_time REAL,
-                doctor_name TEXT,
-                feedback TEXT,
-                insertion_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-            ''')
-            
-            conn.commit()
+            with cls.pool().transaction() as conn:
+                cursor = conn.cursor()
+
+                # Create users table
+                cursor.execute('''
+                CREATE TABLE IF NOT EXISTS users (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    username TEXT NOT NULL UNIQUE,
+                    hashed_password TEXT NOT NULL,
+                    insertion_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+                ''')
+
+                # Create audio_results table (add user_id)
+                cursor.execute('''
+                CREATE TABLE IF NOT EXISTS audio_results (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER,
+                    filename TEXT NOT NULL,
+                    language TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    is_conversation BOOLEAN NOT NULL,
+                    raw_text TEXT,
+                    arabic_text TEXT,
+                    translation_text TEXT,
+                    json_data TEXT,
+                    reasoning TEXT,
+                    preprocessing_time REAL,
+                    voice_processing_time REAL,
+                    llm_processing_time REAL,
+                    doctor_name TEXT,
+                    feedback TEXT,
+                    insertion_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (user_id) REFERENCES users (id)
+                )
+                ''')
+
+                cls._apply_migrations(conn)
+
             logger.info(f"Database initialized at {cls.DB_PATH}")
             return True
         except Exception as e:
             logger.error(f"Error initializing database: {str(e)}")
             return False
-        finally:
-            if conn:
-                conn.close()
+
+    @classmethod
+    def _apply_migrations(cls, conn: sqlite3.Connection):
+        """Bring the schema up to the latest version inside the caller's transaction."""
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for target, migration in enumerate(cls._MIGRATIONS[version:], start=version + 1):
+            if isinstance(migration, str):
+                getattr(cls, migration)(conn)
+            else:
+                for statement in migration:
+                    conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {target}")
+            logger.info(f"Applied database migration {target}")
+
+    @classmethod
+    def _migrate_compressed_payloads(cls, conn: sqlite3.Connection, batch_size: int = 500):
+        """Create the payload side table and move existing inline texts into it."""
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS compression_dictionaries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            codec TEXT NOT NULL,
+            data BLOB NOT NULL,
+            sample_count INTEGER,
+            insertion_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS audio_result_payloads (
+            result_id INTEGER PRIMARY KEY,
+            codec TEXT NOT NULL,
+            dict_id INTEGER,
+            raw_text BLOB,
+            arabic_text BLOB,
+            translation_text BLOB,
+            json_data BLOB,
+            reasoning BLOB,
+            FOREIGN KEY (result_id) REFERENCES audio_results (id),
+            FOREIGN KEY (dict_id) REFERENCES compression_dictionaries (id)
+        )
+        ''')
+        conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS audio_results_delete_payload
+        AFTER DELETE ON audio_results
+        BEGIN
+            DELETE FROM audio_result_payloads WHERE result_id = old.id;
+        END
+        ''')
+
+        has_payload = " OR ".join(f"{column} IS NOT NULL" for column in cls._PAYLOAD_COLUMNS)
+        last_id, moved = 0, 0
+        while True:
+            rows = conn.execute(
+                f"SELECT id, {', '.join(cls._PAYLOAD_COLUMNS)} FROM audio_results "
+                f"WHERE id > ? AND ({has_payload}) ORDER BY id LIMIT ?",
+                (last_id, batch_size),
+            ).fetchall()
+            if not rows:
+                break
+            for row in rows:
+                cls._insert_payload(conn, row[0], dict(zip(cls._PAYLOAD_COLUMNS, row[1:])), dict_id=None)
+            last_id = rows[-1][0]
+            moved += len(rows)
+        if moved:
+            conn.execute(
+                f"UPDATE audio_results SET {', '.join(f'{column} = NULL' for column in cls._PAYLOAD_COLUMNS)} "
+                f"WHERE {has_payload}"
+            )
+            logger.info(f"Moved payloads of {moved} audio results to compressed storage")
+
+    @classmethod
+    def _migrate_fulltext_index(cls, conn: sqlite3.Connection):
+        """Create the FTS5 index, its sync triggers, and index existing payloads.
+
+        The index lives next to the compressed payloads: triggers on
+        audio_result_payloads decompress and normalize the texts through the
+        ``fts_text``/``fts_json`` SQL functions registered on every pooled
+        connection, so any write path keeps the index in sync. It is an
+        external-content table over a view of the payloads, so only the index
+        itself is stored; ``snippet`` decompresses the matching rows on demand.
+
+        Those functions exist only on connections opened through ``pool()``.
+        Any other connection (the sqlite3 shell, an ad hoc maintenance script)
+        fails with "no such function: fts_text" when it writes to
+        ``audio_result_payloads`` or deletes from ``audio_results``, and when it
+        reads the FTS snippets; such scripts must go through ``pool()`` or call
+        ``_register_functions`` on their connection first. Reading the tables
+        themselves (as the Parquet export does) needs no functions.
+        """
+        conn.execute('''
+        CREATE VIEW IF NOT EXISTS audio_result_payloads_text AS
+        SELECT result_id,
+               fts_text(codec, dict_id, arabic_text) AS refined_text,
+               fts_text(codec, dict_id, translation_text) AS translation_text,
+               fts_json(codec, dict_id, json_data) AS json_values
+        FROM audio_result_payloads
+        ''')
+        conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS audio_results_fts USING fts5(
+            refined_text,
+            translation_text,
+            json_values,
+            content = 'audio_result_payloads_text',
+            content_rowid = 'result_id',
+            tokenize = "unicode61 remove_diacritics 2",
+            prefix = '2 3'
+        )
+        ''')
+        # Weight the extracted fields and the translation above the raw refined transcript
+        conn.execute("INSERT INTO audio_results_fts (audio_results_fts, rank) VALUES ('rank', 'bm25(1.0, 1.5, 2.0)')")
+
+        def indexed(row: str) -> str:
+            return f'''
+            {row}.result_id,
+            fts_text({row}.codec, {row}.dict_id, {row}.arabic_text),
+            fts_text({row}.codec, {row}.dict_id, {row}.translation_text),
+            fts_json({row}.codec, {row}.dict_id, {row}.json_data)
+            '''
+
+        columns = "audio_results_fts, rowid, refined_text, translation_text, json_values"
+        # An external-content index only forgets a row when given the values it indexed, and
+        # INSERT OR REPLACE does not fire delete triggers: remove the replaced row first
+        conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS audio_result_payloads_fts_replace
+        BEFORE INSERT ON audio_result_payloads
+        BEGIN
+            INSERT INTO audio_results_fts ({columns})
+            SELECT 'delete', {indexed("old_row")}
+            FROM audio_result_payloads AS old_row WHERE old_row.result_id = new.result_id;
+        END
+        ''')
+        conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS audio_result_payloads_fts_insert
+        AFTER INSERT ON audio_result_payloads
+        BEGIN
+            INSERT INTO audio_results_fts (rowid, refined_text, translation_text, json_values)
+            VALUES ({indexed("new")});
+        END
+        ''')
+        conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS audio_result_payloads_fts_update
+        AFTER UPDATE ON audio_result_payloads
+        BEGIN
+            INSERT INTO audio_results_fts ({columns}) VALUES ('delete', {indexed("old")});
+            INSERT INTO audio_results_fts (rowid, refined_text, translation_text, json_values)
+            VALUES ({indexed("new")});
+        END
+        ''')
+        conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS audio_result_payloads_fts_delete
+        AFTER DELETE ON audio_result_payloads
+        BEGIN
+            INSERT INTO audio_results_fts ({columns}) VALUES ('delete', {indexed("old")});
+        END
+        ''')
+
+        for (dict_id,) in conn.execute("SELECT id FROM compression_dictionaries").fetchall():
+            cls._load_dictionary(conn, dict_id)
+        conn.execute("INSERT INTO audio_results_fts (audio_results_fts) VALUES ('rebuild')")
+
+    @classmethod
+    def _migrate_fulltext_external_content(cls, conn: sqlite3.Connection):
+        """Rebuild an FTS index that kept its own copy of the texts as an external-content one."""
+        row = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'audio_results_fts'").fetchone()
+        if row is not None and "content_rowid" in row[0]:
+            return  # created by the current _migrate_fulltext_index
+        for trigger in ("insert", "update", "delete"):
+            conn.execute(f"DROP TRIGGER IF EXISTS audio_result_payloads_fts_{trigger}")
+        conn.execute("DROP TABLE IF EXISTS audio_results_fts")
+        cls._migrate_fulltext_index(conn)
+
+    @classmethod
+    def _migrate_encounters(cls, conn: sqlite3.Connection):
+        """Create the encounter tables; compress clips stored by the former ad hoc tables."""
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS encounters (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER,
+            doctor_name TEXT,
+            language TEXT NOT NULL,
+            features TEXT,
+            status TEXT NOT NULL,
+            clip_count INTEGER NOT NULL DEFAULT 0,
+            json_data TEXT,
+            reasoning TEXT,
+            result_id INTEGER,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+        ''')
+        legacy = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'encounter_clips'").fetchone()
+        if legacy:
+            conn.execute("ALTER TABLE encounter_clips RENAME TO encounter_clips_legacy")
+        conn.execute('''
+        CREATE TABLE encounter_clips (
+            encounter_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            filename TEXT,
+            codec TEXT NOT NULL,
+            dict_id INTEGER,
+            raw_text BLOB,
+            refined_text BLOB,
+            translated_text BLOB,
+            timings TEXT,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (encounter_id, seq),
+            FOREIGN KEY (dict_id) REFERENCES compression_dictionaries (id)
+        )
+        ''')
+        if legacy:
+            rows = conn.execute(
+                "SELECT encounter_id, seq, filename, raw_text, refined_text, translated_text, timings, created_at "
+                "FROM encounter_clips_legacy"
+            ).fetchall()
+            for encounter_id, seq, filename, *texts, timings, created_at in rows:
+                codec, dict_id, blobs = cls.compress_texts(conn, texts, dict_id=None)
+                conn.execute(
+                    "INSERT INTO encounter_clips VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (encounter_id, seq, filename, codec, dict_id, *blobs, timings, created_at),
+                )
+            conn.execute("DROP TABLE encounter_clips_legacy")
+            logger.info(f"Compressed {len(rows)} stored encounter clips")
+
+    @staticmethod
+    def _register_functions(conn: sqlite3.Connection):
+        """SQL functions used by the full-text index triggers."""
+        def fts_text(codec, dict_id, blob):
+            return normalize_arabic(PayloadCodec.decompress(blob, codec, dict_id) or "")
+
+        def fts_json(codec, dict_id, blob):
+            return normalize_arabic(flatten_json_values(PayloadCodec.decompress(blob, codec, dict_id)))
+
+        conn.create_function("fts_text", 3, fts_text, deterministic=True)
+        conn.create_function("fts_json", 3, fts_json, deterministic=True)
+
+    @classmethod
+    def _active_dictionary(cls, conn: sqlite3.Connection):
+        """Return the id of the newest compression dictionary (or None), loading it on first use.
+
+        The lookup is repeated every ``PAYLOAD_DICTIONARY_REFRESH`` seconds so a
+        dictionary trained by another process is picked up without a restart.
+        """
+        now = time.monotonic()
+        checked_at = cls._active_dict_checked_at
+        if checked_at is None or now - checked_at >= Config.PAYLOAD_DICTIONARY_REFRESH:
+            row = None
+            if PayloadCodec.default_codec() == PayloadCodec.ZSTD:
+                row = conn.execute(
+                    "SELECT id FROM compression_dictionaries WHERE codec = ? ORDER BY id DESC LIMIT 1",
+                    (PayloadCodec.ZSTD,),
+                ).fetchone()
+            cls._active_dict_id = row[0] if row else None
+            if cls._active_dict_id is not None:
+                cls._load_dictionary(conn, cls._active_dict_id)
+            cls._active_dict_checked_at = now
+        return cls._active_dict_id
+
+    @classmethod
+    def _load_dictionary(cls, conn: sqlite3.Connection, dict_id: int):
+        if not PayloadCodec.has_dictionary(dict_id):
+            row = conn.execute("SELECT data FROM compression_dictionaries WHERE id = ?", (dict_id,)).fetchone()
+            if row is None:
+                raise MissingDictionaryError(f"Compression dictionary {dict_id} is not stored")
+            PayloadCodec.register_dictionary(dict_id, row[0])
+
+    @classmethod
+    def _fetch_dictionary(cls, dict_id: int):
+        """Dictionary loader for ``PayloadCodec``: read a dictionary on the calling thread's connection."""
+        row = cls.pool().connection().execute(
+            "SELECT data FROM compression_dictionaries WHERE id = ?", (dict_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    @classmethod
+    def compress_texts(cls, conn: sqlite3.Connection, texts: list, dict_id=False) -> tuple:
+        """Compress ``texts`` with the default codec and (unless given) the newest dictionary.
+
+        Returns ``(codec, dict_id, blobs)``; store codec and dict_id next to the blobs.
+        """
+        if dict_id is False:
+            dict_id = cls._active_dictionary(conn)
+        if dict_id is not None:
+            cls._load_dictionary(conn, dict_id)
+        codec = PayloadCodec.default_codec()
+        return codec, dict_id, [PayloadCodec.compress(text, codec, dict_id) for text in texts]
+
+    @classmethod
+    def decompress_texts(cls, conn: sqlite3.Connection, codec: str, dict_id, blobs) -> list:
+        """Inverse of ``compress_texts``."""
+        if dict_id is not None:
+            cls._load_dictionary(conn, dict_id)
+        return [PayloadCodec.decompress(blob, codec, dict_id) for blob in blobs]
+
+    @classmethod
+    def _insert_payload(cls, conn: sqlite3.Connection, result_id: int, record: dict, dict_id=False):
+        codec, dict_id, blobs = cls.compress_texts(
+            conn, [record.get(column) for column in cls._PAYLOAD_COLUMNS], dict_id
+        )
+        conn.execute(
+            f"INSERT OR REPLACE INTO audio_result_payloads "
+            f"(result_id, codec, dict_id, {', '.join(cls._PAYLOAD_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (result_id, codec, dict_id, *blobs),
+        )
+
+    @classmethod
+    def _insert_result(cls, conn: sqlite3.Connection, record: dict) -> int:
+        """Insert one result row plus its compressed payload; returns the new id."""
+        columns = cls._ROW_COLUMNS
+        cursor = conn.execute(
+            f"INSERT INTO audio_results ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+            tuple(record.get(column) for column in columns),
+        )
+        result_id = cursor.lastrowid
+        cls._insert_payload(conn, result_id, record)
+        return result_id
+
+    @classmethod
+    def _load_payload(cls, conn: sqlite3.Connection, result: dict) -> dict:
+        """Decompress a result's payload columns into ``result`` (in place)."""
+        row = conn.execute(
+            f"SELECT codec, dict_id, {', '.join(cls._PAYLOAD_COLUMNS)} FROM audio_result_payloads "
+            f"WHERE result_id = ?",
+            (result["id"],),
+        ).fetchone()
+        if row is None:
+            return result
+        result.update(zip(cls._PAYLOAD_COLUMNS, cls.decompress_texts(conn, row[0], row[1], row[2:])))
+        return result
+
+    @classmethod
+    def train_compression_dictionary(cls, sample_limit: int = 2000) -> int:
+        """
+        Train a zstd dictionary on the most recent stored payloads.
+
+        New results are compressed with the newest dictionary; existing rows
+        keep the dictionary they were written with until ``recompress_payloads``
+        rewrites them.
+
+        Returns:
+            int: id of the new dictionary.
+        """
+        conn = cls.pool().connection()
+        samples = []
+        ids = conn.execute(
+            "SELECT result_id FROM audio_result_payloads ORDER BY result_id DESC LIMIT ?", (sample_limit,)
+        ).fetchall()
+        for (result_id,) in ids:
+            payload = cls._load_payload(conn, {"id": result_id})
+            samples.extend(payload[column] for column in cls._PAYLOAD_COLUMNS if payload.get(column))
+
+        data = PayloadCodec.train_dictionary(samples)
+        with cls.pool().transaction() as conn:
+            dict_id = conn.execute(
+                "INSERT INTO compression_dictionaries (codec, data, sample_count) VALUES (?, ?, ?)",
+                (PayloadCodec.ZSTD, data, len(samples)),
+            ).lastrowid
+        PayloadCodec.register_dictionary(dict_id, data)
+        cls._active_dict_id, cls._active_dict_checked_at = dict_id, time.monotonic()
+        logger.info(f"Trained compression dictionary {dict_id} on {len(samples)} samples")
+        return dict_id
+
+    @classmethod
+    def recompress_payloads(cls, batch_size: int = 500) -> int:
+        """Rewrite payloads not yet using the newest dictionary; returns rows rewritten."""
+        conn = cls.pool().connection()
+        dict_id = cls._active_dictionary(conn)
+        rewritten, last_id = 0, 0
+        while True:
+            ids = [row[0] for row in conn.execute(
+                "SELECT result_id FROM audio_result_payloads WHERE result_id > ? AND dict_id IS NOT ? "
+                "ORDER BY result_id LIMIT ?",
+                (last_id, dict_id, batch_size),
+            ).fetchall()]
+            if not ids:
+                return rewritten
+            with cls.pool().transaction() as conn:
+                for result_id in ids:
+                    payload = cls._load_payload(conn, {"id": result_id})
+                    cls._insert_payload(conn, result_id, payload, dict_id=dict_id)
+            rewritten += len(ids)
+            last_id = ids[-1]
 
     @classmethod
     def register_user(cls, username: str, hashed_password: str) -> int:
         """Register a new user and return their ID."""
         try:
-            conn = sqlite3.connect(cls.DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO users (username, hashed_password) VALUES (?, ?)",
-                (username, hashed_password)
-            )
-            conn.commit()
-            cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
-            user_id = cursor.fetchone()[0]
+            with cls.pool().transaction() as conn:
+                cursor = conn.execute(
+                    "INSERT INTO users (username, hashed_password) VALUES (?, ?)",
+                    (username, hashed_password)
+                )
+                user_id = cursor.lastrowid
             logger.info(f"User registered: {username}")
             return user_id
         except sqlite3.IntegrityError:
@@ -83,30 +629,22 @@ class DatabaseService:
         except sqlite3.Error as e:
             logger.error(f"User registration failed: {str(e)}")
             raise Exception(f"User registration failed: {str(e)}")
-        finally:
-            if conn:
-                conn.close()
 
     @classmethod
     def update_user_password(cls, username, new_pass):
         """Update a user's password if the user exists."""
         try:
-            conn = sqlite3.connect(cls.DB_PATH)
-            cursor = conn.cursor()
+            with cls.pool().transaction() as conn:
+                cursor = conn.execute(
+                    "UPDATE users SET hashed_password = ? WHERE username = ?",
+                    (new_pass, username)
+                )
+                updated = cursor.rowcount > 0
 
-            # Check if the user exists
-            cursor.execute("SELECT 1 FROM users WHERE username = ?", (username,))
-            user = cursor.fetchone()
-            if not user:
+            if not updated:
                 logger.warning(f"User not found: {username}")
                 return False
 
-            # Update the password
-            cursor.execute(
-                "UPDATE users SET hashed_password = ? WHERE username = ?",
-                (new_pass, username)
-            )
-            conn.commit()
             logger.info(f"Password updated for user: {username}")
             return True
 
@@ -114,18 +652,14 @@ class DatabaseService:
             logger.error(f"User password update failed: {str(e)}")
             raise Exception(f"User password update failed: {str(e)}")
 
-        finally:
-            if conn:
-                conn.close()
-
 
     @classmethod
     def verify_user(cls, username: str) -> dict:
         """Verify user exists and return user data."""
         try:
-            conn = sqlite3.connect(cls.DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute("SELECT id, username, hashed_password FROM users WHERE username = ?", (username,))
+            cursor = cls.pool().connection().execute(
+                "SELECT id, username, hashed_password FROM users WHERE username = ?", (username,)
+            )
             user = cursor.fetchone()
             if user:
                 return {"id": user[0], "username": user[1], "hashed_password": user[2]}
@@ -134,93 +668,245 @@ class DatabaseService:
         except sqlite3.Error as e:
             logger.error(f"User verification failed: {str(e)}")
             raise Exception(f"User verification failed: {str(e)}")
-        finally:
-            if conn:
-                conn.close()
 
     @classmethod
-    def save_audio_result(cls, 
+    def save_audio_result(cls,
                           user_id: int,
-                          filename: str, 
-                          language: str, 
-                          model: str, 
-                          is_conversation: bool, 
-                          raw_text: str, 
-                          arabic_text: str, 
-                          translation_text: str, 
-                          json_data: str, 
-                          reasoning: str, 
-                          preprocessing_time: float, 
-                          voice_processing_time: float, 
+                          filename: str,
+                          language: str,
+                          model: str,
+                          is_conversation: bool,
+                          raw_text: str,
+                          arabic_text: str,
+                          translation_text: str,
+                          json_data: str,
+                          reasoning: str,
+                          preprocessing_time: float,
+                          voice_processing_time: float,
                           llm_processing_time: float,
                           doctor_name: str = None,
                           feedback: str = None):
         """Save audio processing results to database"""
         try:
-            conn = sqlite3.connect(cls.DB_PATH)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-            INSERT INTO audio_results 
-            (user_id, filename, language, model, is_conversation, raw_text, arabic_text, translation_text, 
-            json_data, reasoning, preprocessing_time, voice_processing_time, llm_processing_time,
-            doctor_name, feedback)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                user_id, filename, language, model, is_conversation, raw_text, arabic_text,
-                translation_text, json_data, reasoning, preprocessing_time, voice_processing_time,
-                llm_processing_time, doctor_name, feedback
-            ))
-            
-            conn.commit()
-            result_id = cursor.lastrowid
+            with cls.pool().transaction() as conn:
+                result_id = cls._insert_result(conn, dict(
+                    user_id=user_id, filename=filename, language=language, model=model,
+                    is_conversation=is_conversation, raw_text=raw_text, arabic_text=arabic_text,
+                    translation_text=translation_text, json_data=json_data, reasoning=reasoning,
+                    preprocessing_time=preprocessing_time, voice_processing_time=voice_processing_time,
+                    llm_processing_time=llm_processing_time, doctor_name=doctor_name, feedback=feedback,
+                ))
+
             logger.info(f"Saved audio result with ID: {result_id}")
             return result_id
         except Exception as e:
             logger.error(f"Error saving audio result: {str(e)}")
             return None
-        finally:
-            if conn:
-                conn.close()
-    
+
+    @classmethod
+    def save_audio_results(cls, records: list) -> int:
+        """Save a batch of audio results in a single transaction.
+
+        Each record is a dict with the keyword arguments of ``save_audio_result``.
+        Returns the number of rows written.
+        """
+        if not records:
+            return 0
+        with cls.pool().transaction() as conn:
+            for record in records:
+                cls._insert_result(conn, record)
+        logger.info(f"Saved batch of {len(records)} audio results")
+        return len(records)
+
     @classmethod
     def get_audio_results(cls, limit=100):
-        """Get recent audio processing results"""
+        """Get recent audio processing results, with their texts decompressed.
+
+        Prefer ``list_audio_results`` for history pages; this decompresses every row.
+        """
         try:
-            conn = sqlite3.connect(cls.DB_PATH)
-            conn.row_factory = sqlite3.Row
+            conn = cls.pool().connection()
             cursor = conn.cursor()
-            
+            cursor.row_factory = sqlite3.Row
+
             cursor.execute('''
             SELECT * FROM audio_results
-            ORDER BY insertion_date DESC
+            ORDER BY insertion_date DESC, id DESC
             LIMIT ?
             ''', (limit,))
-            
-            results = [dict(row) for row in cursor.fetchall()]
+
+            results = [cls._load_payload(conn, dict(row)) for row in cursor.fetchall()]
             logger.info(f"Retrieved {len(results)} audio results")
             return results
         except Exception as e:
             logger.error(f"Error retrieving audio results: {str(e)}")
             return []
-        finally:
-            if conn:
-                conn.close()
+
+    @classmethod
+    def list_audio_results(cls,
+                           user_id: int = None,
+                           doctor_name: str = None,
+                           language: str = None,
+                           start_date=None,
+                           end_date=None,
+                           cursor: str = None,
+                           limit: int = 50) -> tuple:
+        """
+        Page through audio results, newest first, using keyset pagination.
+
+        Only the summary columns are returned; open a single result with
+        ``get_audio_result`` to read its texts.
+
+        Args:
+            user_id: Only results for this user.
+            doctor_name: Only results for this doctor.
+            language: Only results in this language ("ar"/"en").
+            start_date: Inclusive lower bound on insertion_date (datetime or "YYYY-MM-DD[ HH:MM:SS]").
+            end_date: Exclusive upper bound on insertion_date.
+            cursor: ``next_cursor`` from the previous page, or None for the first page.
+            limit: Page size.
+
+        Returns:
+            tuple: (rows: list[dict], next_cursor: str or None)
+        """
+        clauses, params = [], []
+        if user_id is not None:
+            clauses.append("user_id = ?")
+            params.append(user_id)
+        if doctor_name is not None:
+            clauses.append("doctor_name = ?")
+            params.append(doctor_name)
+        if language is not None:
+            clauses.append("language = ?")
+            params.append(language)
+        if start_date is not None:
+            clauses.append("insertion_date >= ?")
+            params.append(cls._format_timestamp(start_date))
+        if end_date is not None:
+            clauses.append("insertion_date < ?")
+            params.append(cls._format_timestamp(end_date))
+        if cursor:
+            last_date, last_id = cls._decode_cursor(cursor)
+            clauses.append("(insertion_date, id) < (?, ?)")
+            params.extend((last_date, last_id))
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        query = (
+            f"SELECT {', '.join(cls._SUMMARY_COLUMNS)} FROM audio_results {where} "
+            f"ORDER BY insertion_date DESC, id DESC LIMIT ?"
+        )
+        params.append(limit + 1)
+
+        try:
+            db_cursor = cls.pool().connection().cursor()
+            db_cursor.row_factory = sqlite3.Row
+            rows = [dict(row) for row in db_cursor.execute(query, params).fetchall()]
+        except sqlite3.Error as e:
+            logger.error(f"Error listing audio results: {str(e)}")
+            raise Exception(f"Error listing audio results: {str(e)}")
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = cls._encode_cursor(rows[-1]["insertion_date"], rows[-1]["id"])
+        return rows, next_cursor
+
+    @classmethod
+    def get_audio_result(cls, result_id: int) -> dict:
+        """Get a single audio result with its texts decompressed, or None."""
+        try:
+            conn = cls.pool().connection()
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            row = cursor.execute("SELECT * FROM audio_results WHERE id = ?", (result_id,)).fetchone()
+            return cls._load_payload(conn, dict(row)) if row else None
+        except sqlite3.Error as e:
+            logger.error(f"Error retrieving audio result {result_id}: {str(e)}")
+            raise Exception(f"Error retrieving audio result: {str(e)}")
+
+    @classmethod
+    def search_audio_results(cls,
+                             query: str,
+                             user_id: int = None,
+                             doctor_name: str = None,
+                             language: str = None,
+                             limit: int = 20,
+                             offset: int = 0) -> list:
+        """
+        Full-text search over refined transcripts, translations and extracted fields.
+
+        Args:
+            query: Free text, e.g. a drug name or complaint (Arabic or English).
+            user_id / doctor_name / language: Optional filters.
+            limit / offset: Page of ranked results.
+
+        Returns:
+            list[dict]: Summary columns plus ``rank`` (lower is better) and a
+            highlighted ``snippet`` per matching result, best match first.
+        """
+        match = build_match_query(query)
+        clauses, params = ["audio_results_fts MATCH ?"], [match]
+        if user_id is not None:
+            clauses.append("r.user_id = ?")
+            params.append(user_id)
+        if doctor_name is not None:
+            clauses.append("r.doctor_name = ?")
+            params.append(doctor_name)
+        if language is not None:
+            clauses.append("r.language = ?")
+            params.append(language)
+        params.extend((limit, offset))
+
+        columns = ", ".join(f"r.{column}" for column in cls._SUMMARY_COLUMNS)
+        try:
+            cursor = cls.pool().connection().cursor()
+            cursor.row_factory = sqlite3.Row
+            rows = cursor.execute(f'''
+            SELECT {columns}, audio_results_fts.rank AS rank,
+                   snippet(audio_results_fts, -1, '[', ']', '...', 16) AS snippet
+            FROM audio_results_fts
+            JOIN audio_results r ON r.id = audio_results_fts.rowid
+            WHERE {' AND '.join(clauses)}
+            ORDER BY audio_results_fts.rank
+            LIMIT ? OFFSET ?
+            ''', params).fetchall()
+            return [dict(row) for row in rows]
+        except sqlite3.Error as e:
+            logger.error(f"Error searching audio results: {str(e)}")
+            raise Exception(f"Error searching audio results: {str(e)}")
+
+    @staticmethod
+    def _format_timestamp(value) -> str:
+        """Format a datetime the way SQLite's CURRENT_TIMESTAMP stores it."""
+        if isinstance(value, datetime):
+            return value.strftime("%Y-%m-%d %H:%M:%S")
+        return str(value)
+
+    @staticmethod
+    def _encode_cursor(insertion_date: str, result_id: int) -> str:
+        raw = json.dumps([insertion_date, result_id]).encode()
+        return base64.urlsafe_b64encode(raw).decode()
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> tuple:
+        try:
+            insertion_date, result_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return insertion_date, int(result_id)
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Invalid pagination cursor: {cursor}") from e
 
     @classmethod
     def update_feedback(cls, result_id: int, feedback: str) -> bool:
         """Update feedback for an existing audio result record."""
         try:
-            conn = sqlite3.connect(cls.DB_PATH)
-            cursor = conn.cursor()
-            
-            cursor.execute(
-                "UPDATE audio_results SET feedback = ? WHERE id = ?",
-                (feedback, result_id)
-            )
-            conn.commit()
-            
-            if cursor.rowcount > 0:
+            with cls.pool().transaction() as conn:
+                cursor = conn.execute(
+                    "UPDATE audio_results SET feedback = ? WHERE id = ?",
+                    (feedback, result_id)
+                )
+                updated = cursor.rowcount > 0
+
+            if updated:
                 logger.info(f"Updated feedback for result ID: {result_id}")
                 return True
             else:
@@ -229,6 +915,62 @@ class DatabaseService:
         except Exception as e:
             logger.error(f"Error updating feedback in database: {str(e)}")
             return False
-        finally:
-            if conn:
-                conn.close()
\ No newline at end of file
+
+
+PayloadCodec.set_dictionary_loader(DatabaseService._fetch_dictionary)
+
+
+class AsyncDatabaseService:
+    """Async facade over DatabaseService for the FastAPI app.
+
+    Each call runs on a worker thread via ``asyncio.to_thread`` so the event
+    loop never blocks on SQLite; the worker thread reuses its pooled connection.
+    """
+
+    @staticmethod
+    async def initialize_db():
+        return await asyncio.to_thread(DatabaseService.initialize_db)
+
+    @staticmethod
+    async def register_user(username: str, hashed_password: str) -> int:
+        return await asyncio.to_thread(DatabaseService.register_user, username, hashed_password)
+
+    @staticmethod
+    async def update_user_password(username, new_pass):
+        return await asyncio.to_thread(DatabaseService.update_user_password, username, new_pass)
+
+    @staticmethod
+    async def verify_user(username: str) -> dict:
+        return await asyncio.to_thread(DatabaseService.verify_user, username)
+
+    @staticmethod
+    async def save_audio_result(**kwargs):
+        return await asyncio.to_thread(DatabaseService.save_audio_result, **kwargs)
+
+    @staticmethod
+    async def save_audio_results(records: list) -> int:
+        return await asyncio.to_thread(DatabaseService.save_audio_results, records)
+
+    @staticmethod
+    async def get_audio_results(limit=100):
+        return await asyncio.to_thread(DatabaseService.get_audio_results, limit)
+
+    @staticmethod
+    async def list_audio_results(**kwargs) -> tuple:
+        return await asyncio.to_thread(DatabaseService.list_audio_results, **kwargs)
+
+    @staticmethod
+    async def get_audio_result(result_id: int) -> dict:
+        return await asyncio.to_thread(DatabaseService.get_audio_result, result_id)
+
+    @staticmethod
+    async def search_audio_results(query: str, **kwargs) -> list:
+        return await asyncio.to_thread(DatabaseService.search_audio_results, query, **kwargs)
+
+    @staticmethod
+    async def train_compression_dictionary(sample_limit: int = 2000) -> int:
+        return await asyncio.to_thread(DatabaseService.train_compression_dictionary, sample_limit)
+
+    @staticmethod
+    async def update_feedback(result_id: int, feedback: str) -> bool:
+        return await asyncio.to_thread(DatabaseService.update_feedback, result_id, feedback)
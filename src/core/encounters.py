@@ -0,0 +1,148 @@
+import json
+import time
+import uuid
+import sqlite3
+import logging
+from typing import Callable, Optional
+
+from ..core.database import DatabaseService
+
+logger = logging.getLogger(__name__)
+
+
+class EncounterStore:
+    """
+    Multi-clip encounter sessions, stored next to ``audio_results``.
+
+    A doctor dictates an encounter in several short clips (history, exam,
+    plan). Each clip's texts are kept in ``encounter_clips``, compressed
+    like result payloads (``DatabaseService.compress_texts``), and the
+    encounter row holds the features merged so far. Clips are appended with
+    optimistic concurrency on ``clip_count``: a merge computed against an
+    older version of the features is rejected and must be redone.
+    """
+
+    OPEN = "open"
+    FINALIZED = "finalized"
+
+    _TEXT_COLUMNS = ("raw_text", "refined_text", "translated_text")
+
+    def __init__(self):
+        self._initialized_path = None
+
+    def initialize(self):
+        """Make sure the database (encounter tables included, see migration 5) is up to date."""
+        if self._initialized_path == DatabaseService.DB_PATH:
+            return
+        DatabaseService.initialize_db()
+        self._initialized_path = DatabaseService.DB_PATH
+
+    def create(self, language: str, features: Optional[str] = None,
+               user_id: Optional[int] = None, doctor_name: Optional[str] = None) -> str:
+        """Open a new encounter and return its id."""
+        self.initialize()
+        encounter_id = uuid.uuid4().hex
+        now = time.time()
+        with DatabaseService.pool().transaction() as conn:
+            conn.execute(
+                "INSERT INTO encounters (id, user_id, doctor_name, language, features, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (encounter_id, user_id, doctor_name, language, features, self.OPEN, now, now),
+            )
+        logger.info(f"Opened encounter {encounter_id}")
+        return encounter_id
+
+    def get(self, encounter_id: str, with_clips: bool = True) -> Optional[dict]:
+        """Return the encounter (and its clips, oldest first), or None."""
+        self.initialize()
+        return self._read(DatabaseService.pool().connection(), encounter_id, with_clips)
+
+    def _read(self, conn: sqlite3.Connection, encounter_id: str, with_clips: bool) -> Optional[dict]:
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        row = cursor.execute("SELECT * FROM encounters WHERE id = ?", (encounter_id,)).fetchone()
+        if row is None:
+            return None
+        encounter = dict(row)
+        encounter["json_data"] = json.loads(encounter["json_data"]) if encounter["json_data"] else {}
+        if with_clips:
+            clips = cursor.execute(
+                f"SELECT seq, filename, codec, dict_id, {', '.join(self._TEXT_COLUMNS)}, timings, created_at "
+                f"FROM encounter_clips WHERE encounter_id = ? ORDER BY seq",
+                (encounter_id,),
+            ).fetchall()
+            encounter["clips"] = [self._decode_clip(conn, clip) for clip in clips]
+        return encounter
+
+    def _decode_clip(self, conn: sqlite3.Connection, row: sqlite3.Row) -> dict:
+        texts = DatabaseService.decompress_texts(
+            conn, row["codec"], row["dict_id"], [row[column] for column in self._TEXT_COLUMNS]
+        )
+        return {
+            "seq": row["seq"],
+            "filename": row["filename"],
+            **dict(zip(self._TEXT_COLUMNS, texts)),
+            "timings": json.loads(row["timings"]) if row["timings"] else {},
+            "created_at": row["created_at"],
+        }
+
+    def add_clip(self, encounter_id: str, expected_count: int, clip: dict,
+                 json_data: dict, reasoning: str) -> bool:
+        """
+        Append a clip and store the merged features.
+
+        Returns False without writing anything if another clip was appended
+        since ``expected_count`` was read (the merge is then stale).
+        """
+        self.initialize()
+        now = time.time()
+        with DatabaseService.pool().transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE encounters SET clip_count = clip_count + 1, json_data = ?, reasoning = ?, updated_at = ? "
+                "WHERE id = ? AND clip_count = ? AND status = ?",
+                (json.dumps(json_data, ensure_ascii=False), reasoning, now, encounter_id, expected_count, self.OPEN),
+            )
+            if cursor.rowcount == 0:
+                return False
+            codec, dict_id, blobs = DatabaseService.compress_texts(
+                conn, [clip.get(column) for column in self._TEXT_COLUMNS]
+            )
+            conn.execute(
+                f"INSERT INTO encounter_clips (encounter_id, seq, filename, codec, dict_id, "
+                f"{', '.join(self._TEXT_COLUMNS)}, timings, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (encounter_id, expected_count + 1, clip.get("filename"), codec, dict_id, *blobs,
+                 json.dumps(clip.get("timings") or {}), now),
+            )
+        return True
+
+    def finalize(self, encounter_id: str, build_record: Callable[[dict], dict]) -> int:
+        """
+        Close the encounter and store it as one ``audio_results`` row.
+
+        The encounter and its clips are read, the result inserted and the
+        status changed in one write transaction, so a clip appended
+        concurrently is either part of the result or rejected, and only one
+        of several concurrent calls inserts a row. ``build_record`` turns the
+        encounter into the record passed to ``save_audio_result``. Returns the
+        result id (the existing one if the encounter was already finalized).
+        """
+        self.initialize()
+        with DatabaseService.pool().transaction() as conn:
+            encounter = self._read(conn, encounter_id, with_clips=True)
+            if encounter is None:
+                raise ValueError(f"Encounter {encounter_id} not found")
+            if encounter["status"] != self.OPEN:
+                return encounter["result_id"]
+            if not encounter["clips"]:
+                raise ValueError(f"Encounter {encounter_id} has no clips")
+            result_id = DatabaseService._insert_result(conn, build_record(encounter))
+            conn.execute(
+                "UPDATE encounters SET status = ?, result_id = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (self.FINALIZED, result_id, time.time(), encounter_id, self.OPEN),
+            )
+        logger.info(f"Finalized encounter {encounter_id} as result {result_id}")
+        return result_id
+
+
+# Shared store used by the apps
+encounter_store = EncounterStore()
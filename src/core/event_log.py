@@ -0,0 +1,168 @@
+import time
+import json
+import uuid
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Callable, Iterable, Optional
+
+from ..core.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class RunEventLog:
+    """
+    Bounded in-memory log of the events produced by one pipeline run.
+
+    Events get monotonically increasing ids starting at 1. Only the last
+    ``max_events`` are retained; a reader resuming from an evicted id gets the
+    oldest events still available. Readers either block on the log
+    (``follow``) or await it from an event loop (``afollow``).
+    """
+
+    def __init__(self, run_id: str, max_events: int = Config.EVENT_LOG_MAX_EVENTS):
+        self.run_id = run_id
+        self.created_at = time.time()
+        self.closed_at: Optional[float] = None
+        self._events = deque(maxlen=max_events)
+        self._next_id = 1
+        self._cond = threading.Condition()
+        self._listeners = set()
+
+    @property
+    def closed(self) -> bool:
+        return self.closed_at is not None
+
+    def append(self, step: str, data) -> int:
+        with self._cond:
+            event_id = self._next_id
+            self._next_id += 1
+            self._events.append((event_id, step, data))
+            self._cond.notify_all()
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener()
+        return event_id
+
+    def close(self):
+        with self._cond:
+            self.closed_at = time.time()
+            self._cond.notify_all()
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener()
+
+    def read_after(self, last_id: int) -> tuple:
+        """Return (events with id > last_id, closed) as one consistent snapshot."""
+        with self._cond:
+            return [event for event in self._events if event[0] > last_id], self.closed
+
+    def follow(self, last_id: int = 0, timeout: Optional[float] = None):
+        """Blocking generator of ``(id, step, data)`` until the run is closed."""
+        while True:
+            with self._cond:
+                events, closed = self.read_after(last_id)
+                if not events and not closed:
+                    self._cond.wait(timeout)
+                    events, closed = self.read_after(last_id)
+            for event in events:
+                last_id = event[0]
+                yield event
+            if closed and not events:
+                return
+
+    async def afollow(self, last_id: int = 0):
+        """Async generator of ``(id, step, data)``; waits without holding a thread."""
+        loop = asyncio.get_running_loop()
+        wakeup = asyncio.Event()
+
+        def notify():
+            loop.call_soon_threadsafe(wakeup.set)
+
+        with self._cond:
+            self._listeners.add(notify)
+        try:
+            while True:
+                wakeup.clear()
+                events, closed = self.read_after(last_id)
+                for event in events:
+                    last_id = event[0]
+                    yield event
+                if closed and not events:
+                    return
+                if not events:
+                    await wakeup.wait()
+        finally:
+            with self._cond:
+                self._listeners.discard(notify)
+
+
+class EventLogStore:
+    """Registry of run event logs, expired ``ttl`` seconds after the run ends."""
+
+    def __init__(self, ttl: float = Config.EVENT_LOG_TTL, max_age: float = Config.EVENT_LOG_MAX_AGE):
+        self.ttl = ttl
+        self.max_age = max_age  # hard limit for runs that never close
+        self._logs = {}
+        self._lock = threading.Lock()
+
+    def create(self, run_id: Optional[str] = None) -> RunEventLog:
+        self.purge()
+        log = RunEventLog(run_id or uuid.uuid4().hex)
+        with self._lock:
+            self._logs[log.run_id] = log
+        return log
+
+    def get(self, run_id: str) -> Optional[RunEventLog]:
+        self.purge()
+        with self._lock:
+            return self._logs.get(run_id)
+
+    def purge(self):
+        now = time.time()
+        with self._lock:
+            expired = [
+                run_id for run_id, log in self._logs.items()
+                if (log.closed and now - log.closed_at > self.ttl) or now - log.created_at > self.max_age
+            ]
+            for run_id in expired:
+                del self._logs[run_id]
+
+    def start_run(self, events: Callable[[], Iterable[tuple]], run_id: Optional[str] = None) -> RunEventLog:
+        """
+        Drain ``events()`` (an iterable of ``(step, data)``) into a new log on a
+        background thread, so the run keeps going if the client disconnects and
+        a reconnecting client can resume from the log.
+        """
+        log = self.create(run_id)
+
+        def run():
+            try:
+                for step, data in events():
+                    log.append(step, data)
+            except Exception as e:
+                logger.exception(f"Run {log.run_id} failed")
+                log.append("error", f"Unexpected error: {str(e)}")
+            finally:
+                log.close()
+
+        threading.Thread(target=run, name=f"run-{log.run_id[:8]}", daemon=True).start()
+        return log
+
+
+def parse_last_event_id(value: Optional[str], default: int = 0) -> int:
+    """Parse a ``Last-Event-ID`` header value, falling back to ``default``."""
+    if value and value.strip().isdigit():
+        return int(value.strip())
+    return default
+
+
+def format_sse(event_id: int, step: str, data) -> str:
+    """Frame one pipeline event as a Server-Sent Event with an ``id:`` line."""
+    return f"id: {event_id}\ndata: {json.dumps({'step': step, 'data': data})}\n\n"
+
+
+# Shared store used by the apps
+event_logs = EventLogStore()
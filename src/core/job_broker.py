@@ -0,0 +1,96 @@
+import importlib
+import logging
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Optional
+
+from ..core.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class JobBroker(ABC):
+    """
+    Interface between the API processes that enqueue jobs and the workers that run them.
+
+    Delivery is at-least-once with leases: ``claim`` hands a job to one worker
+    for ``visibility_timeout`` seconds, the worker keeps it with
+    ``extend_lease`` and ends it with ``complete`` or ``fail``; an expired
+    lease makes the job claimable again. Workers publish a job's progress
+    with ``append_event`` and API processes read it back with ``get_events``
+    (ordered by a per-job ``seq``), so the two sides can run on different
+    machines and restart independently.
+
+    ``JobQueue`` (SQLite) is the local implementation; others register a URL
+    scheme with ``register_broker``.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    TERMINAL_STATUSES = (SUCCEEDED, FAILED)
+
+    visibility_timeout: float
+
+    # --- Producer side --- #
+    @abstractmethod
+    def enqueue(self, payload: dict, kind: str = "analyze", job_id: Optional[str] = None) -> str:
+        """Store a job and return its id; a ``priority`` of interactive in the payload is claimed first."""
+
+    @abstractmethod
+    def get_job(self, job_id: str) -> Optional[dict]:
+        """The job (``status``, ``attempts``, ``error``, ``payload``, timestamps) or None."""
+
+    @abstractmethod
+    def get_events(self, job_id: str, after_seq: int = 0, limit: int = 500) -> list:
+        """Events with ``seq > after_seq``, oldest first, as ``{"seq", "step", "data"}``."""
+
+    # --- Worker side --- #
+    @abstractmethod
+    def claim(self, worker_id: str, kinds: tuple = ("analyze",)) -> Optional[dict]:
+        """Lease the next visible job (interactive before batch) to ``worker_id``; returns it or None."""
+
+    @abstractmethod
+    def extend_lease(self, job_id: str, worker_id: str) -> bool:
+        """Push the visibility deadline out again; False if the lease was lost."""
+
+    @abstractmethod
+    def append_event(self, job_id: str, step: str, data) -> int:
+        """Publish an event of the job; returns its sequence number."""
+
+    @abstractmethod
+    def complete(self, job_id: str, worker_id: str) -> bool:
+        """Mark the job succeeded; False if ``worker_id`` no longer holds it."""
+
+    @abstractmethod
+    def fail(self, job_id: str, worker_id: str, error: str, retry: bool = True) -> bool:
+        """Record a failed attempt; requeue with backoff unless out of attempts."""
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Delete finished jobs past retention with their events and uploads; returns the job count.
+
+        Brokers that expire jobs on their own can keep this no-op default.
+        """
+        return 0
+
+
+_BROKERS: Dict[str, Callable[[str], JobBroker]] = {}
+
+
+def register_broker(scheme: str, factory: Callable[[str], JobBroker]):
+    """Make ``<scheme>://...`` URLs create brokers with ``factory(url)``."""
+    _BROKERS[scheme] = factory
+
+
+def broker_from_url(url: str = Config.JOB_BROKER_URL) -> JobBroker:
+    """Create the broker for ``url``, e.g. ``sqlite:///jobs.db``.
+
+    Modules listed in ``JOB_BROKER_PLUGINS`` are imported first so they can
+    register their schemes.
+    """
+    for module in filter(None, (name.strip() for name in Config.JOB_BROKER_PLUGINS.split(","))):
+        importlib.import_module(module)
+    scheme = url.split("://", 1)[0] if "://" in url else ""
+    if scheme not in _BROKERS:
+        raise ValueError(f"Unsupported job broker URL: {url}")
+    return _BROKERS[scheme](url)
@@ -0,0 +1,275 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+from typing import Optional
+
+from ..core.admission import AdmissionController
+from ..core.config import Config
+from ..core.database import ConnectionPool
+from ..core.job_broker import JobBroker, broker_from_url, register_broker
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue(JobBroker):
+    """
+    Durable SQLite-backed job queue with visibility timeouts (the ``sqlite://`` broker).
+
+    Jobs whose payload ``priority`` is interactive (``/analyze`` handed over in
+    ``ANALYZE_MODE=broker``) are claimed before batch ones, oldest first within
+    each class.
+
+    Delivery is at-least-once: ``claim`` leases a job to a worker for
+    ``visibility_timeout`` seconds. A worker that dies (or stops extending its
+    lease) simply lets the lease expire and the job becomes claimable again;
+    after ``max_attempts`` claims the job is marked failed. Every event a job
+    produces is appended to ``job_events`` with a per-job sequence number, so
+    clients can replay a job's progress and tail new events at any time.
+
+    Separate worker processes on the same host (or sharing the file over a
+    filesystem with working locks) use the same database through
+    ``sqlite:///<path>``.
+
+    Jobs that finished more than ``retention`` seconds ago are deleted with
+    their events and uploaded files, at most once every ``prune_interval``
+    seconds (checked when workers claim).
+    """
+
+    def __init__(self,
+                 db_path: str = Config.JOB_QUEUE_PATH,
+                 visibility_timeout: float = Config.JOB_VISIBILITY_TIMEOUT,
+                 max_attempts: int = Config.JOB_MAX_ATTEMPTS,
+                 retention: float = Config.JOB_RETENTION,
+                 prune_interval: float = Config.JOB_PRUNE_INTERVAL):
+        self.db_path = db_path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retention = retention
+        self.prune_interval = prune_interval
+        self._pool = ConnectionPool(db_path)
+        self._initialized = False
+        self._last_prune = 0.0
+
+    @classmethod
+    def from_url(cls, url: str) -> "JobQueue":
+        """``sqlite:///jobs.db`` (relative) or ``sqlite:////var/lib/app/jobs.db`` (absolute)."""
+        return cls(db_path=url[len("sqlite:///"):])
+
+    def initialize(self):
+        """Create the queue tables if they don't exist (idempotent)."""
+        if self._initialized:
+            return
+        with self._pool.transaction() as conn:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 1,
+                payload TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                visible_at REAL NOT NULL,
+                lease_owner TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            ''')
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(jobs)")]
+            if "priority" not in columns:
+                # Queue files created before jobs had a priority
+                conn.execute("ALTER TABLE jobs ADD COLUMN priority INTEGER NOT NULL DEFAULT 1")
+                conn.execute(
+                    "UPDATE jobs SET priority = 0 WHERE json_extract(payload, '$.priority') = ?",
+                    (AdmissionController.INTERACTIVE,),
+                )
+            conn.execute("DROP INDEX IF EXISTS idx_jobs_claim")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_claim_priority ON jobs (status, priority, visible_at)")
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS job_events (
+                job_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                step TEXT NOT NULL,
+                data TEXT,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (job_id, seq)
+            )
+            ''')
+        self._initialized = True
+
+    # --- Producer side --- #
+    def enqueue(self, payload: dict, kind: str = "analyze", job_id: Optional[str] = None) -> str:
+        """Store a job and return its id."""
+        self.initialize()
+        job_id = job_id or uuid.uuid4().hex
+        now = time.time()
+        priority = 0 if payload.get("priority") == AdmissionController.INTERACTIVE else 1
+        with self._pool.transaction() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, priority, payload, max_attempts, visible_at, created_at, "
+                "updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, self.QUEUED, priority, json.dumps(payload), self.max_attempts, now, now, now),
+            )
+        logger.info(f"Enqueued {kind} job {job_id}")
+        return job_id
+
+    def get_job(self, job_id: str) -> Optional[dict]:
+        self.initialize()
+        cursor = self._pool.connection().cursor()
+        cursor.row_factory = sqlite3.Row
+        row = cursor.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        return job
+
+    def get_events(self, job_id: str, after_seq: int = 0, limit: int = 500) -> list:
+        """Return stored events with ``seq > after_seq``, oldest first."""
+        self.initialize()
+        rows = self._pool.connection().execute(
+            "SELECT seq, step, data FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+            (job_id, after_seq, limit),
+        ).fetchall()
+        return [{"seq": seq, "step": step, "data": json.loads(data)} for seq, step, data in rows]
+
+    # --- Worker side --- #
+    def claim(self, worker_id: str, kinds: tuple = ("analyze",)) -> Optional[dict]:
+        """Lease the next visible job (interactive first, then oldest) to ``worker_id``; returns it or None."""
+        self.initialize()
+        now = time.time()
+        if now - self._last_prune > self.prune_interval:
+            self.prune(now)
+        placeholders = ", ".join("?" for _ in kinds)
+        with self._pool.transaction() as conn:
+            while True:
+                row = conn.execute(
+                    f"SELECT id, attempts, max_attempts FROM jobs "
+                    f"WHERE status IN (?, ?) AND visible_at <= ? AND kind IN ({placeholders}) "
+                    f"ORDER BY priority, visible_at LIMIT 1",
+                    (self.QUEUED, self.RUNNING, now, *kinds),
+                ).fetchone()
+                if row is None:
+                    return None
+                job_id, attempts, max_attempts = row
+                if attempts >= max_attempts:
+                    # Lease expired on the last allowed attempt
+                    self._finish(conn, job_id, self.FAILED, "Lease expired after final attempt")
+                    continue
+                conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, visible_at = ?, lease_owner = ?, "
+                    "updated_at = ? WHERE id = ?",
+                    (self.RUNNING, now + self.visibility_timeout, worker_id, now, job_id),
+                )
+                self._append_event(conn, job_id, "attempt", {"attempt": attempts + 1, "worker": worker_id})
+                break
+        return self.get_job(job_id)
+
+    def extend_lease(self, job_id: str, worker_id: str) -> bool:
+        """Push the visibility deadline out again; False if the lease was lost."""
+        now = time.time()
+        with self._pool.transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET visible_at = ?, updated_at = ? WHERE id = ? AND lease_owner = ? AND status = ?",
+                (now + self.visibility_timeout, now, job_id, worker_id, self.RUNNING),
+            )
+            return cursor.rowcount > 0
+
+    def append_event(self, job_id: str, step: str, data) -> int:
+        """Append an event to the job's log; returns its sequence number."""
+        with self._pool.transaction() as conn:
+            return self._append_event(conn, job_id, step, data)
+
+    def complete(self, job_id: str, worker_id: str) -> bool:
+        with self._pool.transaction() as conn:
+            if not self._owns(conn, job_id, worker_id):
+                return False
+            self._finish(conn, job_id, self.SUCCEEDED, None)
+        return True
+
+    def fail(self, job_id: str, worker_id: str, error: str, retry: bool = True) -> bool:
+        """Record a failed attempt; requeue with backoff unless out of attempts."""
+        now = time.time()
+        with self._pool.transaction() as conn:
+            if not self._owns(conn, job_id, worker_id):
+                return False
+            attempts, max_attempts = conn.execute(
+                "SELECT attempts, max_attempts FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if retry and attempts < max_attempts:
+                backoff = min(Config.JOB_RETRY_BACKOFF * 2 ** (attempts - 1), 300)
+                conn.execute(
+                    "UPDATE jobs SET status = ?, visible_at = ?, lease_owner = NULL, error = ?, updated_at = ? "
+                    "WHERE id = ?",
+                    (self.QUEUED, now + backoff, error, now, job_id),
+                )
+            else:
+                self._finish(conn, job_id, self.FAILED, error)
+        return True
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Delete finished jobs older than ``retention`` with their events and uploads; returns the job count."""
+        self.initialize()
+        now = now or time.time()
+        cutoff = now - self.retention
+        self._last_prune = now
+        expired = "SELECT id FROM jobs WHERE status IN (?, ?) AND updated_at < ?"
+        params = (*self.TERMINAL_STATUSES, cutoff)
+        with self._pool.transaction() as conn:
+            files = {path for (path,) in conn.execute(
+                f"SELECT json_extract(payload, '$.file_path') FROM jobs WHERE id IN ({expired})", params
+            ) if path}
+            conn.execute(f"DELETE FROM job_events WHERE job_id IN ({expired})", params)
+            removed = conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?", params
+            ).rowcount
+            # A retried /analyze run may still point newer jobs at the same upload
+            in_use = {path for (path,) in conn.execute(
+                "SELECT json_extract(payload, '$.file_path') FROM jobs"
+            ) if path}
+        for path in files - in_use:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not delete upload {path} of an expired job: {str(e)}")
+        if removed:
+            logger.info(f"Pruned {removed} jobs finished more than {self.retention}s ago")
+        return removed
+
+    # --- Helpers --- #
+    def _owns(self, conn: sqlite3.Connection, job_id: str, worker_id: str) -> bool:
+        row = conn.execute("SELECT lease_owner, status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None or row[0] != worker_id or row[1] != self.RUNNING:
+            logger.warning(f"Worker {worker_id} no longer holds the lease on job {job_id}")
+            return False
+        return True
+
+    def _finish(self, conn: sqlite3.Connection, job_id: str, status: str, error: Optional[str]):
+        conn.execute(
+            "UPDATE jobs SET status = ?, lease_owner = NULL, error = ?, updated_at = ? WHERE id = ?",
+            (status, error, time.time(), job_id),
+        )
+        self._append_event(conn, job_id, "job_status", {"status": status, "error": error})
+
+    @staticmethod
+    def _append_event(conn: sqlite3.Connection, job_id: str, step: str, data) -> int:
+        seq = conn.execute(
+            "SELECT COALESCE(MAX(seq), 0) + 1 FROM job_events WHERE job_id = ?", (job_id,)
+        ).fetchone()[0]
+        conn.execute(
+            "INSERT INTO job_events (job_id, seq, step, data, created_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, seq, step, json.dumps(data, ensure_ascii=False), time.time()),
+        )
+        return seq
+
+
+register_broker("sqlite", JobQueue.from_url)
+
+# Shared broker used by the apps and the worker pools (JOB_BROKER_URL)
+job_queue = broker_from_url(Config.JOB_BROKER_URL)
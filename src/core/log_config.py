@@ -0,0 +1,250 @@
+import atexit
+import contextvars
+import copy
+import logging
+import logging.handlers
+import queue
+import re
+import sys
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, Optional
+
+from ..core.config import Config
+from ..core.metrics import metrics
+
+# Set per HTTP request (middleware / before_request) and per pipeline run; every
+# record logged while they are set carries them, including from stage pool workers
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+run_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("run_id", default=None)
+
+_CONTEXT_VARS = {"request_id": request_id_var, "run_id": run_id_var}
+
+LOG_FORMAT = "%(asctime)s - %(levelname)s - [%(request_id)s %(run_id)s] - %(name)s - %(message)s"
+
+_LOG_DROPPED = metrics.counter("log_records_dropped_total", "Log records dropped because the log queue was full.")
+_LOG_SAMPLED_OUT = metrics.counter(
+    "log_records_sampled_out_total", "Log records skipped by sampling.", ("logger",),
+)
+
+# Credentials that must never reach a log line, however they got into the message
+_SECRETS = re.compile(r"(Bearer\s+|api_key['\"]?\s*[:=]\s*['\"]?)[\w.\-]+", re.IGNORECASE)
+
+
+@contextmanager
+def log_context(**fields: Optional[str]):
+    """Attach ``request_id`` and/or ``run_id`` to every record logged inside the block."""
+    tokens = [(_CONTEXT_VARS[name], _CONTEXT_VARS[name].set(value)) for name, value in fields.items()]
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+def with_log_context(iterable: Iterable, **fields: Optional[str]) -> Iterator:
+    """Iterate ``iterable`` with ``log_context(**fields)`` set around each step.
+
+    For generators: a context set across a ``yield`` would leak into the
+    consumer (and Starlette runs each ``next`` in a fresh copy of the context),
+    so the context is set and reset within every step instead.
+    """
+    iterator = iter(iterable)
+    while True:
+        with log_context(**fields):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+class ContextFilter(logging.Filter):
+    """Stamp records with the current request and run ids (runs in the thread that logs)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for name, var in _CONTEXT_VARS.items():
+            if not hasattr(record, name):
+                setattr(record, name, var.get() or "-")
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep 1 in N records below WARNING for loggers configured with a sample rate.
+
+    Counting is per logger and message template, so one chatty line does not
+    crowd out the rest of that logger; the first occurrence is always kept.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.every = {name: max(1, round(1 / rate)) for name, rate in rates.items() if rate > 0}
+        self.muted = {name for name, rate in rates.items() if rate <= 0}
+        self._counts: Dict[tuple, int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        name = self._configured(record.name)
+        if name is None:
+            return True
+        if name in self.muted:
+            keep = False
+        else:
+            key = (record.name, record.msg)
+            with self._lock:
+                count = self._counts.get(key, 0)
+                self._counts[key] = count + 1
+            keep = count % self.every[name] == 0
+        if not keep:
+            _LOG_SAMPLED_OUT.inc(logger=name)
+        return keep
+
+    def _configured(self, logger_name: str) -> Optional[str]:
+        # Most specific configured ancestor, e.g. "src.core" covers "src.core.database"
+        while logger_name:
+            if logger_name in self.every or logger_name in self.muted:
+                return logger_name
+            logger_name = logger_name.rpartition(".")[0]
+        return None
+
+    @staticmethod
+    def parse(spec: str) -> Dict[str, float]:
+        """``"src.core.database=0.01,src.model.speech_service=0.1"`` -> {logger: rate}."""
+        rates = {}
+        for item in spec.split(","):
+            name, _, rate = item.strip().partition("=")
+            if name and rate:
+                rates[name] = float(rate)
+        return rates
+
+
+class RedactingFormatter(logging.Formatter):
+    """Formats records in the listener thread, shortening or hiding long payloads.
+
+    String arguments longer than ``max_payload_chars`` (transcripts, prompts,
+    model output) are truncated, or with ``redact`` replaced by their length
+    only. The whole message is capped at ``max_message_chars`` to catch
+    payloads already baked into f-strings, and bearer tokens and API keys are
+    masked.
+    """
+
+    def __init__(self, fmt: str = LOG_FORMAT, max_payload_chars: int = Config.LOG_MAX_PAYLOAD_CHARS,
+                 max_message_chars: int = Config.LOG_MAX_MESSAGE_CHARS, redact: bool = Config.LOG_REDACT_PAYLOADS):
+        super().__init__(fmt)
+        self.max_payload_chars = max_payload_chars
+        self.max_message_chars = max_message_chars
+        self.redact = redact
+
+    def format(self, record: logging.LogRecord) -> str:
+        if record.args:
+            record = logging.makeLogRecord(record.__dict__)
+            if isinstance(record.args, dict):
+                record.args = {key: self._shorten(value) for key, value in record.args.items()}
+            else:
+                record.args = tuple(self._shorten(arg) for arg in record.args)
+        return _SECRETS.sub(r"\1***", super().format(record))
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        # Only the message is capped; tracebacks are appended after this in full
+        message = record.message
+        if len(message) > self.max_message_chars:
+            record.message = f"{message[:self.max_message_chars]}... [{len(message) - self.max_message_chars} more chars]"
+        return super().formatMessage(record)
+
+    def _shorten(self, value):
+        if not isinstance(value, str) or len(value) <= self.max_payload_chars:
+            return value
+        if self.redact:
+            return f"<redacted {len(value)} chars>"
+        return f"{value[:self.max_payload_chars]}... [{len(value)} chars]"
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the listener thread without formatting them or ever blocking.
+
+    The stock ``prepare`` formats the message in the caller's thread (to make
+    records picklable for other processes); the queue here is in-process, so
+    that work is left to the listener. Mutable containers among the arguments
+    are shallow-copied, so a caller changing them after logging doesn't change
+    what the line shows. When the queue is full the record is dropped and
+    counted instead of stalling the request.
+    """
+
+    _MUTABLE = (dict, list, set, bytearray)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if not record.args and not isinstance(record.msg, self._MUTABLE):
+            return record
+        record = copy.copy(record)
+        record.msg = self._snapshot(record.msg)
+        if isinstance(record.args, dict):
+            record.args = {key: self._snapshot(value) for key, value in record.args.items()}
+        elif record.args:
+            record.args = tuple(self._snapshot(arg) for arg in record.args)
+        return record
+
+    @classmethod
+    def _snapshot(cls, value):
+        return copy.copy(value) if isinstance(value, cls._MUTABLE) else value
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _LOG_DROPPED.inc()
+
+
+class _LoggingSetup:
+    """Owns the root handler and the background listener; ``configure`` is idempotent."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.listener: Optional[logging.handlers.QueueListener] = None
+
+    def configure(self, level: str = Config.LOG_LEVEL, log_file: Optional[str] = Config.LOG_FILE):
+        with self._lock:
+            if self.listener is not None:
+                return
+            formatter = RedactingFormatter()
+            handlers = [logging.StreamHandler(sys.stderr)]
+            if log_file:
+                handlers.append(logging.FileHandler(log_file))
+            for handler in handlers:
+                handler.setFormatter(formatter)
+
+            queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=Config.LOG_QUEUE_SIZE))
+            queue_handler.addFilter(ContextFilter())  # in the caller's thread, where the context is
+            rates = SamplingFilter.parse(Config.LOG_SAMPLE_RATES)
+            if rates:
+                queue_handler.addFilter(SamplingFilter(rates))
+
+            root = logging.getLogger()
+            for handler in list(root.handlers):
+                root.removeHandler(handler)
+            root.addHandler(queue_handler)
+            root.setLevel(level)
+
+            self.listener = logging.handlers.QueueListener(queue_handler.queue, *handlers)
+            self.listener.start()
+            atexit.register(self.stop)
+
+    def stop(self):
+        """Flush queued records and stop the listener thread."""
+        with self._lock:
+            listener, self.listener = self.listener, None
+        if listener is not None:
+            listener.stop()
+
+
+_setup = _LoggingSetup()
+
+
+def configure_logging(level: str = Config.LOG_LEVEL, log_file: Optional[str] = Config.LOG_FILE):
+    """Route all logging through a queue to a background thread (call once, at startup)."""
+    _setup.configure(level, log_file)
+
+
+def stop_logging():
+    _setup.stop()
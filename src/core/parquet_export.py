@@ -0,0 +1,294 @@
+import os
+import json
+import sqlite3
+import hashlib
+import logging
+import argparse
+from collections import defaultdict
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from ..core.config import Config
+from ..core.compression import PayloadCodec
+from ..core.database import DatabaseService
+from ..core.log_config import configure_logging, stop_logging
+
+logger = logging.getLogger(__name__)
+
+
+class ParquetExporter:
+    """
+    Incremental export of ``audio_results`` to partitioned Parquet for analytics.
+
+    Each run reads only rows with an id above the stored watermark, in batches
+    of ``batch_size``, over a read-only connection (WAL readers never block the
+    live writers). ``json_data`` is flattened into one typed column per field;
+    rows are grouped by form template (the set of json_data keys) so every
+    template gets its own dataset with a stable schema. Files are laid out as::
+
+        <output_dir>/template=<id>/date=<YYYY-MM-DD>/language=<ar|en>/part-<start>-<end>.parquet
+
+    ``<start>``-``<end>`` is the id range of the batch, recorded as ``pending``
+    in the watermark file before any of its files are written. An interrupted
+    run re-reads exactly that range on restart and replaces the same files, so
+    rows that arrived in the meantime never change a batch's file names. Files
+    are written to a temporary path and renamed into place, and the watermark
+    is advanced only after the whole batch is written.
+    """
+
+    WATERMARK_FILE = "_watermark.json"
+    TEMPLATES_FILE = "_templates.json"
+
+    BASE_SCHEMA = [
+        ("id", pa.int64()),
+        ("user_id", pa.int64()),
+        ("filename", pa.string()),
+        ("language", pa.string()),
+        ("model", pa.string()),
+        ("doctor_name", pa.string()),
+        ("feedback", pa.string()),
+        ("insertion_date", pa.timestamp("s")),
+        ("preprocessing_time", pa.float64()),
+        ("voice_processing_time", pa.float64()),
+        ("llm_processing_time", pa.float64()),
+        ("raw_text", pa.string()),
+        ("refined_text", pa.string()),
+        ("translation_text", pa.string()),
+        ("reasoning", pa.string()),
+    ]
+
+    # json_data value types -> Arrow types; anything else is exported as a JSON string
+    _FIELD_TYPES = {
+        "string": pa.string(),
+        "number": pa.float64(),
+        "boolean": pa.bool_(),
+        "list": pa.list_(pa.string()),
+        "json": pa.string(),
+    }
+
+    def __init__(self,
+                 output_dir: str = Config.EXPORT_FOLDER,
+                 batch_size: int = Config.EXPORT_BATCH_SIZE,
+                 row_group_size: int = Config.EXPORT_ROW_GROUP_SIZE,
+                 db_path: str = None):
+        self.output_dir = output_dir
+        self.batch_size = batch_size
+        self.row_group_size = row_group_size
+        self.db_path = db_path or DatabaseService.DB_PATH
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._templates = self._read_json(self.TEMPLATES_FILE, {})
+        self._dropped_values = 0
+
+    # --- Public API --- #
+    def export(self) -> dict:
+        """Export all rows above the watermark; returns run statistics."""
+        state = self._read_json(self.WATERMARK_FILE, {})
+        watermark, pending = state.get("last_id", 0), state.get("pending")
+        stats = {"rows": 0, "files": 0, "start_id": watermark, "last_id": watermark, "dropped_values": 0}
+        self._dropped_values = 0
+
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        try:
+            while True:
+                if pending:
+                    logger.info(f"Resuming interrupted export batch {pending['start']}-{pending['end']}")
+                    rows = self._read_batch(conn, watermark, until_id=pending["end"])
+                else:
+                    rows = self._read_batch(conn, watermark)
+                    if not rows:
+                        break
+                    pending = {"start": watermark + 1, "end": rows[-1]["id"]}
+                    self._write_watermark(watermark, pending)
+
+                stats["files"] += self._write_batch(rows, pending)
+                watermark, pending = pending["end"], None
+                self._write_json(self.TEMPLATES_FILE, self._templates)
+                self._write_watermark(watermark)
+                stats["rows"] += len(rows)
+                stats["last_id"] = watermark
+                stats["dropped_values"] = self._dropped_values
+                logger.info(f"Exported {stats['rows']} rows (watermark {watermark})")
+        finally:
+            conn.close()
+        return stats
+
+    # --- Reading --- #
+    def _read_batch(self, conn: sqlite3.Connection, after_id: int, until_id: int = None) -> list:
+        """Read up to ``batch_size`` rows after ``after_id``, or every row up to ``until_id``."""
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        rows = cursor.execute('''
+        SELECT r.id, r.user_id, r.filename, r.language, r.model, r.doctor_name, r.feedback,
+               r.insertion_date, r.preprocessing_time, r.voice_processing_time, r.llm_processing_time,
+               p.codec, p.dict_id, p.raw_text, p.arabic_text, p.translation_text, p.json_data, p.reasoning
+        FROM audio_results r
+        LEFT JOIN audio_result_payloads p ON p.result_id = r.id
+        WHERE r.id > ? AND (? IS NULL OR r.id <= ?)
+        ORDER BY r.id
+        LIMIT ?
+        ''', (after_id, until_id, until_id, -1 if until_id is not None else self.batch_size)).fetchall()
+
+        records = []
+        for row in rows:
+            record = dict(row)
+            codec, dict_id = record.pop("codec"), record.pop("dict_id")
+            if codec is not None:
+                if dict_id is not None:
+                    DatabaseService._load_dictionary(conn, dict_id)
+                for column in DatabaseService._PAYLOAD_COLUMNS:
+                    record[column] = PayloadCodec.decompress(record[column], codec, dict_id)
+            record["refined_text"] = record.pop("arabic_text")
+            records.append(record)
+        return records
+
+    # --- Writing --- #
+    def _write_batch(self, rows: list, batch: dict) -> int:
+        partitions = defaultdict(list)
+        for row in rows:
+            fields = self._parse_json(row.pop("json_data"))
+            template_id = self._template_for(fields)
+            date = (row["insertion_date"] or "")[:10] or "unknown"
+            partitions[(template_id, date, row["language"])].append((row, fields))
+
+        for (template_id, date, language), items in partitions.items():
+            table = self._to_table(template_id, items)
+            directory = os.path.join(
+                self.output_dir, f"template={template_id}", f"date={date}", f"language={language}"
+            )
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"part-{batch['start']:012d}-{batch['end']:012d}.parquet")
+            tmp_path = f"{path}.tmp"
+            pq.write_table(
+                table, tmp_path,
+                row_group_size=self.row_group_size,
+                write_statistics=True,
+                compression="zstd",
+            )
+            os.replace(tmp_path, path)
+        return len(partitions)
+
+    def _to_table(self, template_id: str, items: list) -> pa.Table:
+        template = self._templates[template_id]
+        columns, fields = {}, []
+        for name, arrow_type in self.BASE_SCHEMA:
+            values = [row[name] for row, _ in items]
+            if name == "insertion_date":
+                values = [datetime.fromisoformat(v) if v else None for v in values]
+            columns[name] = pa.array(values, type=arrow_type)
+            fields.append(pa.field(name, arrow_type))
+        for key, kind in template["fields"].items():
+            arrow_type = self._FIELD_TYPES[kind]
+            values, dropped = [], []
+            for row, data in items:
+                value = self._coerce(data.get(key), kind)
+                if value is None and data.get(key) not in (None, ""):
+                    dropped.append(row["id"])
+                values.append(value)
+            if dropped:
+                # The template's type was fixed by its first row; the value stays in audio_results
+                self._dropped_values += len(dropped)
+                logger.warning(f"Exported {len(dropped)} values of {key} (not a {kind}) as null, "
+                               f"template {template_id}, result ids {dropped[:10]}")
+            columns[f"json_{key}"] = pa.array(values, type=arrow_type)
+            fields.append(pa.field(f"json_{key}", arrow_type))
+        return pa.Table.from_pydict(columns, schema=pa.schema(fields))
+
+    # --- json_data flattening --- #
+    @staticmethod
+    def _parse_json(json_text: str) -> dict:
+        if not json_text:
+            return {}
+        try:
+            data = json.loads(json_text)
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _template_for(self, fields: dict) -> str:
+        """Return the template id for this set of keys, registering it on first sight.
+
+        A field's type is fixed by the first row of the template (``""`` ->
+        string, ``[]`` -> list, ...) and persisted, so the schema of a
+        template's files never changes between export runs.
+        """
+        keys = sorted(fields)
+        template_id = hashlib.sha1("\n".join(keys).encode("utf-8")).hexdigest()[:12]
+        if template_id not in self._templates:
+            self._templates[template_id] = {
+                "keys": keys,
+                "fields": {key: self._kind_of(fields[key]) for key in keys},
+            }
+        return template_id
+
+    @staticmethod
+    def _kind_of(value) -> str:
+        if isinstance(value, bool):
+            return "boolean"
+        if isinstance(value, (int, float)):
+            return "number"
+        if isinstance(value, list):
+            return "list"
+        if isinstance(value, dict):
+            return "json"
+        return "string"
+
+    @staticmethod
+    def _coerce(value, kind: str):
+        """Convert a json_data value to the field's kind; None if it doesn't convert."""
+        if value is None or value == "":
+            return None
+        if kind == "list":
+            items = value if isinstance(value, list) else [value]
+            return [item if isinstance(item, str) else json.dumps(item, ensure_ascii=False) for item in items]
+        if kind == "number":
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                return None
+        if kind == "boolean":
+            return value if isinstance(value, bool) else None
+        if isinstance(value, str):
+            return value
+        return json.dumps(value, ensure_ascii=False)
+
+    # --- State files --- #
+    def _read_json(self, name: str, default):
+        path = os.path.join(self.output_dir, name)
+        if not os.path.exists(path):
+            return default
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_watermark(self, last_id: int, pending: dict = None):
+        state = {"last_id": last_id, "updated_at": datetime.now().isoformat()}
+        if pending:
+            state["pending"] = pending
+        self._write_json(self.WATERMARK_FILE, state)
+
+    def _write_json(self, name: str, data):
+        path = os.path.join(self.output_dir, name)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally export audio_results to Parquet.")
+    parser.add_argument("--output", default=Config.EXPORT_FOLDER, help="export directory")
+    parser.add_argument("--db", default=DatabaseService.DB_PATH, help="SQLite database path")
+    parser.add_argument("--batch-size", type=int, default=Config.EXPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    configure_logging()
+    try:
+        stats = ParquetExporter(output_dir=args.output, batch_size=args.batch_size, db_path=args.db).export()
+        logger.info(f"Export finished: {stats}")
+    finally:
+        stop_logging()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+import contextvars
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional
+
+from ..core.config import Config
+
+logger = logging.getLogger(__name__)
+
+_active_profile: contextvars.ContextVar[Optional["RunProfile"]] = contextvars.ContextVar("profile", default=None)
+
+_SAFE_ID = re.compile(r"^[\w\-]{1,128}$")
+
+
+def _frame_label(code) -> str:
+    path = code.co_filename.replace("\\", "/").split("/")
+    return f"{code.co_name} ({'/'.join(path[-2:])}:{code.co_firstlineno})"
+
+
+def _thread_cpu_clock(thread_id: int) -> Optional[int]:
+    try:
+        return time.pthread_getcpuclockid(thread_id)
+    except (AttributeError, OSError):  # not on this platform, or the thread is gone
+        return None
+
+
+class RunProfile:
+    """Samples of one pipeline run: wall and CPU time per stack, plus tracemalloc peaks.
+
+    Threads doing the run's work ``attach`` while they do it (the run's own
+    thread, graph nodes and stage pool tasks); the sampler only looks at
+    attached threads, so concurrent unprofiled requests don't show up.
+    """
+
+    def __init__(self, run_id: str, interval: float):
+        self.run_id = run_id
+        self.interval = interval
+        self.started_at = time.time()
+        self._started = time.monotonic()
+        self.wall_seconds = 0.0
+        self.samples = 0
+        self.wall: Dict[tuple, float] = defaultdict(float)
+        self.cpu: Dict[tuple, float] = defaultdict(float)
+        self.memory: dict = {}
+        self._threads: Dict[int, int] = {}  # thread id -> attach depth
+        self._cpu_clocks: Dict[int, tuple] = {}  # thread id -> (clock id, last reading)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def attach(self):
+        thread_id = threading.get_ident()
+        with self._lock:
+            self._threads[thread_id] = self._threads.get(thread_id, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                depth = self._threads.pop(thread_id) - 1
+                if depth:
+                    self._threads[thread_id] = depth
+
+    def sample(self, frames: dict, elapsed: float):
+        """Attribute ``elapsed`` wall seconds (and each thread's CPU since last time) to its stack."""
+        with self._lock:
+            threads = list(self._threads)
+        for thread_id in threads:
+            frame = frames.get(thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            stack = tuple(reversed(stack))
+            self.wall[stack] += elapsed
+            self.cpu[stack] += self._cpu_delta(thread_id)
+        self.samples += 1
+
+    def _cpu_delta(self, thread_id: int) -> float:
+        clock, last = self._cpu_clocks.get(thread_id, (None, None))
+        if clock is None:
+            clock = _thread_cpu_clock(thread_id)
+            if clock is None:
+                return 0.0
+        try:
+            now = time.clock_gettime(clock)
+        except OSError:
+            return 0.0
+        self._cpu_clocks[thread_id] = (clock, now)
+        return now - last if last is not None else 0.0
+
+    def report(self, top: int = 50) -> dict:
+        """Per-function self/total wall and CPU seconds, slowest first."""
+        functions: Dict[str, Dict[str, float]] = defaultdict(
+            lambda: {"wall_self": 0.0, "wall_total": 0.0, "cpu_self": 0.0, "cpu_total": 0.0}
+        )
+        for stack, wall in self.wall.items():
+            cpu = self.cpu.get(stack, 0.0)
+            functions[stack[-1]]["wall_self"] += wall
+            functions[stack[-1]]["cpu_self"] += cpu
+            for name in set(stack):
+                functions[name]["wall_total"] += wall
+                functions[name]["cpu_total"] += cpu
+        ranked = sorted(functions.items(), key=lambda item: item[1]["wall_total"], reverse=True)
+        return {
+            "run_id": self.run_id,
+            "started_at": self.started_at,
+            "wall_seconds": round(self.wall_seconds, 3),
+            # Summed over the attached threads, so these can exceed wall_seconds
+            "sampled_thread_seconds": round(sum(self.wall.values()), 3),
+            "sampled_cpu_seconds": round(sum(self.cpu.values()), 3),
+            "samples": self.samples,
+            "interval": self.interval,
+            "memory": self.memory,
+            "functions": [
+                {"function": name, **{key: round(value, 4) for key, value in times.items()}}
+                for name, times in ranked[:top]
+            ],
+        }
+
+    def folded(self, kind: str = "wall") -> str:
+        """Collapsed stacks (``a;b;c <microseconds>``) for flamegraph.pl, speedscope or inferno."""
+        source = self.cpu if kind == "cpu" else self.wall
+        lines = [f"{';'.join(stack)} {int(seconds * 1e6)}" for stack, seconds in source.items() if seconds > 0]
+        return "\n".join(sorted(lines)) + "\n"
+
+
+class Profiler:
+    """Opt-in sampling profiler for pipeline runs, with artifacts stored per run id.
+
+    When no run is being profiled there is no sampler thread and the hooks
+    in the pipeline cost one context variable lookup. A profiled run is
+    sampled every ``interval`` seconds from a background thread (stacks via
+    ``sys._current_frames``, CPU via per-thread clocks), with tracemalloc
+    running for its duration. The report and flamegraph inputs are written
+    to ``folder`` as ``<run_id>.json``, ``<run_id>.wall.folded`` and
+    ``<run_id>.cpu.folded``; only the newest ``max_artifacts`` runs are kept.
+    """
+
+    def __init__(self,
+                 folder: str = Config.PROFILE_FOLDER,
+                 sample_rate: float = Config.PROFILE_SAMPLE_RATE,
+                 interval: float = Config.PROFILE_INTERVAL,
+                 max_artifacts: int = Config.PROFILE_MAX_ARTIFACTS):
+        self.folder = folder
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.max_artifacts = max_artifacts
+        self._profiles: List[RunProfile] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._started_tracemalloc = False
+
+    # --- Hooks --- #
+    def should_profile(self, requested: Optional[str] = None) -> bool:
+        """True if the caller asked for it (e.g. an ``X-Profile: 1`` header) or the run is sampled."""
+        if requested is not None and requested.strip().lower() in ("1", "true", "yes"):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def profile_run(self, run_id: str, events: Callable[[], Iterable[tuple]], enabled: bool) -> Iterable[tuple]:
+        """Yield from ``events()``, profiling the work if ``enabled``; stores the artifact at the end."""
+        if not enabled:
+            yield from events()
+            return
+        profile = self._begin(run_id)
+        iterator = None
+        try:
+            while True:
+                # Attach and set the context per step, like log_config.with_log_context
+                token = _active_profile.set(profile)
+                try:
+                    with profile.attach():
+                        if iterator is None:
+                            iterator = iter(events())
+                        item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    _active_profile.reset(token)
+                yield item
+        finally:
+            self._finish(profile)
+
+    @staticmethod
+    def run_attached(fn: Callable, *args, **kwargs):
+        """Call ``fn`` with this thread attached to the caller's profile, if any (for worker threads)."""
+        profile = _active_profile.get()
+        if profile is None:
+            return fn(*args, **kwargs)
+        with profile.attach():
+            return fn(*args, **kwargs)
+
+    # --- Artifacts --- #
+    def path(self, run_id: str, suffix: str) -> Optional[str]:
+        if not _SAFE_ID.match(run_id):
+            return None
+        return os.path.join(self.folder, f"{run_id}{suffix}")
+
+    def load(self, run_id: str) -> Optional[dict]:
+        path = self.path(run_id, ".json")
+        if path is None or not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def load_folded(self, run_id: str, kind: str = "wall") -> Optional[str]:
+        path = self.path(run_id, f".{'cpu' if kind == 'cpu' else 'wall'}.folded")
+        if path is None or not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+    def list(self) -> List[dict]:
+        """Stored profiles, newest first."""
+        if not os.path.isdir(self.folder):
+            return []
+        profiles = []
+        for name in os.listdir(self.folder):
+            if name.endswith(".json"):
+                path = os.path.join(self.folder, name)
+                profiles.append({"run_id": name[:-5], "created_at": os.path.getmtime(path)})
+        return sorted(profiles, key=lambda profile: profile["created_at"], reverse=True)
+
+    # --- Internals --- #
+    def _begin(self, run_id: str) -> RunProfile:
+        profile = RunProfile(run_id, self.interval)
+        with self._lock:
+            if not self._profiles:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    self._started_tracemalloc = True
+                tracemalloc.reset_peak()
+            self._profiles.append(profile)
+            profile.memory["start_bytes"] = tracemalloc.get_traced_memory()[0]
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+                self._thread.start()
+        logger.info(f"Profiling run {run_id}")
+        return profile
+
+    def _finish(self, profile: RunProfile):
+        profile.wall_seconds = time.monotonic() - profile._started
+        with self._lock:
+            current, peak = tracemalloc.get_traced_memory()
+            profile.memory.update({
+                "end_bytes": current,
+                "peak_bytes": peak,
+                # The peak is process-wide: with overlapping profiled runs it covers all of them
+                "shared_with_other_runs": len(self._profiles) > 1,
+                "top_allocations": [
+                    {"site": str(stat.traceback), "bytes": stat.size, "count": stat.count}
+                    for stat in tracemalloc.take_snapshot().statistics("lineno")[:15]
+                ],
+            })
+            self._profiles.remove(profile)
+            if not self._profiles and self._started_tracemalloc:
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+        try:
+            self._store(profile)
+        except Exception as e:
+            logger.error(f"Could not store profile of run {profile.run_id}: {e}")
+
+    def _sample_loop(self):
+        last = time.monotonic()
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                profiles = list(self._profiles)
+                if not profiles:
+                    self._thread = None
+                    return
+            now = time.monotonic()
+            frames = sys._current_frames()
+            for profile in profiles:
+                profile.sample(frames, now - last)
+            del frames
+            last = now
+
+    def _store(self, profile: RunProfile):
+        json_path = self.path(profile.run_id, ".json")
+        if json_path is None:
+            logger.warning(f"Not storing profile: unsafe run id {profile.run_id!r}")
+            return
+        os.makedirs(self.folder, exist_ok=True)
+        for kind in ("wall", "cpu"):
+            with open(self.path(profile.run_id, f".{kind}.folded"), "w", encoding="utf-8") as f:
+                f.write(profile.folded(kind))
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(profile.report(), f, indent=2)
+        logger.info(f"Stored profile of run {profile.run_id} ({profile.samples} samples)")
+        for old in self.list()[self.max_artifacts:]:
+            for suffix in (".json", ".wall.folded", ".cpu.folded"):
+                path = self.path(old["run_id"], suffix)
+                if path and os.path.exists(path):
+                    os.remove(path)
+
+
+# Shared by both apps
+profiler = Profiler()
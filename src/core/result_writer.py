@@ -0,0 +1,115 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import Optional
+
+from ..core.config import Config
+from ..core.database import DatabaseService
+
+logger = logging.getLogger(__name__)
+
+
+class ResultWriter:
+    """Write-behind persister for completed pipeline results.
+
+    ``submit`` only enqueues the record and returns immediately, so callers on
+    the request path never wait on SQLite. A background thread drains the queue
+    and writes records in multi-row transactions, flushing whenever
+    ``batch_size`` records are pending, ``flush_interval`` seconds have passed,
+    or the writer is stopped. If a multi-row transaction fails, its records
+    are retried one at a time so only the records that fail are dropped.
+    """
+
+    def __init__(self,
+                 batch_size: int = Config.RESULT_WRITER_BATCH_SIZE,
+                 flush_interval: float = Config.RESULT_WRITER_FLUSH_INTERVAL,
+                 max_queue: int = Config.RESULT_WRITER_MAX_QUEUE):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+
+    def start(self):
+        """Start the background thread (idempotent)."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="result-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def submit(self, record: dict) -> bool:
+        """Queue a result record for persistence without blocking.
+
+        Returns False (and drops the record) if the queue is full.
+        """
+        self.start()
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            logger.warning("Result writer queue full, dropping result for %s", record.get("filename"))
+            return False
+
+    def stop(self, timeout: float = 10.0):
+        """Flush pending records and stop the background thread."""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._stop.set()
+        thread.join(timeout)
+
+    def _run(self):
+        DatabaseService.initialize_db()
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            timeout = max(0.0, deadline - time.monotonic())
+            try:
+                batch.append(self._queue.get(timeout=min(timeout, 0.5)))
+            except queue.Empty:
+                pass
+
+            stopping = self._stop.is_set()
+            if stopping:
+                # Drain whatever is left before the final flush
+                while True:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+            if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline or stopping):
+                self._flush(batch)
+                batch = []
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+            if stopping:
+                DatabaseService.close_connection()
+                return
+
+    def _flush(self, batch: list):
+        for start in range(0, len(batch), self.batch_size):
+            chunk = batch[start:start + self.batch_size]
+            try:
+                self.written += DatabaseService.save_audio_results(chunk)
+            except Exception as e:
+                logger.error(f"Error persisting batch of {len(chunk)} results, retrying one by one: {str(e)}")
+                for record in chunk:
+                    try:
+                        self.written += DatabaseService.save_audio_results([record])
+                    except Exception as e:
+                        self.dropped += 1
+                        logger.error(f"Dropping result for {record.get('filename')}: {str(e)}")
+
+
+# Shared writer used by the pipeline runner
+result_writer = ResultWriter()
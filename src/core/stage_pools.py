@@ -0,0 +1,236 @@
+import time
+import queue
+import contextvars
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+from ..core.config import Config
+from ..core.metrics import QUEUE_WAIT, metrics
+from ..core.profiling import Profiler
+
+logger = logging.getLogger(__name__)
+
+
+class StageQueueFull(Exception):
+    """Raised by ``submit`` when a stage's queue stayed full for ``submit_timeout`` seconds."""
+
+
+class StagePool:
+    """
+    A resizable set of worker threads fed by a bounded queue, for one kind of work.
+
+    ``submit`` blocks while the queue is full, so a slow stage pushes back on
+    the stages feeding it instead of buffering work without limit; with a
+    ``submit_timeout`` it gives up with ``StageQueueFull`` instead of waiting
+    indefinitely. Busy time is accumulated per worker to report how saturated
+    the stage is.
+    """
+
+    _IDLE_POLL = 0.5  # seconds an idle worker waits before checking whether it was retired
+
+    def __init__(self, name: str, workers: int, max_queue: int, submit_timeout: Optional[float] = None):
+        self.name = name
+        self.workers = max(1, workers)
+        self.submit_timeout = submit_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._threads = {}  # worker index -> thread
+        self._started_at: Optional[float] = None
+        self._capacity_seconds = 0.0  # worker-seconds available before the last resize
+        self._resized_at: Optional[float] = None
+        self._busy = 0
+        self._busy_seconds = 0.0
+        self._wait_time = 0.0  # moving average, seconds
+        self._service_time = 0.0  # moving average, seconds
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def start(self):
+        """Start the worker threads (idempotent)."""
+        with self._lock:
+            if self._started_at is not None:
+                return
+            self._started_at = self._resized_at = time.monotonic()
+            self._start_workers()
+
+    def resize(self, workers: int):
+        """Change the number of workers, also while the stage is running.
+
+        Extra workers start at once; surplus ones finish their current task
+        and exit.
+        """
+        with self._lock:
+            if self._started_at is not None:
+                now = time.monotonic()
+                self._capacity_seconds += self.workers * (now - self._resized_at)
+                self._resized_at = now
+            self.workers = max(1, workers)
+            if self._started_at is not None:
+                self._start_workers()
+        logger.info(f"Stage pool {self.name} resized to {self.workers} workers")
+
+    def _start_workers(self):
+        for index in range(self.workers):
+            thread = self._threads.get(index)
+            if thread is None or not thread.is_alive():
+                thread = threading.Thread(target=self._work, args=(index,), name=f"stage-{self.name}-{index}",
+                                          daemon=True)
+                self._threads[index] = thread
+                thread.start()
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Queue ``fn(*args, **kwargs)``; blocks while the stage's queue is full."""
+        self.start()
+        future = Future()
+        # Run in the caller's context so log records keep its request and run ids,
+        # and a profiled run's samples include the worker
+        context = contextvars.copy_context()
+        item = (context.run, (Profiler.run_attached, fn, *args), kwargs, future, time.monotonic())
+        try:
+            self._queue.put(item, timeout=self.submit_timeout)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise StageQueueFull(f"Stage {self.name} queue is full ({self._queue.maxsize} pending tasks)")
+        with self._lock:
+            self.submitted += 1
+        return future
+
+    def run(self, fn: Callable, *args, **kwargs):
+        """Run ``fn`` on the stage and wait for its result (re-raises its exception)."""
+        return self.submit(fn, *args, **kwargs).result()
+
+    def stats(self) -> dict:
+        with self._lock:
+            busy_seconds = self._busy_seconds
+            capacity = self._capacity_seconds
+            if self._resized_at is not None:
+                capacity += self.workers * (time.monotonic() - self._resized_at)
+            return {
+                "workers": self.workers,
+                "busy": self._busy,
+                "queued": self._queue.qsize(),
+                "max_queue": self._queue.maxsize,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "avg_wait": round(self._wait_time, 3),
+                "avg_service_time": round(self._service_time, 3),
+                # Share of the stage's worker time spent working since it started
+                "utilization": round(busy_seconds / capacity, 3) if capacity else 0.0,
+            }
+
+    def _retired(self, index: int) -> bool:
+        with self._lock:
+            if index < self.workers:
+                return False
+            if self._threads.get(index) is threading.current_thread():
+                del self._threads[index]
+            return True
+
+    def _work(self, index: int):
+        while not self._retired(index):
+            try:
+                fn, args, kwargs, future, enqueued_at = self._queue.get(timeout=self._IDLE_POLL)
+            except queue.Empty:
+                continue
+            if not future.set_running_or_notify_cancel():
+                continue
+            started = time.monotonic()
+            with self._lock:
+                self._busy += 1
+                self._wait_time = self._ewma(self._wait_time, started - enqueued_at)
+            QUEUE_WAIT.observe(started - enqueued_at, queue=f"stage_{self.name}")
+            failed = False
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                failed = True
+                future.set_exception(e)
+            finally:
+                elapsed = time.monotonic() - started
+                with self._lock:
+                    self._busy -= 1
+                    self._busy_seconds += elapsed
+                    self._service_time = self._ewma(self._service_time, elapsed)
+                    if failed:
+                        self.failed += 1
+                    else:
+                        self.completed += 1
+
+    @staticmethod
+    def _ewma(current: float, sample: float, alpha: float = 0.2) -> float:
+        return current + alpha * (sample - current)
+
+
+class StagePools:
+    """
+    Independently sized worker pools for the pipeline's stages.
+
+    Each request still walks its graph in order, but the work of every node
+    runs on the pool of its kind: CPU-bound audio preprocessing, the Whisper
+    HTTP call, and the LLM calls. Requests therefore overlap stage by stage
+    (preprocessing request N+1 while request N waits on the LLM), each kind
+    of work is limited to what its resource can take, and ``stats`` shows
+    which stage is saturated.
+    """
+
+    PREPROCESS = "preprocess"
+    TRANSCRIPTION = "transcription"
+    LLM = "llm"
+
+    def __init__(self,
+                 preprocess_workers: int = Config.STAGE_PREPROCESS_WORKERS,
+                 transcription_workers: int = Config.STAGE_TRANSCRIPTION_WORKERS,
+                 llm_workers: int = Config.STAGE_LLM_WORKERS,
+                 max_queue: int = Config.STAGE_MAX_QUEUE,
+                 submit_timeout: float = Config.STAGE_SUBMIT_TIMEOUT):
+        submit_timeout = submit_timeout or None
+        self.pools = {
+            self.PREPROCESS: StagePool(self.PREPROCESS, preprocess_workers, max_queue, submit_timeout),
+            self.TRANSCRIPTION: StagePool(self.TRANSCRIPTION, transcription_workers, max_queue, submit_timeout),
+            self.LLM: StagePool(self.LLM, llm_workers, max_queue, submit_timeout),
+        }
+
+    def resize(self, stage: str, workers: int):
+        """Change a stage's worker count (e.g. from a CLI flag, or while it is running)."""
+        self.pools[stage].resize(workers)
+
+    def submit(self, stage: str, fn: Callable, *args, **kwargs) -> Future:
+        """Queue ``fn`` on the pool of ``stage`` without waiting for it."""
+        return self.pools[stage].submit(fn, *args, **kwargs)
+
+    def run(self, stage: str, fn: Callable, *args, **kwargs):
+        """Run ``fn`` on the pool of ``stage`` and wait for its result."""
+        return self.pools[stage].run(fn, *args, **kwargs)
+
+    def stats(self) -> dict:
+        stages = {name: pool.stats() for name, pool in self.pools.items()}
+        busiest = max(stages, key=lambda name: (stages[name]["utilization"], stages[name]["queued"]))
+        return {
+            "stages": stages,
+            "bottleneck": busiest if stages[busiest]["submitted"] else None,
+        }
+
+
+# Shared stage pools used by the pipeline nodes
+stage_pools = StagePools()
+
+_STAGE_UTILIZATION = metrics.gauge("stage_pool_utilization", "Share of worker time spent working.", ("stage",))
+_STAGE_BUSY = metrics.gauge("stage_pool_busy_workers", "Workers currently running a task.", ("stage",))
+_STAGE_QUEUED = metrics.gauge("stage_pool_queued", "Tasks waiting for a worker.", ("stage",))
+
+
+def _collect_stage_pools():
+    for stage, stats in stage_pools.stats()["stages"].items():
+        _STAGE_UTILIZATION.set(stats["utilization"], stage=stage)
+        _STAGE_BUSY.set(stats["busy"], stage=stage)
+        _STAGE_QUEUED.set(stats["queued"], stage=stage)
+
+
+metrics.on_collect(_collect_stage_pools)
@@ -0,0 +1,71 @@
+import json
+import re
+
+# Harakat, Quranic annotation marks and superscript alef
+_ARABIC_DIACRITICS = re.compile("[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED]")
+_TATWEEL = "\u0640"
+_ARABIC_LETTER_MAP = str.maketrans({
+    "\u0622": "\u0627",  # alef with madda -> alef
+    "\u0623": "\u0627",  # alef with hamza above -> alef
+    "\u0625": "\u0627",  # alef with hamza below -> alef
+    "\u0671": "\u0627",  # alef wasla -> alef
+    "\u0649": "\u064A",  # alef maksura -> yaa
+    "\u0629": "\u0647",  # taa marbuta -> haa
+})
+_QUERY_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize_arabic(text: str) -> str:
+    """
+    Normalize Arabic text for indexing and querying.
+
+    The unicode61 tokenizer treats harakat as separators (splitting words in
+    two) and does not fold alef/yaa/taa-marbuta variants, so the same word
+    spelled with or without hamza or diacritics would never match. Both the
+    indexed text and the query go through this function.
+    """
+    if not text:
+        return ""
+    text = _ARABIC_DIACRITICS.sub("", text).replace(_TATWEEL, "")
+    return text.translate(_ARABIC_LETTER_MAP)
+
+
+def flatten_json_values(json_text: str) -> str:
+    """Join every leaf value of a json_data document into one searchable string."""
+    if not json_text:
+        return ""
+    try:
+        document = json.loads(json_text)
+    except (TypeError, ValueError):
+        return json_text
+
+    values = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+        elif node is not None and node != "":
+            values.append(str(node))
+
+    walk(document)
+    return "\n".join(values)
+
+
+def build_match_query(query: str) -> str:
+    """
+    Turn free text typed by a clinician into a safe FTS5 MATCH expression.
+
+    Every word becomes a quoted term (so FTS operators and punctuation in the
+    input cannot break the query) and terms are ANDed; the last word is
+    matched as a prefix so results show up while typing.
+    """
+    terms = _QUERY_TERM.findall(normalize_arabic(query))
+    if not terms:
+        raise ValueError("Search query must contain at least one word")
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " AND ".join(quoted)
@@ -8,14 +8,20 @@ from scipy import signal
 
 class AudioPreprocessingService:
     """Service for audio preprocessing and enhancement."""
-    
+
+    HIGHPASS_CUTOFF = 300  # Hz, keeps speech but removes low rumble
+    LOWPASS_CUTOFF = 8000  # Hz, most speech content is below this
+    FILTER_ORDER = 5
+    TRIM_TOP_DB = 20
+    NOISE_SAMPLE_SECONDS = 0.5
+
     @staticmethod
-    def preprocess_audio(input_file_path, output_file_path=None, 
+    def preprocess_audio(input_file_path, output_file_path=None,
                         normalize=True, remove_noise=True, trim_silence=True,
                         apply_highpass=True, apply_lowpass=True):
         """
         Preprocess audio file to improve quality for transcription.
-        
+
         Args:
             input_file_path: Path to the input audio file
             output_file_path: Path to save the processed audio file (if None, a temp file is created)
@@ -24,7 +30,7 @@ class AudioPreprocessingService:
             trim_silence: Whether to trim silence from the beginning and end
             apply_highpass: Whether to apply high-pass filter (remove low frequencies)
             apply_lowpass: Whether to apply low-pass filter (remove high frequencies)
-            
+
         Returns:
             Path to the processed audio file
         """
@@ -32,78 +38,120 @@ class AudioPreprocessingService:
         if not output_file_path:
             temp_dir = tempfile.mkdtemp()
             output_file_path = os.path.join(temp_dir, "processed_audio.wav")
-        
-        # Load audio file using librosa
+
         try:
-            # Check if input_file_path is None or empty
-            if not input_file_path:
-                raise ValueError("Input file path is None or empty")
-            
-            # Use pydub to convert any format to WAV first if needed
-            if not input_file_path.lower().endswith('.wav'):
-                audio = AudioSegment.from_file(input_file_path)
-                temp_wav = os.path.join(os.path.dirname(input_file_path), "temp_conversion.wav")
-                audio.export(temp_wav, format="wav")
-                input_file_path = temp_wav
-                
-            # Load the audio with librosa
-            y, sr = librosa.load(input_file_path, sr=None)
-            
+            y, sr = AudioPreprocessingService.decode(input_file_path)
+
             # Apply preprocessing steps
             if trim_silence:
-                # Trim leading and trailing silence
-                y, _ = librosa.effects.trim(y, top_db=20)
-            
+                y = AudioPreprocessingService.trim(y)
+
             if apply_highpass:
-                # Apply high-pass filter (300Hz cutoff to keep speech but remove some low rumble)
-                b, a = signal.butter(5, 300/(sr/2), 'highpass')
-                y = signal.filtfilt(b, a, y)
-            
+                y = AudioPreprocessingService.highpass(y, sr)
+
             if apply_lowpass:
-                # Apply low-pass filter (8000Hz cutoff, most speech content is below this)
-                b, a = signal.butter(5, 8000/(sr/2), 'lowpass')
-                y = signal.filtfilt(b, a, y)
-            
+                y = AudioPreprocessingService.lowpass(y, sr)
+
             if remove_noise:
-                # Simple noise reduction using spectral gating
-                # This is a simplified approach - for more advanced noise reduction, consider using librosa.decompose.nn_filter
-                # or a dedicated library like noisereduce
-                
-                # Estimate noise from a small segment (assuming first 0.5 seconds might be noise/silence)
-                noise_sample = y[:int(sr * 0.5)] if len(y) > sr * 0.5 else y[:int(len(y) * 0.1)]
-                
-                # Compute noise profile
-                noise_stft = librosa.stft(noise_sample)
-                noise_power = np.mean(np.abs(noise_stft)**2, axis=1)
-                
-                # Compute STFT of the signal
-                speech_stft = librosa.stft(y)
-                speech_power = np.abs(speech_stft)**2
-                
-                # Apply simple spectral subtraction with a floor
-                mask = (speech_power - 2 * noise_power.reshape(-1, 1)) / speech_power
-                mask = np.maximum(mask, 0.1)  # Apply floor to avoid extreme attenuation
-                
-                # Apply the mask and reconstruct the signal
-                speech_stft_denoised = speech_stft * mask
-                y = librosa.istft(speech_stft_denoised)
-            
+                y = AudioPreprocessingService.spectral_subtract(y, sr)
+
             if normalize:
-                # Normalize audio to have consistent volume
-                y = librosa.util.normalize(y)
-            
-            # Save the processed audio
-            sf.write(output_file_path, y, sr)
-            
-            # Clean up temporary conversion file if created
-            if input_file_path.endswith("temp_conversion.wav"):
-                os.remove(input_file_path)
-            
+                y = AudioPreprocessingService.normalize(y)
+
+            AudioPreprocessingService.save(y, sr, output_file_path)
             return output_file_path
-            
+
         except Exception as e:
             raise Exception(f"Audio preprocessing failed: {str(e)}")
-    
+
+    # --- Steps (also timed individually by benchmarks/bench_preprocessing.py) --- #
+    @staticmethod
+    def decode(input_file_path):
+        """Load any supported file as mono float samples at its native rate; returns (y, sr)."""
+        # Check if input_file_path is None or empty
+        if not input_file_path:
+            raise ValueError("Input file path is None or empty")
+
+        # Use pydub to convert any format to WAV first if needed
+        temp_wav = None
+        if not input_file_path.lower().endswith('.wav'):
+            audio = AudioSegment.from_file(input_file_path)
+            # Unique name: several uploads can be decoded at once
+            fd, temp_wav = tempfile.mkstemp(suffix=".wav")
+            os.close(fd)
+            audio.export(temp_wav, format="wav")
+            input_file_path = temp_wav
+
+        try:
+            # Load the audio with librosa
+            return librosa.load(input_file_path, sr=None)
+        finally:
+            # Clean up temporary conversion file if created
+            if temp_wav is not None and os.path.exists(temp_wav):
+                os.remove(temp_wav)
+
+    @staticmethod
+    def trim(y):
+        """Trim leading and trailing silence."""
+        y, _ = librosa.effects.trim(y, top_db=AudioPreprocessingService.TRIM_TOP_DB)
+        return y
+
+    @staticmethod
+    def highpass(y, sr):
+        """Zero-phase Butterworth high-pass at HIGHPASS_CUTOFF."""
+        return AudioPreprocessingService._butterworth(y, sr, AudioPreprocessingService.HIGHPASS_CUTOFF, 'highpass')
+
+    @staticmethod
+    def lowpass(y, sr):
+        """Zero-phase Butterworth low-pass at LOWPASS_CUTOFF (skipped if that is above Nyquist)."""
+        return AudioPreprocessingService._butterworth(y, sr, AudioPreprocessingService.LOWPASS_CUTOFF, 'lowpass')
+
+    @staticmethod
+    def spectral_subtract(y, sr):
+        """
+        Simple noise reduction using spectral gating.
+
+        This is a simplified approach - for more advanced noise reduction, consider using
+        librosa.decompose.nn_filter or a dedicated library like noisereduce.
+        """
+        # Estimate noise from a small segment (assuming first 0.5 seconds might be noise/silence)
+        noise_length = int(sr * AudioPreprocessingService.NOISE_SAMPLE_SECONDS)
+        noise_sample = y[:noise_length] if len(y) > noise_length else y[:int(len(y) * 0.1)]
+
+        # Compute noise profile
+        noise_stft = librosa.stft(noise_sample)
+        noise_power = np.mean(np.abs(noise_stft)**2, axis=1)
+
+        # Compute STFT of the signal
+        speech_stft = librosa.stft(y)
+        speech_power = np.abs(speech_stft)**2
+
+        # Apply simple spectral subtraction with a floor
+        mask = (speech_power - 2 * noise_power.reshape(-1, 1)) / speech_power
+        mask = np.maximum(mask, 0.1)  # Apply floor to avoid extreme attenuation
+
+        # Apply the mask and reconstruct the signal
+        speech_stft_denoised = speech_stft * mask
+        return librosa.istft(speech_stft_denoised)
+
+    @staticmethod
+    def normalize(y):
+        """Normalize audio to have consistent volume."""
+        return librosa.util.normalize(y)
+
+    @staticmethod
+    def save(y, sr, output_file_path):
+        sf.write(output_file_path, y, sr)
+
+    @staticmethod
+    def _butterworth(y, sr, cutoff, btype):
+        nyquist = sr / 2
+        if not 0 < cutoff < nyquist:
+            # e.g. an 8 kHz low-pass on 16 kHz audio: the band is already limited
+            return y
+        b, a = signal.butter(AudioPreprocessingService.FILTER_ORDER, cutoff / nyquist, btype)
+        return signal.filtfilt(b, a, y)
+
     @staticmethod
     def convert_to_optimal_format(input_file_path, target_sr=16000):
         """
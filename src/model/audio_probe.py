@@ -0,0 +1,336 @@
+import os
+import math
+import struct
+import logging
+from typing import Optional
+
+import numpy as np
+
+from src.core.config import Config
+from src.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_REJECTED = metrics.counter(
+    "upload_preflight_rejected_total", "Uploads rejected before any decoding, by reason.", ("reason",),
+)
+
+# MPEG audio frame header tables, indexed by [version][layer]
+_MPEG_VERSIONS = {3: "1", 2: "2", 0: "2.5"}
+_MPEG_LAYERS = {3: 1, 2: 2, 1: 3}
+_MPEG_SAMPLE_RATES = {"1": (44100, 48000, 32000), "2": (22050, 24000, 16000), "2.5": (11025, 12000, 8000)}
+_MPEG_BITRATES = {
+    ("1", 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    ("1", 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    ("1", 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    ("2", 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    ("2", 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+# WAVE format tags readable straight from disk for the level check, by (tag, bits)
+_PCM_DTYPES = {(1, 8): "u1", (1, 16): "<i2", (1, 32): "<i4", (3, 32): "<f4", (3, 64): "<f8"}
+
+
+class PreflightError(ValueError):
+    """Raised when an upload is rejected before decoding; ``status_code`` is the HTTP status to answer with."""
+
+    def __init__(self, message: str, reason: str, status_code: int):
+        super().__init__(message)
+        self.reason = reason
+        self.status_code = status_code
+
+
+class AudioProbe:
+    """
+    Cheap checks on an uploaded file before it is decoded or queued.
+
+    The container and codec are sniffed from the first bytes, and duration,
+    channels and sample rate come from the headers (WAV chunks, the Ogg
+    identification header and last page, MP3 frame and Xing/VBRI headers,
+    FLAC STREAMINFO), so a probe reads a few kilobytes however long the clip
+    is. For PCM WAV the loudest 50 ms window is measured on a decimated view
+    of the samples to catch silent recordings before they cost a Whisper call.
+    """
+
+    HEADER_BYTES = 64 * 1024
+    TAIL_BYTES = 64 * 1024
+    LEVEL_ANALYSIS_RATE = 4000  # samples per second kept for the level check
+    LEVEL_WINDOW_SECONDS = 0.05
+
+    @staticmethod
+    def preflight(file_path: str, filename: Optional[str] = None, max_bytes: Optional[int] = None,
+                  max_duration: Optional[float] = None) -> dict:
+        """
+        Validate an upload and return what the probe found.
+
+        The upload policy applies only when its arguments are given: with a
+        ``filename`` both the name and the detected container must be an
+        allowed type, and the file may not exceed ``max_bytes`` or
+        ``max_duration`` seconds. The apps pass all three; the pipeline only
+        checks that queued and batch files are readable, non-trivial audio.
+
+        Raises:
+            PreflightError: unsupported type (415), empty or unreadable file
+                (400), too large or too long (413), too short or silent (422).
+        """
+        try:
+            info = AudioProbe._preflight(file_path, filename, max_bytes, max_duration)
+        except PreflightError as e:
+            _REJECTED.inc(reason=e.reason)
+            logger.info(f"Rejected upload {filename or os.path.basename(file_path)}: {e}")
+            raise
+        logger.debug("Preflight of %s: %s", file_path, info)
+        return info
+
+    @staticmethod
+    def _preflight(file_path: str, filename: Optional[str], max_bytes: Optional[int],
+                   max_duration: Optional[float]) -> dict:
+        if filename is not None:
+            extension = os.path.splitext(filename)[1].lstrip(".").lower()
+            if extension not in Config.ALLOWED_EXTENSIONS:
+                raise PreflightError(
+                    f"Unsupported file type '.{extension}', expected one of {sorted(Config.ALLOWED_EXTENSIONS)}",
+                    "unsupported", 415,
+                )
+        size = os.path.getsize(file_path)
+        if size == 0:
+            raise PreflightError("File is empty", "empty", 400)
+        if max_bytes is not None and size > max_bytes:
+            raise PreflightError(f"File is {size} bytes, the limit is {max_bytes}", "too_large", 413)
+
+        info = AudioProbe.probe(file_path)
+        if info["container"] is None:
+            raise PreflightError("File is not a recognized audio format", "unrecognized", 415)
+        if filename is not None and info["container"] not in Config.ALLOWED_EXTENSIONS:
+            raise PreflightError(
+                f"File contains {info['container']} audio, expected one of {sorted(Config.ALLOWED_EXTENSIONS)}",
+                "unsupported", 415,
+            )
+
+        duration = info["duration"]
+        if duration is not None:
+            if max_duration is not None and duration > max_duration:
+                raise PreflightError(f"Audio is {duration:.0f}s long, the limit is {max_duration:.0f}s", "too_long", 413)
+            if duration < Config.PREFLIGHT_MIN_DURATION:
+                raise PreflightError(f"Audio is only {duration:.2f}s long", "too_short", 422)
+
+        info["level_db"] = AudioProbe.peak_level_db(file_path, info)
+        if info["level_db"] is not None and info["level_db"] < Config.PREFLIGHT_SILENCE_DB:
+            raise PreflightError(f"No speech detected (loudest part {info['level_db']:.0f} dBFS)", "silent", 422)
+        return info
+
+    @staticmethod
+    def sniff(header: bytes) -> tuple:
+        """``(container, codec)`` from the first bytes of a file; ``(None, None)`` if unknown."""
+        if header[:4] == b"RIFF" and header[8:12] == b"WAVE":
+            return "wav", None
+        if header[:4] == b"OggS":
+            packet = AudioProbe._ogg_first_packet(header)
+            if packet.startswith(b"OpusHead"):
+                return "ogg", "opus"
+            if packet.startswith(b"\x01vorbis"):
+                return "ogg", "vorbis"
+            if packet.startswith(b"\x7fFLAC"):
+                return "ogg", "flac"
+            return "ogg", None
+        if header[:4] == b"fLaC":
+            return "flac", "flac"
+        if header[4:8] == b"ftyp":
+            return "m4a", None
+        if header[:4] == b"\x1a\x45\xdf\xa3":
+            return "webm", None
+        if header[:3] == b"ID3" or AudioProbe._mpeg_frame(header, 0) is not None:
+            return "mp3", "mp3"
+        return None, None
+
+    @staticmethod
+    def probe(file_path: str) -> dict:
+        """Container, codec, duration (s), channels and sample rate read from the headers only.
+
+        Fields the headers don't give are None; a header that doesn't parse
+        raises PreflightError.
+        """
+        size = os.path.getsize(file_path)
+        with open(file_path, "rb") as f:
+            header = f.read(AudioProbe.HEADER_BYTES)
+            container, codec = AudioProbe.sniff(header)
+            info = {
+                "container": container, "codec": codec, "duration": None,
+                "channels": None, "sample_rate": None, "bytes": size,
+            }
+            try:
+                if container == "wav":
+                    info.update(AudioProbe._wav_info(f, size))
+                elif container == "ogg":
+                    info.update(AudioProbe._ogg_info(f, header, codec, size))
+                elif container == "mp3":
+                    info.update(AudioProbe._mp3_info(header, size))
+                elif container == "flac":
+                    info.update(AudioProbe._flac_info(header))
+            except (struct.error, IndexError, ValueError, ZeroDivisionError) as e:
+                raise PreflightError(f"Corrupt {container} header: {e}", "corrupt", 400) from e
+        return info
+
+    @staticmethod
+    def peak_level_db(file_path: str, info: dict) -> Optional[float]:
+        """
+        dBFS of the loudest ``LEVEL_WINDOW_SECONDS`` window, or None if the
+        samples can't be read without decoding (anything but plain PCM WAV).
+
+        Samples are mapped from disk and only every n-th frame is read
+        (down to ``LEVEL_ANALYSIS_RATE``); without an anti-alias filter the
+        high frequencies fold down, but the energy a level check needs is kept.
+        """
+        dtype = _PCM_DTYPES.get((info.get("format_tag"), info.get("bits")))
+        if dtype is None or not info.get("data_bytes"):
+            return None
+        channels, sample_rate = info["channels"], info["sample_rate"]
+        frames = info["data_bytes"] // (np.dtype(dtype).itemsize * channels)
+        if frames == 0:
+            return None
+        samples = np.memmap(file_path, dtype=dtype, mode="r", offset=info["data_offset"], shape=(frames, channels))
+        step = max(1, sample_rate // AudioProbe.LEVEL_ANALYSIS_RATE)
+        x = np.asarray(samples[::step], dtype=np.float32)
+        if dtype == "u1":
+            x = (x - 128.0) / 128.0
+        elif dtype[1] == "i":
+            x /= float(2 ** (8 * np.dtype(dtype).itemsize - 1))
+        window = max(1, int(AudioProbe.LEVEL_WINDOW_SECONDS * sample_rate / step))
+        usable = len(x) // window * window or len(x)
+        power = np.square(x[:usable]).reshape(-1, min(window, usable), channels).mean(axis=1)
+        peak = float(np.sqrt(power.max()))
+        return 20 * math.log10(max(peak, 1e-10))
+
+    # --- Container headers --- #
+    @staticmethod
+    def _wav_info(f, size: int) -> dict:
+        f.seek(12)
+        info = {}
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                break
+            chunk_id, chunk_size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+            if chunk_id == b"fmt ":
+                body = f.read(chunk_size)
+                tag, channels, sample_rate, byte_rate, _, bits = struct.unpack("<HHIIHH", body[:16])
+                if tag == 0xFFFE and len(body) >= 26:  # WAVE_FORMAT_EXTENSIBLE: the real tag is in the sub-format GUID
+                    tag = struct.unpack("<H", body[24:26])[0]
+                codec = {1: f"pcm_s{bits}" if bits > 8 else "pcm_u8", 3: f"pcm_f{bits}", 6: "alaw", 7: "mulaw",
+                         0x55: "mp3"}.get(tag, f"0x{tag:04x}")
+                info.update(format_tag=tag, codec=codec, channels=channels, sample_rate=sample_rate,
+                            bits=bits, byte_rate=byte_rate)
+                if chunk_size & 1:
+                    f.seek(1, 1)
+            elif chunk_id == b"data":
+                offset = f.tell()
+                # Streaming writers leave the size at 0 or 0xFFFFFFFF; the data then runs to the end
+                data_bytes = size - offset if chunk_size in (0, 0xFFFFFFFF) else min(chunk_size, size - offset)
+                info.update(data_offset=offset, data_bytes=data_bytes)
+                break
+            else:
+                f.seek(chunk_size + (chunk_size & 1), 1)
+        if "sample_rate" not in info:
+            raise ValueError("no fmt chunk")
+        if "data_bytes" in info and info["byte_rate"]:
+            info["duration"] = info["data_bytes"] / info["byte_rate"]
+        return info
+
+    @staticmethod
+    def _ogg_first_packet(header: bytes) -> bytes:
+        segments = header[26] if len(header) > 26 else 0
+        start = 27 + segments
+        return header[start:start + sum(header[27:start])]
+
+    @staticmethod
+    def _ogg_info(f, header: bytes, codec: Optional[str], size: int) -> dict:
+        packet = AudioProbe._ogg_first_packet(header)
+        if codec == "opus":
+            channels, pre_skip, input_rate = packet[9], *struct.unpack("<HI", packet[10:16])
+            info, granule_rate = {"channels": channels, "sample_rate": input_rate or 48000}, 48000
+        elif codec == "vorbis":
+            channels, sample_rate = packet[11], struct.unpack("<I", packet[12:16])[0]
+            info, granule_rate, pre_skip = {"channels": channels, "sample_rate": sample_rate}, sample_rate, 0
+        else:
+            return {}
+        # The last page's granule position is the stream's length in samples
+        f.seek(max(0, size - AudioProbe.TAIL_BYTES))
+        tail = f.read(AudioProbe.TAIL_BYTES)
+        position = tail.rfind(b"OggS")
+        while position >= 0:
+            granule = struct.unpack("<q", tail[position + 6:position + 14])[0]
+            if granule >= 0:
+                info["duration"] = max(0, granule - pre_skip) / granule_rate
+                break
+            position = tail.rfind(b"OggS", 0, position)
+        return info
+
+    @staticmethod
+    def _mpeg_frame(data: bytes, offset: int) -> Optional[dict]:
+        """Parse an MPEG audio frame header at ``offset``; None if there isn't a valid one."""
+        if offset + 4 > len(data) or data[offset] != 0xFF or data[offset + 1] & 0xE0 != 0xE0:
+            return None
+        b1, b2, b3 = data[offset + 1], data[offset + 2], data[offset + 3]
+        version, layer = _MPEG_VERSIONS.get((b1 >> 3) & 3), _MPEG_LAYERS.get((b1 >> 1) & 3)
+        bitrate_index, rate_index = b2 >> 4, (b2 >> 2) & 3
+        if version is None or layer is None or bitrate_index in (0, 15) or rate_index == 3:
+            return None
+        bitrate = _MPEG_BITRATES[(version if version == "1" else "2", layer if version == "1" or layer == 1 else 2)]
+        bitrate = bitrate[bitrate_index] * 1000
+        sample_rate = _MPEG_SAMPLE_RATES[version][rate_index]
+        samples = 384 if layer == 1 else 576 if layer == 3 and version != "1" else 1152
+        padding = (b2 >> 1) & 1
+        return {
+            "version": version, "layer": layer, "bitrate": bitrate, "sample_rate": sample_rate,
+            "channels": 1 if b3 >> 6 == 3 else 2, "samples": samples,
+            "length": samples // 8 * bitrate // sample_rate + padding * (4 if layer == 1 else 1),
+        }
+
+    @staticmethod
+    def _mp3_info(header: bytes, size: int) -> dict:
+        offset = 0
+        if header[:3] == b"ID3":
+            tag_size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+            offset = 10 + tag_size + (10 if header[5] & 0x10 else 0)
+            if offset + 4 > len(header):
+                return {}  # cover art larger than the header read; let the decoder deal with it
+        # First frame header followed by another one where its length says (so stray 0xFF bytes don't count)
+        frame = None
+        for start in range(offset, min(len(header) - 4, offset + 4096)):
+            frame = AudioProbe._mpeg_frame(header, start)
+            if frame is not None and (start + frame["length"] + 4 > len(header)
+                                      or AudioProbe._mpeg_frame(header, start + frame["length"]) is not None):
+                offset = start
+                break
+            frame = None
+        if frame is None:
+            raise ValueError("no MPEG audio frame found")
+
+        info = {"sample_rate": frame["sample_rate"], "channels": frame["channels"], "bitrate": frame["bitrate"]}
+        # VBR files carry the frame count in a Xing/Info or VBRI header inside the first frame
+        side_info = (32 if frame["channels"] == 2 else 17) if frame["version"] == "1" else (17 if frame["channels"] == 2 else 9)
+        xing = offset + 4 + side_info
+        frames = None
+        if header[xing:xing + 4] in (b"Xing", b"Info") and struct.unpack(">I", header[xing + 4:xing + 8])[0] & 1:
+            frames = struct.unpack(">I", header[xing + 8:xing + 12])[0]
+        elif header[offset + 36:offset + 40] == b"VBRI":
+            frames = struct.unpack(">I", header[offset + 50:offset + 54])[0]
+        if frames:
+            info["duration"] = frames * frame["samples"] / frame["sample_rate"]
+        else:
+            info["duration"] = (size - offset) * 8 / frame["bitrate"]
+        return info
+
+    @staticmethod
+    def _flac_info(header: bytes) -> dict:
+        if header[4] & 0x7F != 0:
+            raise ValueError("first metadata block is not STREAMINFO")
+        fields = int.from_bytes(header[18:26], "big")
+        sample_rate = fields >> 44
+        total_samples = fields & ((1 << 36) - 1)
+        return {
+            "sample_rate": sample_rate,
+            "channels": ((fields >> 41) & 7) + 1,
+            "bits": ((fields >> 36) & 0x1F) + 1,
+            "duration": total_samples / sample_rate if total_samples and sample_rate else None,
+        }
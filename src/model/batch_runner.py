@@ -0,0 +1,350 @@
+"""
+Offline batch processing of archived recordings.
+
+Run from the repository root:
+
+    python -m src.model.batch_runner uploads/ --language ar --concurrency 8 \\
+        --state backfill.db --parquet exports
+
+Walks a directory (recursively, files with an allowed extension) or reads a
+manifest (``--manifest``: one path per line, or JSON lines with ``path`` and
+optional ``language``, ``features``, ``user_id`` and ``doctor_name``), and
+runs every file through the same pipeline as ``/analyze``. Files are
+processed ``--concurrency`` at a time and their work is spread over the
+stage pools: preprocessing runs on ``--preprocess-workers`` threads, and
+Whisper and LLM calls are capped at ``--transcription-workers`` and
+``--llm-workers`` concurrent requests.
+
+Progress is checkpointed in ``--state`` (SQLite): finished files are skipped
+on the next run, failed ones are retried up to ``--max-attempts``, and a file
+interrupted mid-pipeline resumes from its last completed stage (its LangGraph
+checkpoint). Results are written to ``audio_results`` in batches of
+``--db-batch-size`` rows (``--db`` selects another database file), and
+``--parquet`` exports the new rows incrementally afterwards. A file is marked
+done only once its row is committed, so an interrupted run never loses a
+result (a crash between the two may at worst store it twice).
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+from src.core.config import Config
+from src.core.database import DatabaseService
+from src.core.log_config import configure_logging
+from src.core.stage_pools import StagePools, stage_pools
+from src.model.checkpoints import pipeline_checkpoints
+from src.model.pipeline_graph import stream_pipeline
+
+logger = logging.getLogger(__name__)
+
+
+class BatchState:
+    """Per-file progress of a batch run, in its own SQLite file."""
+
+    PENDING = "pending"
+    DONE = "done"
+    FAILED = "failed"
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute('''
+        CREATE TABLE IF NOT EXISTS batch_files (
+            path TEXT PRIMARY KEY,
+            run_id TEXT NOT NULL,
+            size INTEGER,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            updated_at TEXT
+        )''')
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT run_id, status, attempts FROM batch_files WHERE path = ?", (path,)
+            ).fetchone()
+        return {"run_id": row[0], "status": row[1], "attempts": row[2]} if row else None
+
+    def add(self, path: str, run_id: str, size: int):
+        """Register a file; a file that changed since (new run id) starts over as pending."""
+        with self._lock:
+            self._conn.execute('''
+            INSERT INTO batch_files (path, run_id, size, updated_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(path) DO UPDATE SET
+                run_id = excluded.run_id, size = excluded.size, status = 'pending',
+                attempts = 0, error = NULL, updated_at = excluded.updated_at
+            WHERE batch_files.run_id != excluded.run_id
+            ''', (path, run_id, size, datetime.now().isoformat()))
+
+    def mark_done(self, paths: List[str]):
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "UPDATE batch_files SET status = ?, error = NULL, attempts = attempts + 1, updated_at = ? WHERE path = ?",
+                [(self.DONE, now, path) for path in paths],
+            )
+            self._conn.execute("COMMIT")
+
+    def mark_failed(self, path: str, error: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE batch_files SET status = ?, error = ?, attempts = attempts + 1, updated_at = ? WHERE path = ?",
+                (self.FAILED, error[:2000], datetime.now().isoformat(), path),
+            )
+
+    def counts(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM batch_files GROUP BY status").fetchall()
+        return dict(rows)
+
+    def close(self):
+        self._conn.close()
+
+
+class Progress:
+    """Throughput and ETA over the files processed in this run."""
+
+    def __init__(self, total: int, total_bytes: int):
+        self.total = total
+        self.total_bytes = total_bytes
+        self.done = 0
+        self.failed = 0
+        self.bytes = 0
+        self.started = time.monotonic()
+
+    def add(self, size: int, ok: bool):
+        if ok:
+            self.done += 1
+        else:
+            self.failed += 1
+        self.bytes += size
+
+    def summary(self) -> dict:
+        elapsed = time.monotonic() - self.started
+        finished = self.done + self.failed
+        rate = finished / elapsed if elapsed else 0.0
+        byte_rate = self.bytes / elapsed if elapsed else 0.0
+        # Bytes predict the remaining time better than file counts when sizes vary
+        eta = (self.total_bytes - self.bytes) / byte_rate if byte_rate else None
+        return {
+            "files": self.total, "done": self.done, "failed": self.failed,
+            "elapsed_seconds": round(elapsed, 1), "files_per_second": round(rate, 3),
+            "megabytes_per_second": round(byte_rate / 1048576, 3),
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+        }
+
+    def line(self) -> str:
+        s = self.summary()
+        eta = time.strftime("%H:%M:%S", time.gmtime(s["eta_seconds"])) if s["eta_seconds"] is not None else "?"
+        return (f"{s['done'] + s['failed']}/{s['files']} files ({s['failed']} failed), "
+                f"{s['files_per_second']:.2f} files/s, {s['megabytes_per_second']:.2f} MB/s, ETA {eta}")
+
+
+def run_id_for(path: str, size: int, mtime: float) -> str:
+    """Stable run id per file version, so an interrupted file resumes from its checkpoint."""
+    return "batch-" + hashlib.sha1(f"{path}\n{size}\n{mtime}".encode("utf-8")).hexdigest()[:32]
+
+
+def scan_directory(root: str) -> Iterator[dict]:
+    for directory, _, names in os.walk(root):
+        for name in sorted(names):
+            if name.rsplit(".", 1)[-1].lower() in Config.ALLOWED_EXTENSIONS:
+                yield {"path": os.path.join(directory, name)}
+
+
+def read_manifest(manifest: str) -> Iterator[dict]:
+    base = os.path.dirname(os.path.abspath(manifest))
+    with open(manifest, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            item = json.loads(line) if line.startswith("{") else {"path": line}
+            item["path"] = os.path.join(base, item["path"])
+            yield item
+
+
+class BatchRunner:
+    """Runs files through the pipeline with bounded concurrency and bulk result writes."""
+
+    def __init__(self, state: BatchState, concurrency: int = 8, language: str = "ar",
+                 features: Optional[str] = None, max_attempts: int = 3, db_batch_size: int = 200,
+                 progress_interval: float = 10.0):
+        self.state = state
+        self.concurrency = max(1, concurrency)
+        self.language = language
+        self.features = features
+        self.max_attempts = max_attempts
+        self.db_batch_size = db_batch_size
+        self.progress_interval = progress_interval
+        self._records: List[tuple] = []  # (item, audio_results record) waiting for the next bulk write
+        self.written = 0
+
+    def plan(self, items: Iterator[dict]) -> List[dict]:
+        """Register the files and return the ones still to process (skips done / exhausted)."""
+        todo = []
+        for item in items:
+            path = os.path.abspath(item["path"])
+            if not os.path.isfile(path):
+                logger.warning(f"Skipping {path}: not a file")
+                continue
+            stat = os.stat(path)
+            self.state.add(path, run_id_for(path, stat.st_size, stat.st_mtime), stat.st_size)
+            entry = self.state.get(path)
+            if entry["status"] == BatchState.DONE:
+                continue
+            if entry["status"] == BatchState.FAILED and entry["attempts"] >= self.max_attempts:
+                continue
+            todo.append({**item, "path": path, "run_id": entry["run_id"], "size": stat.st_size})
+        return todo
+
+    def run(self, todo: List[dict]) -> dict:
+        progress = Progress(len(todo), sum(item["size"] for item in todo))
+        logger.info(f"Processing {len(todo)} files with {self.concurrency} in flight")
+        last_report = time.monotonic()
+        pending = set()
+        queue = iter(todo)
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch") as executor:
+            try:
+                while True:
+                    while len(pending) < self.concurrency:
+                        item = next(queue, None)
+                        if item is None:
+                            break
+                        pending.add(executor.submit(self._process, item))
+                    if not pending:
+                        break
+                    finished, pending = wait(pending, timeout=self.progress_interval, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        item, record, error = future.result()
+                        if error is None:
+                            self._records.append((item, record))
+                        else:
+                            self.state.mark_failed(item["path"], error)
+                            progress.add(item["size"], ok=False)
+                    if len(self._records) >= self.db_batch_size:
+                        self._flush(progress)
+                    if time.monotonic() - last_report >= self.progress_interval:
+                        logger.info(progress.line())
+                        last_report = time.monotonic()
+            except KeyboardInterrupt:
+                logger.warning("Interrupted; waiting for files in flight (run again to resume)")
+                for future in pending:
+                    future.cancel()
+                for future in wait(pending)[0]:
+                    if not future.cancelled():
+                        item, record, error = future.result()
+                        if error is None:
+                            self._records.append((item, record))
+            finally:
+                self._flush(progress)
+        logger.info(progress.line())
+        return {**progress.summary(), "rows_written": self.written}
+
+    def _process(self, item: dict) -> tuple:
+        records = []
+        try:
+            for _ in stream_pipeline(
+                file_path=item["path"],
+                language=item.get("language", self.language),
+                features=item.get("features", self.features),
+                user_id=item.get("user_id"),
+                doctor_name=item.get("doctor_name"),
+                persist=False,
+                run_id=item["run_id"],
+                on_result=records.append,
+            ):
+                pass
+            if not records:
+                raise Exception("Pipeline finished without a result")
+            # Keep the original file name (relative paths would be ambiguous across folders)
+            return item, {**records[-1], "filename": item["path"]}, None
+        except Exception as e:
+            logger.error(f"Failed {item['path']}: {e}")
+            return item, None, str(e)
+
+    def _flush(self, progress: Progress):
+        if not self._records:
+            return
+        batch, self._records = self._records, []
+        try:
+            self.written += DatabaseService.save_audio_results([record for _, record in batch])
+        except Exception as e:
+            logger.error(f"Could not write {len(batch)} results: {e}")
+            for item, _ in batch:
+                self.state.mark_failed(item["path"], f"Database write failed: {e}")
+                progress.add(item["size"], ok=False)
+            return
+        self.state.mark_done([item["path"] for item, _ in batch])
+        for item, _ in batch:
+            progress.add(item["size"], ok=True)
+            pipeline_checkpoints.delete(item["run_id"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("directory", nargs="?", help="directory of recordings (searched recursively)")
+    source.add_argument("--manifest", help="file with one path (or JSON object) per line")
+    parser.add_argument("--language", default="ar", help="default language of the recordings")
+    parser.add_argument("--features-file", help="feature schema to extract (default: the pipeline's)")
+    parser.add_argument("--concurrency", type=int, default=8, help="files in flight")
+    parser.add_argument("--preprocess-workers", type=int, default=Config.STAGE_PREPROCESS_WORKERS)
+    parser.add_argument("--transcription-workers", type=int, default=Config.STAGE_TRANSCRIPTION_WORKERS)
+    parser.add_argument("--llm-workers", type=int, default=Config.STAGE_LLM_WORKERS)
+    parser.add_argument("--state", default="batch_state.db", help="progress checkpoint (SQLite)")
+    parser.add_argument("--max-attempts", type=int, default=3, help="tries per file across runs")
+    parser.add_argument("--db", default=DatabaseService.DB_PATH, help="SQLite database for audio_results")
+    parser.add_argument("--db-batch-size", type=int, default=200, help="rows per bulk insert")
+    parser.add_argument("--parquet", help="export the new rows to Parquet in this directory afterwards")
+    parser.add_argument("--progress-interval", type=float, default=10.0, help="seconds between progress lines")
+    parser.add_argument("--report", help="write the run summary as JSON")
+    args = parser.parse_args()
+
+    configure_logging()
+    stage_pools.resize(StagePools.PREPROCESS, args.preprocess_workers)
+    stage_pools.resize(StagePools.TRANSCRIPTION, args.transcription_workers)
+    stage_pools.resize(StagePools.LLM, args.llm_workers)
+    DatabaseService.DB_PATH = args.db
+    DatabaseService.initialize_db()
+
+    features = None
+    if args.features_file:
+        with open(args.features_file, encoding="utf-8") as f:
+            features = f.read()
+
+    state = BatchState(args.state)
+    try:
+        runner = BatchRunner(state, concurrency=args.concurrency, language=args.language, features=features,
+                             max_attempts=args.max_attempts, db_batch_size=args.db_batch_size,
+                             progress_interval=args.progress_interval)
+        items = read_manifest(args.manifest) if args.manifest else scan_directory(args.directory)
+        summary = runner.run(runner.plan(items))
+        summary["state"] = state.counts()
+
+        if args.parquet:
+            from src.core.parquet_export import ParquetExporter  # needs pyarrow
+
+            summary["parquet"] = ParquetExporter(output_dir=args.parquet, db_path=args.db).export()
+    finally:
+        state.close()
+
+    logger.info(f"Batch finished: {summary}")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import time
+import logging
+import threading
+from typing import TYPE_CHECKING, Optional
+
+from src.core.config import Config
+from src.core.database import ConnectionPool
+
+if TYPE_CHECKING:
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineCheckpoints:
+    """
+    Persistent LangGraph checkpoints for pipeline runs, keyed by run id.
+
+    Every node's output is saved under the run id (LangGraph ``thread_id``),
+    so a failed or re-requested run picks up from the last completed node
+    instead of paying again for preprocessing, Whisper and the LLM stages.
+    A ``pipeline_runs`` table records when each run was last touched;
+    checkpoints of runs idle for longer than ``retention`` seconds are
+    deleted, at most once every ``prune_interval`` seconds.
+
+    Each run gets its own checkpointer on the calling thread's pooled
+    connection, so concurrent runs don't queue on one connection and lock.
+    """
+
+    def __init__(self,
+                 db_path: str = Config.CHECKPOINT_DB_PATH,
+                 retention: float = Config.CHECKPOINT_RETENTION,
+                 prune_interval: float = Config.CHECKPOINT_PRUNE_INTERVAL):
+        self.db_path = db_path
+        self.retention = retention
+        self.prune_interval = prune_interval
+        self._pool = ConnectionPool(db_path)
+        self._lock = threading.Lock()
+        self._initialized = False
+        self._last_prune = 0.0
+
+    def saver(self) -> "SqliteSaver":
+        """Return a checkpointer on the calling thread's connection, creating the database on first use."""
+        from langgraph.checkpoint.sqlite import SqliteSaver  # deferred: slow import
+        saver = SqliteSaver(self._pool.connection())
+        with self._lock:
+            if not self._initialized:
+                saver.setup()
+                conn = saver.conn
+                conn.execute('''
+                CREATE TABLE IF NOT EXISTS pipeline_runs (
+                    run_id TEXT PRIMARY KEY,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                ''')
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_pipeline_runs_updated ON pipeline_runs (updated_at)")
+                self._initialized = True
+            saver.is_setup = True
+        return saver
+
+    def touch(self, run_id: str):
+        """Record activity on a run (keeps it out of retention) and prune if due."""
+        self.saver()
+        now = time.time()
+        with self._pool.transaction() as conn:
+            conn.execute(
+                "INSERT INTO pipeline_runs (run_id, created_at, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(run_id) DO UPDATE SET updated_at = excluded.updated_at",
+                (run_id, now, now),
+            )
+        if now - self._last_prune > self.prune_interval:
+            self.prune()
+
+    def has_run(self, run_id: str) -> bool:
+        conn = self.saver().conn
+        row = conn.execute("SELECT 1 FROM checkpoints WHERE thread_id = ? LIMIT 1", (run_id,)).fetchone()
+        return row is not None
+
+    def delete(self, run_id: str):
+        self.saver().delete_thread(run_id)
+        with self._pool.transaction() as conn:
+            conn.execute("DELETE FROM pipeline_runs WHERE run_id = ?", (run_id,))
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Delete checkpoints of runs idle for longer than ``retention``; returns the run count."""
+        self.saver()
+        now = now or time.time()
+        cutoff = now - self.retention
+        self._last_prune = now
+        with self._pool.transaction() as conn:
+            expired = "SELECT run_id FROM pipeline_runs WHERE updated_at < ?"
+            conn.execute(f"DELETE FROM writes WHERE thread_id IN ({expired})", (cutoff,))
+            conn.execute(f"DELETE FROM checkpoints WHERE thread_id IN ({expired})", (cutoff,))
+            removed = conn.execute("DELETE FROM pipeline_runs WHERE updated_at < ?", (cutoff,)).rowcount
+        if removed:
+            logger.info(f"Pruned checkpoints of {removed} pipeline runs older than {self.retention}s")
+        return removed
+
+
+# Shared checkpoint store used by stream_pipeline
+pipeline_checkpoints = PipelineCheckpoints()
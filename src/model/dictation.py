@@ -0,0 +1,334 @@
+import os
+import time
+import asyncio
+import logging
+import tempfile
+from typing import Optional, List
+
+import numpy as np
+
+from src.core.config import Config
+from src.core.result_writer import result_writer
+from src.core.stage_pools import StagePools, stage_pools
+from src.model.speech_service import SpeechService
+from src.model.pipeline_graph import (
+    TRANSCRIPTION_MODEL, PipelineState, validate_node, refine_node, translate_node, extract_node,
+    _result_record, _step_event, _client_event,
+)
+
+try:
+    import opuslib
+except ImportError:  # Opus frames are optional; PCM needs no extra dependency
+    opuslib = None
+
+logger = logging.getLogger(__name__)
+
+
+class StreamingSegmenter:
+    """
+    Streaming preprocessing and pause detection for live dictation.
+
+    Incoming 16-bit mono PCM is high-pass filtered with a stateful filter
+    (so chunk boundaries leave no artifacts), split into short frames and
+    classified as speech or silence against an adaptive noise floor. A
+    segment is closed when speech is followed by ``pause_ms`` of silence or
+    grows beyond ``max_segment_seconds``; segments with less than
+    ``min_speech_ms`` of speech are dropped as clicks or breaths.
+    """
+
+    FRAME_MS = 30
+    PRE_ROLL_MS = 200
+    SPEECH_MARGIN_DB = 10.0
+    MIN_SPEECH_DB = -50.0
+
+    def __init__(self,
+                 sample_rate: int = Config.DICTATION_SAMPLE_RATE,
+                 pause_ms: int = Config.DICTATION_PAUSE_MS,
+                 max_segment_seconds: float = Config.DICTATION_MAX_SEGMENT_SECONDS,
+                 min_speech_ms: int = Config.DICTATION_MIN_SPEECH_MS):
+        self.sample_rate = sample_rate
+        self.frame_size = int(sample_rate * self.FRAME_MS / 1000)
+        self.pause_frames = max(1, pause_ms // self.FRAME_MS)
+        self.max_segment_frames = int(max_segment_seconds * 1000 / self.FRAME_MS)
+        self.min_speech_frames = max(1, min_speech_ms // self.FRAME_MS)
+        self.pre_roll_frames = self.PRE_ROLL_MS // self.FRAME_MS
+
+        from scipy import signal  # deferred: scipy.signal takes seconds to import
+
+        # Same 300 Hz high-pass as the file pipeline, in a streaming (causal) form
+        self._sosfilt = signal.sosfilt
+        self._sos = signal.butter(5, 300 / (sample_rate / 2), "highpass", output="sos")
+        self._zi = signal.sosfilt_zi(self._sos) * 0.0
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._noise_db: Optional[float] = None
+
+        self._frames: List[np.ndarray] = []   # frames of the open segment
+        self._pre_roll: List[np.ndarray] = []
+        self._speech_frames = 0
+        self._silent_run = 0
+        self.segments_emitted = 0
+
+    def feed(self, pcm: bytes) -> List[np.ndarray]:
+        """Add raw PCM and return the segments closed by it (possibly none)."""
+        samples = np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768.0
+        filtered, self._zi = self._sosfilt(self._sos, samples, zi=self._zi)
+        self._pending = np.concatenate([self._pending, filtered.astype(np.float32)])
+
+        closed = []
+        while len(self._pending) >= self.frame_size:
+            frame, self._pending = self._pending[:self.frame_size], self._pending[self.frame_size:]
+            segment = self._add_frame(frame)
+            if segment is not None:
+                closed.append(segment)
+        return closed
+
+    def flush(self) -> Optional[np.ndarray]:
+        """Close the open segment at end of stream."""
+        if self._frames and len(self._pending):
+            self._frames.append(self._pending)
+        self._pending = np.zeros(0, dtype=np.float32)
+        return self._close()
+
+    def _add_frame(self, frame: np.ndarray) -> Optional[np.ndarray]:
+        level_db = 20 * np.log10(np.sqrt(np.mean(frame ** 2)) + 1e-10)
+        if self._noise_db is None:
+            self._noise_db = level_db
+        is_speech = level_db > max(self._noise_db + self.SPEECH_MARGIN_DB, self.MIN_SPEECH_DB)
+
+        if not is_speech:
+            # Track the noise floor on silence only, following drops quickly and rises slowly
+            rate = 0.5 if level_db < self._noise_db else 0.05
+            self._noise_db += rate * (level_db - self._noise_db)
+
+        if not self._frames:
+            if not is_speech:
+                self._pre_roll = (self._pre_roll + [frame])[-self.pre_roll_frames:] if self.pre_roll_frames else []
+                return None
+            self._frames = self._pre_roll
+            self._pre_roll = []
+
+        self._frames.append(frame)
+        if is_speech:
+            self._speech_frames += 1
+            self._silent_run = 0
+        else:
+            self._silent_run += 1
+
+        if self._silent_run >= self.pause_frames or len(self._frames) >= self.max_segment_frames:
+            return self._close()
+        return None
+
+    def _close(self) -> Optional[np.ndarray]:
+        frames, speech_frames, silent_run = self._frames, self._speech_frames, self._silent_run
+        self._frames, self._speech_frames, self._silent_run = [], 0, 0
+        if not frames or speech_frames < self.min_speech_frames:
+            return None
+        # Keep a little of the trailing pause, drop the rest
+        trailing = max(0, silent_run - self.pre_roll_frames)
+        audio = np.concatenate(frames[:len(frames) - trailing] if trailing else frames)
+        peak = np.max(np.abs(audio))
+        self.segments_emitted += 1
+        return audio / peak if peak > 0 else audio
+
+
+class DictationSession:
+    """
+    One live dictation over a WebSocket.
+
+    Audio frames are segmented at pauses while the doctor speaks. Each closed
+    segment is transcribed right away (segments in parallel, reassembled in
+    order) and a rolling partial transcript is pushed to ``events``. While
+    speech continues, validation runs once enough text has arrived and
+    refinement re-runs on the accumulated transcript (coalescing updates, at
+    most one refinement in flight). When the stream ends only the tail
+    segment, a final refinement of any new text, translation and extraction
+    remain, so the result is ready seconds after the doctor stops.
+
+    Events are ``(step_name, payload)`` tuples; the final ones match
+    ``stream_pipeline`` so clients can reuse their handlers.
+    """
+
+    PCM = "pcm"
+    OPUS = "opus"
+
+    def __init__(self, language: str = "ar", features: Optional[str] = None,
+                 sample_rate: int = Config.DICTATION_SAMPLE_RATE, encoding: str = PCM,
+                 api_key: Optional[str] = None, user_id: Optional[int] = None,
+                 doctor_name: Optional[str] = None, persist: bool = Config.PERSIST_RESULTS):
+        if encoding not in (self.PCM, self.OPUS):
+            raise ValueError(f"Unsupported encoding: {encoding}")
+        if encoding == self.OPUS and opuslib is None:
+            raise ValueError("Opus frames need the optional 'opuslib' package; send 16-bit PCM instead")
+        self.language = language
+        self.features = features
+        self.sample_rate = sample_rate
+        self.encoding = encoding
+        self.api_key = api_key or Config.FIREWORKS_API_KEY
+        self.user_id = user_id
+        self.doctor_name = doctor_name
+        self.persist = persist
+        self.events: asyncio.Queue = asyncio.Queue()
+
+        self.segmenter = StreamingSegmenter(sample_rate=sample_rate)
+        self._decoder = opuslib.Decoder(sample_rate, 1) if encoding == self.OPUS else None
+        self._texts: dict = {}
+        self._segment_count = 0
+        self._transcriptions = set()
+        self._timings = {"preprocessing": 0.0, "transcription": 0.0}
+
+        self._validated: Optional[PipelineState] = None
+        self._refined_for = ""
+        self._refined: Optional[PipelineState] = None
+        self._refine_task: Optional[asyncio.Task] = None
+        self._refine_dirty = False
+        self.started_at = time.time()
+
+    # --- Audio input --- #
+    async def feed(self, frame: bytes):
+        """Add one audio frame; closed segments are sent for transcription."""
+        started = time.time()
+        pcm = self._decoder.decode(frame, int(self.sample_rate * 0.12)) if self._decoder else frame
+        segments = self.segmenter.feed(pcm)
+        self._timings["preprocessing"] += time.time() - started
+        for segment in segments:
+            self._submit(segment)
+
+    async def finish(self):
+        """End of speech: drain transcriptions and run the final stages."""
+        tail = self.segmenter.flush()
+        if tail is not None:
+            self._submit(tail)
+        await asyncio.gather(*list(self._transcriptions))
+        if self._refine_task is not None:
+            await self._refine_task
+
+        transcript = self.transcript
+        if not transcript:
+            await self._emit("error", "No speech detected")
+            return
+
+        state: PipelineState = {
+            "file_path": f"dictation-{int(self.started_at)}.wav",
+            "language": self.language,
+            "raw_text": transcript,
+            "timings": dict(self._timings),
+        }
+        if self.features:
+            state["features"] = self.features
+        await self._emit("transcription", {"text": transcript})
+
+        validated = self._validated or await asyncio.to_thread(validate_node, state)
+        state = {**state, **{k: validated[k] for k in ("is_medical", "validation")}}
+        state["timings"]["validate"] = validated["timings"].get("validate", 0.0)
+        await self._emit(*_client_event("validate", state, state))
+        if not state.get("is_medical", False):
+            self._save(state)
+            return
+
+        if self._refined is not None and self._refined_for == transcript:
+            refined = self._refined
+        else:
+            refined = await asyncio.to_thread(refine_node, state)
+        state["refined_text"] = refined["refined_text"]
+        state["timings"]["refine"] = refined["timings"].get("refine", 0.0)
+        await self._emit(*_step_event("refine", state))
+
+        if self.language == "ar":
+            state = await asyncio.to_thread(translate_node, state)
+            await self._emit(*_step_event("maybe_translate", state))
+        state = await asyncio.to_thread(extract_node, state)
+        self._save(state)
+        await self._emit(*_client_event("extract", state, state))
+
+    def cancel(self):
+        """The client went away: stop pending transcriptions and the rolling refinement."""
+        for task in list(self._transcriptions):
+            task.cancel()
+        if self._refine_task is not None:
+            self._refine_task.cancel()
+
+    # --- Rolling transcription --- #
+    @property
+    def transcript(self) -> str:
+        """Text of the contiguous run of transcribed segments, in speaking order."""
+        texts = []
+        for index in range(self._segment_count):
+            if index not in self._texts:
+                break
+            if self._texts[index]:
+                texts.append(self._texts[index])
+        return " ".join(texts)
+
+    def _submit(self, segment: np.ndarray):
+        index = self._segment_count
+        self._segment_count += 1
+        task = asyncio.create_task(self._transcribe(index, segment))
+        self._transcriptions.add(task)
+        task.add_done_callback(self._transcriptions.discard)
+
+    async def _transcribe(self, index: int, segment: np.ndarray):
+        try:
+            text, meta = await asyncio.to_thread(
+                stage_pools.run, StagePools.TRANSCRIPTION, self._transcribe_segment, segment
+            )
+            self._timings["transcription"] += meta["transcription_time"]
+        except Exception as e:
+            logger.error(f"Dictation segment {index} failed: {str(e)}")
+            self._texts[index] = ""
+            await self._emit("error", f"Segment {index} could not be transcribed: {str(e)}")
+            return
+        self._texts[index] = text.strip()
+        await self._emit("partial_transcript", {"segment": index, "text": text, "transcript": self.transcript})
+        self._schedule_refine()
+
+    def _transcribe_segment(self, segment: np.ndarray):
+        import soundfile as sf
+
+        fd, path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        try:
+            sf.write(path, segment, self.sample_rate, subtype="PCM_16")
+            # Already filtered and normalized by the segmenter
+            return SpeechService.transcribe_audio(
+                path, api_key=self.api_key, language=self.language, preprocess=False,
+                model=TRANSCRIPTION_MODEL, return_meta=True,
+            )
+        finally:
+            os.remove(path)
+
+    def _schedule_refine(self):
+        if self._refine_task is not None and not self._refine_task.done():
+            self._refine_dirty = True
+            return
+        self._refine_task = asyncio.create_task(self._rolling_refine())
+
+    async def _rolling_refine(self):
+        """Validate once, then refine the accumulated text until it stops changing."""
+        while True:
+            self._refine_dirty = False
+            transcript = self.transcript
+            if not transcript or transcript == self._refined_for:
+                return
+            state: PipelineState = {"raw_text": transcript, "language": self.language, "timings": {}}
+            try:
+                if self._validated is None and len(transcript.split()) >= Config.DICTATION_MIN_VALIDATION_WORDS:
+                    self._validated = await asyncio.to_thread(validate_node, state)
+                    await self._emit("partial_validation", _step_event("validate", self._validated)[1])
+                if self._validated is None or self._validated.get("is_medical", False):
+                    self._refined = await asyncio.to_thread(refine_node, state)
+                    self._refined_for = transcript
+                    await self._emit("partial_refinement", {"text": self._refined["refined_text"]})
+            except Exception as e:
+                # The final stages run again on the full text; a failed rolling pass only costs latency
+                logger.warning(f"Rolling refinement failed: {str(e)}")
+                return
+            if not self._refine_dirty:
+                return
+
+    # --- Helpers --- #
+    async def _emit(self, step: str, data):
+        await self.events.put((step, data))
+
+    def _save(self, state: PipelineState):
+        if self.persist:
+            result_writer.submit(_result_record(state, self.user_id, self.doctor_name))
@@ -1,10 +1,10 @@
 import time
 import logging
+import threading
 from .llm_service import LLMService
 from ..core.config import Config
+from ..core.stage_pools import StagePools, stage_pools
 
-# Configure logger
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class ExtractFeature:
@@ -44,11 +44,105 @@ class ExtractFeature:
 
             extraction_time = time.time() - extraction_start
             logger.info(f"[ExtractFeature] Extraction completed in {extraction_time:.2f}s")
-            logger.debug(f"[ExtractFeature] Extracted features: {json_data}")
-            logger.debug(f"[ExtractFeature] Reasoning: {reasoning[:200]}...")  # truncate preview
+            logger.debug("[ExtractFeature] Extracted features: %s", json_data)
+            logger.debug("[ExtractFeature] Reasoning: %s", reasoning)  # truncated by the log formatter
 
             return json_data, reasoning
 
         except Exception as e:
             logger.error(f"[ExtractFeature] Extraction failed: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+    @staticmethod
+    def merge(
+        new_text: str,
+        features: str,
+        current_data: dict,
+    ) -> tuple[dict, str]:
+        """
+        Update already extracted features with the text of a new encounter clip.
+
+        Only the new text is sent to the LLM, together with the current
+        features, so the cost per clip does not grow with the encounter.
+
+        Args:
+            new_text (str): The translated text of the new clip.
+            features (str): The features/schema being extracted.
+            current_data (dict): Features extracted from the earlier clips.
+
+        Returns:
+            tuple: (json_data: dict, reasoning: str)
+        """
+        if not current_data:
+            return ExtractFeature.extract(end_text=new_text, features=features)
+        if not new_text or not isinstance(new_text, str):
+            raise ValueError("Input new_text must be a non-empty string")
+
+        merge_start = time.time()
+        try:
+            features_output = LLMService.merge_features(
+                new_text=new_text,
+                features=features,
+                current_data=current_data,
+                api_key=Config.EXTRACTION_API_KEY,
+            )
+
+            # Never lose earlier findings the model left out or blanked
+            json_data = dict(current_data)
+            for key, value in features_output.get("json_data", {}).items():
+                if value not in ("", [], None):
+                    json_data[key] = value
+            reasoning = features_output.get("reasoning", "")
+
+            merge_time = time.time() - merge_start
+            logger.info(f"[ExtractFeature] Merge completed in {merge_time:.2f}s")
+            return json_data, reasoning
+
+        except Exception as e:
+            logger.error(f"[ExtractFeature] Merge failed: {str(e)}")
+            raise
+
+    @staticmethod
+    def extract_many(
+        end_text: str,
+        schemas: dict,
+        max_workers: int = Config.EXTRACT_MAX_CONCURRENCY,
+    ) -> dict:
+        """
+        Extract several feature schemas from the same text concurrently, on
+        the shared LLM stage pool so re-extractions count against its limit.
+
+        Args:
+            end_text (str): The translated (or English refined) text to process.
+            schemas (dict): Schema name -> features/schema text.
+            max_workers (int): Maximum number of this call's extractions in flight.
+
+        Returns:
+            dict: Schema name -> {"json_data", "reasoning", "extraction_time"},
+            or {"error": message} for a schema whose extraction failed.
+        """
+        def run(features: str) -> dict:
+            started = time.time()
+            try:
+                json_data, reasoning = ExtractFeature.extract(end_text=end_text, features=features)
+            except Exception as e:
+                return {"error": str(e)}
+            return {"json_data": json_data, "reasoning": reasoning, "extraction_time": time.time() - started}
+
+        if not schemas:
+            return {}
+        in_flight = threading.BoundedSemaphore(max(1, max_workers))
+        futures, results = {}, {}
+        for name, features in schemas.items():
+            in_flight.acquire()
+            try:
+                future = stage_pools.submit(StagePools.LLM, run, features)
+            except Exception as e:
+                in_flight.release()
+                logger.error(f"[ExtractFeature] Could not queue extraction of schema {name}: {str(e)}")
+                results[name] = {"error": str(e)}
+                continue
+            future.add_done_callback(lambda _: in_flight.release())
+            futures[name] = future
+        results.update({name: future.result() for name, future in futures.items()})
+        return {name: results[name] for name in schemas}
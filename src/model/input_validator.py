@@ -3,8 +3,6 @@ import logging
 from ..core.config import Config
 import re
 
-# Configure logger
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class MedicalValidator:
@@ -30,7 +28,7 @@ Response format: MEDICAL|95 or NON_MEDICAL|87
             
             # Call the LLM API using your existing service
             response = LLMService._call_llm_api(
-                model_account="accounts/fireworks/models/deepseek-v3",
+                model_account=LLMService.DEEPSEEK_MODEL,
                 prompt=formatted_prompt,
                 temperature=0.1
             )
@@ -40,7 +38,7 @@ Response format: MEDICAL|95 or NON_MEDICAL|87
             
             # Parse the response
             result = response.strip()
-            logger.info(f"LLM validation response: {result}")
+            logger.info("LLM validation response: %s", result)
             
             # Extract classification and confidence
             if '|' in result:
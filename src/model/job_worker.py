@@ -0,0 +1,276 @@
+import os
+import sys
+import time
+import signal
+import asyncio
+import socket
+import logging
+import argparse
+import threading
+from typing import Optional
+
+from src.core.admission import AdmissionController, AdmissionRejected, admission, tenant_key
+from src.core.config import Config
+from src.core.job_broker import JobBroker, broker_from_url
+from src.core.job_queue import job_queue
+from src.core.log_config import configure_logging, log_context, stop_logging
+from src.core.result_writer import result_writer
+from src.model.audio_probe import PreflightError
+from src.model.pipeline_graph import stream_pipeline
+from src.model.prewarm import prewarmer
+
+logger = logging.getLogger(__name__)
+
+
+class JobWorkerPool:
+    """
+    Pool of worker threads that run queued jobs through ``stream_pipeline``.
+
+    Each worker claims a job, extends its lease while the pipeline runs, stores
+    every pipeline event in the broker's event log and acknowledges the job at
+    the end. A crashed worker's job is picked up again once its lease expires.
+    Runs inside the apps (``JOB_WORKERS``) or standalone, see ``main``.
+    """
+
+    def __init__(self, queue: JobBroker = job_queue, num_workers: int = Config.JOB_WORKERS,
+                 poll_interval: float = Config.JOB_POLL_INTERVAL, kinds: tuple = ("analyze",)):
+        self.queue = queue
+        self.num_workers = num_workers
+        self.poll_interval = poll_interval
+        self.kinds = kinds
+        self._stop = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the worker threads (idempotent)."""
+        with self._lock:
+            if self._threads or self.num_workers <= 0:
+                return
+            self._stop.clear()
+            for index in range(self.num_workers):
+                worker_id = f"{socket.gethostname()}:{os.getpid()}:{index}"
+                thread = threading.Thread(target=self._run, args=(worker_id,), name=f"job-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            logger.info(f"Started {self.num_workers} job workers")
+
+    def stop(self, timeout: float = 5.0):
+        """Ask workers to stop after their current job."""
+        self._stop.set()
+        with self._lock:
+            for thread in self._threads:
+                thread.join(timeout)
+            self._threads = []
+
+    def _run(self, worker_id: str):
+        while not self._stop.is_set():
+            try:
+                job = self.queue.claim(worker_id, self.kinds)
+            except Exception as e:
+                logger.error(f"[{worker_id}] Failed to claim job: {str(e)}")
+                job = None
+            if job is None:
+                self._stop.wait(self.poll_interval)
+                continue
+            self.process(job, worker_id)
+
+    def process(self, job: dict, worker_id: str):
+        """Run one claimed job to completion, recording its events."""
+        job_id = job["id"]
+        payload = job["payload"]
+        heartbeat_stop = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat, args=(job_id, worker_id, heartbeat_stop), daemon=True
+        )
+        heartbeat.start()
+        logger.info(f"[{worker_id}] Processing job {job_id} (attempt {job['attempts']})")
+        # /jobs are batch work: they share pipeline slots fairly per tenant and yield
+        # to interactive requests (/analyze handed over in ANALYZE_MODE=broker)
+        tenant = tenant_key(payload.get("user_id"), payload.get("doctor_name"))
+        try:
+            ticket = admission.reserve(tenant, priority=payload.get("priority", AdmissionController.BATCH))
+        except AdmissionRejected:
+            ticket = admission.reserve(tenant, priority=AdmissionController.BATCH)
+        # A retried attempt resumes from the last checkpointed stage of the run
+        run_id = payload.get("run_id") or job_id
+        try:
+            with admission.slot(ticket), log_context(run_id=run_id):
+                for step_name, data in stream_pipeline(
+                    file_path=payload.get("file_path"),
+                    language=payload.get("language", "ar"),
+                    features=payload.get("features"),
+                    user_id=payload.get("user_id"),
+                    doctor_name=payload.get("doctor_name"),
+                    run_id=run_id,
+                ):
+                    self.queue.append_event(job_id, step_name, data)
+            self.queue.complete(job_id, worker_id)
+        except Exception as e:
+            logger.exception(f"[{worker_id}] Job {job_id} failed")
+            self.queue.append_event(job_id, "error", f"Unexpected error: {str(e)}")
+            # Missing or invalid input files will not change on retry
+            self.queue.fail(job_id, worker_id, str(e), retry=not isinstance(e, (FileNotFoundError, PreflightError)))
+        finally:
+            heartbeat_stop.set()
+
+    def _heartbeat(self, job_id: str, worker_id: str, stop: threading.Event):
+        interval = self.queue.visibility_timeout / 3
+        while not stop.wait(interval):
+            try:
+                if not self.queue.extend_lease(job_id, worker_id):
+                    logger.warning(f"[{worker_id}] Lost lease on job {job_id}")
+                    return
+            except Exception as e:
+                logger.error(f"[{worker_id}] Failed to extend lease on job {job_id}: {str(e)}")
+
+
+def stream_job_events(job_id: str, after_seq: int = 0, queue: Optional[JobBroker] = None):
+    """
+    Yield ``(seq, step, data)`` for a job: first the stored events after
+    ``after_seq``, then new ones as workers append them, until the job reaches
+    a terminal status and every event has been delivered.
+
+    Blocking generator for the Flask app; FastAPI uses ``astream_job_events``.
+    """
+    queue = queue or job_queue
+    while True:
+        events = queue.get_events(job_id, after_seq)
+        for event in events:
+            after_seq = event["seq"]
+            yield event["seq"], event["step"], event["data"]
+        if events:
+            continue
+        job = queue.get_job(job_id)
+        if job is None or job["status"] in JobBroker.TERMINAL_STATUSES:
+            # Pick up anything appended between the last read and the status check
+            for event in queue.get_events(job_id, after_seq):
+                yield event["seq"], event["step"], event["data"]
+            return
+        time.sleep(Config.JOB_POLL_INTERVAL)
+
+
+async def astream_job_events(job_id: str, after_seq: int = 0, queue: Optional[JobBroker] = None):
+    """``stream_job_events`` for the event loop: broker reads run on a thread, waits don't block one."""
+    queue = queue or job_queue
+    while True:
+        events = await asyncio.to_thread(queue.get_events, job_id, after_seq)
+        for event in events:
+            after_seq = event["seq"]
+            yield event["seq"], event["step"], event["data"]
+        if events:
+            continue
+        job = await asyncio.to_thread(queue.get_job, job_id)
+        if job is None or job["status"] in JobBroker.TERMINAL_STATUSES:
+            for event in await asyncio.to_thread(queue.get_events, job_id, after_seq):
+                yield event["seq"], event["step"], event["data"]
+            return
+        await asyncio.sleep(Config.JOB_POLL_INTERVAL)
+
+
+class _AnalyzeEvents:
+    """
+    Maps a job's events to the ones ``/analyze`` streams inline, dropping the
+    broker's bookkeeping events.
+
+    An attempt that fails and is retried shows up as one ``retrying`` event
+    (with the error and the new attempt number) instead of an ``error``, so
+    ``error`` stays final; a job that fails for good ends with ``error`` even
+    if its worker died without reporting one.
+    """
+
+    def __init__(self):
+        self._pending_error = None
+
+    def feed(self, seq: int, step_name: str, data) -> list:
+        if step_name == "error":
+            self._pending_error = (seq, data)
+            return []
+        if step_name == "attempt":
+            events = []
+            if self._pending_error is not None or data["attempt"] > 1:
+                error = self._pending_error[1] if self._pending_error is not None else "Worker lost the job"
+                events.append((seq, "retrying", {"attempt": data["attempt"], "error": error}))
+            self._pending_error = None
+            return events
+        if step_name == "job_status":
+            events = []
+            if data["status"] == JobBroker.FAILED:
+                pending = self._pending_error
+                events.append((pending[0], "error", pending[1]) if pending is not None
+                              else (seq, "error", f"Job failed: {data['error']}"))
+            self._pending_error = None
+            return events
+        return [(seq, step_name, data)]
+
+    def finish(self) -> list:
+        pending, self._pending_error = self._pending_error, None
+        return [(pending[0], "error", pending[1])] if pending is not None else []
+
+
+def stream_analyze_events(job_id: str, after_seq: int = 0, queue: Optional[JobBroker] = None):
+    """A job's events as ``/analyze`` streams them inline: ``(seq, step, data)``, see ``_AnalyzeEvents``."""
+    mapper = _AnalyzeEvents()
+    for seq, step_name, data in stream_job_events(job_id, after_seq, queue):
+        yield from mapper.feed(seq, step_name, data)
+    yield from mapper.finish()
+
+
+async def astream_analyze_events(job_id: str, after_seq: int = 0, queue: Optional[JobBroker] = None):
+    """``stream_analyze_events`` for the event loop."""
+    mapper = _AnalyzeEvents()
+    async for seq, step_name, data in astream_job_events(job_id, after_seq, queue):
+        for event in mapper.feed(seq, step_name, data):
+            yield event
+    for event in mapper.finish():
+        yield event
+
+
+# Shared in-process pool started by the apps
+job_workers = JobWorkerPool()
+
+
+def main(argv=None):
+    """
+    Standalone pipeline worker: ``python -m src.model.job_worker``.
+
+    Claims jobs from ``--broker`` (default ``JOB_BROKER_URL``) and publishes
+    their events back to it, so API nodes (run with ``JOB_WORKERS=0`` and
+    ``ANALYZE_MODE=broker``) only accept uploads and stream events, and
+    workers can be scaled, restarted or crash without dropping HTTP streams.
+    Uploads must be on storage the workers can read (a shared
+    ``UPLOAD_FOLDER``). SIGTERM finishes the current jobs within
+    ``--drain-timeout``; unfinished ones are picked up again once their
+    leases expire and resume from their checkpoints.
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--broker", default=Config.JOB_BROKER_URL, help="broker URL, e.g. sqlite:///jobs.db")
+    parser.add_argument("--workers", type=int, default=max(1, Config.JOB_WORKERS), help="concurrent jobs")
+    parser.add_argument("--kinds", default="analyze", help="comma-separated job kinds to claim")
+    parser.add_argument("--drain-timeout", type=float, default=60.0,
+                        help="seconds to let running jobs finish on shutdown")
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    broker = job_queue if args.broker == Config.JOB_BROKER_URL else broker_from_url(args.broker)
+    pool = JobWorkerPool(broker, num_workers=args.workers, kinds=tuple(args.kinds.split(",")))
+
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+
+    prewarmer.start()
+    pool.start()
+    logger.info(f"Worker {socket.gethostname()}:{os.getpid()} claiming {args.kinds} jobs from {args.broker}")
+    while not stop.wait(1.0):
+        pass
+
+    logger.info("Shutting down, draining running jobs")
+    pool.stop(timeout=args.drain_timeout)
+    result_writer.stop()
+    stop_logging()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,16 @@
-import fireworks.client
+import os
+import time
 import logging
 import json
+import threading
 from typing import Optional, Type
 from pydantic import BaseModel, ValidationError
 
 from .utils import prompt as prompt_utils
+from ..core.config import Config
+from ..core.metrics import LLM_TOKENS, UPSTREAM_LATENCY, UPSTREAM_PAYLOAD_BYTES
 
 # ---------------- Logger ---------------- #
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # ---------------- Pydantic Models ---------------- #
@@ -19,6 +22,16 @@ class ExtractedFeatures(BaseModel):
 class LLMService:
     """Service wrapper around Fireworks LLM API for refinement, translation, and extraction."""
 
+    # Point both at a local stand-in (benchmarks/fireworks_stub.py) with FIREWORKS_BASE_URL
+    FIREWORKS_BASE_URL = os.getenv("FIREWORKS_BASE_URL", "https://api.fireworks.ai")
+    BASE_URL = os.getenv("FIREWORKS_LLM_BASE_URL", f"{FIREWORKS_BASE_URL}/inference/v1")
+
+    DEEPSEEK_MODEL = "accounts/fireworks/models/deepseek-v3"
+    LLAMA_MODEL = "accounts/fireworks/models/llama4-maverick-instruct-basic"
+
+    _clients = {}  # api_key -> FireworksClient, reused for its connection pool
+    _clients_lock = threading.Lock()
+
     # --- Public APIs --- #
     @staticmethod
     def refine_en_transcription(raw_text: str, api_key: str):
@@ -48,6 +61,14 @@ class LLMService:
             prompt_type="extract_dynamic", features=features, pydantic_model=ExtractedFeatures
         )
 
+    @staticmethod
+    def merge_features(new_text: str, features: list, current_data: dict, api_key: str):
+        return LLMService.process_text(
+            text=new_text, api_key=api_key, model="llama",
+            prompt_type="extract_merge", features=features, current_data=current_data,
+            pydantic_model=ExtractedFeatures
+        )
+
     # --- Core Logic --- #
     @staticmethod
     def process_text(
@@ -57,33 +78,34 @@ class LLMService:
         prompt_type: str,
         features: Optional[list] = None,
         pydantic_model: Optional[Type[BaseModel]] = None,
+        current_data: Optional[dict] = None,
     ):
         """Generic method to process text with LLM (refine, translate, extract)."""
-        fireworks.client.api_key = api_key
         if model == "deepseek":
-            model_account = "accounts/fireworks/models/deepseek-v3"
+            model_account = LLMService.DEEPSEEK_MODEL
         else:
-            model_account = "accounts/fireworks/models/llama4-maverick-instruct-basic"
+            model_account = LLMService.LLAMA_MODEL
 
 
         # Final prompt
         prompt = LLMService._get_prompt(
-            prompt_type, text, features
+            prompt_type, text, features, current_data
         )
-        logger.debug(f"Generated prompt: {prompt}")
+        logger.debug("Generated prompt: %s", prompt)
 
         # Call LLM
         result = LLMService._call_llm_api(
             model_account=model_account,
             prompt=prompt,
             pydantic_model=pydantic_model,
+            api_key=api_key,
         )
 
         return result if result else text
 
     # --- Private Helpers --- #
     @staticmethod
-    def _get_prompt(prompt_type: str, text: str, features: Optional[list]):
+    def _get_prompt(prompt_type: str, text: str, features: Optional[list], current_data: Optional[dict] = None):
         """Select prompt dynamically from utils.prompt."""
         mapping = {
             # --- English Refinement ---
@@ -98,6 +120,7 @@ class LLMService:
             # --- Extraction ---
             ("extract"): prompt_utils.get_extraction_prompt_llama,
             ("extract_dynamic"): lambda t: prompt_utils.get_dynamic_extraction_prompt_llama(t, features),
+            ("extract_merge"): lambda t: prompt_utils.get_merge_extraction_prompt_llama(t, features, current_data),
         }
 
         key = (prompt_type)
@@ -109,10 +132,23 @@ class LLMService:
         return func(text)
 
     @staticmethod
-    def _call_llm_api(model_account: str, prompt: str, pydantic_model: Optional[Type[BaseModel]] = None, temperature: float = 0.3):
+    def _client(api_key: Optional[str]):
+        """The Fireworks client for ``api_key``; credentials stay per client, never module globals."""
+        from fireworks.client.api_client import FireworksClient  # deferred: slow import, only needed per call
+
+        with LLMService._clients_lock:
+            client = LLMService._clients.get(api_key)
+            if client is None:
+                client = FireworksClient(api_key=api_key, base_url=LLMService.BASE_URL)
+                LLMService._clients[api_key] = client
+            return client
+
+    @staticmethod
+    def _call_llm_api(model_account: str, prompt: str, pydantic_model: Optional[Type[BaseModel]] = None,
+                      temperature: float = 0.3, api_key: Optional[str] = None):
         """Fireworks API call wrapper with optional structured output parsing."""
         try:
-            logger.info(f"Calling LLM API -> model: {model_account}")
+            logger.info("Calling LLM API -> model: %s", model_account)
 
             params = {
                 "model": model_account,
@@ -125,13 +161,26 @@ class LLMService:
             if pydantic_model:
                 params["response_format"] = {"type": "json_object", "schema": pydantic_model.schema()}
 
-            response = fireworks.client.Completion.create(**params)
+            model_name = model_account.rsplit("/", 1)[-1]
+            UPSTREAM_PAYLOAD_BYTES.observe(len(prompt.encode("utf-8")), service="llm", model=model_name, direction="sent")
+            import fireworks.client
+
+            client = LLMService._client(api_key or Config.FIREWORKS_API_KEY)
+            call_start = time.perf_counter()
+            try:
+                response = fireworks.client.Completion.create(**params, client=client)
+            except Exception:
+                UPSTREAM_LATENCY.observe(time.perf_counter() - call_start, service="llm", model=model_name, outcome="error")
+                raise
+            UPSTREAM_LATENCY.observe(time.perf_counter() - call_start, service="llm", model=model_name, outcome="ok")
+            LLMService._observe_usage(model_name, response)
 
             if not response.choices or not response.choices[0].text.strip():
                 logger.warning("LLM returned empty response")
                 return None
 
             raw_output = response.choices[0].text.strip()
+            UPSTREAM_PAYLOAD_BYTES.observe(len(raw_output.encode("utf-8")), service="llm", model=model_name, direction="received")
 
             # Parse JSON if structured
             if pydantic_model:
@@ -148,3 +197,14 @@ class LLMService:
         except Exception as e:
             logger.error(f"LLM API call failed: {e}")
             return None
+
+    @staticmethod
+    def _observe_usage(model_name: str, response):
+        """Record the token counts the API reports, if any."""
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return
+        for kind in ("prompt_tokens", "completion_tokens"):
+            count = getattr(usage, kind, None)
+            if count is not None:
+                LLM_TOKENS.observe(count, model=model_name, kind=kind.split("_")[0])
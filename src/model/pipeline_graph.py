@@ -1,16 +1,32 @@
 from __future__ import annotations
 
+import os
+import json
+import time
 import logging
-from typing import TypedDict, Optional, Any, Dict
-
-from langgraph.graph import StateGraph, START, END
+import functools
+from typing import TYPE_CHECKING, TypedDict, Optional, Any, Callable, Dict
 
 from src.core.config import Config
+from src.core.encounters import EncounterStore, encounter_store
+from src.core.log_config import with_log_context
+from src.core.metrics import trace_stage
+from src.core.profiling import Profiler
+from src.core.result_writer import result_writer
+from src.core.stage_pools import StagePools, stage_pools
+from src.model.audio_probe import AudioProbe
+from src.model.checkpoints import pipeline_checkpoints
 from src.model.speech_service import SpeechService
 from src.model.input_validator import MedicalValidator
 from src.model.refine_text import RefineText
 from src.model.translation import Translate
 from src.model.extract_features import ExtractFeature  # ensure your file is named extract_features.py
+from src.model.llm_service import LLMService
+
+if TYPE_CHECKING:
+    # langgraph/langchain take most of a second to import; the builders load them on first use
+    from langchain_core.runnables import RunnableConfig
+    from langgraph.graph import StateGraph
 
 logger = logging.getLogger(__name__)
 
@@ -31,7 +47,6 @@ class PipelineState(TypedDict, total=False):
     # Inputs
     file_path: str
     language: str              # "ar" or "en"
-    api_key: str
     features: str              # schema text for extractor
 
     # Outputs per stage
@@ -43,24 +58,71 @@ class PipelineState(TypedDict, total=False):
     json_data: Dict[str, Any]
     reasoning: str
 
+    # Seconds spent per stage, e.g. {"preprocessing": 1.2, "transcription": 3.4, "refine": 2.0}
+    timings: Dict[str, float]
+
     # Error
     error: str
 
 
+TRANSCRIPTION_MODEL = "whisper-v3"
+LLM_STAGES = ("validate", "refine", "translate", "extract")
+
+
+def _with_timing(state: PipelineState, stage: str, started: float) -> Dict[str, float]:
+    return {**state.get("timings", {}), stage: time.time() - started}
+
+
+def traced(stage: str, model: str):
+    """Record a node's duration (and failures) in the stage metrics, labelled by model and language."""
+    model_name = model.rsplit("/", 1)[-1]
+
+    def decorator(node):
+        @functools.wraps(node)  # keeps the signature LangGraph inspects for ``config``
+        def wrapper(state: PipelineState, *args, **kwargs):
+            with trace_stage(stage, model_name, state.get("language", "ar")):
+                return Profiler.run_attached(node, state, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
 # ---- Nodes -----------------------------------------------------------------
 
-def transcribe_node(state: PipelineState) -> PipelineState:
+@traced("transcribe", TRANSCRIPTION_MODEL)
+def transcribe_node(state: PipelineState, config: Optional[RunnableConfig] = None) -> PipelineState:
     file_path = state["file_path"]
-    api_key = state.get("api_key") or Config.FIREWORKS_API_KEY
+    # The key travels in the run config, not the state, so it never lands in a checkpoint
+    api_key = ((config or {}).get("configurable") or {}).get("api_key") or Config.FIREWORKS_API_KEY
     language = state.get("language", "ar")
 
-    text = SpeechService.transcribe_audio(file_path, api_key=api_key, language=language, preprocess=True)
-    return {**state, "raw_text": text}
+    # Header-only checks (milliseconds): corrupt, empty or silent files fail before any decoding.
+    # Upload limits (type, size, duration) are the apps' policy and are enforced at upload time;
+    # queued jobs, backfills and the batch CLI may carry longer or other-format recordings
+    AudioProbe.preflight(file_path)
+
+    # Preprocessing (CPU) and the Whisper call (I/O) run on separate stage pools
+    processed_path, preprocessing_time = stage_pools.run(StagePools.PREPROCESS, SpeechService.preprocess, file_path)
+    try:
+        text, meta = stage_pools.run(
+            StagePools.TRANSCRIPTION, SpeechService.transcribe_audio,
+            processed_path, api_key=api_key, language=language, preprocess=False,
+            model=TRANSCRIPTION_MODEL, return_meta=True,
+        )
+    finally:
+        SpeechService.remove_preprocessed(file_path, processed_path)
+    timings = {
+        **state.get("timings", {}),
+        "preprocessing": preprocessing_time,
+        "transcription": meta["transcription_time"],
+    }
+    return {**state, "raw_text": text, "timings": timings}
 
+@traced("validate", LLMService.DEEPSEEK_MODEL)
 def validate_node(state: PipelineState) -> PipelineState:
+    started = time.time()
     raw = state.get("raw_text", "")
     # If you want a simple keyword gate, you can replace this with your own logic.
-    result = MedicalValidator.validate_medical_content(raw)
+    result = stage_pools.run(StagePools.LLM, MedicalValidator.validate_medical_content, raw)
     classification = result.get("classification", "NON_MEDICAL")
     is_medical = classification == "MEDICAL"
     out = {
@@ -69,45 +131,82 @@ def validate_node(state: PipelineState) -> PipelineState:
             "classification": classification,
             "confidence": result.get("confidence", 0.0),
             "raw_response": result,
-        }
+        },
+        "timings": _with_timing(state, "validate", started),
     }
     return {**state, **out}
 
+@traced("refine", LLMService.DEEPSEEK_MODEL)
 def refine_node(state: PipelineState) -> PipelineState:
+    started = time.time()
     raw = state.get("raw_text", "")
     language = state.get("language", "ar")
 
-    refined = RefineText.refining_transcription(
+    refined = stage_pools.run(
+        StagePools.LLM, RefineText.refining_transcription,
         raw_text=raw,
         language=language
     )
-    return {**state, "refined_text": refined}
+    return {**state, "refined_text": refined, "timings": _with_timing(state, "refine", started)}
 
+@traced("translate", LLMService.DEEPSEEK_MODEL)
 def translate_node(state: PipelineState) -> PipelineState:
+    started = time.time()
     refined = state.get("refined_text", "")
 
-    translated = Translate.translate(
+    translated = stage_pools.run(
+        StagePools.LLM, Translate.translate,
         refined_text=refined,
     )
-    return {**state, "translated_text": translated}
+    return {**state, "translated_text": translated, "timings": _with_timing(state, "translate", started)}
 
+@traced("extract", LLMService.LLAMA_MODEL)
 def extract_node(state: PipelineState) -> PipelineState:
+    started = time.time()
     # If language is Arabic, we expect translate_node to have run, else we use refined_text
     language = state.get("language", "ar")
     end_text = state.get("translated_text") if language == "ar" else state.get("refined_text", "")
 
     features_schema = state.get("features") or DEFAULT_FEATURES
 
-    json_data, reasoning = ExtractFeature.extract(
+    json_data, reasoning = stage_pools.run(
+        StagePools.LLM, ExtractFeature.extract,
         end_text=end_text,
         features=features_schema,
     )
-    return {**state, "json_data": json_data, "reasoning": reasoning}
+    return {
+        **state,
+        "json_data": json_data,
+        "reasoning": reasoning,
+        "timings": _with_timing(state, "extract", started),
+    }
+
+@traced("merge_extract", LLMService.LLAMA_MODEL)
+def merge_extract_node(state: PipelineState) -> PipelineState:
+    started = time.time()
+    # Encounter clips: update the features merged so far with this clip's text only
+    language = state.get("language", "ar")
+    new_text = state.get("translated_text") if language == "ar" else state.get("refined_text", "")
+
+    json_data, reasoning = stage_pools.run(
+        StagePools.LLM, ExtractFeature.merge,
+        new_text=new_text,
+        features=state.get("features") or DEFAULT_FEATURES,
+        current_data=state.get("json_data") or {},
+    )
+    return {
+        **state,
+        "json_data": json_data,
+        "reasoning": reasoning,
+        "timings": _with_timing(state, "extract", started),
+    }
 
 
 # ---- Graph Builder ---------------------------------------------------------
 
 def build_pipeline() -> StateGraph:
+    from langgraph.graph import StateGraph, START, END
+
     graph = StateGraph(PipelineState)
 
     # Register nodes
@@ -145,44 +244,349 @@ def build_pipeline() -> StateGraph:
     return graph
 
 
+def build_clip_pipeline() -> StateGraph:
+    """
+    Graph for one clip of a multi-clip encounter: the clip is transcribed,
+    refined and translated on its own, then merged into the encounter's
+    features. Validation is skipped; the encounter is medical by construction.
+    """
+    from langgraph.graph import StateGraph, START, END
+
+    graph = StateGraph(PipelineState)
+
+    graph.add_node("transcribe", transcribe_node)
+    graph.add_node("refine", refine_node)
+    graph.add_node("maybe_translate", translate_node)  # only if language == "ar"
+    graph.add_node("merge_extract", merge_extract_node)
+
+    graph.add_edge(START, "transcribe")
+    graph.add_edge("transcribe", "refine")
+
+    def on_refine_cond(state: PipelineState) -> str:
+        return "translate" if state.get("language", "ar") == "ar" else "extract"
+
+    graph.add_conditional_edges("refine", on_refine_cond, {
+        "translate": "maybe_translate",
+        "extract": "merge_extract",
+    })
+
+    graph.add_edge("maybe_translate", "merge_extract")
+    graph.add_edge("merge_extract", END)
+
+    return graph
+
+
+# ---- Persistence -----------------------------------------------------------
+
+def _result_record(state: PipelineState, user_id: Optional[int], doctor_name: Optional[str]) -> dict:
+    """Map a finished pipeline state onto an ``audio_results`` row."""
+    timings = state.get("timings", {})
+    json_data = state.get("json_data")
+    return {
+        "user_id": user_id,
+        "filename": os.path.basename(state.get("file_path", "")),
+        "language": state.get("language", "ar"),
+        "model": TRANSCRIPTION_MODEL,
+        "is_conversation": False,
+        "raw_text": state.get("raw_text"),
+        # Column predates English support: it holds the refined transcript in either language
+        "arabic_text": state.get("refined_text"),
+        "translation_text": state.get("translated_text"),
+        "json_data": json.dumps(json_data, ensure_ascii=False) if json_data is not None else None,
+        "reasoning": state.get("reasoning"),
+        "preprocessing_time": timings.get("preprocessing"),
+        "voice_processing_time": timings.get("transcription"),
+        "llm_processing_time": sum(timings.get(stage, 0.0) for stage in LLM_STAGES),
+        "doctor_name": doctor_name,
+    }
+
+
+def parse_schemas(schemas_json: Optional[str]) -> Dict[str, str]:
+    """
+    Parse the ``schemas`` form field of a re-extraction request.
+
+    Accepts a JSON object (name -> schema text) or a JSON list of schema
+    texts (named by position). An empty schema means ``DEFAULT_FEATURES``.
+    Raises ValueError for malformed input.
+    """
+    if not schemas_json:
+        return {"default": DEFAULT_FEATURES}
+    try:
+        schemas = json.loads(schemas_json)
+    except ValueError:
+        raise ValueError("schemas must be a JSON object or list")
+    if isinstance(schemas, list):
+        schemas = {str(index): schema for index, schema in enumerate(schemas)}
+    if not isinstance(schemas, dict) or not schemas:
+        raise ValueError("schemas must be a non-empty JSON object or list")
+    if len(schemas) > Config.REEXTRACT_MAX_SCHEMAS:
+        raise ValueError(f"At most {Config.REEXTRACT_MAX_SCHEMAS} schemas per request")
+    parsed = {}
+    for name, schema in schemas.items():
+        if schema and not isinstance(schema, str):
+            # Allow a schema given as a JSON template instead of its text
+            schema = json.dumps(schema, ensure_ascii=False)
+        parsed[str(name)] = schema or DEFAULT_FEATURES
+    return parsed
+
+
+def reextract_result(result: dict, schemas: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Run only the extraction stage of a stored result against new schemas.
+
+    Reuses the stored translation (Arabic) or refined transcript (English)
+    instead of the whole pipeline, so each extra form costs one LLM call;
+    the schemas are extracted concurrently.
+    """
+    # ``arabic_text`` holds the refined transcript in either language
+    end_text = result.get("translation_text") if result.get("language", "ar") == "ar" else result.get("arabic_text")
+    if not end_text:
+        raise ValueError("Result has no stored text to extract from")
+    return ExtractFeature.extract_many(end_text, schemas)
+
+
+def _is_final(node_name: str, state: PipelineState) -> bool:
+    return node_name == "extract" or (node_name == "validate" and not state.get("is_medical", False))
+
+
+def _step_event(node_name: str, payload: PipelineState):
+    """Map a node update onto the (step_name, payload) pair sent to clients."""
+    if node_name == "transcribe":
+        return "transcription", {"text": payload.get("raw_text", "")}
+    if node_name == "validate":
+        return "validation", {
+            "is_medical": payload.get("is_medical"),
+            "classification": payload.get("validation", {}).get("classification"),
+            "confidence": payload.get("validation", {}).get("confidence"),
+        }
+    if node_name == "refine":
+        return "refinement", {"text": payload.get("refined_text", "")}
+    if node_name == "maybe_translate":
+        return "translation", {"text": payload.get("translated_text", "")}
+    if node_name == "extract":
+        return "feature_extraction", {
+            "json_data": payload.get("json_data", {}),
+            "reasoning": payload.get("reasoning", ""),
+        }
+    return None
+
+
+# State key written by each node, in graph order; used to replay a checkpointed run
+_NODE_OUTPUTS = (
+    ("transcribe", "raw_text"),
+    ("validate", "validation"),
+    ("refine", "refined_text"),
+    ("maybe_translate", "translated_text"),
+    ("extract", "json_data"),
+)
+
+
+def _client_event(node_name: str, payload: PipelineState, state: PipelineState):
+    """``_step_event``, with the run's per-stage timings attached to the final event."""
+    step_event = _step_event(node_name, payload)
+    if step_event is not None and _is_final(node_name, state):
+        step_name, data = step_event
+        step_event = step_name, {**data, "timings": state.get("timings", {})}
+    return step_event
+
+
+def _replay_events(state: PipelineState, skip: tuple = ()):
+    """Yield the events of the nodes a checkpointed run has already completed."""
+    for node_name, key in _NODE_OUTPUTS:
+        if key in state and node_name not in skip:
+            yield _client_event(node_name, state, state)
+
+
 # ---- Runner (helper for FastAPI) ------------------------------------------
 
-def stream_pipeline(file_path: str, language: str, api_key: Optional[str] = None, features: Optional[str] = None):
+def stream_pipeline(file_path: Optional[str], language: str, api_key: Optional[str] = None,
+                    features: Optional[str] = None, user_id: Optional[int] = None,
+                    doctor_name: Optional[str] = None, persist: bool = Config.PERSIST_RESULTS,
+                    run_id: Optional[str] = None, on_result: Optional[Callable[[dict], None]] = None):
     """
     Helper that builds the graph and yields (step_name, payload_dict) events,
     suitable for SSE streaming in FastAPI.
+
+    With a ``run_id`` every node's output is checkpointed under that id and a
+    later call with the same id resumes instead of starting over: the events of
+    completed stages are replayed from the checkpoint, a run that failed
+    continues from the node that failed, and a finished run given a different
+    ``features`` schema re-runs only the extraction. ``file_path`` may be None
+    when resuming.
+
+    When ``persist`` is set, the finished state is handed to the write-behind
+    ``result_writer`` just before the last event is yielded; the writer batches
+    it into ``audio_results`` on its own thread. A run is stored once: re-running
+    the extraction of a finished run streams the new extraction but doesn't store
+    it (``POST /results/{id}/extract`` extracts further schemas from a stored
+    result without storing them either). ``on_result`` is called with
+    the same record, also when a finished run is only replayed (the batch CLI
+    collects records this way and writes them itself).
     """
     api_key = api_key or Config.FIREWORKS_API_KEY
-    graph = build_pipeline().compile()
+    checkpointer = pipeline_checkpoints.saver() if run_id else None
+    graph = build_pipeline().compile(checkpointer=checkpointer)
+    config: RunnableConfig = {"configurable": {"thread_id": run_id, "api_key": api_key}}
 
     # Initial state
     state: PipelineState = {
         "file_path": file_path,
         "language": language,
-        "api_key": api_key,
     }
     if features:
         state["features"] = features
+    inputs = state
+    persisted = False
+
+    if run_id:
+        pipeline_checkpoints.touch(run_id)
+        snapshot = graph.get_state(config)
+        saved = dict(snapshot.values or {})
+        if "raw_text" in saved:
+            # Resume from the checkpoint; a new run only if nothing worth keeping was done
+            inputs = None
+            rerun_extract = (
+                bool(features) and features != saved.get("features")
+                and saved.get("is_medical", False) and "refined_text" in saved
+            )
+            # A run that reached its last node was stored when it did
+            persisted = not snapshot.next
+            if rerun_extract:
+                if snapshot.next:
+                    graph.update_state(config, {"features": features})
+                else:
+                    # Pretend the stage before extract just finished so only extract runs again
+                    before_extract = "maybe_translate" if saved.get("language", "ar") == "ar" else "refine"
+                    graph.update_state(config, {"features": features}, as_node=before_extract)
+                saved["features"] = features
+            elif not snapshot.next:
+                logger.info(f"Run {run_id} already finished; replaying its checkpoint")
+                if on_result is not None:
+                    on_result(_result_record(saved, user_id, doctor_name))
+                yield from _replay_events(saved)
+                return
+            logger.info(f"Resuming run {run_id} at {snapshot.next or ('extract',)}")
+            yield from _replay_events(saved, skip=("extract",) if rerun_extract else ())
+            state = saved
+        elif file_path is None:
+            raise FileNotFoundError(f"No checkpoint for run {run_id} and no audio file to start from")
 
     # The stream yields events for each node execution
-    for event in graph.stream(state, stream_mode="updates"):
+    for event in with_log_context(graph.stream(inputs, config, stream_mode="updates"), run_id=run_id):
         # event is a dict like {"node_name": {...updated_state...}}
         for node_name, payload in event.items():
+            state = {**state, **payload}
+            if _is_final(node_name, state):
+                if persist and not persisted:
+                    result_writer.submit(_result_record(state, user_id, doctor_name))
+                if on_result is not None:
+                    on_result(_result_record(state, user_id, doctor_name))
+
             # Yield friendly step names + minimal payloads for the client
-            if node_name == "transcribe":
-                yield "transcription", {"text": payload.get("raw_text", "")}
-            elif node_name == "validate":
-                yield "validation", {
-                    "is_medical": payload.get("is_medical"),
-                    "classification": payload.get("validation", {}).get("classification"),
-                    "confidence": payload.get("validation", {}).get("confidence"),
-                }
-            elif node_name == "refine":
-                yield "refinement", {"text": payload.get("refined_text", "")}
-            elif node_name == "maybe_translate":
-                yield "translation", {"text": payload.get("translated_text", "")}
-            elif node_name == "extract":
-                yield "feature_extraction", {
-                    "json_data": payload.get("json_data", {}),
-                    "reasoning": payload.get("reasoning", ""),
-                }
\ No newline at end of file
+            step_event = _client_event(node_name, payload, state)
+            if step_event is not None:
+                yield step_event
+
+
+# ---- Encounter sessions -----------------------------------------------------
+
+ENCOUNTER_MERGE_RETRIES = 3
+
+
+def stream_encounter_clip(encounter_id: str, file_path: str, api_key: Optional[str] = None,
+                          store: EncounterStore = encounter_store):
+    """
+    Process one more clip of an encounter and yield (step_name, payload) events.
+
+    Only the new clip goes through transcription, refinement and translation;
+    extraction merges its text into the encounter's current features. If
+    another clip was appended meanwhile, the merge is redone against the
+    newer features (one LLM call) before the clip is stored.
+    """
+    encounter = store.get(encounter_id, with_clips=False)
+    if encounter is None:
+        raise ValueError(f"Encounter {encounter_id} not found")
+    if encounter["status"] != EncounterStore.OPEN:
+        raise ValueError(f"Encounter {encounter_id} is already finalized")
+
+    api_key = api_key or Config.FIREWORKS_API_KEY
+    graph = build_clip_pipeline().compile()
+    config: RunnableConfig = {"configurable": {"api_key": api_key}}
+    features = encounter["features"] or DEFAULT_FEATURES
+    state: PipelineState = {
+        "file_path": file_path,
+        "language": encounter["language"],
+        "features": features,
+        "json_data": encounter["json_data"],
+    }
+    clip_count = encounter["clip_count"]
+
+    for event in with_log_context(graph.stream(state, config, stream_mode="updates"), run_id=encounter_id):
+        for node_name, payload in event.items():
+            state = {**state, **payload}
+            if node_name != "merge_extract":
+                yield _step_event(node_name, payload)
+                continue
+
+            clip = {
+                "filename": os.path.basename(file_path),
+                "raw_text": state.get("raw_text"),
+                "refined_text": state.get("refined_text"),
+                "translated_text": state.get("translated_text"),
+                "timings": state.get("timings", {}),
+            }
+            for _ in range(ENCOUNTER_MERGE_RETRIES):
+                if store.add_clip(encounter_id, clip_count, clip, state["json_data"], state.get("reasoning", "")):
+                    break
+                latest = store.get(encounter_id, with_clips=False)
+                if latest is None or latest["status"] != EncounterStore.OPEN:
+                    raise ValueError(f"Encounter {encounter_id} was finalized while the clip was processed")
+                logger.info(f"Encounter {encounter_id} changed during merge; merging clip again")
+                clip_count = latest["clip_count"]
+                state = merge_extract_node({**state, "json_data": latest["json_data"]})
+            else:
+                raise Exception(f"Could not store clip for encounter {encounter_id}: too many concurrent clips")
+
+            yield "feature_extraction", {
+                "json_data": state.get("json_data", {}),
+                "reasoning": state.get("reasoning", ""),
+                "clip": clip_count + 1,
+                "timings": state.get("timings", {}),
+            }
+
+
+def finalize_encounter(encounter_id: str, store: EncounterStore = encounter_store) -> Optional[int]:
+    """
+    Close an encounter and store it as one ``audio_results`` row (clip texts
+    joined in order, merged features), so it shows up in history, search and
+    exports like a single recording. Returns the result id; finalizing twice
+    returns the same id.
+    """
+    def build_record(encounter: dict) -> dict:
+        clips = encounter["clips"]
+
+        def joined(key: str) -> Optional[str]:
+            texts = [clip[key] for clip in clips if clip.get(key)]
+            return "\n\n".join(texts) if texts else None
+
+        def total(*stages: str) -> float:
+            return sum(clip["timings"].get(stage, 0.0) for clip in clips for stage in stages)
+
+        return dict(
+            user_id=encounter["user_id"],
+            filename=f"encounter-{encounter_id}",
+            language=encounter["language"],
+            model=TRANSCRIPTION_MODEL,
+            is_conversation=False,
+            raw_text=joined("raw_text"),
+            arabic_text=joined("refined_text"),
+            translation_text=joined("translated_text"),
+            json_data=json.dumps(encounter["json_data"], ensure_ascii=False),
+            reasoning=encounter["reasoning"],
+            preprocessing_time=total("preprocessing"),
+            voice_processing_time=total("transcription"),
+            llm_processing_time=total(*LLM_STAGES),
+            doctor_name=encounter["doctor_name"],
+        )
+
+    return store.finalize(encounter_id, build_record)
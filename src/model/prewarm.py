@@ -0,0 +1,132 @@
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.core.config import Config
+
+logger = logging.getLogger(__name__)
+
+WARMUP_SECONDS = 2.0
+WARMUP_SAMPLE_RATE = 16000
+
+
+def _warm_pipeline():
+    from src.model.pipeline_graph import build_clip_pipeline, build_pipeline
+
+    build_pipeline().compile()
+    build_clip_pipeline().compile()
+
+
+def _warm_checkpoints():
+    from src.model.checkpoints import pipeline_checkpoints
+
+    pipeline_checkpoints.saver()
+
+
+def _warm_clients():
+    import fireworks.client  # noqa: F401
+    import requests  # noqa: F401
+
+
+def _warm_preprocessing():
+    """Run every preprocessing step once on a short tone so numba compiles librosa's kernels."""
+    from src.model.audio_preprocessing import AudioPreprocessingService as APS
+
+    t = np.arange(int(WARMUP_SECONDS * WARMUP_SAMPLE_RATE)) / WARMUP_SAMPLE_RATE
+    y = (0.1 * np.sin(2 * np.pi * 220 * t) * (t > 0.5)).astype(np.float32)
+    fd, path = tempfile.mkstemp(suffix=".wav")
+    os.close(fd)
+    try:
+        APS.save(y, WARMUP_SAMPLE_RATE, path)
+        APS.preprocess_audio(path, path)
+    finally:
+        os.remove(path)
+
+
+def _warm_dictation():
+    from src.model.dictation import StreamingSegmenter
+
+    StreamingSegmenter().feed(np.zeros(WARMUP_SAMPLE_RATE // 10, dtype=np.int16).tobytes())
+
+
+class Prewarmer:
+    """Imports and exercises the lazily loaded pipeline dependencies in the background.
+
+    The heavy modules (langgraph, librosa/numba/scipy, the fireworks client)
+    are only imported on first use so the server answers ``/health`` quickly;
+    ``start`` pays that cost on a daemon thread right after startup instead of
+    on the first request. Failures are logged and never stop the app.
+    """
+
+    STEPS: List[Tuple[str, Callable[[], None]]] = [
+        ("pipeline", _warm_pipeline),
+        ("checkpoints", _warm_checkpoints),
+        ("clients", _warm_clients),
+        ("preprocessing", _warm_preprocessing),
+        ("dictation", _warm_dictation),
+    ]
+
+    def __init__(self, enabled: bool = Config.PREWARM):
+        self.enabled = enabled
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.step_seconds: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+
+    def start(self):
+        """Start warming up on a background thread (idempotent, no-op if disabled)."""
+        with self._lock:
+            if not self.enabled or self._thread is not None:
+                return
+            self.started_at = time.monotonic()
+            self._thread = threading.Thread(target=self._run, name="prewarm", daemon=True)
+            self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until warm-up is done; returns False on timeout or if it never started."""
+        thread = self._thread
+        if thread is None:
+            return False
+        thread.join(timeout)
+        return not thread.is_alive()
+
+    def stats(self) -> dict:
+        if not self.enabled:
+            state = "disabled"
+        elif self._thread is None:
+            state = "pending"
+        elif self.finished_at is None:
+            state = "running"
+        else:
+            state = "done"
+        total = None
+        if self.started_at is not None and self.finished_at is not None:
+            total = round(self.finished_at - self.started_at, 3)
+        return {
+            "state": state,
+            "seconds": total,
+            "steps": {name: round(seconds, 3) for name, seconds in self.step_seconds.items()},
+            "errors": dict(self.errors),
+        }
+
+    def _run(self):
+        for name, step in self.STEPS:
+            started = time.monotonic()
+            try:
+                step()
+            except Exception as e:
+                self.errors[name] = str(e)
+                logger.warning(f"Prewarm step {name} failed: {e}")
+            self.step_seconds[name] = time.monotonic() - started
+        self.finished_at = time.monotonic()
+        logger.info(f"Prewarm finished in {self.finished_at - self.started_at:.2f}s: {self.stats()['steps']}")
+
+
+prewarmer = Prewarmer()
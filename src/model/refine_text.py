@@ -3,8 +3,6 @@ import logging
 from .llm_service import LLMService
 from ..core.config import Config
 
-# Configure logger
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class RefineText:
@@ -40,7 +38,7 @@ class RefineText:
 
             refine_time = time.time() - refine_start
             logger.info(f"[RefineText] Refinement completed in {refine_time:.2f}s")
-            logger.debug(f"[RefineText] Output: {refined_text[:200]}...")  # truncate log preview
+            logger.debug("[RefineText] Output: %s", refined_text)  # truncated by the log formatter
 
             return refined_text
 
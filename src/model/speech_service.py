@@ -1,10 +1,10 @@
 import os
+import time
 import logging
 from typing import Optional, Tuple, Dict, Any
-import requests
 
-# Configure logger
-logging.basicConfig(level=logging.INFO)
+from ..core.metrics import UPSTREAM_LATENCY, UPSTREAM_PAYLOAD_BYTES, trace_stage
+
 logger = logging.getLogger(__name__)
 
 
@@ -57,19 +57,13 @@ class SpeechService:
             raise FileNotFoundError(f"Audio file not found: {audio_file_path}")
 
         processed_file_path = audio_file_path
-        temp_file_created = False
+        preprocessing_time = 0.0
 
         # Optional preprocessing
         if preprocess:
-            try:
-                from .audio_preprocessing import AudioPreprocessingService  # optional
-                processed_file_path = AudioPreprocessingService.preprocess_audio(audio_file_path)
-                temp_file_created = processed_file_path != audio_file_path
-                logger.info("Audio preprocessing applied: %s → %s", audio_file_path, processed_file_path)
-            except Exception as e:
-                # Preprocessing is optional; you can choose to fail or continue.
-                # Here we *fail fast* to keep behavior explicit.
-                raise TranscriptionError(f"Audio preprocessing failed: {e}") from e
+            processed_file_path, preprocessing_time = SpeechService.preprocess(audio_file_path)
+
+        import requests  # deferred with the other HTTP/audio dependencies to keep startup fast
 
         try:
             headers = {"Authorization": f"Bearer {api_key}"}
@@ -80,16 +74,29 @@ class SpeechService:
                 data["language"] = language
 
             logger.info("Starting transcription: file=%s, model=%s, language=%s", processed_file_path, model, language)
+            transcription_start = time.time()
 
-            with open(processed_file_path, "rb") as f:
-                files = {"file": (os.path.basename(processed_file_path), f, "application/octet-stream")}
-                resp = requests.post(
-                    SpeechService.TRANSCRIBE_ENDPOINT,
-                    headers=headers,
-                    files=files,
-                    data=data,
-                    timeout=timeout,
-                )
+            UPSTREAM_PAYLOAD_BYTES.observe(os.path.getsize(processed_file_path),
+                                           service="transcription", model=model, direction="sent")
+            outcome = "error"
+            try:
+                with open(processed_file_path, "rb") as f:
+                    files = {"file": (os.path.basename(processed_file_path), f, "application/octet-stream")}
+                    resp = requests.post(
+                        SpeechService.TRANSCRIBE_ENDPOINT,
+                        headers=headers,
+                        files=files,
+                        data=data,
+                        timeout=timeout,
+                    )
+                outcome = "ok" if resp.status_code < 400 else f"http_{resp.status_code}"
+            except requests.Timeout:
+                outcome = "timeout"
+                raise
+            finally:
+                UPSTREAM_LATENCY.observe(time.time() - transcription_start,
+                                         service="transcription", model=model, outcome=outcome)
+            UPSTREAM_PAYLOAD_BYTES.observe(len(resp.content), service="transcription", model=model, direction="received")
 
             if resp.status_code >= 400:
                 # Try to surface server error details
@@ -119,6 +126,8 @@ class SpeechService:
                     "language": language,
                     "endpoint": SpeechService.TRANSCRIBE_ENDPOINT,
                     "status_code": resp.status_code,
+                    "preprocessing_time": preprocessing_time,
+                    "transcription_time": time.time() - transcription_start,
                 }
                 return text, meta
             return text
@@ -134,9 +143,38 @@ class SpeechService:
             raise TranscriptionError(f"Audio transcription failed: {e}") from e
         finally:
             # Clean up temporary processed file if we created one
-            try:
-                if temp_file_created and processed_file_path != audio_file_path and os.path.exists(processed_file_path):
-                    os.remove(processed_file_path)
-                    logger.debug("Removed temporary preprocessed file: %s", processed_file_path)
-            except Exception as cleanup_err:
-                logger.warning("Failed to remove temporary file %s: %s", processed_file_path, cleanup_err)
+            SpeechService.remove_preprocessed(audio_file_path, processed_file_path)
+
+    @staticmethod
+    def preprocess(audio_file_path: str) -> Tuple[str, float]:
+        """
+        Run audio preprocessing on its own (the CPU-bound part of transcription).
+
+        Returns:
+            (processed_file_path, preprocessing_seconds). The processed file is
+            temporary; remove it with ``remove_preprocessed``.
+
+        Raises:
+            TranscriptionError: If preprocessing fails.
+        """
+        preprocess_start = time.time()
+        try:
+            from .audio_preprocessing import AudioPreprocessingService  # optional
+            with trace_stage("preprocessing"):
+                processed_file_path = AudioPreprocessingService.preprocess_audio(audio_file_path)
+            logger.info("Audio preprocessing applied: %s → %s", audio_file_path, processed_file_path)
+        except Exception as e:
+            # Preprocessing is optional; you can choose to fail or continue.
+            # Here we *fail fast* to keep behavior explicit.
+            raise TranscriptionError(f"Audio preprocessing failed: {e}") from e
+        return processed_file_path, time.time() - preprocess_start
+
+    @staticmethod
+    def remove_preprocessed(audio_file_path: str, processed_file_path: str):
+        """Delete the temporary file produced by ``preprocess`` (never the original)."""
+        try:
+            if processed_file_path != audio_file_path and os.path.exists(processed_file_path):
+                os.remove(processed_file_path)
+                logger.debug("Removed temporary preprocessed file: %s", processed_file_path)
+        except Exception as cleanup_err:
+            logger.warning("Failed to remove temporary file %s: %s", processed_file_path, cleanup_err)
@@ -3,8 +3,6 @@ import logging
 from .llm_service import LLMService
 from ..core.config import Config
 
-# Configure logger
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class Translate:
@@ -33,7 +31,7 @@ class Translate:
 
             translation_time = time.time() - translation_start
             logger.info(f"[Translate] Translation completed in {translation_time:.2f}s")
-            logger.debug(f"[Translate] Output: {translated_text[:200]}...")  # log preview
+            logger.debug("[Translate] Output: %s", translated_text)  # truncated by the log formatter
 
             return translated_text
 
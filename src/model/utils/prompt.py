@@ -1,3 +1,6 @@
+import json
+
+
 def get_refine_arabic_prompt_deepseek(raw_text):
     return f"""
     Correct the grammar and structure of this Arabic medical text and try to ignore the names of the speakers. 
@@ -96,6 +99,28 @@ Example output:
 """
 
 
+def get_merge_extraction_prompt_llama(new_text, features, current_data):
+    return f"""
+You are a medical expert updating the structured record of an encounter that is dictated in several parts.
+Below are the features already extracted from the earlier parts and the text of the NEW part only.
+Return a JSON object with two fields:
+- "json_data": The complete updated dictionary with these medical features:
+  {features}
+- "reasoning": A string explaining what the new part added or changed.
+
+Rules:
+- Start from the current features and keep everything the new part does not contradict.
+- Add information that appears only in the new part; append to lists instead of replacing them.
+- Replace a value only when the new part explicitly corrects or updates it.
+- Leave fields empty ("" for strings, [] for lists) only if neither the current features nor the new part have information.
+
+Current features:
+{json.dumps(current_data, ensure_ascii=False, indent=2)}
+
+New text: {new_text}
+"""
+
+
 # def get_extraction_prompt_deepseek(translated_text):
 #     return f"""
 #     Extract patient information from this medical text into exactly two sections:
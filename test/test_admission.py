@@ -0,0 +1,147 @@
+import pytest
+
+from src.core.admission import ANONYMOUS, AdmissionController, AdmissionRejected, tenant_key
+
+INTERACTIVE = AdmissionController.INTERACTIVE
+BATCH = AdmissionController.BATCH
+
+
+def controller(**overrides) -> AdmissionController:
+    options = dict(max_in_flight=2, max_queue=8, queue_timeout=30, initial_service_time=20,
+                   tenant_max_in_flight=1, batch_max_in_flight=1, tenant_weights={})
+    options.update(overrides)
+    return AdmissionController(**options)
+
+
+def start_next(admission: AdmissionController):
+    """Start whichever ticket the scheduler picks (acquire returns at once for it)."""
+    ticket = admission._next()
+    if ticket is not None:
+        admission.acquire(ticket)
+    return ticket
+
+
+def test_tenant_key():
+    assert tenant_key(7, "Amr") == "user:7"
+    assert tenant_key(None, "Amr") == "doctor:Amr"
+    assert tenant_key() == ANONYMOUS
+
+
+def test_interactive_starts_before_batch():
+    admission = controller(max_in_flight=1)
+    running = admission.reserve("user:0", BATCH)
+    admission.acquire(running)
+    batch = admission.reserve("user:1", BATCH)
+    interactive = admission.reserve("user:2", INTERACTIVE)
+    admission.release(running)
+    assert start_next(admission) is interactive
+    admission.release(interactive)
+    assert start_next(admission) is batch
+
+
+def test_tenants_interleave_by_weight():
+    admission = controller(max_in_flight=1, tenant_max_in_flight=1, tenant_weights={"user:heavy": 2.0})
+    blocker = admission.reserve("user:0")
+    admission.acquire(blocker)
+    clinic = [admission.reserve("user:clinic", BATCH) for _ in range(3)]
+    heavy = [admission.reserve("user:heavy", BATCH) for _ in range(4)]
+    admission.release(blocker)
+    order = []
+    while (ticket := start_next(admission)) is not None:
+        order.append(ticket)
+        admission.release(ticket)
+    # Tags 1/w apart: heavy gets two slots for each of clinic's
+    assert order == [heavy[0], clinic[0], heavy[1], heavy[2], clinic[1], heavy[3], clinic[2]]
+
+
+def test_batch_cap_keeps_headroom_for_interactive():
+    admission = controller(max_in_flight=2, tenant_max_in_flight=2, batch_max_in_flight=1)
+    first, second = admission.reserve("user:1", BATCH), admission.reserve("user:1", BATCH)
+    assert start_next(admission) is first
+    assert start_next(admission) is None
+    interactive = admission.reserve("user:2")
+    assert start_next(admission) is interactive
+    assert second in admission._queue
+
+
+def test_rejects_when_queue_is_full():
+    admission = controller(max_in_flight=1, max_queue=2, initial_service_time=1)
+    admission.acquire(admission.reserve("user:0"))
+    admission.reserve("user:1")
+    admission.reserve("user:2")
+    with pytest.raises(AdmissionRejected, match="queue is full"):
+        admission.reserve("user:3")
+    assert admission.rejected == 1
+
+
+def test_rejects_when_expected_wait_exceeds_timeout():
+    admission = controller(max_in_flight=1, initial_service_time=20)
+    admission.acquire(admission.reserve("user:0"))
+    with pytest.raises(AdmissionRejected) as rejected:
+        admission.reserve("user:1", timeout=10)
+    assert rejected.value.retry_after == pytest.approx(10)
+    assert rejected.value.retry_after_header == "10"
+    # Batch work is never rejected, it waits
+    assert admission.reserve("user:1", BATCH).deadline == float("inf")
+
+
+def test_rejects_when_tenant_cap_means_waiting_too_long():
+    admission = controller(max_in_flight=4, tenant_max_in_flight=1, initial_service_time=20)
+    admission.acquire(admission.reserve("user:1"))
+    # Free global slots, but user:1 already holds its only one
+    with pytest.raises(AdmissionRejected):
+        admission.reserve("user:1", timeout=10)
+    assert admission.reserve("user:2", timeout=10) is not None
+
+
+def test_anonymous_bucket_is_not_tenant_capped():
+    admission = controller(max_in_flight=4, tenant_max_in_flight=1)
+    tickets = [admission.reserve(ANONYMOUS, timeout=10) for _ in range(4)]
+    assert [start_next(admission) for _ in tickets] == tickets
+    assert admission.stats()["tenants"][ANONYMOUS]["in_flight"] == 4
+
+
+def test_release_of_a_queued_ticket_dequeues_it():
+    admission = controller(max_in_flight=1)
+    admission.acquire(admission.reserve("user:0"))
+    waiting = admission.reserve("user:1", BATCH)
+    admission.release(waiting)
+    assert admission.stats()["queue_depth"] == 0
+    assert admission.completed == 0
+
+
+def test_idle_tenants_are_forgotten():
+    admission = controller(max_in_flight=1, tenant_max_in_flight=1)
+    running = admission.reserve("user:1")
+    admission.acquire(running)
+    queued = admission.reserve("user:2", BATCH)
+    cancelled = admission.reserve("user:3", BATCH)
+    admission.release(cancelled)
+    assert set(admission._tenant_tags) == {"user:1", "user:2"}
+
+    admission.release(running)
+    assert set(admission._tenant_tags) == {"user:2"}
+    admission.acquire(queued)
+    admission.release(queued)
+    assert admission._tenant_tags == {}
+
+    blocker = admission.reserve("user:4")
+    admission.acquire(blocker)
+    waiting = admission.reserve("user:5", BATCH)
+    waiting.deadline = 0  # gave up waiting
+    with pytest.raises(AdmissionRejected, match="Timed out"):
+        admission.acquire(waiting)
+    assert set(admission._tenant_tags) == {"user:4"}
+
+
+def test_aged_batch_work_is_not_starved():
+    admission = controller(max_in_flight=1, batch_aging=60)
+    running = admission.reserve("user:0")
+    admission.acquire(running)
+    batch = admission.reserve("user:1", BATCH)
+    interactive = admission.reserve("user:2")
+    admission.release(running)
+    assert admission._next() is interactive
+
+    batch.created_at -= 61
+    assert start_next(admission) is batch
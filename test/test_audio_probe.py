@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+import soundfile as sf
+
+from src.core.config import Config
+from src.model.audio_probe import AudioProbe, PreflightError
+
+SAMPLE_RATE = 16000
+
+
+def tone(seconds: float, sample_rate: int = SAMPLE_RATE, amplitude: float = 0.5) -> np.ndarray:
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    return amplitude * np.sin(2 * np.pi * 440 * t)
+
+
+def write(tmp_path, name: str, audio: np.ndarray, sample_rate: int = SAMPLE_RATE, **options) -> str:
+    path = str(tmp_path / name)
+    sf.write(path, audio, sample_rate, **options)
+    return path
+
+
+@pytest.mark.parametrize("subtype", ["PCM_U8", "PCM_16", "PCM_24", "PCM_32", "FLOAT"])
+def test_wav_header(tmp_path, subtype):
+    info = AudioProbe.probe(write(tmp_path, "a.wav", tone(2.0), subtype=subtype))
+    assert (info["container"], info["channels"], info["sample_rate"]) == ("wav", 1, SAMPLE_RATE)
+    assert info["duration"] == pytest.approx(2.0, abs=0.01)
+
+
+def test_wav_stereo_level(tmp_path):
+    path = write(tmp_path, "stereo.wav", np.stack([tone(1.0, 44100), tone(1.0, 44100) * 0], axis=1), 44100)
+    info = AudioProbe.probe(path)
+    assert (info["channels"], info["sample_rate"]) == (2, 44100)
+    assert AudioProbe.peak_level_db(path, info) == pytest.approx(20 * np.log10(0.5 / np.sqrt(2)), abs=1.0)  # RMS of the loudest window
+
+
+@pytest.mark.parametrize("fmt, subtype, codec, sample_rate", [
+    ("OGG", "VORBIS", "vorbis", SAMPLE_RATE),
+    ("OGG", "OPUS", "opus", 48000),
+    ("FLAC", "PCM_16", "flac", SAMPLE_RATE),
+    ("MP3", "MPEG_LAYER_III", "mp3", SAMPLE_RATE),
+])
+def test_compressed_headers(tmp_path, fmt, subtype, codec, sample_rate):
+    try:
+        path = write(tmp_path, f"a.{fmt.lower()}", tone(3.0, sample_rate), sample_rate, format=fmt, subtype=subtype)
+    except (sf.LibsndfileError, ValueError, TypeError):
+        pytest.skip(f"libsndfile cannot write {fmt}/{subtype}")
+    info = AudioProbe.probe(path)
+    assert info["codec"] == codec
+    assert info["duration"] == pytest.approx(sf.info(path).duration, rel=0.05)
+
+
+def test_sniff():
+    assert AudioProbe.sniff(b"RIFF\x00\x00\x00\x00WAVEfmt ") == ("wav", None)
+    assert AudioProbe.sniff(b"fLaC\x00\x00\x00\x22") == ("flac", "flac")
+    assert AudioProbe.sniff(b"\x00\x00\x00\x20ftypM4A ") == ("m4a", None)
+    assert AudioProbe.sniff(b"ID3\x04\x00\x00\x00\x00\x00\x00") == ("mp3", "mp3")
+    assert AudioProbe.sniff(b"hello world, not audio") == (None, None)
+
+
+def test_truncated_wav_is_corrupt(tmp_path):
+    path = tmp_path / "cut.wav"
+    path.write_bytes(b"RIFF\x24\x00\x00\x00WAVEfmt \x10\x00\x00\x00\x01\x00")
+    with pytest.raises(PreflightError) as rejected:
+        AudioProbe.preflight(str(path))
+    assert rejected.value.status_code == 400
+
+
+@pytest.mark.parametrize("audio, reason, status", [
+    (tone(0.1), "too_short", 422),
+    (np.random.default_rng(0).normal(0, 1e-4, SAMPLE_RATE * 2), "silent", 422),
+])
+def test_preflight_rejects(tmp_path, audio, reason, status):
+    path = write(tmp_path, "a.wav", audio, subtype="PCM_16")
+    with pytest.raises(PreflightError) as rejected:
+        AudioProbe.preflight(path)
+    assert (rejected.value.reason, rejected.value.status_code) == (reason, status)
+
+
+def test_upload_policy_applies_only_when_asked(tmp_path, monkeypatch):
+    path = write(tmp_path, "a.wav", tone(1.0), subtype="PCM_16")
+    monkeypatch.setattr(Config, "ALLOWED_EXTENSIONS", {"mp3"})
+    assert AudioProbe.preflight(path, max_duration=None)["duration"] == pytest.approx(1.0, abs=0.01)
+    with pytest.raises(PreflightError, match="contains wav") as rejected:
+        AudioProbe.preflight(path, "a.mp3")
+    assert rejected.value.status_code == 415
+    with pytest.raises(PreflightError, match="long") as rejected:
+        AudioProbe.preflight(path, max_duration=0.8)
+    assert rejected.value.status_code == 413
+    monkeypatch.setattr(Config, "ALLOWED_EXTENSIONS", {"wav"})
+    with pytest.raises(PreflightError, match="bytes") as rejected:
+        AudioProbe.preflight(path, "a.wav", max_bytes=1000)
+    assert rejected.value.status_code == 413
+    with pytest.raises(PreflightError) as rejected:
+        AudioProbe.preflight(path, "a.exe")
+    assert rejected.value.status_code == 415
@@ -0,0 +1,133 @@
+import json
+import os
+
+import pytest
+
+import src.model.batch_runner as batch_runner
+from src.core.database import DatabaseService
+from src.model.batch_runner import BatchRunner, BatchState, read_manifest, run_id_for, scan_directory
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    monkeypatch.setattr(DatabaseService, "DB_PATH", str(tmp_path / "results.db"))
+    assert DatabaseService.initialize_db()
+    yield DatabaseService
+    DatabaseService.pool().close_all()
+
+
+@pytest.fixture
+def state(tmp_path):
+    state = BatchState(str(tmp_path / "state.db"))
+    yield state
+    state.close()
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """Fake pipeline: records the files it ran; files named ``bad*`` fail."""
+    calls, deleted = [], []
+
+    def fake_stream_pipeline(file_path, language, features=None, user_id=None, doctor_name=None,
+                             persist=False, run_id=None, on_result=None):
+        calls.append(os.path.basename(file_path))
+        if os.path.basename(file_path).startswith("bad"):
+            raise RuntimeError("transcription failed")
+        on_result({"user_id": user_id, "filename": os.path.basename(file_path), "language": language,
+                   "model": "whisper", "is_conversation": False, "raw_text": "raw", "arabic_text": "refined"})
+        yield "transcription", {"text": "raw"}
+
+    monkeypatch.setattr(batch_runner, "stream_pipeline", fake_stream_pipeline)
+    monkeypatch.setattr(batch_runner.pipeline_checkpoints, "delete", deleted.append)
+    return calls
+
+
+def recordings(tmp_path, *names) -> str:
+    folder = tmp_path / "recordings"
+    for name in names:
+        path = folder / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"RIFF" + name.encode())
+    return str(folder)
+
+
+def stored_filenames() -> list:
+    rows = DatabaseService.pool().connection().execute("SELECT filename FROM audio_results ORDER BY filename")
+    return [os.path.basename(row[0]) for row in rows.fetchall()]
+
+
+def test_scan_directory_finds_audio_files_recursively(tmp_path):
+    folder = recordings(tmp_path, "a.wav", "notes.txt", "clinic/b.MP3", "clinic/c.ogg")
+    assert sorted(os.path.relpath(item["path"], folder) for item in scan_directory(folder)) == [
+        "a.wav", os.path.join("clinic", "b.MP3"), os.path.join("clinic", "c.ogg"),
+    ]
+
+
+def test_read_manifest_resolves_paths_next_to_the_manifest(tmp_path):
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("\n".join([
+        "# archive",
+        "a.wav",
+        json.dumps({"path": "sub/b.wav", "language": "en", "doctor_name": "Amr"}),
+        "",
+    ]))
+    assert list(read_manifest(str(manifest))) == [
+        {"path": str(tmp_path / "a.wav")},
+        {"path": str(tmp_path / "sub" / "b.wav"), "language": "en", "doctor_name": "Amr"},
+    ]
+
+
+def test_run_id_tracks_the_file_version():
+    assert run_id_for("/a.wav", 10, 1.0) == run_id_for("/a.wav", 10, 1.0)
+    assert run_id_for("/a.wav", 10, 1.0) != run_id_for("/a.wav", 11, 1.0)
+    assert run_id_for("/a.wav", 10, 1.0) != run_id_for("/a.wav", 10, 2.0)
+    assert run_id_for("/a.wav", 10, 1.0) != run_id_for("/b.wav", 10, 1.0)
+
+
+def test_resume_skips_done_files_and_retries_failed_ones(tmp_path, database, state, pipeline):
+    folder = recordings(tmp_path, "a.wav", "b.wav", "bad.wav")
+    runner = BatchRunner(state, concurrency=2, max_attempts=2, db_batch_size=10)
+    summary = runner.run(runner.plan(scan_directory(folder)))
+
+    assert summary["done"] == 2 and summary["failed"] == 1 and summary["rows_written"] == 2
+    assert stored_filenames() == ["a.wav", "b.wav"]
+    assert state.counts() == {BatchState.DONE: 2, BatchState.FAILED: 1}
+
+    pipeline.clear()
+    runner = BatchRunner(state, max_attempts=2)
+    runner.run(runner.plan(scan_directory(folder)))
+    assert pipeline == ["bad.wav"]
+
+    # Out of attempts: not tried again
+    pipeline.clear()
+    assert BatchRunner(state, max_attempts=2).plan(scan_directory(folder)) == []
+
+    # A changed file is a new version and starts over
+    with open(os.path.join(folder, "a.wav"), "ab") as f:
+        f.write(b"more")
+    todo = BatchRunner(state, max_attempts=2).plan(scan_directory(folder))
+    assert [os.path.basename(item["path"]) for item in todo] == ["a.wav"]
+
+
+def test_files_are_marked_done_only_after_the_bulk_save(tmp_path, database, state, pipeline, monkeypatch):
+    folder = recordings(tmp_path, "a.wav", "b.wav")
+
+    save = DatabaseService.save_audio_results
+
+    def failing_save(records):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(DatabaseService, "save_audio_results", failing_save)
+    runner = BatchRunner(state, db_batch_size=10)
+    summary = runner.run(runner.plan(scan_directory(folder)))
+    assert summary["failed"] == 2 and summary["rows_written"] == 0
+    assert state.counts() == {BatchState.FAILED: 2}
+    assert state.get(os.path.join(folder, "a.wav"))["attempts"] == 1
+
+    assert stored_filenames() == []
+
+    monkeypatch.setattr(DatabaseService, "save_audio_results", save)
+    runner = BatchRunner(state, db_batch_size=10)
+    assert runner.run(runner.plan(scan_directory(folder)))["rows_written"] == 2
+    assert state.counts() == {BatchState.DONE: 2}
+    assert stored_filenames() == ["a.wav", "b.wav"]
@@ -0,0 +1,104 @@
+import time
+import types
+
+import pytest
+
+import src.model.pipeline_graph as pipeline_graph
+from src.model.checkpoints import PipelineCheckpoints
+from src.model.pipeline_graph import stream_pipeline
+
+
+@pytest.fixture
+def checkpoints(tmp_path, monkeypatch):
+    store = PipelineCheckpoints(db_path=str(tmp_path / "checkpoints.db"), retention=60, prune_interval=3600)
+    monkeypatch.setattr(pipeline_graph, "pipeline_checkpoints", store)
+    yield store
+    store._pool.close_all()
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Replace every stage with a fake that counts its calls; ``fail`` makes a stage raise once."""
+    counts = {"transcribe": 0, "translate": 0, "extract": 0, "fail": set(), "submitted": []}
+
+    def stage(name, result):
+        def run(*args, **kwargs):
+            counts[name] += 1
+            if name in counts["fail"]:
+                counts["fail"].discard(name)
+                raise RuntimeError(f"{name} failed")
+            return result(*args, **kwargs)
+        return run
+
+    monkeypatch.setattr(pipeline_graph.AudioProbe, "preflight", staticmethod(lambda *args, **kwargs: {}))
+    monkeypatch.setattr(pipeline_graph.SpeechService, "preprocess", staticmethod(lambda path: (path, 0.0)))
+    monkeypatch.setattr(pipeline_graph.SpeechService, "remove_preprocessed", staticmethod(lambda *args: None))
+    monkeypatch.setattr(pipeline_graph.SpeechService, "transcribe_audio", staticmethod(
+        stage("transcribe", lambda *args, **kwargs: ("raw", {"transcription_time": 0.1}))))
+    monkeypatch.setattr(pipeline_graph, "MedicalValidator", types.SimpleNamespace(
+        validate_medical_content=lambda text: {"classification": "MEDICAL", "confidence": 0.9}))
+    monkeypatch.setattr(pipeline_graph, "RefineText", types.SimpleNamespace(
+        refining_transcription=lambda raw_text, language: "refined"))
+    monkeypatch.setattr(pipeline_graph, "Translate", types.SimpleNamespace(
+        translate=stage("translate", lambda refined_text: "translated")))
+    monkeypatch.setattr(pipeline_graph, "ExtractFeature", types.SimpleNamespace(
+        extract=stage("extract", lambda end_text, features: ({"schema": features}, ""))))
+    monkeypatch.setattr(pipeline_graph.result_writer, "submit", counts["submitted"].append)
+    return counts
+
+
+def run(run_id, file_path="visit.wav", **kwargs):
+    return list(stream_pipeline(file_path, "ar", api_key="test", persist=True, run_id=run_id, **kwargs))
+
+
+def test_failed_run_resumes_from_the_failing_node(checkpoints, calls):
+    calls["fail"].add("translate")
+    with pytest.raises(RuntimeError, match="translate failed"):
+        run("run-1")
+    assert calls["transcribe"] == 1 and calls["translate"] == 1 and calls["submitted"] == []
+
+    events = run("run-1", file_path=None)
+    assert [name for name, _ in events] == [
+        "transcription", "validation", "refinement", "translation", "feature_extraction",
+    ]
+    assert events[0][1]["text"] == "raw" and events[3][1]["text"] == "translated"
+    assert calls["transcribe"] == 1 and calls["translate"] == 2 and calls["extract"] == 1
+    assert len(calls["submitted"]) == 1
+
+
+def test_finished_run_is_replayed_and_new_features_rerun_only_extract(checkpoints, calls):
+    run("run-2", features='"plan": ""')
+    assert calls["extract"] == 1 and len(calls["submitted"]) == 1
+
+    records = []
+    replayed = run("run-2", file_path=None, on_result=records.append)
+    assert replayed[-1][0] == "feature_extraction"
+    assert replayed[-1][1]["json_data"] == {"schema": '"plan": ""'}
+    assert calls["extract"] == 1 and len(records) == 1
+
+    events = run("run-2", file_path=None, features='"assessment": ""')
+    assert events[-1][1]["json_data"] == {"schema": '"assessment": ""'}
+    assert [name for name, _ in events].count("feature_extraction") == 1
+    assert calls["transcribe"] == 1 and calls["translate"] == 1 and calls["extract"] == 2
+    assert len(calls["submitted"]) == 1  # the finished run was already stored
+
+
+def test_resume_without_checkpoint_or_file_fails(checkpoints, calls):
+    with pytest.raises(FileNotFoundError):
+        run("missing", file_path=None)
+
+
+def test_prune_removes_idle_runs_only(checkpoints, calls):
+    run("old")
+    run("recent")
+    conn = checkpoints._pool.connection()
+    conn.execute("UPDATE pipeline_runs SET updated_at = updated_at - 120 WHERE run_id = 'old'")
+
+    assert checkpoints.prune() == 1
+    assert not checkpoints.has_run("old") and checkpoints.has_run("recent")
+    for table in ("checkpoints", "writes"):
+        assert conn.execute(f"SELECT COUNT(*) FROM {table} WHERE thread_id = 'old'").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM writes WHERE thread_id = 'recent'").fetchone()[0] > 0
+
+    assert checkpoints.prune(now=time.time() + 120) == 1
+    assert not checkpoints.has_run("recent")
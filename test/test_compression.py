@@ -0,0 +1,105 @@
+import sqlite3
+
+import pytest
+
+import src.core.compression as compression
+from src.core.compression import MissingDictionaryError, PayloadCodec
+from src.core.config import Config
+from src.core.database import DatabaseService
+
+pytest.importorskip("zstandard")
+
+TERMS = ("headache", "chest pain", "hypertension", "diabetes", "paracetamol", "ibuprofen", "fever", "cough")
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    monkeypatch.setattr(DatabaseService, "DB_PATH", str(tmp_path / "results.db"))
+    # Dictionary ids are per database; don't reuse ones registered by another test
+    monkeypatch.setattr(PayloadCodec, "_dictionaries", {})
+    assert DatabaseService.initialize_db()
+    yield DatabaseService
+    DatabaseService.pool().close_all()
+
+
+def record(index: int) -> dict:
+    terms = [TERMS[(index + offset) % len(TERMS)] for offset in range(3)]
+    return {
+        "user_id": 1, "filename": f"{index}.wav", "language": "en", "model": "whisper", "is_conversation": False,
+        "raw_text": f"Patient {index} reports {terms[0]} for {index % 9 + 1} days, history of {terms[1]}.",
+        "arabic_text": f"The patient reports {terms[0]} and {terms[2]}; visit number {index}.",
+        "translation_text": None,
+        "json_data": f'{{"chief_complaint": "{terms[0]}", "current_medication": "{terms[2]}", "visit": {index}}}',
+        "reasoning": f"Extracted {terms[0]} from the transcript of visit {index}.",
+        "preprocessing_time": 0.0, "voice_processing_time": 0.0, "llm_processing_time": 0.0,
+    }
+
+
+def dict_ids() -> set:
+    rows = DatabaseService.pool().connection().execute("SELECT DISTINCT dict_id FROM audio_result_payloads")
+    return {row[0] for row in rows.fetchall()}
+
+
+def test_codec_round_trip():
+    text = "مريض يعاني من ألم في الصدر"
+    for codec in (PayloadCodec.ZSTD, PayloadCodec.ZLIB):
+        assert PayloadCodec.decompress(PayloadCodec.compress(text, codec), codec) == text
+        assert PayloadCodec.compress(None, codec) is None
+    with pytest.raises(ValueError):
+        PayloadCodec.compress(text, "lz4")
+
+
+def test_dictionary_round_trip_and_recompression(database):
+    database.save_audio_results([record(index) for index in range(300)])
+    assert dict_ids() == {None}
+
+    first = database.train_compression_dictionary()
+    database.save_audio_results([record(300)])
+    assert dict_ids() == {None, first}
+
+    second = database.train_compression_dictionary()
+    assert database.recompress_payloads(batch_size=64) == 301
+    assert dict_ids() == {second}
+    assert database.recompress_payloads() == 0
+
+    # A fresh process has no dictionary registered; it is loaded on demand
+    PayloadCodec._dictionaries.clear()
+    blob = PayloadCodec.compress("chest pain", PayloadCodec.ZSTD, dict_id=first)
+    assert PayloadCodec.decompress(blob, PayloadCodec.ZSTD, dict_id=first) == "chest pain"
+    for result_id in (1, 150, 301):
+        expected = record(result_id - 1)
+        result = database.get_audio_result(result_id)
+        assert {key: result[key] for key in DatabaseService._PAYLOAD_COLUMNS} == {
+            key: expected[key] for key in DatabaseService._PAYLOAD_COLUMNS
+        }
+
+
+def test_missing_dictionary_is_a_clear_error(database):
+    with pytest.raises(MissingDictionaryError, match="dictionary 42 is not stored"):
+        PayloadCodec.compress("text", PayloadCodec.ZSTD, dict_id=42)
+
+
+def test_dictionary_trained_by_another_process_is_picked_up(database, monkeypatch):
+    database.save_audio_results([record(index) for index in range(300)])
+    samples = [record(index)["raw_text"] for index in range(300)]
+    other = sqlite3.connect(database.DB_PATH)
+    other.execute("INSERT INTO compression_dictionaries (codec, data, sample_count) VALUES (?, ?, ?)",
+                  (PayloadCodec.ZSTD, PayloadCodec.train_dictionary(samples, dict_size=4096), len(samples)))
+    other.commit()
+    other.close()
+
+    monkeypatch.setattr(Config, "PAYLOAD_DICTIONARY_REFRESH", 0.0)
+    database.save_audio_results([record(300)])
+    assert dict_ids() == {None, 1}
+    assert database.get_audio_result(301)["raw_text"] == record(300)["raw_text"]
+
+
+def test_zlib_fallback_without_zstandard(database, monkeypatch):
+    monkeypatch.setattr(compression, "zstandard", None)
+    assert PayloadCodec.default_codec() == PayloadCodec.ZLIB
+    database.save_audio_results([record(0)])
+    row = database.pool().connection().execute("SELECT codec, dict_id FROM audio_result_payloads").fetchone()
+    assert row == (PayloadCodec.ZLIB, None)
+    assert database.get_audio_result(1)["raw_text"] == record(0)["raw_text"]
+    with pytest.raises(RuntimeError, match="zstandard is required"):
+        PayloadCodec.decompress(b"\x28\xb5\x2f\xfd", PayloadCodec.ZSTD)
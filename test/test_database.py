@@ -0,0 +1,107 @@
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+
+from src.core.database import AsyncDatabaseService, ConnectionPool, DatabaseService
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    monkeypatch.setattr(DatabaseService, "DB_PATH", str(tmp_path / "results.db"))
+    assert DatabaseService.initialize_db()
+    yield DatabaseService
+    DatabaseService.pool().close_all()
+
+
+def record(index: int, **overrides) -> dict:
+    return {
+        "user_id": 1, "filename": f"{index}.wav", "language": "ar", "model": "whisper", "is_conversation": False,
+        "raw_text": f"raw {index}", "arabic_text": "refined", "translation_text": "translated", "json_data": "{}",
+        "reasoning": "", "preprocessing_time": 0.0, "voice_processing_time": 0.0, "llm_processing_time": 0.0,
+        **overrides,
+    }
+
+
+def all_pages(database, **filters) -> list:
+    pages, cursor = [], None
+    while True:
+        rows, cursor = database.list_audio_results(cursor=cursor, **filters)
+        pages.append([row["id"] for row in rows])
+        if cursor is None:
+            return pages
+
+
+def test_pagination_is_stable_across_equal_timestamps(database):
+    database.save_audio_results([record(index) for index in range(7)])
+    with database.pool().transaction() as conn:
+        conn.execute("UPDATE audio_results SET insertion_date = '2024-05-01 10:00:00' WHERE id <= 5")
+        conn.execute("UPDATE audio_results SET insertion_date = '2024-05-02 09:00:00' WHERE id > 5")
+
+    assert all_pages(database, limit=2) == [[7, 6], [5, 4], [3, 2], [1]]
+    assert all_pages(database, limit=7) == [[7, 6, 5, 4, 3, 2, 1]]
+    assert all_pages(database, limit=3, end_date="2024-05-02") == [[5, 4, 3], [2, 1]]
+
+
+def test_pagination_filters(database):
+    database.save_audio_results([record(0, language="en"), record(1, doctor_name="Amr"), record(2, user_id=2)])
+    assert all_pages(database, language="en") == [[1]]
+    assert all_pages(database, doctor_name="Amr") == [[2]]
+    assert all_pages(database, user_id=2) == [[3]]
+
+
+def test_cursor_round_trip(database):
+    cursor = DatabaseService._encode_cursor("2024-05-01 10:00:00", 42)
+    assert DatabaseService._decode_cursor(cursor) == ("2024-05-01 10:00:00", 42)
+    with pytest.raises(ValueError, match="Invalid pagination cursor"):
+        DatabaseService._decode_cursor("not-a-cursor")
+
+
+def test_transaction_rolls_back_on_error(database):
+    with pytest.raises(RuntimeError):
+        with database.pool().transaction() as conn:
+            DatabaseService._insert_result(conn, record(0))
+            raise RuntimeError("abort")
+    assert database.list_audio_results() == ([], None)
+    assert database.save_audio_results([record(1)]) == 1
+
+
+def test_connections_are_per_thread(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"))
+    main = pool.connection()
+    assert pool.connection() is main
+    assert main.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(pool.connection()))
+    thread.start()
+    thread.join()
+    assert other[0] is not main
+
+    pool.close_connection()
+    assert pool.connection() is not main
+    pool.close_all()
+
+
+def test_async_service_runs_off_the_event_loop(database):
+    async def main():
+        result_id = await AsyncDatabaseService.save_audio_result(**record(0))
+        return result_id, await AsyncDatabaseService.get_audio_result(result_id)
+
+    result_id, result = asyncio.run(main())
+    assert result["id"] == result_id and result["raw_text"] == "raw 0"
+
+
+def test_payload_writes_need_the_pooled_functions(database):
+    database.save_audio_results([record(0)])
+    conn = sqlite3.connect(database.DB_PATH)
+    try:
+        with pytest.raises(sqlite3.OperationalError, match="no such function"):
+            conn.execute("DELETE FROM audio_results")
+        DatabaseService._register_functions(conn)
+        conn.execute("DELETE FROM audio_results")
+        conn.commit()
+    finally:
+        conn.close()
+    assert database.search_audio_results("translated") == []
@@ -0,0 +1,104 @@
+import time
+import types
+import asyncio
+
+import numpy as np
+import soundfile as sf
+
+import src.model.dictation as dictation
+import src.model.pipeline_graph as pipeline_graph
+from src.model.dictation import DictationSession
+
+SAMPLE_RATE = 16000
+# Speech bursts separated by pauses longer than DICTATION_PAUSE_MS; the last one has no trailing pause
+BURSTS = (("silence", 0.5), ("speech", 0.6), ("silence", 1.0), ("speech", 1.2),
+          ("silence", 1.0), ("speech", 1.8))
+WORDS = ("alpha", "beta", "gamma")
+
+
+def synthetic_pcm() -> bytes:
+    rng = np.random.default_rng(0)
+    parts = []
+    for kind, seconds in BURSTS:
+        t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+        noise = 0.001 * rng.standard_normal(len(t))
+        tone = 0.3 * np.sin(2 * np.pi * 440 * t) * (1 + 0.5 * np.sin(2 * np.pi * 3 * t)) if kind == "speech" else 0
+        parts.append(noise + tone)
+    return (np.concatenate(parts) * 32767).astype("<i2").tobytes()
+
+
+def fake_transcribe(path, api_key=None, language=None, preprocess=True, model=None, return_meta=False):
+    """Name segments by length; the first (shortest) answers last to exercise reordering."""
+    seconds = sf.info(path).duration
+    index = 0 if seconds < 1.3 else 1 if seconds < 1.9 else 2
+    if index == 0:
+        time.sleep(0.3)
+    return WORDS[index], {"preprocessing_time": 0.0, "transcription_time": 0.01}
+
+
+def run_session(monkeypatch, frame_bytes: int = 3200):
+    monkeypatch.setattr(dictation.SpeechService, "transcribe_audio", staticmethod(fake_transcribe))
+    monkeypatch.setattr(pipeline_graph, "MedicalValidator", types.SimpleNamespace(
+        validate_medical_content=lambda text: {"classification": "MEDICAL", "confidence": 0.9}))
+    monkeypatch.setattr(pipeline_graph, "RefineText", types.SimpleNamespace(
+        refining_transcription=lambda raw_text, language: raw_text.upper()))
+    monkeypatch.setattr(pipeline_graph, "Translate", types.SimpleNamespace(
+        translate=lambda refined_text: f"translated {refined_text}"))
+    monkeypatch.setattr(pipeline_graph, "ExtractFeature", types.SimpleNamespace(
+        extract=lambda end_text, features: ({"plan": end_text}, "reasoning")))
+
+    async def main():
+        session = DictationSession(language="ar", sample_rate=SAMPLE_RATE, api_key="test", persist=False)
+        pcm = synthetic_pcm()
+        for offset in range(0, len(pcm), frame_bytes):
+            await session.feed(pcm[offset:offset + frame_bytes])
+        await session.finish()
+        events = []
+        while not session.events.empty():
+            events.append(session.events.get_nowait())
+        return session, events
+
+    return asyncio.run(main())
+
+
+def test_segments_at_pauses(monkeypatch):
+    session, _ = run_session(monkeypatch)
+    assert session.segmenter.segments_emitted == 3
+
+
+def test_partial_transcripts_keep_speaking_order(monkeypatch):
+    _, events = run_session(monkeypatch)
+    partials = [data for step, data in events if step == "partial_transcript"]
+    assert sorted(partial["segment"] for partial in partials) == [0, 1, 2]
+    # Segment 0 answers last: later segments wait for it instead of jumping ahead
+    assert partials[-1]["segment"] == 0
+    for partial in partials[:-1]:
+        assert partial["transcript"] == ""
+    assert partials[-1]["transcript"] == "alpha beta gamma"
+
+
+def test_final_events_match_the_file_pipeline(monkeypatch):
+    _, events = run_session(monkeypatch)
+    final = [(step, data) for step, data in events if not step.startswith("partial_")]
+    assert [step for step, _ in final] == [
+        "transcription", "validation", "refinement", "translation", "feature_extraction",
+    ]
+    assert final[0][1] == {"text": "alpha beta gamma"}
+    assert final[2][1]["text"] == "ALPHA BETA GAMMA"
+    assert final[-1][1]["json_data"] == {"plan": "translated ALPHA BETA GAMMA"}
+    assert "timings" in final[-1][1]
+
+
+def test_cancel_stops_pending_work(monkeypatch):
+    monkeypatch.setattr(dictation.SpeechService, "transcribe_audio", staticmethod(fake_transcribe))
+
+    async def main():
+        session = DictationSession(language="ar", sample_rate=SAMPLE_RATE, api_key="test", persist=False)
+        await session.feed(synthetic_pcm())
+        pending = list(session._transcriptions)
+        session.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        return pending
+
+    pending = asyncio.run(main())
+    assert pending and all(task.cancelled() for task in pending)
@@ -0,0 +1,72 @@
+import threading
+
+import pytest
+
+from src.core.database import DatabaseService
+from src.core.encounters import EncounterStore
+from src.model.pipeline_graph import finalize_encounter
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(DatabaseService, "DB_PATH", str(tmp_path / "results.db"))
+    yield EncounterStore()
+    DatabaseService.pool().close_all()
+
+
+def add_clip(store: EncounterStore, encounter_id: str, text: str) -> bool:
+    count = store.get(encounter_id, with_clips=False)["clip_count"]
+    clip = {"filename": f"{text}.wav", "raw_text": text, "refined_text": text.upper(), "translated_text": None,
+            "timings": {"transcription": 1.0}}
+    return store.add_clip(encounter_id, count, clip, {"plan": text}, "")
+
+
+def result_count() -> int:
+    return DatabaseService.pool().connection().execute("SELECT COUNT(*) FROM audio_results").fetchone()[0]
+
+
+def test_finalize_stores_one_result_with_all_clips(store):
+    encounter_id = store.create("en", doctor_name="dr")
+    assert add_clip(store, encounter_id, "history") and add_clip(store, encounter_id, "plan")
+
+    result_id = finalize_encounter(encounter_id, store)
+    result = DatabaseService.get_audio_result(result_id)
+    assert result["raw_text"] == "history\n\nplan"
+    assert result["arabic_text"] == "HISTORY\n\nPLAN"
+    assert result["voice_processing_time"] == 2.0
+
+    encounter = store.get(encounter_id)
+    assert encounter["status"] == EncounterStore.FINALIZED and encounter["result_id"] == result_id
+    assert not add_clip(store, encounter_id, "late")
+
+
+def test_double_finalize_inserts_one_result(store):
+    encounter_id = store.create("en")
+    add_clip(store, encounter_id, "exam")
+
+    barrier = threading.Barrier(4)
+    result_ids = []
+
+    def finalize():
+        barrier.wait()
+        result_ids.append(finalize_encounter(encounter_id, store))
+
+    threads = [threading.Thread(target=finalize) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(result_ids)) == 1 and result_ids[0] is not None
+    assert result_count() == 1
+    assert finalize_encounter(encounter_id, store) == result_ids[0]
+
+
+def test_finalize_rejects_unknown_and_empty_encounters(store):
+    with pytest.raises(ValueError, match="not found"):
+        finalize_encounter("missing", store)
+    encounter_id = store.create("en")
+    with pytest.raises(ValueError, match="no clips"):
+        finalize_encounter(encounter_id, store)
+    assert store.get(encounter_id)["status"] == EncounterStore.OPEN
+    assert result_count() == 0
@@ -0,0 +1,86 @@
+import asyncio
+import threading
+
+from src.core.event_log import EventLogStore, RunEventLog, format_sse, parse_last_event_id
+
+
+def test_replay_and_resume_after_an_event_id():
+    log = RunEventLog("run", max_events=10)
+    for step in ("transcription", "validation", "refinement"):
+        log.append(step, {})
+    log.close()
+    assert [event[1] for event in log.follow()] == ["transcription", "validation", "refinement"]
+    assert [event[0] for event in log.follow(2)] == [3]
+    assert list(log.follow(3)) == []
+
+
+def test_resume_from_an_evicted_id_gets_the_oldest_retained_events():
+    log = RunEventLog("run", max_events=2)
+    for index in range(5):
+        log.append("step", index)
+    log.close()
+    assert [event[0] for event in log.follow(1)] == [4, 5]
+
+
+def test_follow_tails_a_running_log():
+    log = RunEventLog("run")
+
+    def produce():
+        for index in range(3):
+            log.append("step", index)
+        log.close()
+
+    threading.Timer(0.05, produce).start()
+    assert [event[2] for event in log.follow(timeout=5)] == [0, 1, 2]
+
+
+def test_afollow_waits_on_the_event_loop():
+    log = RunEventLog("run")
+    log.append("transcription", {})
+
+    async def main():
+        received = []
+
+        async def read():
+            async for event in log.afollow(0):
+                received.append(event[0])
+
+        reader = asyncio.create_task(read())
+        await asyncio.sleep(0.01)
+        await asyncio.to_thread(log.append, "validation", {})
+        await asyncio.to_thread(log.close)
+        await asyncio.wait_for(reader, 5)
+        return received
+
+    assert asyncio.run(main()) == [1, 2]
+    assert not log._listeners
+
+
+def test_start_run_records_errors_and_closes():
+    store = EventLogStore(ttl=60, max_age=600)
+
+    def events():
+        yield "transcription", {"text": "hi"}
+        raise RuntimeError("upstream 502")
+
+    log = store.start_run(events, run_id="r1")
+    steps = [(event[1], event[2]) for event in log.follow(timeout=5)]
+    assert steps[0] == ("transcription", {"text": "hi"})
+    assert steps[1][0] == "error" and "upstream 502" in steps[1][1]
+    assert store.get("r1") is log and log.closed
+
+
+def test_closed_logs_expire_after_the_ttl():
+    store = EventLogStore(ttl=0, max_age=600)
+    log = store.create("r1")
+    assert store.get("r1") is log
+    log.close()
+    log.closed_at -= 1
+    assert store.get("r1") is None
+
+
+def test_sse_helpers():
+    assert parse_last_event_id(" 7 ") == 7
+    assert parse_last_event_id("abc", 3) == 3
+    assert parse_last_event_id(None) == 0
+    assert format_sse(2, "validation", {"ok": True}) == 'id: 2\ndata: {"step": "validation", "data": {"ok": true}}\n\n'
@@ -0,0 +1,99 @@
+import json
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as fastapi_app
+from src.core.database import DatabaseService
+from src.core.stage_pools import stage_pools
+from src.model.extract_features import ExtractFeature
+from src.model.pipeline_graph import reextract_result
+
+
+@pytest.fixture
+def fake_extract(monkeypatch):
+    """Slow fake extraction that records peak concurrency; a schema named "broken" fails."""
+    lock = threading.Lock()
+    stats = {"running": 0, "peak": 0, "texts": []}
+
+    def extract(end_text, features):
+        with lock:
+            stats["running"] += 1
+            stats["peak"] = max(stats["peak"], stats["running"])
+            stats["texts"].append(end_text)
+        try:
+            time.sleep(0.05)
+            if features == "broken":
+                raise ValueError("model returned invalid JSON")
+            return {"schema": features}, "ok"
+        finally:
+            with lock:
+                stats["running"] -= 1
+
+    monkeypatch.setattr(ExtractFeature, "extract", staticmethod(extract))
+    return stats
+
+
+def test_schemas_run_concurrently_up_to_the_limit(fake_extract):
+    schemas = {f"form{index}": f"schema {index}" for index in range(6)}
+    results = ExtractFeature.extract_many("text", schemas, max_workers=3)
+
+    assert list(results) == list(schemas)
+    assert all(results[name]["json_data"] == {"schema": schema} for name, schema in schemas.items())
+    assert 1 < fake_extract["peak"] <= 3
+
+
+def test_failures_are_reported_per_schema(fake_extract):
+    results = ExtractFeature.extract_many("text", {"a": "schema a", "b": "broken", "c": "schema c"})
+
+    assert results["b"] == {"error": "model returned invalid JSON"}
+    assert results["a"]["json_data"] == {"schema": "schema a"} and results["c"]["reasoning"] == "ok"
+
+
+def test_rejected_submit_releases_its_slot(fake_extract, monkeypatch):
+    submit = stage_pools.submit
+
+    def flaky_submit(stage, fn, features):
+        if features == "rejected":
+            raise RuntimeError("stage queue full")
+        return submit(stage, fn, features)
+
+    monkeypatch.setattr(stage_pools, "submit", flaky_submit)
+    # With one slot, a leaked acquire would block the next schema forever
+    results = ExtractFeature.extract_many("text", {"x": "rejected", "y": "schema y", "z": "rejected"}, max_workers=1)
+
+    assert results["x"] == results["z"] == {"error": "stage queue full"}
+    assert results["y"]["json_data"] == {"schema": "schema y"}
+
+
+def test_reextract_uses_the_stored_end_text(fake_extract):
+    reextract_result({"language": "ar", "translation_text": "translated", "arabic_text": "refined"}, {"a": "s"})
+    reextract_result({"language": "en", "translation_text": None, "arabic_text": "refined"}, {"a": "s"})
+    assert fake_extract["texts"] == ["translated", "refined"]
+    with pytest.raises(ValueError):
+        reextract_result({"language": "ar", "translation_text": None}, {"a": "s"})
+
+
+def test_extract_endpoint(fake_extract, tmp_path, monkeypatch):
+    monkeypatch.setattr(DatabaseService, "DB_PATH", str(tmp_path / "results.db"))
+    assert DatabaseService.initialize_db()
+    result_id = DatabaseService.save_audio_result(
+        user_id=1, filename="visit.wav", language="en", model="whisper", is_conversation=False,
+        raw_text="raw", arabic_text="refined", translation_text=None, json_data="{}", reasoning="",
+        preprocessing_time=0.0, voice_processing_time=0.0, llm_processing_time=0.0,
+    )
+    client = TestClient(fastapi_app.app)
+    try:
+        response = client.post(f"/results/{result_id}/extract",
+                               data={"schemas": json.dumps({"intake": "schema a", "billing": "broken"})})
+        assert response.status_code == 200
+        extractions = response.json()["extractions"]
+        assert extractions["intake"]["json_data"] == {"schema": "schema a"}
+        assert extractions["billing"] == {"error": "model returned invalid JSON"}
+
+        assert client.post(f"/results/{result_id}/extract", data={"schemas": "not json"}).status_code == 400
+        assert client.post("/results/999/extract", data={"schemas": "[\"s\"]"}).status_code == 404
+    finally:
+        DatabaseService.pool().close_all()
@@ -0,0 +1,73 @@
+import time
+
+from src.core.admission import AdmissionController
+from src.core.job_broker import JobBroker
+from src.core.job_queue import JobQueue
+
+
+def queue(tmp_path, **options) -> JobQueue:
+    return JobQueue(db_path=str(tmp_path / "jobs.db"), **options)
+
+
+def test_claims_interactive_jobs_first(tmp_path):
+    jobs = queue(tmp_path)
+    batch = jobs.enqueue({"n": 1})
+    interactive = jobs.enqueue({"n": 2, "priority": AdmissionController.INTERACTIVE})
+    later_batch = jobs.enqueue({"n": 3, "priority": AdmissionController.BATCH})
+    assert [jobs.claim("w")["id"] for _ in range(3)] == [interactive, batch, later_batch]
+    assert jobs.claim("w") is None
+
+
+def test_events_are_sequenced_per_job(tmp_path):
+    jobs = queue(tmp_path)
+    job_id = jobs.enqueue({})
+    jobs.claim("w")
+    jobs.append_event(job_id, "transcription", {"text": "hi"})
+    assert jobs.complete(job_id, "w")
+    steps = [(event["seq"], event["step"]) for event in jobs.get_events(job_id)]
+    assert steps == [(1, "attempt"), (2, "transcription"), (3, "job_status")]
+    assert [event["seq"] for event in jobs.get_events(job_id, after_seq=2)] == [3]
+    assert jobs.get_job(job_id)["status"] == JobBroker.SUCCEEDED
+
+
+def test_expired_lease_is_claimed_again_until_out_of_attempts(tmp_path):
+    jobs = queue(tmp_path, visibility_timeout=0, max_attempts=2)
+    job_id = jobs.enqueue({})
+    assert jobs.claim("w1")["attempts"] == 1
+    assert jobs.claim("w2")["attempts"] == 2
+    # The first worker lost its lease
+    assert not jobs.complete(job_id, "w1")
+    assert jobs.claim("w3") is None
+    job = jobs.get_job(job_id)
+    assert job["status"] == JobBroker.FAILED and "Lease expired" in job["error"]
+
+
+def test_failed_attempt_is_retried_with_backoff(tmp_path):
+    jobs = queue(tmp_path)
+    job_id = jobs.enqueue({})
+    jobs.claim("w")
+    assert jobs.fail(job_id, "w", "upstream 502")
+    job = jobs.get_job(job_id)
+    assert job["status"] == JobBroker.QUEUED and job["visible_at"] > time.time()
+    assert jobs.claim("w") is None
+
+
+def test_prune_removes_old_jobs_events_and_unreferenced_uploads(tmp_path):
+    jobs = queue(tmp_path, retention=60)
+    shared, own = tmp_path / "shared.wav", tmp_path / "own.wav"
+    shared.write_bytes(b"x")
+    own.write_bytes(b"x")
+    old = jobs.enqueue({"file_path": str(own)})
+    retried = jobs.enqueue({"file_path": str(shared)})
+    jobs.claim("w")
+    jobs.complete(old, "w")
+    jobs.claim("w")
+    jobs.complete(retried, "w")
+    pending = jobs.enqueue({"file_path": str(shared)})
+
+    assert jobs.prune(time.time() + 30) == 0
+    assert jobs.prune(time.time() + 120) == 2
+    assert jobs.get_job(old) is None and jobs.get_events(old) == []
+    assert not own.exists()
+    # Still needed by the queued job
+    assert shared.exists() and jobs.get_job(pending) is not None
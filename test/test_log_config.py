@@ -0,0 +1,73 @@
+import logging
+import queue
+
+from src.core.log_config import (
+    ContextFilter, NonBlockingQueueHandler, RedactingFormatter, SamplingFilter, _LOG_DROPPED, log_context,
+)
+
+
+def make_record(msg, *args, level=logging.INFO, name="src.core.database") -> logging.LogRecord:
+    return logging.LogRecord(name, level, __file__, 1, msg, args or None, None)
+
+
+def format_message(formatter: logging.Formatter, record: logging.LogRecord) -> str:
+    ContextFilter().filter(record)
+    return formatter.format(record).rsplit(" - ", 1)[1]
+
+
+def test_long_arguments_are_truncated_or_redacted():
+    transcript = "patient reports chest pain " * 20
+    truncating = RedactingFormatter(max_payload_chars=10, redact=False)
+    assert format_message(truncating, make_record("text: %s", transcript)) == \
+        f"text: {transcript[:10]}... [{len(transcript)} chars]"
+    redacting = RedactingFormatter(max_payload_chars=10, redact=True)
+    assert format_message(redacting, make_record("text: %s", transcript)) == f"text: <redacted {len(transcript)} chars>"
+    assert format_message(redacting, make_record("short: %s", "ok")) == "short: ok"
+
+
+def test_message_is_capped_and_secrets_masked():
+    formatter = RedactingFormatter(max_message_chars=20)
+    assert format_message(formatter, make_record("x" * 30)) == "x" * 20 + "... [10 more chars]"
+    assert format_message(formatter, make_record("Bearer abc.def")) == "Bearer ***"
+    assert format_message(formatter, make_record("api_key='sk-123'")) == "api_key='***'"
+
+
+def test_sampling_keeps_one_in_n_below_warning():
+    sampler = SamplingFilter(SamplingFilter.parse("src.core=0.25, src.model.speech_service=0"))
+    kept = [sampler.filter(make_record("query took %s", index)) for index in range(8)]
+    assert kept == [True, False, False, False, True, False, False, False]
+    # Counted per message template, so another line of the same logger still gets through
+    assert sampler.filter(make_record("other line"))
+    assert sampler.filter(make_record("slow query", level=logging.WARNING))
+    assert not sampler.filter(make_record("chunk", name="src.model.speech_service"))
+    assert sampler.filter(make_record("unsampled", name="src.model.pipeline_graph"))
+
+
+def test_full_queue_drops_and_counts():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    before = _LOG_DROPPED._values.get((), 0.0)
+    for index in range(3):
+        handler.handle(make_record("line %s", index))
+    assert handler.queue.qsize() == 1
+    assert _LOG_DROPPED._values[()] == before + 2
+
+
+def test_arguments_are_snapshotted_when_logged():
+    handler = NonBlockingQueueHandler(queue.Queue())
+    payload, items = {"status": "queued"}, ["a"]
+    handler.handle(make_record("job %s with %s", payload, items))
+    payload["status"] = "done"
+    items.append("b")
+
+    record = handler.queue.get_nowait()
+    assert record.getMessage() == "job {'status': 'queued'} with ['a']"
+
+
+def test_context_ids_are_stamped_in_the_logging_thread():
+    record = make_record("hello")
+    with log_context(request_id="req-1", run_id="run-1"):
+        ContextFilter().filter(record)
+    assert (record.request_id, record.run_id) == ("req-1", "run-1")
+    other = make_record("hello")
+    ContextFilter().filter(other)
+    assert (other.request_id, other.run_id) == ("-", "-")
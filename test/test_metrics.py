@@ -0,0 +1,82 @@
+import types
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as fastapi_app
+import src.model.pipeline_graph as pipeline_graph
+from src.core.metrics import CONTENT_TYPE, STAGE_DURATION, MetricsRegistry, _Metric
+from src.model.pipeline_graph import stream_pipeline
+
+
+def test_exposition_format():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests served.", ("path",))
+    depth = registry.gauge("queue_depth", "Jobs waiting.")
+    latency = registry.histogram("latency_seconds", "Request latency.", ("path",), buckets=(0.1, 1))
+    registry.on_collect(lambda: depth.set(1))
+
+    requests.inc(path='/a"b')
+    requests.inc(2, path='/a"b')
+    for value in (0.05, 0.1, 0.5, 3):
+        latency.observe(value, path="/x")
+
+    assert registry.render() == "\n".join([
+        "# HELP requests_total Requests served.",
+        "# TYPE requests_total counter",
+        'requests_total{path="/a\\"b"} 3',
+        "# HELP queue_depth Jobs waiting.",
+        "# TYPE queue_depth gauge",
+        "queue_depth 1",
+        "# HELP latency_seconds Request latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{path="/x",le="0.1"} 2',
+        'latency_seconds_bucket{path="/x",le="1"} 3',
+        'latency_seconds_bucket{path="/x",le="+Inf"} 4',
+        'latency_seconds_sum{path="/x"} 3.65',
+        'latency_seconds_count{path="/x"} 4',
+    ]) + "\n"
+    assert registry.counter("requests_total", "Registered twice.") is requests
+
+
+def test_metric_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        _Metric("plain", "No samples.")
+
+
+def test_metrics_endpoint():
+    response = TestClient(fastapi_app.app).get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == CONTENT_TYPE
+    assert "# TYPE pipeline_stage_duration_seconds histogram" in response.text
+    assert 'stage_pool_utilization{stage="llm"}' in response.text
+
+
+def test_final_event_carries_stage_timings(monkeypatch):
+    monkeypatch.setattr(pipeline_graph.AudioProbe, "preflight", staticmethod(lambda *args, **kwargs: {}))
+    monkeypatch.setattr(pipeline_graph.SpeechService, "preprocess", staticmethod(lambda path: (path, 0.25)))
+    monkeypatch.setattr(pipeline_graph.SpeechService, "remove_preprocessed", staticmethod(lambda *args: None))
+    monkeypatch.setattr(pipeline_graph.SpeechService, "transcribe_audio", staticmethod(
+        lambda *args, **kwargs: ("raw", {"transcription_time": 1.5})))
+    monkeypatch.setattr(pipeline_graph, "MedicalValidator", types.SimpleNamespace(
+        validate_medical_content=lambda text: {"classification": "MEDICAL", "confidence": 0.9}))
+    monkeypatch.setattr(pipeline_graph, "RefineText", types.SimpleNamespace(
+        refining_transcription=lambda raw_text, language: "refined"))
+    monkeypatch.setattr(pipeline_graph, "Translate", types.SimpleNamespace(translate=lambda refined_text: "translated"))
+    monkeypatch.setattr(pipeline_graph, "ExtractFeature", types.SimpleNamespace(
+        extract=lambda end_text, features: ({"plan": "rest"}, "")))
+
+    def extract_count() -> int:
+        lines = STAGE_DURATION.render()
+        return sum(int(line.rsplit(" ", 1)[1]) for line in lines
+                   if line.startswith('pipeline_stage_duration_seconds_count{stage="extract"'))
+
+    before = extract_count()
+    events = list(stream_pipeline("visit.wav", "ar", api_key="test", persist=False))
+
+    assert [name for name, _ in events][-1] == "feature_extraction"
+    assert all("timings" not in payload for _, payload in events[:-1])
+    timings = events[-1][1]["timings"]
+    assert set(timings) == {"preprocessing", "transcription", "validate", "refine", "translate", "extract"}
+    assert timings["preprocessing"] == 0.25 and timings["transcription"] == 1.5
+    assert extract_count() == before + 1
@@ -0,0 +1,99 @@
+import json
+import os
+
+import pytest
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+from src.core.database import DatabaseService  # noqa: E402
+from src.core.parquet_export import ParquetExporter  # noqa: E402
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    monkeypatch.setattr(DatabaseService, "DB_PATH", str(tmp_path / "results.db"))
+    assert DatabaseService.initialize_db()
+    yield DatabaseService
+    DatabaseService.pool().close_all()
+
+
+def record(index: int, json_data: dict, language: str = "ar") -> dict:
+    return {
+        "user_id": 1, "filename": f"{index}.wav", "language": language, "model": "whisper",
+        "is_conversation": False, "raw_text": "raw", "arabic_text": f"refined {index}",
+        "translation_text": "translated", "json_data": json.dumps(json_data), "reasoning": "",
+        "preprocessing_time": 0.0, "voice_processing_time": 0.0, "llm_processing_time": 0.0,
+    }
+
+
+def exported_rows(output_dir: str) -> list:
+    rows = []
+    for directory, _, files in os.walk(output_dir):
+        for name in sorted(files):
+            if name.endswith(".parquet"):
+                rows.extend(pq.read_table(os.path.join(directory, name)).to_pylist())
+    return sorted(rows, key=lambda row: row["id"])
+
+
+def test_exports_only_rows_above_the_watermark(database, tmp_path):
+    output_dir = str(tmp_path / "exports")
+    database.save_audio_results([record(index, {"plan": "rest", "icd10_codes": ["R51"]}) for index in range(3)])
+    exporter = ParquetExporter(output_dir=output_dir, batch_size=2, db_path=database.DB_PATH)
+
+    assert exporter.export() == {"rows": 3, "files": 2, "start_id": 0, "last_id": 3, "dropped_values": 0}
+    assert exporter.export()["rows"] == 0
+
+    database.save_audio_results([record(3, {"plan": "surgery", "icd10_codes": []}, language="en")])
+    stats = ParquetExporter(output_dir=output_dir, batch_size=2, db_path=database.DB_PATH).export()
+    assert stats == {"rows": 1, "files": 1, "start_id": 3, "last_id": 4, "dropped_values": 0}
+
+    rows = exported_rows(output_dir)
+    assert [row["id"] for row in rows] == [1, 2, 3, 4]
+    assert rows[0]["refined_text"] == "refined 0"
+    assert rows[3]["json_plan"] == "surgery" and rows[3]["json_icd10_codes"] == []
+    with open(os.path.join(output_dir, ParquetExporter.WATERMARK_FILE)) as f:
+        assert json.load(f)["last_id"] == 4
+
+
+def test_values_that_do_not_fit_the_template_type_are_counted(database, tmp_path, caplog):
+    output_dir = str(tmp_path / "exports")
+    database.save_audio_results([record(0, {"pulse": 72}), record(1, {"pulse": "72 bpm"}), record(2, {"pulse": "80"})])
+    stats = ParquetExporter(output_dir=output_dir, db_path=database.DB_PATH).export()
+
+    assert stats["dropped_values"] == 1
+    assert [row["json_pulse"] for row in exported_rows(output_dir)] == [72.0, None, 80.0]
+    assert "values of pulse (not a number) as null" in caplog.text and "[2]" in caplog.text
+
+
+def test_templates_get_separate_datasets(database, tmp_path):
+    output_dir = str(tmp_path / "exports")
+    database.save_audio_results([record(0, {"plan": "rest"}), record(1, {"assessment": "stable"})])
+    ParquetExporter(output_dir=output_dir, db_path=database.DB_PATH).export()
+    templates = [name for name in os.listdir(output_dir) if name.startswith("template=")]
+    assert len(templates) == 2
+
+
+def test_interrupted_batch_is_replaced_not_duplicated(database, tmp_path):
+    output_dir = str(tmp_path / "exports")
+    database.save_audio_results([record(index, {"plan": "rest"}) for index in range(3)])
+    exporter = ParquetExporter(output_dir=output_dir, batch_size=10, db_path=database.DB_PATH)
+    write_batch = exporter._write_batch
+
+    def crash_after_write(rows, batch):
+        write_batch(rows, batch)
+        raise RuntimeError("killed before the watermark was advanced")
+
+    exporter._write_batch = crash_after_write
+    with pytest.raises(RuntimeError):
+        exporter.export()
+    with open(os.path.join(output_dir, ParquetExporter.WATERMARK_FILE)) as f:
+        state = json.load(f)
+    assert state["last_id"] == 0 and state["pending"] == {"start": 1, "end": 3}
+
+    database.save_audio_results([record(3, {"plan": "surgery"})])
+    stats = ParquetExporter(output_dir=output_dir, batch_size=10, db_path=database.DB_PATH).export()
+    assert stats == {"rows": 4, "files": 2, "start_id": 0, "last_id": 4, "dropped_values": 0}
+
+    files = sorted(name for _, _, names in os.walk(output_dir) for name in names if name.startswith("part-"))
+    assert files == ["part-000000000001-000000000003.parquet", "part-000000000004-000000000004.parquet"]
+    assert [row["id"] for row in exported_rows(output_dir)] == [1, 2, 3, 4]
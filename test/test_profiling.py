@@ -0,0 +1,89 @@
+import os
+import time
+import tracemalloc
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as fastapi_app
+from src.core.config import Config
+from src.core.profiling import Profiler, profiler
+
+
+def busy_events(seconds: float = 0.2):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        sum(range(1000))
+    yield "done", {}
+
+
+def test_profiled_run_stores_artifacts_and_stops_the_sampler(tmp_path):
+    profiles = Profiler(folder=str(tmp_path), sample_rate=0, interval=0.005, max_artifacts=2)
+    assert list(profiles.profile_run("run-1", busy_events, enabled=True)) == [("done", {})]
+
+    report = profiles.load("run-1")
+    assert report["samples"] > 0 and report["wall_seconds"] >= 0.2
+    assert any("busy_events" in entry["function"] for entry in report["functions"])
+    assert "busy_events" in profiles.load_folded("run-1", "wall")
+    assert profiles.load_folded("run-1", "cpu") is not None
+
+    deadline = time.monotonic() + 2
+    while profiles._thread is not None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert profiles._thread is None
+    assert not tracemalloc.is_tracing()
+
+
+def test_unprofiled_runs_store_nothing(tmp_path):
+    profiles = Profiler(folder=str(tmp_path), sample_rate=0)
+    assert list(profiles.profile_run("run-1", busy_events, enabled=False)) == [("done", {})]
+    assert profiles.list() == [] and profiles._thread is None
+    assert profiles.should_profile("1") and not profiles.should_profile(None)
+
+
+def test_only_the_newest_artifacts_are_kept(tmp_path):
+    profiles = Profiler(folder=str(tmp_path), sample_rate=0, interval=0.005, max_artifacts=2)
+    for index in range(3):
+        list(profiles.profile_run(f"run-{index}", lambda: busy_events(0.01), enabled=True))
+        os.utime(profiles.path(f"run-{index}", ".json"), (index, index))
+    list(profiles.profile_run("run-3", lambda: busy_events(0.01), enabled=True))
+    assert [profile["run_id"] for profile in profiles.list()] == ["run-3", "run-2"]
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        f"run-{index}{suffix}" for index in (2, 3) for suffix in (".json", ".wall.folded", ".cpu.folded")
+    )
+
+
+def test_unsafe_run_ids_are_rejected(tmp_path):
+    profiles = Profiler(folder=str(tmp_path / "profiles"), sample_rate=0, interval=0.005)
+    (tmp_path / "secret.json").write_text("{}")
+    for run_id in ("../secret", "a/b", "", "x" * 129, "run.1"):
+        assert profiles.path(run_id, ".json") is None
+        assert profiles.load(run_id) is None and profiles.load_folded(run_id) is None
+    list(profiles.profile_run("../escape", lambda: busy_events(0.01), enabled=True))
+    assert not os.path.exists(tmp_path / "escape.json") and profiles.list() == []
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiler, "folder", str(tmp_path))
+    list(profiler.profile_run("stored-run", lambda: busy_events(0.01), enabled=True))
+    return TestClient(fastapi_app.app)
+
+
+def test_admin_endpoints_fail_closed_without_a_token(client, monkeypatch):
+    monkeypatch.setattr(Config, "ADMIN_TOKEN", None)
+    for headers in ({}, {"X-Admin-Token": ""}, {"X-Admin-Token": "anything"}):
+        assert client.get("/admin/profiles", headers=headers).status_code == 403
+        assert client.get("/admin/profiles/stored-run", headers=headers).status_code == 403
+
+
+def test_admin_endpoints_with_a_token(client, monkeypatch):
+    monkeypatch.setattr(Config, "ADMIN_TOKEN", "s3cret")
+    assert client.get("/admin/profiles", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+    headers = {"X-Admin-Token": "s3cret"}
+    assert [p["run_id"] for p in client.get("/admin/profiles", headers=headers).json()["profiles"]] == ["stored-run"]
+    assert client.get("/admin/profiles/stored-run", headers=headers).json()["run_id"] == "stored-run"
+    assert client.get("/admin/profiles/stored-run/flamegraph?kind=cpu", headers=headers).status_code == 200
+    assert client.get("/admin/profiles/run.1", headers=headers).status_code == 404
+    assert client.get("/admin/profiles/missing/flamegraph", headers=headers).status_code == 404
@@ -0,0 +1,88 @@
+import time
+import types
+
+import pytest
+
+from src.core.database import DatabaseService
+from src.core.result_writer import ResultWriter
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    monkeypatch.setattr(DatabaseService, "DB_PATH", str(tmp_path / "results.db"))
+    assert DatabaseService.initialize_db()
+    yield DatabaseService
+    DatabaseService.pool().close_all()
+
+
+@pytest.fixture
+def saved_batches(database, monkeypatch):
+    batches = []
+    save = DatabaseService.save_audio_results
+
+    def recording_save(records):
+        batches.append([record["filename"] for record in records])
+        return save(records)
+
+    monkeypatch.setattr(DatabaseService, "save_audio_results", recording_save)
+    return batches
+
+
+def record(index: int, **overrides) -> dict:
+    return {
+        "user_id": 1, "filename": f"{index}.wav", "language": "en", "model": "whisper",
+        "is_conversation": False, "raw_text": "raw", "arabic_text": "refined", "translation_text": None,
+        "json_data": "{}", "reasoning": "", "preprocessing_time": 0.0, "voice_processing_time": 0.0,
+        "llm_processing_time": 0.0, **overrides,
+    }
+
+
+def stored_filenames() -> list:
+    rows = DatabaseService.pool().connection().execute("SELECT filename FROM audio_results ORDER BY id")
+    return [row[0] for row in rows.fetchall()]
+
+
+def test_full_batches_are_written_in_one_transaction(saved_batches):
+    writer = ResultWriter(batch_size=3, flush_interval=60)
+    for index in range(3):
+        assert writer.submit(record(index))
+
+    deadline = time.monotonic() + 5
+    while writer.written < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    writer.stop()
+
+    assert saved_batches == [["0.wav", "1.wav", "2.wav"]]
+    assert stored_filenames() == ["0.wav", "1.wav", "2.wav"]
+
+
+def test_stop_drains_pending_records(saved_batches):
+    writer = ResultWriter(batch_size=4, flush_interval=60)
+    for index in range(6):
+        writer.submit(record(index))
+    writer.stop()
+
+    assert writer.written == 6 and writer.dropped == 0
+    assert [len(batch) for batch in saved_batches] == [4, 2]
+    # Only the writer thread's connection is closed; this thread's is still usable
+    assert stored_filenames() == [f"{index}.wav" for index in range(6)]
+
+
+def test_a_failing_record_only_drops_itself(saved_batches):
+    writer = ResultWriter(batch_size=10, flush_interval=60)
+    writer.submit(record(0))
+    writer.submit(record(1, filename=None))  # violates NOT NULL
+    writer.submit(record(2))
+    writer.stop()
+
+    assert writer.written == 2 and writer.dropped == 1
+    assert stored_filenames() == ["0.wav", "2.wav"]
+    assert saved_batches[0] == ["0.wav", None, "2.wav"]
+
+
+def test_submit_drops_when_the_queue_is_full(database):
+    writer = ResultWriter(batch_size=10, flush_interval=60, max_queue=1)
+    writer._thread = types.SimpleNamespace(is_alive=lambda: True)  # no writer thread drains the queue
+    assert writer.submit(record(0))
+    assert not writer.submit(record(1))
+    assert writer.dropped == 1
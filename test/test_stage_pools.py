@@ -0,0 +1,105 @@
+import threading
+import time
+
+import pytest
+
+from src.core.log_config import log_context, request_id_var
+from src.core.stage_pools import StagePool, StagePools, StageQueueFull
+
+
+def wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.01)
+
+
+def test_full_queue_rejects_after_the_submit_timeout():
+    pool = StagePool("test", workers=1, max_queue=1, submit_timeout=0.05)
+    gate = threading.Event()
+    running = pool.submit(gate.wait)
+    wait_for(lambda: pool.stats()["busy"] == 1)
+    queued = pool.submit(lambda: "queued")
+
+    with pytest.raises(StageQueueFull, match="queue is full"):
+        pool.submit(lambda: "rejected")
+    assert pool.stats()["rejected"] == 1 and pool.stats()["submitted"] == 2
+
+    gate.set()
+    assert running.result(timeout=5) is True and queued.result(timeout=5) == "queued"
+
+
+def test_full_queue_blocks_without_a_timeout():
+    pool = StagePool("test", workers=1, max_queue=1)
+    gate = threading.Event()
+    pool.submit(gate.wait)
+    wait_for(lambda: pool.stats()["busy"] == 1)
+    pool.submit(lambda: None)
+
+    submitted = threading.Event()
+    threading.Thread(target=lambda: (pool.submit(lambda: None), submitted.set()), daemon=True).start()
+    assert not submitted.wait(0.1)
+    gate.set()
+    assert submitted.wait(5)
+
+
+def test_workers_run_in_the_callers_context():
+    pool = StagePool("test", workers=2, max_queue=4)
+    with log_context(request_id="req-1"):
+        assert pool.run(request_id_var.get) == "req-1"
+    assert pool.run(request_id_var.get) is None
+
+
+def test_exceptions_reach_the_caller():
+    pool = StagePool("test", workers=1, max_queue=4)
+    with pytest.raises(ZeroDivisionError):
+        pool.run(lambda: 1 / 0)
+    assert pool.stats()["failed"] == 1
+
+
+def test_resize_under_load():
+    pool = StagePool("test", workers=1, max_queue=32)
+    lock = threading.Lock()
+    state = {"running": 0, "peak": 0}
+    gate = threading.Event()
+
+    def task():
+        with lock:
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+        gate.wait()
+        with lock:
+            state["running"] -= 1
+
+    futures = [pool.submit(task) for _ in range(8)]
+    wait_for(lambda: state["running"] == 1)
+    pool.resize(4)
+    wait_for(lambda: state["running"] == 4)
+    assert pool.stats()["workers"] == 4
+
+    pool.resize(2)
+    gate.set()
+    for future in futures:
+        future.result(timeout=5)
+    wait_for(lambda: len(pool._threads) == 2)
+    assert state["peak"] == 4 and pool.stats()["completed"] == 8
+
+    # The remaining workers keep serving
+    gate.clear()
+    more = [pool.submit(task) for _ in range(4)]
+    wait_for(lambda: state["running"] == 2)
+    time.sleep(0.05)
+    assert state["running"] == 2
+    gate.set()
+    for future in more:
+        future.result(timeout=5)
+
+
+def test_utilization_and_bottleneck():
+    pools = StagePools(preprocess_workers=1, transcription_workers=1, llm_workers=2, max_queue=4)
+    assert pools.stats()["bottleneck"] is None
+    pools.run(StagePools.LLM, time.sleep, 0.1)
+    stats = pools.stats()
+    assert stats["bottleneck"] == StagePools.LLM
+    assert 0 < stats["stages"][StagePools.LLM]["utilization"] <= 0.5
+    assert stats["stages"][StagePools.LLM]["completed"] == 1
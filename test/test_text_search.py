@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from src.core.database import DatabaseService
+from src.core.text_search import build_match_query, flatten_json_values, normalize_arabic
+
+
+def test_normalize_arabic_folds_spelling_variants():
+    assert normalize_arabic("أَحْمَد") == normalize_arabic("احمد") == "احمد"
+    assert normalize_arabic("مستشفى") == "مستشفي"
+    assert normalize_arabic("صـــحة") == normalize_arabic("صحة") == "صحه"
+    assert normalize_arabic("") == ""
+
+
+def test_flatten_json_values_keeps_leaf_values_only():
+    document = {"chief_complaint": "headache", "icd10_codes": ["R51", ""], "plan": {"drug": "paracetamol", "x": None}}
+    assert flatten_json_values(json.dumps(document)).split("\n") == ["headache", "R51", "paracetamol"]
+    assert flatten_json_values("not json") == "not json"
+    assert flatten_json_values(None) == ""
+
+
+def test_build_match_query_quotes_terms_and_prefixes_the_last():
+    assert build_match_query("chest pain") == '"chest" AND "pain"*'
+    assert build_match_query("السُّكَّري") == '"السكري"*'
+
+
+def test_build_match_query_neutralizes_fts_syntax():
+    assert build_match_query('pain" OR NOT * (x') == '"pain" AND "OR" AND "NOT" AND "x"*'
+    with pytest.raises(ValueError):
+        build_match_query(" *** ")
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    monkeypatch.setattr(DatabaseService, "DB_PATH", str(tmp_path / "results.db"))
+    assert DatabaseService.initialize_db()
+    yield DatabaseService
+    DatabaseService.pool().close_all()
+
+
+def record(refined: str, translation: str, complaint: str, **overrides) -> dict:
+    return {
+        "user_id": 1, "filename": "a.wav", "language": "ar", "model": "whisper", "is_conversation": False,
+        "raw_text": refined, "arabic_text": refined, "translation_text": translation,
+        "json_data": json.dumps({"chief_complaint": complaint}), "reasoning": "", "preprocessing_time": 0.0,
+        "voice_processing_time": 0.0, "llm_processing_time": 0.0, **overrides,
+    }
+
+
+def test_search_matches_normalized_text_and_extracted_fields(database):
+    database.save_audio_results([
+        record("مريض يعاني من أَلم في الصدر", "patient has chest pain", "chest pain"),
+        record("صداع مستمر", "persistent headache", "headache", doctor_name="Amr"),
+    ])
+    assert [hit["filename"] for hit in database.search_audio_results("الم")] == ["a.wav"]
+    hits = database.search_audio_results("headache")
+    assert len(hits) == 1 and hits[0]["doctor_name"] == "Amr" and "[headache]" in hits[0]["snippet"]
+    assert database.search_audio_results("head", doctor_name="Other") == []
+
+
+def test_search_index_follows_deletes(database):
+    database.save_audio_results([record("نص", "ibuprofen twice daily", "fever")])
+    assert len(database.search_audio_results("ibuprofen")) == 1
+    with database.pool().transaction() as conn:
+        conn.execute("DELETE FROM audio_results")
+    assert database.search_audio_results("ibuprofen") == []
@@ -1,13 +1,19 @@
 from locust import HttpUser, task, between
+import os
 import time
 
+# Audio posted by every user; run the app against benchmarks/fireworks_stub.py to keep it offline
+AUDIO_PATH = os.getenv(
+    "LOAD_TEST_AUDIO", os.path.join(os.path.dirname(os.path.abspath(__file__)), "uploads", "dr_amr_elkiki2.ogg")
+)
+
 class AnalyzeUser(HttpUser):
     wait_time = between(1, 3)
 
     @task
     def analyze_audio(self):
-        with open("/Users/muhammedamr/Desktop/AHBS/Medical_voice_assistant/uploads/dr_elshwtfy.ogg", "rb") as audio_file:
-            files = {"audio": ("dr_elshwtfy.ogg", audio_file, "audio/ogg")}
+        with open(AUDIO_PATH, "rb") as audio_file:
+            files = {"audio": (os.path.basename(AUDIO_PATH), audio_file, "audio/ogg")}
             data = {"language": "ar"}
 
             start_time = time.time()